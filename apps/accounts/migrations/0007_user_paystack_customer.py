@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_courierprofile_account_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='paystack_customer_code',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='paystack_customer_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
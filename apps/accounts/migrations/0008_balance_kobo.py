@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:38
+
+from decimal import Decimal
+
+import apps.core.money
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+BALANCE_MODELS = ['userprofile', 'courierprofile']
+
+
+def naira_to_kobo(apps, schema_editor):
+    for model_name in BALANCE_MODELS:
+        apps.get_model('accounts', model_name).objects.update(balance=Round(F('balance') * 100))
+
+
+def kobo_to_naira(apps, schema_editor):
+    for model_name in BALANCE_MODELS:
+        apps.get_model('accounts', model_name).objects.update(balance=F('balance') * Decimal('0.01'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_paystack_customer'),
+    ]
+
+    # Widen the Naira columns so they can hold kobo, convert the values, then
+    # switch to integer kobo
+    operations = [
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name='balance',
+                field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20),
+            )
+            for model_name in BALANCE_MODELS
+        ],
+        migrations.RunPython(naira_to_kobo, kobo_to_naira),
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name='balance',
+                field=apps.core.money.MoneyField(default=0, help_text='Available balance in kobo'),
+            )
+            for model_name in BALANCE_MODELS
+        ],
+    ]
@@ -3,9 +3,9 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import RegexValidator
-from decimal import Decimal
 
 from apps.core.models import AbstractBaseModel
+from apps.core.money import MoneyField
 
 
 def validate_image_file(value):
@@ -67,6 +67,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_superuser = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
     last_login = models.DateTimeField(null=True, blank=True)
+    # Paystack customer, stored once known so DVA calls can skip the lookup
+    paystack_customer_code = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    paystack_customer_id = models.CharField(max_length=255, blank=True, null=True)
 
     objects = UserManager()
 
@@ -114,11 +117,9 @@ class UserProfile(AbstractBaseModel):
         validators=[validate_image_file],
         help_text='User profile image'
     )
-    balance = models.DecimalField(
-        max_digits=12,
-        decimal_places=2,
-        default=Decimal('0.00'),
-        help_text='Available balance (always rounded to 2 decimal places)'
+    balance = MoneyField(
+        default=0,
+        help_text='Available balance in kobo'
     )
     # Add more customer-specific fields as needed
 
@@ -130,6 +131,14 @@ class UserProfile(AbstractBaseModel):
     def __str__(self):
         return f"{self.full_name} - {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Invalidate the cached balance on direct saves too (e.g. admin edits)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'balance' in update_fields:
+            from apps.core.utils import invalidate_cached_balance
+            invalidate_cached_balance(self.user_id)
+
 
 class CourierProfile(AbstractBaseModel):
     """
@@ -161,11 +170,9 @@ class CourierProfile(AbstractBaseModel):
         validators=[validate_image_file],
         help_text='Courier profile image'
     )
-    balance = models.DecimalField(
-        max_digits=12,
-        decimal_places=2,
-        default=Decimal('0.00'),
-        help_text='Available balance (always rounded to 2 decimal places)'
+    balance = MoneyField(
+        default=0,
+        help_text='Available balance in kobo'
     )
     
     # Bank Verification Number
@@ -237,3 +244,11 @@ class CourierProfile(AbstractBaseModel):
     def __str__(self):
         return f"{self.full_name} - {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Invalidate the cached balance on direct saves too (e.g. admin edits)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'balance' in update_fields:
+            from apps.core.utils import invalidate_cached_balance
+            invalidate_cached_balance(self.user_id)
+
@@ -3,6 +3,7 @@ from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from apps.core.utils import get_user_balance
 import os
 
 User = get_user_model()
@@ -85,12 +86,8 @@ class UserSerializer(serializers.ModelSerializer):
         return None
     
     def get_balance(self, obj):
-        """Get balance from profile"""
-        if obj.user_type == 'USER' and hasattr(obj, 'user_profile'):
-            return str(obj.user_profile.balance)
-        elif obj.user_type == 'COURIER' and hasattr(obj, 'courier_profile'):
-            return str(obj.courier_profile.balance)
-        return "0.00"
+        """Get balance from the balance cache, falling back to the profile"""
+        return str(get_user_balance(obj))
     
     def get_isAddressSet(self, obj):
         """Check if user has set their address"""
@@ -0,0 +1,123 @@
+"""
+K-sortable, collision-free identifiers for business references.
+
+IDs follow the ULID layout with a node field carved out of the random part:
+
+    48 bits  milliseconds since the Unix epoch
+    16 bits  node id (ID_GENERATOR_NODE_ID setting, or derived from the hostname)
+    64 bits  per-process monotonic sequence, randomly seeded
+
+and are encoded as 26 Crockford base32 characters, so lexical order matches
+creation order. Uniqueness needs no database round trip: the node field
+separates hosts, and each process (re)seeds its sequence with 64 random bits
+after start-up or fork.
+"""
+import os
+import secrets
+import socket
+import threading
+import time
+import zlib
+
+from django.conf import settings
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ID_LENGTH = 26
+
+_NODE_BITS = 16
+_SEQUENCE_BITS = 64
+_MAX_NODE = (1 << _NODE_BITS) - 1
+_MAX_SEQUENCE = (1 << _SEQUENCE_BITS) - 1
+
+
+def _default_node_id():
+    """Node id from settings, falling back to a stable hash of the hostname"""
+    configured = getattr(settings, 'ID_GENERATOR_NODE_ID', None)
+    if configured not in (None, ''):
+        return int(configured) & _MAX_NODE
+    return zlib.crc32(socket.gethostname().encode('utf-8')) & _MAX_NODE
+
+
+def _encode(value):
+    chars = []
+    for _ in range(ID_LENGTH):
+        chars.append(CROCKFORD_ALPHABET[value & 0x1F])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+class IdGenerator:
+    """
+    Thread-safe generator of monotonic 128-bit identifiers.
+    """
+
+    def __init__(self, node_id=None):
+        self._node_id = node_id
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_ms = 0
+        self._sequence = 0
+
+    @property
+    def node_id(self):
+        if self._node_id is None:
+            self._node_id = _default_node_id()
+        return self._node_id
+
+    def _next_components(self):
+        with self._lock:
+            pid = os.getpid()
+            if pid != self._pid:
+                # Fresh process (or forked worker): never continue the parent's sequence
+                self._pid = pid
+                self._last_ms = 0
+
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = secrets.randbits(_SEQUENCE_BITS - 1)
+            elif self._sequence < _MAX_SEQUENCE:
+                # Same millisecond, or the clock moved backwards: stay monotonic
+                self._sequence += 1
+            else:
+                self._last_ms += 1
+                self._sequence = secrets.randbits(_SEQUENCE_BITS - 1)
+
+            return self._last_ms, self._sequence
+
+    def generate(self):
+        """
+        Generate a new identifier.
+
+        Returns:
+            str: 26-character Crockford base32 string
+        """
+        timestamp_ms, sequence = self._next_components()
+        value = (
+            (timestamp_ms << (_NODE_BITS + _SEQUENCE_BITS))
+            | (self.node_id << _SEQUENCE_BITS)
+            | sequence
+        )
+        return _encode(value)
+
+
+_generator = IdGenerator()
+
+
+def generate_id():
+    """Generate a k-sortable identifier using the process-wide generator"""
+    return _generator.generate()
+
+
+def generate_reference(prefix, separator='_'):
+    """
+    Generate a prefixed reference, e.g. ``TXN_01HZX3K8J6Q1W0000F3Z9D7B2M``.
+
+    Args:
+        prefix: Reference prefix (e.g. 'TXN', 'ORD')
+        separator: Separator between prefix and id (default: '_')
+
+    Returns:
+        str: Prefixed reference
+    """
+    return f"{prefix}{separator}{generate_id()}"
@@ -0,0 +1,253 @@
+"""
+Idempotency-Key support for function-based API views.
+
+Clients send an ``Idempotency-Key`` header with unsafe requests they may
+retry. The first request with a given key runs the view and, if it reached a
+final outcome, its response is stored against the key; retries with the same
+key and payload get the stored response back without the view (and therefore
+Paystack) being called again. Transient failures (5xx, 409 and 429) release
+the key so the retry runs the view again.
+A retry that arrives while the first request is still running waits briefly
+for it to finish instead of running concurrently.
+
+Records live in the database so every worker process sees them; completed
+responses are also kept in the cache for fast replays.
+"""
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.core.models import IdempotencyRecord
+from apps.core.response import error_response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+IDEMPOTENCY_CACHE_VERSION = 1
+
+# Poll interval while waiting on an in-flight request with the same key
+_POLL_INTERVAL = 0.05
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name='Idempotency-Key',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        'Unique key for safely retrying this request. Retries with the same key '
+        'and payload return the original response without repeating the operation.'
+    ),
+)
+
+
+def _key_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+
+
+def _lock_timeout():
+    return getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 120)
+
+
+def _wait_timeout():
+    return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 5)
+
+
+def _cache_key(user_id, scope, key):
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return f"idempotency:{user_id}:{scope}:{digest}"
+
+
+def _fingerprint(request):
+    """Hash of the method, path and request payload"""
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    raw = f"{request.method}:{request.path}:{payload}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _is_final(response):
+    """Whether a response is a business outcome worth replaying"""
+    code = response.status_code
+    return 200 <= code < 300 or (400 <= code < 500 and code not in (409, 429))
+
+
+def _replay(response_status, response_body):
+    response = Response(response_body, status=response_status)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _mismatch_response():
+    return error_response(
+        'Idempotency-Key has already been used with a different request',
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+def _claim(user, scope, key, fingerprint):
+    """
+    Try to become the request that runs the view for this key.
+
+    Returns:
+        tuple: (record, owner) where owner is True if the caller must run the view
+    """
+    now = timezone.now()
+    try:
+        with db_transaction.atomic():
+            record = IdempotencyRecord.objects.create(
+                user=user,
+                scope=scope,
+                key=key,
+                fingerprint=fingerprint,
+                locked_until=now + timedelta(seconds=_lock_timeout()),
+                expires_at=now + timedelta(seconds=_key_ttl()),
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyRecord.objects.filter(user=user, scope=scope, key=key).first()
+    if record is None or record.expires_at > now:
+        return record, False
+
+    # Expired key: reuse the row for this request
+    updated = IdempotencyRecord.objects.filter(pk=record.pk, expires_at__lte=now).update(
+        fingerprint=fingerprint,
+        status='IN_PROGRESS',
+        response_status=None,
+        response_body=None,
+        locked_until=now + timedelta(seconds=_lock_timeout()),
+        expires_at=now + timedelta(seconds=_key_ttl()),
+    )
+    record.refresh_from_db()
+    return record, bool(updated)
+
+
+def _take_over(record):
+    """Take over a record whose owner died without releasing its lock"""
+    now = timezone.now()
+    return IdempotencyRecord.objects.filter(
+        pk=record.pk,
+        status='IN_PROGRESS',
+        locked_until__lte=now
+    ).update(locked_until=now + timedelta(seconds=_lock_timeout())) == 1
+
+
+def _complete(record, cache_key, response):
+    body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+    IdempotencyRecord.objects.filter(pk=record.pk).update(
+        status='COMPLETED',
+        response_status=response.status_code,
+        response_body=body,
+    )
+    try:
+        cache.set(
+            cache_key,
+            {'fingerprint': record.fingerprint, 'status': response.status_code, 'body': body},
+            timeout=max(int((record.expires_at - timezone.now()).total_seconds()), 1),
+            version=IDEMPOTENCY_CACHE_VERSION,
+        )
+    except Exception as e:
+        logger.warning(f"Idempotency cache write failed for {record.scope}: {e}")
+
+
+def _get_cached(cache_key):
+    try:
+        return cache.get(cache_key, version=IDEMPOTENCY_CACHE_VERSION)
+    except Exception as e:
+        logger.warning(f"Idempotency cache read failed: {e}")
+        return None
+
+
+def idempotent(scope):
+    """
+    Decorator adding Idempotency-Key handling to a DRF function-based view.
+
+    Place it below ``@api_view``/``@permission_classes`` so it receives the
+    authenticated DRF request. Requests without the header are unaffected.
+
+    Args:
+        scope: Name identifying the endpoint; keys are unique per user and scope
+
+    Returns:
+        Decorated view function
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = (request.META.get(IDEMPOTENCY_HEADER) or '').strip()
+            if not key or not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return error_response(
+                    f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters',
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            fingerprint = _fingerprint(request)
+            cache_key = _cache_key(request.user.pk, scope, key)
+
+            # Fast path: completed responses are immutable until the key expires
+            cached = _get_cached(cache_key)
+            if cached is not None:
+                if cached['fingerprint'] != fingerprint:
+                    return _mismatch_response()
+                return _replay(cached['status'], cached['body'])
+
+            record, owner = _claim(request.user, scope, key, fingerprint)
+            deadline = time.monotonic() + _wait_timeout()
+            while not owner:
+                if record is not None:
+                    if record.fingerprint != fingerprint:
+                        return _mismatch_response()
+                    if record.status == 'COMPLETED':
+                        return _replay(record.response_status, record.response_body)
+                    if record.locked_until <= timezone.now() and _take_over(record):
+                        logger.warning(f"Took over stale idempotency lock for {scope} (user {request.user.pk})")
+                        break
+                if time.monotonic() >= deadline:
+                    return error_response(
+                        'A request with this Idempotency-Key is still being processed. Please retry shortly.',
+                        status_code=status.HTTP_409_CONFLICT
+                    )
+                time.sleep(_POLL_INTERVAL)
+                if record is not None:
+                    record = IdempotencyRecord.objects.filter(pk=record.pk).first()
+                if record is None:
+                    # The previous owner failed and released the key
+                    record, owner = _claim(request.user, scope, key, fingerprint)
+
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                # Nothing was recorded; let the client retry with the same key
+                IdempotencyRecord.objects.filter(pk=record.pk, status='IN_PROGRESS').delete()
+                raise
+
+            if getattr(response, 'data', None) is None or not _is_final(response):
+                # Transient failure; release the key so a retry runs the view again
+                IdempotencyRecord.objects.filter(pk=record.pk, status='IN_PROGRESS').delete()
+                return response
+
+            _complete(record, cache_key, response)
+            return response
+
+        return wrapper
+
+    return decorator
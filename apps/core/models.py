@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -13,3 +15,46 @@ class AbstractBaseModel(models.Model):
         abstract = True
         ordering = ['-created_at']
 
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored outcome of a request made with an Idempotency-Key header.
+    
+    While the first request is running the record is IN_PROGRESS and holds a
+    short lock; once it finishes the response is stored so retries with the
+    same key are answered without re-running the view.
+    """
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In Progress'),
+        ('COMPLETED', 'Completed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_records'
+    )
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'idempotency_records'
+        verbose_name = 'Idempotency Record'
+        verbose_name_plural = 'Idempotency Records'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'scope', 'key'],
+                name='uniq_idempotency_user_scope_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} - {self.key} - {self.status}"
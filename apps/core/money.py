@@ -0,0 +1,275 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+from django import forms
+from django.core import validators
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from rest_framework import serializers
+
+_CENT = Decimal('0.01')
+
+
+def _round_half_up(numerator, denominator):
+    """Integer division of numerator by a positive denominator, rounding half away from zero"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+@total_ordering
+class Money:
+    """
+    An immutable Naira amount stored as a whole number of kobo.
+
+    Arithmetic and comparisons stay in integers, so there is no Decimal
+    context or float rounding on the hot paths. Convert at the edges with
+    from_naira()/naira for user input and display, and use kobo directly for
+    Paystack, which already speaks kobo.
+    """
+    __slots__ = ('kobo',)
+
+    def __init__(self, kobo=0):
+        if isinstance(kobo, bool) or not isinstance(kobo, int):
+            raise TypeError(f"Money must be built from integer kobo, not {type(kobo).__name__}")
+        object.__setattr__(self, 'kobo', kobo)
+
+    @classmethod
+    def from_kobo(cls, kobo):
+        """Build Money from a kobo amount such as a Paystack 'amount' field"""
+        if isinstance(kobo, cls):
+            return kobo
+        return cls(int(kobo))
+
+    @classmethod
+    def from_naira(cls, amount):
+        """
+        Build Money from a Naira amount, rounding to the nearest kobo.
+
+        Args:
+            amount: Decimal, int or numeric string in Naira
+
+        Returns:
+            Money
+        """
+        if isinstance(amount, cls):
+            return amount
+        if isinstance(amount, float):
+            # Go through the shortest repr so 0.1 is 10 kobo, not 0.1000000000000000055...
+            amount = repr(amount)
+        try:
+            value = Decimal(amount) if not isinstance(amount, Decimal) else amount
+            return cls(int(value.quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2)))
+        except (InvalidOperation, ValueError, TypeError):
+            raise ValueError(f"Invalid amount: {amount!r}")
+
+    @property
+    def naira(self):
+        """The amount in Naira as a two-place Decimal"""
+        return Decimal(self.kobo).scaleb(-2)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Money is immutable')
+
+    def __reduce__(self):
+        return (Money, (self.kobo,))
+
+    def deconstruct(self):
+        return ('apps.core.money.Money', (self.kobo,), {})
+
+    def __repr__(self):
+        return f"Money({self.kobo})"
+
+    def __str__(self):
+        return str(self.naira)
+
+    def __format__(self, format_spec):
+        return format(self.naira, format_spec) if format_spec else str(self)
+
+    def __hash__(self):
+        return hash(self.kobo)
+
+    def __bool__(self):
+        return self.kobo != 0
+
+    def _other_kobo(self, other):
+        if isinstance(other, Money):
+            return other.kobo
+        if isinstance(other, int) and not isinstance(other, bool) and other == 0:
+            # Allow comparisons against a literal zero and sum() starting at 0
+            return 0
+        return None
+
+    def __eq__(self, other):
+        kobo = self._other_kobo(other)
+        if kobo is None:
+            return NotImplemented
+        return self.kobo == kobo
+
+    def __lt__(self, other):
+        kobo = self._other_kobo(other)
+        if kobo is None:
+            return NotImplemented
+        return self.kobo < kobo
+
+    def __add__(self, other):
+        kobo = self._other_kobo(other)
+        if kobo is None:
+            return NotImplemented
+        return Money(self.kobo + kobo)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        kobo = self._other_kobo(other)
+        if kobo is None:
+            return NotImplemented
+        return Money(self.kobo - kobo)
+
+    def __rsub__(self, other):
+        kobo = self._other_kobo(other)
+        if kobo is None:
+            return NotImplemented
+        return Money(kobo - self.kobo)
+
+    def __neg__(self):
+        return Money(-self.kobo)
+
+    def __abs__(self):
+        return Money(abs(self.kobo))
+
+    def __mul__(self, other):
+        """
+        Multiply by an integer count or a rate.
+
+        Rates (Decimal or numeric string, e.g. a fee or payout percentage) are
+        applied with exact integer arithmetic and rounded half up to the kobo.
+        """
+        if isinstance(other, bool):
+            return NotImplemented
+        if isinstance(other, int):
+            return Money(self.kobo * other)
+        if isinstance(other, str):
+            other = Decimal(other)
+        if isinstance(other, Decimal):
+            numerator, denominator = other.as_integer_ratio()
+            return Money(_round_half_up(self.kobo * numerator, denominator))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+
+ZERO = Money(0)
+
+
+class MoneyJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder that writes Money as a Naira string, like a Decimal"""
+
+    def default(self, o):
+        if isinstance(o, Money):
+            return str(o)
+        return super().default(o)
+
+
+class MoneyDescriptor(DeferredAttribute):
+    """Coerces values assigned to a MoneyField attribute to Money"""
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = self.field.to_python(value)
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    Stores a Money amount as integer kobo.
+
+    Accepts Money, or a Decimal or string in Naira (admin forms, fixtures,
+    API input). A bare int could mean either unit, so only 0 is accepted
+    (e.g. default=0); build Money(kobo) or Money.from_naira() instead. Query
+    expressions pass through untouched, so F('balance') + amount.kobo keeps
+    working in updates.
+
+    ModelSerializers need the field declared as a MoneySerializerField.
+    """
+    descriptor_class = MoneyDescriptor
+
+    @property
+    def validators(self):
+        # BigIntegerField's range validators compare against ints
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Money(int(value))
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money) or hasattr(value, 'resolve_expression'):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            if value == 0:
+                return ZERO
+            raise TypeError(
+                f"Ambiguous MoneyField value {value!r}: use Money(kobo) or a Naira Decimal or string"
+            )
+        try:
+            return Money.from_naira(value)
+        except ValueError:
+            raise ValidationError(
+                self.error_messages['invalid'],
+                code='invalid',
+                params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        if hasattr(value, 'resolve_expression'):
+            return value
+        value = self.to_python(value)
+        return value.kobo if value is not None else None
+
+    def get_default(self):
+        return self.to_python(super().get_default())
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return '' if value is None else str(value)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+class MoneySerializerField(serializers.DecimalField):
+    """
+    Naira amount in the API, Money internally.
+
+    Renders like a two-place DecimalField so the wire format is unchanged.
+    """
+
+    def __init__(self, **kwargs):
+        min_value = kwargs.pop('min_value', None)
+        max_value = kwargs.pop('max_value', None)
+        kwargs.setdefault('max_digits', None)
+        kwargs.setdefault('decimal_places', 2)
+        super().__init__(**kwargs)
+        if min_value is not None:
+            self.min_value = Money.from_naira(min_value)
+            message = self.error_messages['min_value'].format(min_value=self.min_value)
+            self.validators.append(validators.MinValueValidator(self.min_value, message=message))
+        if max_value is not None:
+            self.max_value = Money.from_naira(max_value)
+            message = self.error_messages['max_value'].format(max_value=self.max_value)
+            self.validators.append(validators.MaxValueValidator(self.max_value, message=message))
+
+    def to_internal_value(self, data):
+        return Money.from_naira(super().to_internal_value(data))
+
+    def to_representation(self, value):
+        if isinstance(value, Money):
+            value = value.naira
+        return super().to_representation(value)
@@ -12,7 +12,7 @@ class PaystackAccountVerification:
     
     def __init__(self):
         self.secret_key = settings.PAYSTACK_SECRET_KEY
-        self.base_url = 'https://api.paystack.co'
+        self.base_url = getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
         self.headers = {
             'Authorization': f'Bearer {self.secret_key}',
             'Content-Type': 'application/json'
@@ -0,0 +1,287 @@
+"""
+Process-wide directory of Nigerian banks.
+
+The bundled nigerian_banks.json is loaded on first use so lookups never wait
+on the network; the list is then refreshed from Paystack's /bank endpoint in
+a background thread every BANK_DIRECTORY_TTL seconds. Each load builds an
+immutable snapshot holding:
+
+- the banks sorted by name, plus the pre-rendered list_banks response body
+- a normalized-name index for exact matches
+- an acronym index ("gtb", "fcmb") and a token index for fuzzy matches
+
+Readers only ever see a complete snapshot, so lookups need no locking.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BANKS_FILE = os.path.join(os.path.dirname(__file__), 'nigerian_banks.json')
+
+# Retry delay after a failed refresh, in seconds
+REFRESH_RETRY_DELAY = 300
+
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+# Words shared by too many banks to tell them apart
+_STOPWORDS = frozenset({'bank', 'banks', 'plc', 'ltd', 'limited', 'nigeria', 'of', 'for', 'the', 'and'})
+
+# Words skipped when building acronyms (e.g. "United Bank for Africa" -> "uba")
+_ACRONYM_SKIP = frozenset({'of', 'for', 'the', 'and'})
+
+
+def normalize_bank_name(name):
+    """Lowercase, turn '&' into 'and' and collapse punctuation to single spaces"""
+    name = (name or '').lower().replace('&', ' and ')
+    return _NON_ALPHANUMERIC.sub(' ', name).strip()
+
+
+def _significant_tokens(normalized_name):
+    return [token for token in normalized_name.split() if token not in _STOPWORDS]
+
+
+class _Snapshot:
+    """Immutable bank list with its lookup indexes and rendered payload"""
+
+    def __init__(self, raw_banks, source):
+        banks = []
+        for bank in raw_banks:
+            if not isinstance(bank, dict):
+                continue
+            # Handle both local JSON format and Paystack API format
+            bank_code = bank.get('code') or bank.get('id') or ''
+            bank_name = bank.get('name') or ''
+            if not bank_code and not bank_name:
+                continue
+            banks.append({
+                'code': str(bank_code),
+                'name': bank_name,
+                'slug': bank.get('slug') or '',
+            })
+        banks.sort(key=lambda bank: bank['name'].lower())
+
+        self.banks = banks
+        self.source = source
+        self.by_code = {}
+        self.by_name = {}
+        self.compact_names = []
+        self.tokens = []
+        self.token_index = defaultdict(list)
+        acronyms = defaultdict(set)
+
+        for index, bank in enumerate(banks):
+            normalized = normalize_bank_name(bank['name'])
+            words = normalized.split()
+            self.by_code.setdefault(bank['code'], bank)
+            self.by_name.setdefault(normalized, bank['code'])
+            self.compact_names.append(normalized.replace(' ', ''))
+
+            tokens = frozenset(_significant_tokens(normalized))
+            self.tokens.append(tokens)
+            for token in tokens:
+                self.token_index[token].append(index)
+
+            initials = ''.join(word[0] for word in words if word not in _ACRONYM_SKIP)
+            if len(initials) >= 2:
+                acronyms[initials].add(bank['code'])
+
+        # Ambiguous acronyms are left out rather than guessed
+        self.by_acronym = {acronym: next(iter(codes)) for acronym, codes in acronyms.items() if len(codes) == 1}
+        self.token_index = dict(self.token_index)
+
+        # Rendered the way JSONRenderer renders success_response()
+        body = {
+            'status': 200,
+            'message': 'Banks retrieved successfully',
+            'banks': banks,
+            'count': len(banks),
+        }
+        self.payload = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = f'"{hashlib.sha256(self.payload).hexdigest()[:32]}"'
+
+
+def _load_local_banks():
+    """Load Nigerian banks data from the bundled JSON file"""
+    try:
+        with open(BANKS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load banks data file: {e}")
+        return []
+
+
+def _fetch_paystack_banks():
+    """
+    Fetch the bank list from Paystack.
+
+    Returns:
+        list: Banks, or None if the request failed
+    """
+    secret_key = getattr(settings, 'PAYSTACK_SECRET_KEY', '')
+    # The bank list endpoint also works without authentication
+    headers = {'Authorization': f'Bearer {secret_key}'} if secret_key else {}
+    try:
+        response = requests.get(
+            f"{getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')}/bank",
+            headers=headers,
+            params={'country': 'nigeria'},
+            timeout=30
+        )
+        response.raise_for_status()
+        response_data = response.json()
+        if response_data.get('status') and response_data.get('data'):
+            return response_data['data']
+        logger.warning(f"Paystack bank list returned no data: {response_data.get('message')}")
+    except Exception as e:
+        logger.warning(f"Failed to fetch banks from Paystack API: {e}")
+    return None
+
+
+class BankDirectory:
+    """
+    Bank list and lookups shared by every request in the process.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._pid = None
+        self._next_refresh = 0.0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'BANK_DIRECTORY_TTL', 86400)
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = _Snapshot(_load_local_banks(), 'local')
+                snapshot = self._snapshot
+
+        if self.ttl and time.monotonic() >= self._next_refresh:
+            self._schedule_refresh()
+        return snapshot
+
+    def _schedule_refresh(self):
+        with self._lock:
+            pid = os.getpid()
+            if pid != self._pid:
+                # A forked worker does not inherit the parent's refresh thread
+                self._pid = pid
+                self._refreshing = False
+            if self._refreshing or time.monotonic() < self._next_refresh:
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self._background_refresh, name='bank-directory-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Bank directory refresh failed: {e}", exc_info=True)
+            self._next_refresh = time.monotonic() + REFRESH_RETRY_DELAY
+        finally:
+            self._refreshing = False
+
+    def refresh(self):
+        """
+        Reload the bank list from Paystack, keeping the current list on failure.
+
+        Returns:
+            bool: True if the directory was updated
+        """
+        banks = _fetch_paystack_banks()
+        if not banks:
+            self._next_refresh = time.monotonic() + REFRESH_RETRY_DELAY
+            return False
+
+        self._snapshot = _Snapshot(banks, 'paystack')
+        self._next_refresh = time.monotonic() + self.ttl
+        logger.info(f"Bank directory refreshed from Paystack: {len(self._snapshot.banks)} banks")
+        return True
+
+    @property
+    def banks(self):
+        """Banks sorted by name, as dicts with code, name and slug"""
+        return self._current().banks
+
+    def list_payload(self):
+        """
+        Pre-rendered list_banks response body.
+
+        Returns:
+            tuple: (JSON bytes, ETag)
+        """
+        snapshot = self._current()
+        return snapshot.payload, snapshot.etag
+
+    def get_bank(self, bank_code):
+        """Return the bank with the given code, or None"""
+        return self._current().by_code.get(str(bank_code))
+
+    def find_bank_code(self, bank_name):
+        """
+        Find a bank code by name.
+
+        Tries, in order: exact normalized name, acronym (e.g. "GTB"), best
+        token overlap, then substring match on the name without spaces.
+
+        Args:
+            bank_name: Bank name to search for
+
+        Returns:
+            str: Bank code if found, None otherwise
+        """
+        query = normalize_bank_name(bank_name)
+        if not query:
+            return None
+
+        snapshot = self._current()
+        compact_query = query.replace(' ', '')
+
+        code = snapshot.by_name.get(query) or snapshot.by_acronym.get(compact_query)
+        if code:
+            return code
+
+        query_tokens = set(_significant_tokens(query))
+        overlaps = defaultdict(int)
+        for token in query_tokens:
+            for index in snapshot.token_index.get(token, ()):
+                overlaps[index] += 1
+        if overlaps:
+            best = max(
+                overlaps,
+                key=lambda index: (
+                    overlaps[index] / len(query_tokens | snapshot.tokens[index]),
+                    -len(snapshot.compact_names[index]),
+                )
+            )
+            return snapshot.banks[best]['code']
+
+        for index, compact_name in enumerate(snapshot.compact_names):
+            if compact_query in compact_name or compact_name in compact_query:
+                return snapshot.banks[index]['code']
+
+        return None
+
+
+_directory = BankDirectory()
+
+
+def get_bank_directory():
+    """Return the process-wide bank directory"""
+    return _directory
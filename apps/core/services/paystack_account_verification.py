@@ -1,11 +1,118 @@
 import requests
 import logging
-import json
-import os
+import threading
 from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.services.bank_directory import get_bank_directory
 
 logger = logging.getLogger(__name__)
 
+RESOLVE_CACHE_VERSION = 1
+
+# Paystack answers for an account that cannot be resolved; safe to cache briefly
+NEGATIVE_CACHE_STATUS_CODES = frozenset({400, 404, 422})
+
+# Longest a duplicate lookup waits for the in-flight one (upstream timeout is 30s)
+SINGLE_FLIGHT_WAIT = 35
+
+
+class ResolveCacheStats:
+    """Process-wide hit/miss counters for account resolution"""
+    
+    FIELDS = ('hits', 'negative_hits', 'misses', 'coalesced', 'upstream_errors')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+    
+    def increment(self, field):
+        with self._lock:
+            self._counts[field] += 1
+    
+    def snapshot(self):
+        """Return the counters and the cache hit ratio"""
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['negative_hits'] + counts['misses'] + counts['coalesced']
+        served = lookups - counts['misses']
+        counts['hit_ratio'] = round(served / lookups, 4) if lookups else None
+        return counts
+    
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+    
+    def do(self, key, fn):
+        """
+        Run fn, or wait for an identical call already in progress.
+        
+        Returns:
+            tuple: (result, shared) where shared is True if another call's result was reused
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            if flight.done.wait(SINGLE_FLIGHT_WAIT) and flight.error is None:
+                return flight.result, True
+            # The leader failed or is stuck; make our own call
+            return fn(), False
+        
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+resolve_cache_stats = ResolveCacheStats()
+_resolve_flights = SingleFlight()
+
+
+def _resolve_cache_key(account_number, bank_code):
+    return f"bank_resolve:{bank_code}:{account_number}"
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key, version=RESOLVE_CACHE_VERSION)
+    except Exception as e:
+        logger.warning(f"Account resolution cache read failed: {e}")
+        return None
+
+
+def _cache_set(key, response, timeout):
+    try:
+        cache.set(key, response, timeout=timeout, version=RESOLVE_CACHE_VERSION)
+    except Exception as e:
+        logger.warning(f"Account resolution cache write failed: {e}")
+
 
 class PaystackAccountVerification:
     """
@@ -14,70 +121,28 @@ class PaystackAccountVerification:
     
     def __init__(self):
         self.secret_key = settings.PAYSTACK_SECRET_KEY
-        self.base_url = 'https://api.paystack.co'
+        self.base_url = getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
         self.headers = {
             'Authorization': f'Bearer {self.secret_key}',
             'Content-Type': 'application/json'
         }
-        # Load Nigerian banks data
-        self._load_banks_data()
-    
-    def _load_banks_data(self):
-        """Load Nigerian banks data from JSON file"""
-        try:
-            file_path = os.path.join(os.path.dirname(__file__), 'nigerian_banks.json')
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.banks_data = json.load(f)
-        except Exception as e:
-            logger.warning(f"Could not load banks data file: {e}")
-            self.banks_data = []
     
     def get_banks(self):
         """
         Get list of Nigerian banks.
         
+        Served from the process-wide bank directory, which is refreshed from
+        Paystack in the background.
+        
         Returns:
-            list: List of banks with code and name
+            list: List of banks with code, name and slug, sorted by name
         """
-        # Try to fetch from Paystack API first (more up-to-date)
-        # Note: Paystack bank list endpoint doesn't require authentication
-        if self.secret_key:
-            try:
-                response = self._fetch_banks_from_paystack()
-                if response and response.get('status'):
-                    return response.get('data', [])
-            except Exception as e:
-                logger.warning(f"Failed to fetch banks from Paystack API: {e}")
-        else:
-            # Try without authentication (public endpoint)
-            try:
-                url = f"{self.base_url}/bank?country=nigeria"
-                response = requests.get(url, timeout=30)
-                if response.status_code == 200:
-                    response_data = response.json()
-                    if response_data.get('status'):
-                        return response_data.get('data', [])
-            except Exception as e:
-                logger.warning(f"Failed to fetch banks from Paystack API (public): {e}")
-        
-        # Fallback to local data
-        return self.banks_data
-    
-    def _fetch_banks_from_paystack(self):
-        """Fetch banks list from Paystack API"""
-        try:
-            url = f"{self.base_url}/bank?country=nigeria"
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Error fetching banks from Paystack: {e}")
-            return None
+        return get_bank_directory().banks
     
     def get_bank_code_by_name(self, bank_name):
         """
         Get bank code by bank name (case-insensitive search).
-        Supports exact match and partial match.
+        Supports exact, acronym and partial (fuzzy) matches.
         
         Args:
             bank_name: Bank name to search for
@@ -87,58 +152,65 @@ class PaystackAccountVerification:
         """
         if not bank_name:
             return None
-        
-        bank_name_lower = bank_name.lower().strip()
-        
-        # First, try exact match in local data
-        for bank in self.banks_data:
-            if bank.get('name', '').lower() == bank_name_lower:
-                return str(bank.get('code', ''))
-        
-        # Try Paystack API if available (more up-to-date)
-        if self.secret_key:
-            try:
-                banks = self._fetch_banks_from_paystack()
-                if banks and banks.get('status'):
-                    for bank in banks.get('data', []):
-                        bank_api_name = bank.get('name', '').lower()
-                        if bank_name_lower == bank_api_name:
-                            # Paystack API uses 'id' as bank code
-                            return str(bank.get('id', bank.get('code', '')))
-            except Exception as e:
-                logger.warning(f"Error searching bank in Paystack API: {e}")
-        
-        # Try partial match (contains) in local data
-        for bank in self.banks_data:
-            bank_local_name = bank.get('name', '').lower()
-            if bank_name_lower in bank_local_name or bank_local_name in bank_name_lower:
-                return str(bank.get('code', ''))
-        
-        # Try partial match in Paystack API if available
-        if self.secret_key:
-            try:
-                banks = self._fetch_banks_from_paystack()
-                if banks and banks.get('status'):
-                    for bank in banks.get('data', []):
-                        bank_api_name = bank.get('name', '').lower()
-                        if bank_name_lower in bank_api_name or bank_api_name in bank_name_lower:
-                            # Paystack API uses 'id' as bank code
-                            return str(bank.get('id', bank.get('code', '')))
-            except Exception as e:
-                logger.warning(f"Error searching bank in Paystack API: {e}")
-        
-        return None
+        return get_bank_directory().find_bank_code(bank_name)
     
     def resolve_account(self, account_number, bank_code):
         """
         Resolve bank account details.
         
+        Results are cached: successful resolutions for RESOLVE_ACCOUNT_CACHE_TTL
+        seconds and definitive failures (e.g. unknown account) for
+        RESOLVE_ACCOUNT_NEGATIVE_CACHE_TTL seconds. Concurrent lookups of the
+        same account in this process share one upstream call.
+        
+        Args:
+            account_number: Bank account number
+            bank_code: Bank code
+        
+        Returns:
+            dict: Paystack resolution response (see _resolve_account_upstream)
+        """
+        if not self.secret_key:
+            logger.error("Paystack secret key not configured")
+            return {'status': False, 'message': 'Paystack secret key not configured'}
+        
+        account_number = str(account_number).strip()
+        bank_code = str(bank_code).strip()
+        key = _resolve_cache_key(account_number, bank_code)
+        
+        cached = _cache_get(key)
+        if cached is not None:
+            resolve_cache_stats.increment('hits' if cached.get('status') else 'negative_hits')
+            return dict(cached)
+        
+        def lookup():
+            resolve_cache_stats.increment('misses')
+            response, status_code = self._resolve_account_upstream(account_number, bank_code)
+            if response.get('status'):
+                _cache_set(key, response, getattr(settings, 'RESOLVE_ACCOUNT_CACHE_TTL', 86400))
+            elif status_code in NEGATIVE_CACHE_STATUS_CODES:
+                _cache_set(key, response, getattr(settings, 'RESOLVE_ACCOUNT_NEGATIVE_CACHE_TTL', 60))
+            else:
+                # Timeouts, rate limits and server errors are not cached
+                resolve_cache_stats.increment('upstream_errors')
+            return response
+        
+        response, shared = _resolve_flights.do(key, lookup)
+        if shared:
+            resolve_cache_stats.increment('coalesced')
+        return dict(response)
+    
+    def _resolve_account_upstream(self, account_number, bank_code):
+        """
+        Resolve bank account details with Paystack.
+        
         Args:
             account_number: Bank account number
             bank_code: Bank code
         
         Returns:
-            dict: Account details with account_name and bank_id
+            tuple: (response dict, HTTP status code or None), where the response
+                holds account details with account_name and bank_id
                 {
                     "status": true,
                     "message": "Account number resolved",
@@ -149,10 +221,6 @@ class PaystackAccountVerification:
                     }
                 }
         """
-        if not self.secret_key:
-            logger.error("Paystack secret key not configured")
-            return {'status': False, 'message': 'Paystack secret key not configured'}
-        
         url = f"{self.base_url}/bank/resolve"
         params = {
             'account_number': account_number,
@@ -162,16 +230,16 @@ class PaystackAccountVerification:
         try:
             response = requests.get(url, headers=self.headers, params=params, timeout=30)
             response.raise_for_status()
-            return response.json()
+            return response.json(), response.status_code
         except requests.exceptions.Timeout:
             logger.error(f"Paystack account verification timeout")
-            return {'status': False, 'message': 'Request timeout'}
+            return {'status': False, 'message': 'Request timeout'}, None
         except requests.exceptions.RequestException as e:
             logger.error(f"Paystack account verification error: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 try:
-                    return e.response.json()
+                    return e.response.json(), e.response.status_code
                 except:
                     pass
-            return {'status': False, 'message': str(e)}
+            return {'status': False, 'message': str(e)}, None
 
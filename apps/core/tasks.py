@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.utils import timezone
+import logging
+
+from apps.core.models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def purge_expired_idempotency_records():
+    """
+    Periodic task to delete expired idempotency records.
+    
+    Expired keys are already ignored at lookup time; this keeps the table small.
+    
+    Runs daily via Celery Beat.
+    """
+    try:
+        deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+        logger.info(f"Purged {deleted} expired idempotency records")
+        return {'status': 'success', 'deleted': deleted}
+    except Exception as e:
+        logger.error(f"Error purging idempotency records: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
@@ -0,0 +1,248 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TransactionTestCase
+
+from apps.core.money import Money, MoneyField, MoneySerializerField, ZERO
+
+
+class MoneyTests(SimpleTestCase):
+    """Money arithmetic and rounding"""
+
+    def test_from_naira_rounds_half_up_to_the_kobo(self):
+        self.assertEqual(Money.from_naira('12.34'), Money(1234))
+        self.assertEqual(Money.from_naira('0.005'), Money(1))
+        self.assertEqual(Money.from_naira('0.004'), ZERO)
+        self.assertEqual(Money.from_naira('-0.005'), Money(-1))
+        self.assertEqual(Money.from_naira(Decimal('1.995')), Money(200))
+        self.assertEqual(Money.from_naira(7), Money(700))
+
+    def test_from_naira_uses_the_shortest_float_repr(self):
+        self.assertEqual(Money.from_naira(0.1), Money(10))
+        self.assertEqual(Money.from_naira(1.005), Money(101))
+
+    def test_from_naira_rejects_invalid_amounts(self):
+        for amount in ('abc', '', None, [1]):
+            with self.assertRaises(ValueError):
+                Money.from_naira(amount)
+
+    def test_only_integer_kobo_builds_money(self):
+        for kobo in (Decimal('1'), 1.0, '1', True):
+            with self.assertRaises(TypeError):
+                Money(kobo)
+        self.assertEqual(Money.from_kobo('250'), Money(250))
+
+    def test_naira_and_formatting(self):
+        amount = Money(123456)
+        self.assertEqual(amount.naira, Decimal('1234.56'))
+        self.assertEqual(str(amount), '1234.56')
+        self.assertEqual(f'{amount:,.2f}', '1,234.56')
+        self.assertEqual(str(Money(-5)), '-0.05')
+
+    def test_addition_and_subtraction(self):
+        self.assertEqual(Money(150) + Money(275), Money(425))
+        self.assertEqual(Money(150) - Money(275), Money(-125))
+        self.assertEqual(-Money(10), Money(-10))
+        self.assertEqual(abs(Money(-10)), Money(10))
+        self.assertEqual(sum([Money(1), Money(2), Money(3)]), Money(6))
+        with self.assertRaises(TypeError):
+            Money(1) + 1
+        with self.assertRaises(TypeError):
+            Money(1) + Decimal('0.01')
+
+    def test_comparisons(self):
+        self.assertLess(Money(99), Money(100))
+        self.assertGreater(Money(1), 0)
+        self.assertEqual(ZERO, 0)
+        self.assertFalse(ZERO)
+        self.assertNotEqual(Money(100), 100)
+        self.assertNotEqual(Money(100), Decimal('1.00'))
+        with self.assertRaises(TypeError):
+            Money(100) < 100
+
+    def test_multiplication_by_counts_and_rates(self):
+        self.assertEqual(Money(250) * 3, Money(750))
+        self.assertEqual(3 * Money(250), Money(750))
+        self.assertEqual(Money(1005) * Decimal('0.5'), Money(503))
+        self.assertEqual(Money(-1005) * Decimal('0.5'), Money(-503))
+        self.assertEqual(Money(1004) * '0.5', Money(502))
+        self.assertEqual(Money(333) * Decimal('0.80'), Money(266))
+        self.assertEqual(Money(1250) * Decimal('0.015'), Money(19))
+        with self.assertRaises(TypeError):
+            Money(100) * 1.5
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            Money(1).kobo = 2
+
+
+class MoneyFieldTests(SimpleTestCase):
+
+    def test_to_python_reads_decimals_and_strings_as_naira(self):
+        field = MoneyField()
+        self.assertEqual(field.to_python(Decimal('12.50')), Money(1250))
+        self.assertEqual(field.to_python('3'), Money(300))
+        self.assertEqual(field.to_python(Money(5)), Money(5))
+        self.assertIsNone(field.to_python(None))
+
+    def test_to_python_only_accepts_a_zero_int(self):
+        field = MoneyField()
+        self.assertEqual(field.to_python(0), ZERO)
+        with self.assertRaises(TypeError):
+            field.to_python(100)
+        with self.assertRaises(TypeError):
+            field.get_prep_value(100)
+
+    def test_to_python_rejects_invalid_strings(self):
+        with self.assertRaises(ValidationError):
+            MoneyField().to_python('ten')
+
+    def test_get_prep_value_is_kobo(self):
+        field = MoneyField()
+        self.assertEqual(field.get_prep_value(Money(1234)), 1234)
+        self.assertEqual(field.get_prep_value('12.34'), 1234)
+
+    def test_serializer_field(self):
+        field = MoneySerializerField(max_digits=12, min_value=Decimal('0.01'))
+        self.assertEqual(field.run_validation('12.34'), Money(1234))
+        self.assertEqual(field.to_representation(Money(1234)), '12.34')
+        with self.assertRaises(Exception):
+            field.run_validation('0.00')
+
+
+class KoboMigrationTests(TransactionTestCase):
+    """Naira amounts survive the migrations to integer kobo and back"""
+
+    migrate_from = [
+        ('accounts', '0007_user_paystack_customer'),
+        ('orders', '0002_order_settlement'),
+        ('payments', '0010_transaction_pending_deposit_index'),
+    ]
+    migrate_to = [
+        ('accounts', '0008_balance_kobo'),
+        ('orders', '0003_order_amounts_kobo'),
+        ('payments', '0011_transaction_amounts_kobo'),
+    ]
+
+    def setUp(self):
+        self.old_apps = self._migrate(self.migrate_from)
+        User = self.old_apps.get_model('accounts', 'User')
+        self.user = User.objects.create(
+            email='user@example.com',
+            phone_number='+2348000000001',
+            user_type='USER',
+            password='x',
+        )
+        self.courier = User.objects.create(
+            email='courier@example.com',
+            phone_number='+2348000000002',
+            user_type='COURIER',
+            password='x',
+        )
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def test_balances(self):
+        self.old_apps.get_model('accounts', 'UserProfile').objects.create(
+            user_id=self.user.pk, full_name='User', balance=Decimal('1234.56')
+        )
+        self.old_apps.get_model('accounts', 'CourierProfile').objects.create(
+            user_id=self.courier.pk, full_name='Courier', balance=Decimal('0.07')
+        )
+
+        new_apps = self._migrate(self.migrate_to)
+        self.assertEqual(new_apps.get_model('accounts', 'UserProfile').objects.get().balance, Money(123456))
+        self.assertEqual(new_apps.get_model('accounts', 'CourierProfile').objects.get().balance, Money(7))
+
+        old_apps = self._migrate(self.migrate_from)
+        self.assertEqual(old_apps.get_model('accounts', 'UserProfile').objects.get().balance, Decimal('1234.56'))
+        self.assertEqual(old_apps.get_model('accounts', 'CourierProfile').objects.get().balance, Decimal('0.07'))
+
+    def test_order_amounts(self):
+        amounts = {
+            'parcel_financial_worth': Decimal('25000.00'),
+            'delivery_fee': Decimal('1500.50'),
+            'service_charge': Decimal('99.99'),
+            'insurance_fee': Decimal('0.01'),
+            'total_amount': Decimal('1600.50'),
+            'courier_payout': Decimal('1200.40'),
+        }
+        self.old_apps.get_model('orders', 'Order').objects.create(
+            order_number='ORD-1',
+            tracking_number='TRK-1',
+            sender_id=self.user.pk,
+            pickup_address='a',
+            dropoff_address='b',
+            recipient_name='r',
+            recipient_phone='1',
+            parcel_type='DOCUMENTS',
+            parcel_description='d',
+            parcel_condition='Normal',
+            parcel_weight_kg=Decimal('1.00'),
+            **amounts,
+        )
+
+        new_apps = self._migrate(self.migrate_to)
+        order = new_apps.get_model('orders', 'Order').objects.get()
+        for name, amount in amounts.items():
+            self.assertEqual(getattr(order, name), Money.from_naira(amount), name)
+
+        old_apps = self._migrate(self.migrate_from)
+        order = old_apps.get_model('orders', 'Order').objects.get()
+        for name, amount in amounts.items():
+            self.assertEqual(getattr(order, name), amount, name)
+
+    def test_transaction_amounts(self):
+        self.old_apps.get_model('payments', 'Transaction').objects.create(
+            user_id=self.user.pk,
+            transaction_type='DEPOSIT',
+            status='SUCCESS',
+            payment_method='CARD',
+            amount=Decimal('100.05'),
+            fee=Decimal('1.50'),
+            net_amount=Decimal('98.55'),
+            reference='TXN-1',
+        )
+        self.old_apps.get_model('payments', 'PayoutBatch').objects.create(
+            reference='PYB-1', total_amount=Decimal('5000.00')
+        )
+        self.old_apps.get_model('payments', 'DailyTransactionSummary').objects.create(
+            user_id=self.user.pk,
+            date='2026-01-01',
+            transaction_type='DEPOSIT',
+            transaction_count=1,
+            total_amount=Decimal('100.05'),
+            total_fee=Decimal('1.50'),
+            total_net_amount=Decimal('98.55'),
+        )
+
+        new_apps = self._migrate(self.migrate_to)
+        transaction_obj = new_apps.get_model('payments', 'Transaction').objects.get()
+        self.assertEqual(
+            (transaction_obj.amount, transaction_obj.fee, transaction_obj.net_amount),
+            (Money(10005), Money(150), Money(9855)),
+        )
+        self.assertEqual(new_apps.get_model('payments', 'PayoutBatch').objects.get().total_amount, Money(500000))
+        summary = new_apps.get_model('payments', 'DailyTransactionSummary').objects.get()
+        self.assertEqual(
+            (summary.total_amount, summary.total_fee, summary.total_net_amount),
+            (Money(10005), Money(150), Money(9855)),
+        )
+
+        old_apps = self._migrate(self.migrate_from)
+        transaction_obj = old_apps.get_model('payments', 'Transaction').objects.get()
+        self.assertEqual(
+            (transaction_obj.amount, transaction_obj.fee, transaction_obj.net_amount),
+            (Decimal('100.05'), Decimal('1.50'), Decimal('98.55')),
+        )
+        self.assertEqual(old_apps.get_model('payments', 'PayoutBatch').objects.get().total_amount, Decimal('5000.00'))
@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import verify_account, list_banks, list_states
+from .views import verify_account, verify_account_cache_stats, list_banks, list_states
 
 app_name = 'core'
 
 urlpatterns = [
     path('verify-account/', verify_account, name='verify_account'),
+    path('verify-account/stats/', verify_account_cache_stats, name='verify_account_cache_stats'),
     path('banks/', list_banks, name='list_banks'),
     path('states/', list_states, name='list_states'),
 ]
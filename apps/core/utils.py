@@ -1,9 +1,21 @@
-from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction as db_transaction
 from django.db.models import F
 import logging
+import secrets
+
+from apps.core.money import Money, ZERO
 
 logger = logging.getLogger(__name__)
 
+# Bump when the cached balance format changes so stale entries are ignored
+BALANCE_CACHE_VERSION = 3
+
+# Generations outlive the balances cached under them; losing one only costs a miss
+BALANCE_GENERATION_TIMEOUT = 86400
+
 
 def get_user_profile(user):
     if user.user_type == 'USER':
@@ -13,12 +25,140 @@ def get_user_profile(user):
     return None
 
 
+def _profile_is_loaded(user):
+    related_name = {'USER': 'user_profile', 'COURIER': 'courier_profile'}.get(user.user_type)
+    return related_name is not None and getattr(type(user), related_name).is_cached(user)
+
+
+def _balance_cache_key(user_id):
+    return f"user_balance:{user_id}"
+
+
+def _balance_generation_key(user_id):
+    return f"user_balance_generation:{user_id}"
+
+
+def _balance_cache_enabled():
+    return getattr(settings, 'BALANCE_CACHE_ENABLED', True)
+
+
+def _read_balance_cache(user_id):
+    """
+    Return (balance, generation) for a user from one cache round trip.
+
+    A cached balance only counts if it was filled under the user's current
+    generation; balance is None on a miss and generation None if the user
+    has none yet.
+    """
+    key = _balance_cache_key(user_id)
+    generation_key = _balance_generation_key(user_id)
+    values = cache.get_many([key, generation_key], version=BALANCE_CACHE_VERSION)
+    generation = values.get(generation_key)
+    entry = values.get(key)
+    if entry is not None and generation is not None and entry[0] == generation:
+        return Money(entry[1]), generation
+    return None, generation
+
+
+def _start_balance_generation(user_id):
+    """Give a user a fresh, unpredictable generation unless another process already did"""
+    generation_key = _balance_generation_key(user_id)
+    cache.add(generation_key, secrets.randbits(48), timeout=BALANCE_GENERATION_TIMEOUT, version=BALANCE_CACHE_VERSION)
+    return cache.get(generation_key, version=BALANCE_CACHE_VERSION)
+
+
+def get_cached_balance(user_id):
+    """Return the cached balance for a user, or None on a miss or cache error"""
+    if not _balance_cache_enabled():
+        return None
+    try:
+        balance, _ = _read_balance_cache(user_id)
+    except Exception as e:
+        logger.warning(f"Balance cache read failed for user {user_id}: {e}")
+        return None
+    return balance
+
+
+def invalidate_cached_balance(user_id):
+    """
+    Invalidate a user's cached balance once the surrounding DB transaction commits.
+    
+    Call after any change to a balance. Instead of writing the new balance,
+    which could land after a later writer's, the user's generation is
+    advanced so every balance cached before the commit stops matching; the
+    next get_user_balance refills it. A rolled-back change leaves the cache
+    alone, and outside a transaction the generation moves immediately.
+    """
+    if not _balance_cache_enabled():
+        return
+    
+    def _advance():
+        generation_key = _balance_generation_key(user_id)
+        try:
+            try:
+                cache.incr(generation_key, version=BALANCE_CACHE_VERSION)
+            except ValueError:
+                # No generation yet, or it expired: any fresh one invalidates
+                cache.set(generation_key, secrets.randbits(48), timeout=BALANCE_GENERATION_TIMEOUT, version=BALANCE_CACHE_VERSION)
+        except Exception as e:
+            logger.warning(f"Balance cache invalidation failed for user {user_id}: {e}")
+    
+    db_transaction.on_commit(_advance)
+
+
 def get_user_balance(user):
-    profile = get_user_profile(user)
-    return profile.balance if profile else Decimal('0.00')
+    generation = None
+    if _balance_cache_enabled():
+        try:
+            cached, generation = _read_balance_cache(user.pk)
+            if cached is not None:
+                return cached
+            if generation is None:
+                generation = _start_balance_generation(user.pk)
+        except Exception as e:
+            logger.warning(f"Balance cache read failed for user {user.pk}: {e}")
+    
+    # A profile loaded earlier may predate the change that invalidated the cache
+    loaded = _profile_is_loaded(user)
+    try:
+        profile = get_user_profile(user)
+    except ObjectDoesNotExist:
+        profile = None
+    if not profile:
+        return ZERO
+    if loaded:
+        profile.refresh_from_db(fields=['balance'])
+    
+    if generation is not None:
+        _fill_balance_cache(user.pk, generation, profile.balance)
+    return profile.balance
+
+
+def _fill_balance_cache(user_id, generation, balance):
+    """
+    Cache a balance read from the database under the generation seen before the read.
+    
+    If a writer commits in between, it has advanced the generation and this
+    entry never matches, so a stale read can't outlive the write. The fill
+    waits for commit so a balance changed in a rolled-back transaction is
+    never cached.
+    """
+    def _write():
+        try:
+            cache.set(
+                _balance_cache_key(user_id),
+                (generation, Money.from_naira(balance).kobo),
+                timeout=getattr(settings, 'BALANCE_CACHE_TIMEOUT', 300),
+                version=BALANCE_CACHE_VERSION,
+            )
+        except Exception as e:
+            logger.warning(f"Balance cache write failed for user {user_id}: {e}")
+    
+    db_transaction.on_commit(_write)
 
 
 def deduct_balance(user, amount, reference):
+    amount = Money.from_naira(amount)
     profile = get_user_profile(user)
     if not profile:
         logger.error(f"Profile not found for user {user.email}")
@@ -33,7 +173,7 @@ def deduct_balance(user, amount, reference):
         pk=profile.pk,
         balance__gte=amount
     ).update(
-        balance=F('balance') - Decimal(str(amount)).quantize(Decimal('0.01'))
+        balance=F('balance') - amount.kobo
     )
     
     if updated == 0:
@@ -41,19 +181,21 @@ def deduct_balance(user, amount, reference):
         return False
     
     profile.refresh_from_db()
+    invalidate_cached_balance(user.pk)
     logger.info(f"Balance deducted for {user.email}: -₦{amount:,.2f} (Reference: {reference})")
     return True
 
 
 def add_balance(user, amount, reference):
+    amount = Money.from_naira(amount)
     profile = get_user_profile(user)
     if not profile:
         return False
     
     profile.__class__.objects.filter(pk=profile.pk).update(
-        balance=F('balance') + Decimal(str(amount)).quantize(Decimal('0.01'))
+        balance=F('balance') + amount.kobo
     )
     profile.refresh_from_db()
+    invalidate_cached_balance(user.pk)
     logger.info(f"Balance added for {user.email}: +₦{amount:,.2f} (Reference: {reference})")
     return True
-
@@ -1,14 +1,16 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from apps.core.response import success_response, error_response, validation_error_response
 from django_ratelimit.decorators import ratelimit
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
+from django.http import HttpResponse
 import logging
 
-from apps.core.services.paystack_account_verification import PaystackAccountVerification
+from apps.core.services.paystack_account_verification import PaystackAccountVerification, resolve_cache_stats
+from apps.core.services.bank_directory import get_bank_directory
 
 logger = logging.getLogger(__name__)
 
@@ -62,35 +64,14 @@ def list_banks(request):
     Returns list of banks with code and name for bank selection.
     """
     try:
-        verification_service = PaystackAccountVerification()
-        banks = verification_service.get_banks()
-        
-        # Format response to match expected structure
-        formatted_banks = []
-        for bank in banks:
-            if isinstance(bank, dict):
-                # Handle both local JSON format and Paystack API format
-                bank_code = bank.get('code') or bank.get('id') or ''
-                bank_name = bank.get('name') or ''
-                bank_slug = bank.get('slug') or ''
-                
-                # Skip if no code or name
-                if not bank_code and not bank_name:
-                    continue
-                
-                formatted_banks.append({
-                    'code': str(bank_code),
-                    'name': bank_name,
-                    'slug': bank_slug,
-                })
-        
-        # Sort banks by name for better UX
-        formatted_banks.sort(key=lambda x: x['name'].lower())
-        
-        return success_response(
-            data={'banks': formatted_banks, 'count': len(formatted_banks)},
-            message='Banks retrieved successfully'
-        )
+        # Pre-sorted and pre-rendered once per bank list refresh
+        payload, etag = get_bank_directory().list_payload()
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(payload, content_type='application/json')
+        response['ETag'] = etag
+        return response
         
     except Exception as e:
         logger.error(f"Error fetching banks: {e}", exc_info=True)
@@ -235,6 +216,28 @@ def verify_account(request):
         return error_response('Failed to verify account. Please try again.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@extend_schema(
+    tags=['Core'],
+    summary='Account Resolution Cache Stats',
+    description='Hit/miss counters for the bank account resolution cache in the serving process. Admin only.',
+    responses={
+        200: {'description': 'Cache counters retrieved successfully'},
+        403: {'description': 'Admin access required'},
+    },
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def verify_account_cache_stats(request):
+    """
+    Get account resolution cache counters.
+    GET /api/v1/core/verify-account/stats/
+    """
+    return success_response(
+        data={'stats': resolve_cache_stats.snapshot()},
+        message='Cache stats retrieved successfully'
+    )
+
+
 @extend_schema(
     tags=['Core'],
     summary='Get Nigerian States',
@@ -3,6 +3,7 @@ from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from apps.core.models import AbstractBaseModel
+from apps.core.id_generator import generate_reference
 
 
 class Category(AbstractBaseModel):
@@ -90,8 +91,7 @@ class Product(AbstractBaseModel):
     
     def save(self, *args, **kwargs):
         if not self.sku:
-            import uuid
-            self.sku = f"PRD-{uuid.uuid4().hex[:10].upper()}"
+            self.sku = generate_reference('PRD', separator='-')
         super().save(*args, **kwargs)
 
 
@@ -8,7 +8,7 @@ class OrderAdmin(admin.ModelAdmin):
                     'status', 'total_amount', 'created_at']
     list_filter = ['status', 'payment_status', 'parcel_type', 'created_at']
     search_fields = ['order_number', 'tracking_number', 'sender__email', 'recipient_name']
-    readonly_fields = ['order_number', 'tracking_number', 'created_at', 'updated_at']
+    readonly_fields = ['order_number', 'tracking_number', 'settled_at', 'settlement_reference', 'created_at', 'updated_at']
     fieldsets = (
         ('Order Information', {
             'fields': ('order_number', 'tracking_number', 'status')
@@ -34,7 +34,8 @@ class OrderAdmin(admin.ModelAdmin):
         }),
         ('Financial Information', {
             'fields': ('delivery_fee', 'service_charge', 'insurance_fee',
-                      'total_amount', 'payment_status', 'courier_payout')
+                      'total_amount', 'payment_status', 'courier_payout',
+                      'settled_at', 'settlement_reference')
         }),
         ('Tracking', {
             'fields': ('current_location', 'estimated_delivery_time')
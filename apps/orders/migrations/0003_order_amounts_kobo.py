@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:39
+
+from decimal import Decimal
+
+import apps.core.money
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+# Field name -> default of the MoneyField it becomes
+AMOUNT_FIELDS = {
+    'parcel_financial_worth': None,
+    'delivery_fee': None,
+    'service_charge': None,
+    'insurance_fee': 0,
+    'total_amount': None,
+    'courier_payout': 0,
+}
+
+
+def naira_to_kobo(apps, schema_editor):
+    apps.get_model('orders', 'Order').objects.update(
+        **{name: Round(F(name) * 100) for name in AMOUNT_FIELDS}
+    )
+
+
+def kobo_to_naira(apps, schema_editor):
+    apps.get_model('orders', 'Order').objects.update(
+        **{name: F(name) * Decimal('0.01') for name in AMOUNT_FIELDS}
+    )
+
+
+def _money_field(default):
+    if default is None:
+        return apps.core.money.MoneyField()
+    return apps.core.money.MoneyField(default=default)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_settlement'),
+    ]
+
+    # Widen the Naira columns so they can hold kobo, convert the values, then
+    # switch to integer kobo
+    operations = [
+        *[
+            migrations.AlterField(
+                model_name='order',
+                name=name,
+                field=models.DecimalField(decimal_places=2, max_digits=20),
+            )
+            for name in AMOUNT_FIELDS
+        ],
+        migrations.RunPython(naira_to_kobo, kobo_to_naira),
+        *[
+            migrations.AlterField(
+                model_name='order',
+                name=name,
+                field=_money_field(default),
+            )
+            for name, default in AMOUNT_FIELDS.items()
+        ],
+    ]
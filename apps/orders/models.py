@@ -2,6 +2,8 @@ from django.db import models
 from django.conf import settings
 from decimal import Decimal
 from apps.core.models import AbstractBaseModel
+from apps.core.money import MoneyField
+from apps.core.id_generator import generate_reference
 
 
 class Order(AbstractBaseModel):
@@ -71,16 +73,18 @@ class Order(AbstractBaseModel):
     parcel_condition = models.CharField(max_length=50)  # e.g., "Fragile", "Normal", "Liquid"
     parcel_quantity = models.PositiveIntegerField(default=1)
     parcel_weight_kg = models.DecimalField(max_digits=8, decimal_places=2)
-    parcel_financial_worth = models.DecimalField(max_digits=12, decimal_places=2)
+    parcel_financial_worth = MoneyField()
     parcel_images = models.JSONField(default=list, blank=True)  # Store up to 5 image URLs
     
     # Financial details
-    delivery_fee = models.DecimalField(max_digits=10, decimal_places=2)
-    service_charge = models.DecimalField(max_digits=10, decimal_places=2)
-    insurance_fee = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    delivery_fee = MoneyField()
+    service_charge = MoneyField()
+    insurance_fee = MoneyField(default=0)
+    total_amount = MoneyField()
     payment_status = models.CharField(max_length=20, default='PENDING')  # PENDING, PAID, FAILED
-    courier_payout = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    courier_payout = MoneyField(default=0)
+    settled_at = models.DateTimeField(null=True, blank=True)  # When courier_payout was credited
+    settlement_reference = models.CharField(max_length=100, null=True, blank=True, db_index=True)  # Settlement run
     
     # Status and tracking
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
@@ -109,6 +113,12 @@ class Order(AbstractBaseModel):
             models.Index(fields=['assigned_courier']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Partial index: the settlement job only ever scans delivered, unsettled orders
+            models.Index(
+                fields=['delivered_at'],
+                name='orders_unsettled_delivered_idx',
+                condition=models.Q(status='DELIVERED', settled_at__isnull=True),
+            ),
         ]
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
@@ -118,15 +128,17 @@ class Order(AbstractBaseModel):
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import uuid
-            self.order_number = f"ORD-{uuid.uuid4().hex[:12].upper()}"
+            self.order_number = generate_reference('ORD', separator='-')
         if not self.tracking_number:
-            import uuid
-            self.tracking_number = f"TRK-{uuid.uuid4().hex[:16].upper()}"
+            self.tracking_number = generate_reference('TRK', separator='-')
         # Auto-calculate total_amount if not set
         if not self.total_amount:
             self.total_amount = self.delivery_fee + self.service_charge + self.insurance_fee
         super().save(*args, **kwargs)
+    
+    def calculate_courier_payout(self):
+        """Courier's share of the delivery fee (COURIER_PAYOUT_RATE)"""
+        return self.delivery_fee * Decimal(str(getattr(settings, 'COURIER_PAYOUT_RATE', '0.80')))
 
 
 class TrackingHistory(AbstractBaseModel):
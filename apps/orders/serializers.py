@@ -1,9 +1,15 @@
 from rest_framework import serializers
+from apps.core.money import MoneySerializerField
 from apps.orders.models import Order, TrackingHistory
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating a new order"""
+    parcel_financial_worth = MoneySerializerField(max_digits=12)
+    delivery_fee = MoneySerializerField(max_digits=10)
+    service_charge = MoneySerializerField(max_digits=10)
+    insurance_fee = MoneySerializerField(max_digits=10, required=False)
+    total_amount = MoneySerializerField(max_digits=10)
     
     class Meta:
         model = Order
@@ -29,6 +35,7 @@ class OrderListSerializer(serializers.ModelSerializer):
     """Serializer for listing orders"""
     sender_email = serializers.EmailField(source='sender.email', read_only=True)
     assigned_courier_name = serializers.SerializerMethodField()
+    total_amount = MoneySerializerField(max_digits=10, read_only=True)
     
     class Meta:
         model = Order
@@ -53,6 +60,12 @@ class OrderDetailSerializer(serializers.ModelSerializer):
     sender_email = serializers.EmailField(source='sender.email', read_only=True)
     assigned_courier_email = serializers.EmailField(source='assigned_courier.email', read_only=True)
     tracking_history = serializers.SerializerMethodField()
+    parcel_financial_worth = MoneySerializerField(max_digits=12)
+    delivery_fee = MoneySerializerField(max_digits=10)
+    service_charge = MoneySerializerField(max_digits=10)
+    insurance_fee = MoneySerializerField(max_digits=10, required=False)
+    total_amount = MoneySerializerField(max_digits=10)
+    courier_payout = MoneySerializerField(max_digits=10, required=False)
     
     class Meta:
         model = Order
@@ -83,3 +96,11 @@ class PublicOrderTrackingSerializer(serializers.ModelSerializer):
             'tracking_history'
         ]
 
+
+
+class OrderPaymentSerializer(serializers.Serializer):
+    """Serializer for paying an order from the wallet balance"""
+    confirm = serializers.BooleanField(
+        default=False,
+        help_text='Also confirm the order and send it to couriers once paid'
+    )
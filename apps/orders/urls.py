@@ -2,6 +2,7 @@ from django.urls import path
 from apps.orders.views import (
     create_order,
     confirm_order,
+    pay_order,
     list_orders,
     order_detail,
     track_order,
@@ -19,6 +20,7 @@ urlpatterns = [
     # User endpoints
     path('upload-image/', upload_parcel_image, name='upload_parcel_image'),
     path('create/', create_order, name='create_order'),
+    path('<int:order_id>/pay/', pay_order, name='pay_order'),
     path('<int:order_id>/confirm/', confirm_order, name='confirm_order'),
     path('list/', list_orders, name='list_orders'),
     path('<int:order_id>/', order_detail, name='order_detail'),
@@ -17,9 +17,12 @@ from apps.orders.serializers import (
     OrderListSerializer,
     OrderDetailSerializer,
     TrackingHistorySerializer,
-    PublicOrderTrackingSerializer
+    PublicOrderTrackingSerializer,
+    OrderPaymentSerializer,
 )
+from apps.payments.services.wallet import WalletError, pay_order_from_wallet
 from apps.core.permissions import IsUser, IsCourier
+from apps.core.idempotency import idempotent, IDEMPOTENCY_KEY_PARAMETER
 from apps.accounts.models import User
 
 logger = logging.getLogger(__name__)
@@ -72,6 +75,54 @@ def confirm_order(request, order_id):
     if order.payment_status != 'PAID':
         return error_response('Order must be paid before it can be confirmed and sent to couriers.', status_code=status.HTTP_400_BAD_REQUEST)
     
+    dispatch_order(order)
+    return success_response(data=OrderDetailSerializer(order).data, message='Order confirmed successfully')
+
+
+@extend_schema(
+    tags=['Orders'],
+    summary='Pay for Order',
+    description='Pay for a pending order from your balance. Pass confirm=true to also confirm the order '
+                'and send it to couriers in the same request.',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
+    request=OrderPaymentSerializer,
+    responses={200: OrderDetailSerializer}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsUser])
+@ratelimit(key='user', rate='60/h', method='POST')
+@idempotent('pay_order')
+def pay_order(request, order_id):
+    """Pay for an order from the wallet balance, optionally confirming it"""
+    serializer = OrderPaymentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return validation_error_response(serializer.errors, message='Validation error')
+    
+    try:
+        order = Order.objects.get(id=order_id, sender=request.user)
+    except Order.DoesNotExist:
+        return not_found_response('Order not found. Please check the order ID and try again.')
+    
+    try:
+        # Payment, confirmation and courier dispatch commit or roll back together
+        with db_transaction.atomic():
+            transaction_obj = pay_order_from_wallet(request.user, order)
+            if serializer.validated_data['confirm']:
+                dispatch_order(order)
+    except WalletError as e:
+        return error_response(str(e), status_code=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error paying for order {order.order_number}: {e}", exc_info=True)
+        return error_response('Unable to process payment at this time. Please try again later.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return success_response(
+        data={'order': OrderDetailSerializer(order).data, 'payment_reference': transaction_obj.reference},
+        message='Order paid and confirmed successfully' if serializer.validated_data['confirm'] else 'Order paid successfully'
+    )
+
+
+def dispatch_order(order):
+    """Make a paid order available and offer it to couriers"""
     # Update order status to available
     order.status = 'AVAILABLE'
     order.save()
@@ -85,7 +136,6 @@ def confirm_order(request, order_id):
     
     # Assign to couriers (simple random selection)
     assign_order_to_couriers(order)
-    return success_response(data=OrderDetailSerializer(order).data, message='Order confirmed successfully')
 
 
 def assign_order_to_couriers(order):
@@ -365,6 +415,9 @@ def update_order_status(request, order_id):
         order.picked_up_at = timezone.now()
     elif new_status == 'DELIVERED':
         order.delivered_at = timezone.now()
+        # Credited to the courier by the nightly settlement run
+        if not order.courier_payout:
+            order.courier_payout = order.calculate_courier_payout()
     
     order.save()
     
@@ -1,5 +1,24 @@
+import json
+
 from django.contrib import admin
-from .models import Transaction, Notification, DedicatedVirtualAccount, TransferRecipient
+from django.utils.html import format_html
+from .models import Transaction, TransactionPayload, Notification, DedicatedVirtualAccount, DVAProvisioning, TransferRecipient, DailyTransactionSummary, PayoutBatch, DepositEvent, OutboxEvent
+
+
+class TransactionPayloadInline(admin.TabularInline):
+    """Archived Paystack payloads, decompressed only on the transaction's change page"""
+    model = TransactionPayload
+    extra = 0
+    can_delete = False
+    fields = ['source', 'created_at', 'payload_json']
+    readonly_fields = ['source', 'created_at', 'payload_json']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    @admin.display(description='Payload')
+    def payload_json(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.payload, indent=2, sort_keys=True))
 
 
 @admin.register(Transaction)
@@ -30,6 +49,7 @@ class TransactionAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['created_at', 'updated_at', 'completed_at']
     ordering = ['-created_at']
+    inlines = [TransactionPayloadInline]
     
     fieldsets = (
         ('Transaction Information', {
@@ -188,6 +208,39 @@ class DedicatedVirtualAccountAdmin(admin.ModelAdmin):
         return qs.select_related('user')
 
 
+@admin.register(DVAProvisioning)
+class DVAProvisioningAdmin(admin.ModelAdmin):
+    list_display = [
+        'user',
+        'status',
+        'create_if_missing',
+        'attempts',
+        'updated_at',
+    ]
+    list_filter = [
+        'status',
+        'create_if_missing',
+        'created_at',
+    ]
+    search_fields = [
+        'user__email',
+    ]
+    readonly_fields = [
+        'user',
+        'status',
+        'create_if_missing',
+        'attempts',
+        'last_error',
+        'created_at',
+        'updated_at',
+    ]
+    ordering = ['-updated_at']
+    
+    def has_add_permission(self, request):
+        """Provisioning requests are created by the DVA endpoints only"""
+        return False
+
+
 @admin.register(TransferRecipient)
 class TransferRecipientAdmin(admin.ModelAdmin):
     list_display = [
@@ -248,3 +301,154 @@ class TransferRecipientAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('user')
 
+
+
+@admin.register(DailyTransactionSummary)
+class DailyTransactionSummaryAdmin(admin.ModelAdmin):
+    list_display = [
+        'date',
+        'user',
+        'transaction_type',
+        'transaction_count',
+        'total_amount',
+        'total_fee',
+        'total_net_amount',
+    ]
+    list_filter = [
+        'transaction_type',
+        'date',
+    ]
+    search_fields = [
+        'user__email',
+    ]
+    readonly_fields = [
+        'user',
+        'date',
+        'transaction_type',
+        'transaction_count',
+        'total_amount',
+        'total_fee',
+        'total_net_amount',
+        'updated_at',
+    ]
+    ordering = ['-date']
+    date_hierarchy = 'date'
+    
+    def get_queryset(self, request):
+        """Optimize queryset"""
+        qs = super().get_queryset(request)
+        return qs.select_related('user')
+    
+    def has_add_permission(self, request):
+        """Rows are maintained from transactions only"""
+        return False
+
+
+@admin.register(PayoutBatch)
+class PayoutBatchAdmin(admin.ModelAdmin):
+    list_display = [
+        'reference',
+        'status',
+        'item_count',
+        'total_amount',
+        'attempts',
+        'submitted_at',
+        'created_at',
+    ]
+    list_filter = [
+        'status',
+        'created_at',
+    ]
+    search_fields = [
+        'reference',
+    ]
+    readonly_fields = [
+        'reference',
+        'item_count',
+        'total_amount',
+        'attempts',
+        'submitted_at',
+        'last_error',
+        'created_at',
+        'updated_at',
+    ]
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        """Batches are created by the payout task only"""
+        return False
+
+
+@admin.register(DepositEvent)
+class DepositEventAdmin(admin.ModelAdmin):
+    list_display = [
+        'reference',
+        'status',
+        'attempts',
+        'transaction',
+        'processed_at',
+        'created_at',
+    ]
+    list_filter = [
+        'status',
+        'created_at',
+    ]
+    search_fields = [
+        'reference',
+    ]
+    readonly_fields = [
+        'reference',
+        'payload',
+        'status',
+        'attempts',
+        'last_error',
+        'transaction',
+        'processed_at',
+        'created_at',
+        'updated_at',
+    ]
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        """Events are created by the charge.success webhook only"""
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'event_type',
+        'status',
+        'coalesce_key',
+        'attempts',
+        'available_at',
+        'published_at',
+        'created_at',
+    ]
+    list_filter = [
+        'event_type',
+        'status',
+        'created_at',
+    ]
+    search_fields = [
+        'coalesce_key',
+        'last_error',
+    ]
+    readonly_fields = [
+        'event_type',
+        'payload',
+        'coalesce_key',
+        'status',
+        'attempts',
+        'available_at',
+        'last_error',
+        'published_at',
+        'created_at',
+        'updated_at',
+    ]
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        """Events are recorded by the payment handlers only"""
+        return False
@@ -0,0 +1,8 @@
+"""
+Load-benchmark tooling for the payment paths.
+
+- fake_paystack: local Paystack stand-in with latency and failure injection
+- runner: fixed-rate load generator reporting latency percentiles
+
+Used by the run_fake_paystack and benchmark_payments management commands.
+"""
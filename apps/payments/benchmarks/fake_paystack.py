@@ -0,0 +1,613 @@
+"""
+Local stand-in for the Paystack API.
+
+Serves the endpoints PaystackClient and PaystackAccountVerification call,
+keeping customers, charges, recipients and transfers in memory so the
+payment paths can be load-tested without touching the real API. Each
+response can be delayed (fixed latency plus jitter) and a share of requests
+can fail with a 500 or stall past the client timeout.
+
+Events Paystack would normally send (charge.success, transfer.success,
+dedicatedaccount.assign.success) are POSTed to webhook_url, signed with the
+webhook secret exactly like Paystack does.
+
+Point the app at it with PAYSTACK_BASE_URL=http://127.0.0.1:<port>.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+BANKS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'core', 'services', 'nigerian_banks.json'
+)
+
+
+def sign_payload(body, secret):
+    """Return the X-Paystack-Signature value for a raw webhook body"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha512).hexdigest()
+
+
+def build_event(event, data):
+    """Serialize a webhook event the way Paystack sends it"""
+    return json.dumps({'event': event, 'data': data}, separators=(',', ':'))
+
+
+@dataclass
+class FakePaystackConfig:
+    """Behaviour knobs; can be changed at runtime through POST /_fake/config"""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 31.0
+    charge_status: str = 'success'
+    transfer_status: str = 'success'
+    require_otp: bool = False
+    webhook_url: str = ''
+    webhook_secret: str = ''
+    webhook_delay_ms: float = 0.0
+
+    def update(self, values):
+        for field in fields(self):
+            if field.name in values:
+                setattr(self, field.name, field.type(values[field.name]))
+
+
+class WebhookEmitter:
+    """Delivers signed webhook events from a background thread"""
+
+    def __init__(self, config):
+        self.config = config
+        self.delivered = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run, name='fake-paystack-webhooks', daemon=True)
+        self._thread.start()
+
+    def emit(self, event, data):
+        if self.config.webhook_url:
+            self._queue.put((event, data, time.monotonic() + self.config.webhook_delay_ms / 1000))
+
+    def _run(self):
+        while True:
+            event, data, due = self._queue.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            body = build_event(event, data)
+            try:
+                response = self._session.post(
+                    self.config.webhook_url,
+                    data=body.encode('utf-8'),
+                    headers={
+                        'Content-Type': 'application/json',
+                        'X-Paystack-Signature': sign_payload(body, self.config.webhook_secret),
+                    },
+                    timeout=30,
+                )
+                if response.status_code < 300:
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+                    logger.warning(f"Webhook {event} rejected with {response.status_code}")
+            except requests.RequestException as e:
+                self.failed += 1
+                logger.warning(f"Webhook {event} delivery failed: {e}")
+
+
+class FakePaystackState:
+    """In-memory Paystack objects"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1000000)
+        self.customers = {}
+        self.customer_codes = {}
+        self.dedicated_accounts = {}
+        self.charges = {}
+        self.recipients = {}
+        self.transfers = {}
+        self.transfer_codes = {}
+
+    def next_id(self):
+        return next(self._ids)
+
+    def customer(self, email=None, code=None):
+        if code:
+            email = self.customer_codes.get(code)
+        return self.customers.get(email) if email else None
+
+    def add_customer(self, email, **extra):
+        with self.lock:
+            customer = self.customers.get(email)
+            if customer is None:
+                customer_id = self.next_id()
+                customer = {
+                    'id': customer_id,
+                    'customer_code': f'CUS_fake{customer_id}',
+                    'email': email,
+                    **extra,
+                }
+                self.customers[email] = customer
+                self.customer_codes[customer['customer_code']] = email
+            return customer
+
+    def add_charge(self, reference, email, amount, status, channel='card'):
+        charge = {
+            'id': self.next_id(),
+            'reference': reference,
+            'amount': int(amount),
+            'currency': 'NGN',
+            'status': status,
+            'channel': channel,
+            'paid_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()),
+            'customer': {'email': email},
+        }
+        with self.lock:
+            self.charges[reference] = charge
+        return charge
+
+    def add_transfer(self, reference, amount, recipient, reason, status):
+        transfer_id = self.next_id()
+        transfer = {
+            'id': transfer_id,
+            'transfer_code': f'TRF_fake{transfer_id}',
+            'reference': reference,
+            'amount': int(amount),
+            'currency': 'NGN',
+            'recipient': recipient,
+            'reason': reason or '',
+            'status': status,
+            'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()),
+        }
+        with self.lock:
+            self.transfers[reference] = transfer
+            self.transfer_codes[transfer['transfer_code']] = reference
+        return transfer
+
+
+def _load_banks():
+    try:
+        with open(BANKS_FILE, 'r', encoding='utf-8') as f:
+            banks = json.load(f)
+    except (OSError, ValueError):
+        banks = [{'code': '058', 'name': 'Guaranty Trust Bank'}]
+    return [
+        {'id': index + 1, 'name': bank['name'], 'code': bank['code'], 'slug': bank['name'].lower().replace(' ', '-'), 'currency': 'NGN'}
+        for index, bank in enumerate(banks)
+    ]
+
+
+class FakePaystackHandler(BaseHTTPRequestHandler):
+    """Routes requests to the fake endpoints"""
+
+    server_version = 'FakePaystack/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        ('POST', r'/transaction/initialize', 'initialize_transaction'),
+        ('GET', r'/transaction/verify/(?P<reference>[^/]+)', 'verify_transaction'),
+        ('GET', r'/transaction', 'list_transactions'),
+        ('POST', r'/customer', 'create_customer'),
+        ('GET', r'/customer/(?P<identifier>[^/]+)', 'get_customer'),
+        ('POST', r'/dedicated_account/assign', 'assign_dedicated_account'),
+        ('GET', r'/dedicated_account', 'list_dedicated_accounts'),
+        ('POST', r'/transferrecipient', 'create_transfer_recipient'),
+        ('POST', r'/transfer', 'create_transfer'),
+        ('POST', r'/transfer/bulk', 'bulk_create_transfers'),
+        ('POST', r'/transfer/finalize_transfer', 'finalize_transfer'),
+        ('GET', r'/transfer/verify/(?P<reference>[^/]+)', 'verify_transfer'),
+        ('GET', r'/transfer/(?P<transfer_code>[^/]+)', 'get_transfer'),
+        ('GET', r'/transfer', 'list_transfers'),
+        ('GET', r'/bank', 'list_banks'),
+        ('GET', r'/bank/resolve', 'resolve_account'),
+        ('POST', r'/_fake/charge', 'fake_charge'),
+        ('POST', r'/_fake/config', 'fake_config'),
+        ('GET', r'/_fake/stats', 'fake_stats'),
+    ]
+    compiled_routes = [(method, re.compile(f'^{pattern}/?$'), name) for method, pattern, name in routes]
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        try:
+            self.body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            self._send(400, {'status': False, 'message': 'Invalid JSON body'})
+            return
+
+        for route_method, pattern, name in self.compiled_routes:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                break
+        else:
+            self._send(404, {'status': False, 'message': f'Route not found: {method} {parsed.path}'})
+            return
+
+        self.fake.count(name)
+        if not name.startswith('fake_') and not self.fake.authorized(self.headers.get('Authorization', '')):
+            self._send(401, {'status': False, 'message': 'Invalid key'})
+            return
+
+        config = self.fake.config
+        if not name.startswith('fake_'):
+            delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+            roll = random.random()
+            if roll < config.timeout_rate:
+                delay = max(delay, config.timeout_seconds * 1000)
+            elif roll < config.timeout_rate + config.error_rate:
+                self._sleep(delay)
+                self._send(500, {'status': False, 'message': 'Fake Paystack injected failure'})
+                return
+            self._sleep(delay)
+
+        status_code, payload = getattr(self, f'handle_{name}')(**{key: unquote(value) for key, value in match.groupdict().items()})
+        self._send(status_code, payload)
+
+    def _sleep(self, delay_ms):
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _send(self, status_code, payload):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        try:
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. an injected timeout)
+            pass
+
+    @staticmethod
+    def _ok(message, data=None, **extra):
+        payload = {'status': True, 'message': message}
+        if data is not None:
+            payload['data'] = data
+        payload.update(extra)
+        return 200, payload
+
+    @staticmethod
+    def _error(status_code, message):
+        return status_code, {'status': False, 'message': message}
+
+    # Transactions
+
+    def handle_initialize_transaction(self):
+        reference = self.body.get('reference') or f'fake_{self.fake.state.next_id()}'
+        if reference in self.fake.state.charges:
+            return self._error(400, 'Duplicate Transaction Reference')
+        self.fake.state.add_charge(reference, self.body.get('email', ''), self.body.get('amount', 0), self.fake.config.charge_status)
+        access_code = f'fake_access_{reference}'
+        return self._ok('Authorization URL created', {
+            'authorization_url': f'https://checkout.paystack.com/{access_code}',
+            'access_code': access_code,
+            'reference': reference,
+        })
+
+    def handle_verify_transaction(self, reference):
+        charge = self.fake.state.charges.get(reference)
+        if charge is None:
+            return self._error(404, 'Transaction reference not found')
+        return self._ok('Verification successful', charge)
+
+    def handle_list_transactions(self):
+        page = max(int(self.query.get('page', 1)), 1)
+        per_page = max(int(self.query.get('perPage', 50)), 1)
+        charges = list(self.fake.state.charges.values())
+        if self.query.get('status'):
+            charges = [charge for charge in charges if charge['status'] == self.query['status']]
+        start = (page - 1) * per_page
+        return self._ok('Transactions retrieved', charges[start:start + per_page], meta={
+            'total': len(charges),
+            'page': page,
+            'perPage': per_page,
+            'pageCount': (len(charges) + per_page - 1) // per_page,
+        })
+
+    # Customers and dedicated accounts
+
+    def handle_create_customer(self):
+        email = self.body.get('email')
+        if not email:
+            return self._error(400, 'Email is required')
+        customer = self.fake.state.add_customer(
+            email,
+            first_name=self.body.get('first_name'),
+            last_name=self.body.get('last_name'),
+            phone=self.body.get('phone'),
+        )
+        return self._ok('Customer created', customer)
+
+    def handle_get_customer(self, identifier):
+        if identifier.startswith('CUS_'):
+            customer = self.fake.state.customer(code=identifier)
+        else:
+            customer = self.fake.state.customer(email=identifier)
+        if customer is None:
+            return self._error(404, 'Customer not found')
+        return self._ok('Customer retrieved', customer)
+
+    def handle_assign_dedicated_account(self):
+        customer = self.fake.state.customer(code=self.body.get('customer'))
+        if customer is None:
+            return self._error(404, 'Customer not found')
+        account = self._dedicated_account(customer)
+        self.fake.webhooks.emit('dedicatedaccount.assign.success', {
+            'customer': customer,
+            'dedicated_account': account,
+        })
+        return self._ok('Assign dedicated account in progress')
+
+    def handle_list_dedicated_accounts(self):
+        customer = self.fake.state.customer(code=self.query.get('customer'))
+        account = self.fake.state.dedicated_accounts.get(customer['customer_code']) if customer else None
+        return self._ok('Managed accounts successfully retrieved', [account] if account else [])
+
+    def _dedicated_account(self, customer):
+        with self.fake.state.lock:
+            account = self.fake.state.dedicated_accounts.get(customer['customer_code'])
+            if account is None:
+                account = {
+                    'id': self.fake.state.next_id(),
+                    'account_name': f"{customer.get('first_name') or 'Fake'} {customer.get('last_name') or 'Customer'}",
+                    'account_number': f"9{customer['id']:09d}"[-10:],
+                    'currency': 'NGN',
+                    'active': True,
+                    'assigned': True,
+                    'bank': {'id': 1, 'name': 'Test Bank', 'slug': 'test-bank'},
+                    'customer': {'customer_code': customer['customer_code'], 'email': customer['email']},
+                }
+                self.fake.state.dedicated_accounts[customer['customer_code']] = account
+            return account
+
+    # Transfers
+
+    def handle_create_transfer_recipient(self):
+        recipient_id = self.fake.state.next_id()
+        bank = self.fake.banks_by_code.get(str(self.body.get('bank_code', '')), {})
+        recipient = {
+            'id': recipient_id,
+            'recipient_code': f'RCP_fake{recipient_id}',
+            'type': self.body.get('type', 'nuban'),
+            'name': self.body.get('name', ''),
+            'currency': self.body.get('currency', 'NGN'),
+            'active': True,
+            'details': {
+                'account_number': self.body.get('account_number', ''),
+                'account_name': self.body.get('name', ''),
+                'bank_code': self.body.get('bank_code', ''),
+                'bank_name': bank.get('name', ''),
+            },
+        }
+        with self.fake.state.lock:
+            self.fake.state.recipients[recipient['recipient_code']] = recipient
+        return 201, {'status': True, 'message': 'Transfer recipient created successfully', 'data': recipient}
+
+    def _start_transfer(self, item):
+        reference = item.get('reference') or f'fake_trf_{self.fake.state.next_id()}'
+        if reference in self.fake.state.transfers:
+            return None, 'Duplicate Transfer Reference'
+        if item.get('recipient') not in self.fake.state.recipients:
+            return None, 'Recipient specified is invalid'
+        status = 'otp' if self.fake.config.require_otp else self.fake.config.transfer_status
+        transfer = self.fake.state.add_transfer(reference, item.get('amount', 0), item['recipient'], item.get('reason'), status)
+        if status in ('success', 'failed'):
+            self.fake.webhooks.emit(f'transfer.{status}', transfer)
+        return transfer, None
+
+    def handle_create_transfer(self):
+        transfer, error = self._start_transfer(self.body)
+        if error:
+            return self._error(400, error)
+        data = dict(transfer)
+        if transfer['status'] == 'otp':
+            # PaystackClient callers detect OTP by the key's presence
+            data['otp'] = True
+            return self._ok('Transfer requires OTP to continue', data)
+        return self._ok('Transfer has been queued', data)
+
+    def handle_bulk_create_transfers(self):
+        results = []
+        for item in self.body.get('transfers') or []:
+            transfer, error = self._start_transfer(item)
+            if transfer:
+                results.append({
+                    'reference': transfer['reference'],
+                    'recipient': transfer['recipient'],
+                    'amount': transfer['amount'],
+                    'transfer_code': transfer['transfer_code'],
+                    'currency': 'NGN',
+                    'status': 'pending' if transfer['status'] == 'success' else transfer['status'],
+                })
+        return self._ok(f'{len(results)} transfers queued.', results)
+
+    def handle_finalize_transfer(self):
+        reference = self.fake.state.transfer_codes.get(self.body.get('transfer_code'))
+        transfer = self.fake.state.transfers.get(reference)
+        if transfer is None:
+            return self._error(404, 'Transfer not found')
+        if transfer['status'] != 'otp':
+            return self._error(400, 'Transfer is not currently awaiting OTP')
+        transfer['status'] = 'success'
+        self.fake.webhooks.emit('transfer.success', transfer)
+        return self._ok('Transfer has been queued', transfer)
+
+    def handle_verify_transfer(self, reference):
+        transfer = self.fake.state.transfers.get(reference)
+        if transfer is None:
+            return self._error(404, 'Transfer not found')
+        return self._ok('Transfer retrieved', transfer)
+
+    def handle_get_transfer(self, transfer_code):
+        return self.handle_verify_transfer(self.fake.state.transfer_codes.get(transfer_code, ''))
+
+    def handle_list_transfers(self):
+        page = max(int(self.query.get('page', 1)), 1)
+        per_page = max(int(self.query.get('perPage', 50)), 1)
+        transfers = list(self.fake.state.transfers.values())
+        if self.query.get('status'):
+            transfers = [transfer for transfer in transfers if transfer['status'] == self.query['status']]
+        if self.query.get('recipient'):
+            transfers = [transfer for transfer in transfers if transfer['recipient'] == self.query['recipient']]
+        start = (page - 1) * per_page
+        return self._ok('Transfers retrieved', transfers[start:start + per_page], meta={
+            'total': len(transfers),
+            'page': page,
+            'perPage': per_page,
+            'pageCount': (len(transfers) + per_page - 1) // per_page,
+        })
+
+    # Banks
+
+    def handle_list_banks(self):
+        return self._ok('Banks retrieved', self.fake.banks)
+
+    def handle_resolve_account(self):
+        account_number = self.query.get('account_number', '')
+        bank = self.fake.banks_by_code.get(self.query.get('bank_code', ''))
+        if not bank or not re.fullmatch(r'\d{10}', account_number):
+            return self._error(422, 'Could not resolve account name. Check parameters or try again.')
+        return self._ok('Account number resolved', {
+            'account_number': account_number,
+            'account_name': f'FAKE ACCOUNT {account_number[-4:]}',
+            'bank_id': bank['id'],
+        })
+
+    # Control endpoints
+
+    def handle_fake_charge(self):
+        """Record a successful charge and send its charge.success webhook"""
+        data = self.fake.charge(
+            email=self.body.get('email', ''),
+            amount=self.body.get('amount', 0),
+            channel=self.body.get('channel', 'dedicated_nuban'),
+            reference=self.body.get('reference'),
+        )
+        return self._ok('Charge recorded', data)
+
+    def handle_fake_config(self):
+        self.fake.config.update(self.body)
+        return self._ok('Config updated', {field.name: getattr(self.fake.config, field.name) for field in fields(self.fake.config)})
+
+    def handle_fake_stats(self):
+        return self._ok('Stats retrieved', self.fake.stats())
+
+
+class FakePaystackServer:
+    """
+    Threaded fake Paystack HTTP server.
+
+    Usage:
+        with FakePaystackServer(latency_ms=80, webhook_url=...) as fake:
+            settings.PAYSTACK_BASE_URL = fake.url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, secret_key='', **config):
+        self.config = FakePaystackConfig()
+        self.config.update(config)
+        self.secret_key = secret_key
+        self.state = FakePaystackState()
+        self.webhooks = WebhookEmitter(self.config)
+        self.banks = _load_banks()
+        self.banks_by_code = {bank['code']: bank for bank in self.banks}
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), FakePaystackHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def authorized(self, authorization):
+        return not self.secret_key or authorization == f'Bearer {self.secret_key}'
+
+    def count(self, name):
+        with self._counts_lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def stats(self):
+        with self._counts_lock:
+            requests_by_endpoint = dict(self._counts)
+        return {
+            'requests': requests_by_endpoint,
+            'webhooks_delivered': self.webhooks.delivered,
+            'webhooks_failed': self.webhooks.failed,
+        }
+
+    def charge(self, email, amount, channel='dedicated_nuban', reference=None, emit=True):
+        """
+        Record a successful charge (amount in kobo) and optionally send charge.success.
+
+        Returns:
+            dict: The charge.success event data
+        """
+        reference = reference or f'fake_chg_{self.state.next_id()}'
+        customer = self.state.add_customer(email)
+        charge = self.state.add_charge(reference, email, amount, 'success', channel=channel)
+        data = dict(charge, customer={'email': email, 'customer_code': customer['customer_code'], 'id': customer['id']})
+        if emit:
+            self.webhooks.emit('charge.success', data)
+        return data
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-paystack', daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Paystack listening on {self.url}")
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
@@ -0,0 +1,120 @@
+"""
+Fixed-rate load generator.
+
+Operations are started on a fixed schedule (open loop) rather than as fast as
+workers free up, and each latency is measured from the operation's scheduled
+start. A slow response therefore shows up in the percentiles of everything
+queued behind it instead of silently lowering the offered load.
+"""
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.db import connections
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class LoadResult:
+    name: str
+    target_rate: float
+    duration: float = 0.0
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    first_error: str = ''
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.requests / self.duration if self.duration else 0.0
+
+    def summary(self):
+        """Latencies in milliseconds and throughput in operations per second"""
+        ordered = sorted(self.latencies)
+        return {
+            'name': self.name,
+            'requests': self.requests,
+            'errors': self.errors,
+            'target_rate': self.target_rate,
+            'throughput': round(self.throughput, 2),
+            'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+            'max_ms': round((ordered[-1] if ordered else 0.0) * 1000, 2),
+            'first_error': self.first_error,
+        }
+
+
+def run_load(name, operation, rate, total, concurrency):
+    """
+    Call operation(index) total times at rate calls per second.
+
+    Args:
+        name: Label for the result
+        operation: Callable taking the call index; raising counts as an error
+        rate: Target calls per second
+        total: Number of calls
+        concurrency: Worker threads available to run calls in parallel
+
+    Returns:
+        LoadResult
+    """
+    result = LoadResult(name=name, target_rate=rate)
+    lock = threading.Lock()
+    work = queue.Queue()
+
+    def worker():
+        try:
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                index, scheduled = item
+                error = None
+                try:
+                    operation(index)
+                except Exception as e:
+                    error = e
+                latency = time.perf_counter() - scheduled
+                with lock:
+                    result.latencies.append(latency)
+                    if error is not None:
+                        result.errors += 1
+                        if not result.first_error:
+                            result.first_error = f'{type(error).__name__}: {error}'
+        finally:
+            # Threads own their database connections
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, name=f'bench-{name}-{n}', daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    for index in range(total):
+        scheduled = start + index * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        work.put((index, scheduled))
+
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+
+    result.duration = time.perf_counter() - start
+    return result
@@ -0,0 +1,225 @@
+"""
+Benchmark scenarios for the payment paths.
+
+Each scenario prepares its data in setup() and then exercises one path per
+call to run(index): the API views through DRF's in-process test client, the
+Celery tasks by calling them directly. Paystack calls go to the fake server
+in context.fake.
+"""
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import UserProfile
+from apps.payments.models import Transaction
+from apps.payments.services.paystack_client import PaystackClient
+from apps.payments.benchmarks.fake_paystack import build_event, sign_payload
+from apps.core.utils import get_user_balance
+from apps.core.money import Money, ZERO
+
+SYNC_BATCH_SIZE = 50  # DEPOSIT_SWEEP_BATCH_SIZE default
+BENCH_BALANCE = Money.from_naira('100000000.00')
+
+
+class BenchmarkFailure(Exception):
+    """The operation completed with an unexpected result"""
+
+
+class BenchmarkContext:
+    """Users, fake Paystack server and per-thread API clients shared by scenarios"""
+
+    def __init__(self, fake, webhook_secret, user_count):
+        self.fake = fake
+        self.webhook_secret = webhook_secret
+        self.run_id = uuid.uuid4().hex[:8]
+        self._local = threading.local()
+        self.users = self._create_users(user_count)
+
+    def _create_users(self, count):
+        User = get_user_model()
+        phone_prefix = int(self.run_id, 16) % 10000
+        users = []
+        for n in range(count):
+            user = User.objects.create_user(
+                email=f'bench-{self.run_id}-{n}@example.com',
+                password=None,
+                phone_number=f'+2349{phone_prefix:04d}{n:05d}',
+                user_type='USER',
+            )
+            UserProfile.objects.create(user=user, full_name=f'Bench User {n}', balance=BENCH_BALANCE)
+            get_user_balance(user)  # warm the balance cache
+            users.append(user)
+        return users
+
+    def user(self, index):
+        return self.users[index % len(self.users)]
+
+    def client(self, user):
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        client = clients.get(user.pk)
+        if client is None:
+            client = clients[user.pk] = APIClient()
+            client.force_authenticate(user)
+        return client
+
+    def reference(self, prefix, index):
+        return f'{prefix}_{self.run_id}_{index}'
+
+
+def _expect(response, *status_codes):
+    if response.status_code not in status_codes:
+        raise BenchmarkFailure(f'HTTP {response.status_code}: {getattr(response, "data", response.content)!r}'[:300])
+
+
+class Scenario:
+    name = ''
+    description = ''
+    # Fixed worker count for paths that never run concurrently in production
+    concurrency = None
+
+    def __init__(self, context):
+        self.context = context
+
+    def setup(self, total):
+        """Prepare data for total calls to run()"""
+
+    def run(self, index):
+        raise NotImplementedError
+
+
+class InitializePaymentScenario(Scenario):
+    name = 'initialize_payment'
+    description = 'POST /payments/initialize/ (Paystack initialize + PENDING transaction)'
+
+    def run(self, index):
+        user = self.context.user(index)
+        response = self.context.client(user).post('/api/v1/payments/initialize/', {'amount': '5000.00'}, format='json')
+        _expect(response, 200)
+
+
+class PaystackWebhookScenario(Scenario):
+    name = 'paystack_webhook'
+    description = 'POST /payments/webhook/ with a signed charge.success (deposit processed inline)'
+
+    def run(self, index):
+        user = self.context.user(index)
+        body = build_event('charge.success', {
+            'id': 900000000 + index,
+            'reference': self.context.reference('WHK', index),
+            'amount': 250000,
+            'channel': 'dedicated_nuban',
+            'status': 'success',
+            'customer': {'email': user.email},
+        })
+        response = APIClient().post(
+            '/api/v1/payments/webhook/',
+            data=body,
+            content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=sign_payload(body, self.context.webhook_secret),
+        )
+        _expect(response, 200)
+
+
+class ProcessDVADepositScenario(Scenario):
+    name = 'process_dva_deposit'
+    description = 'process_dva_deposit task for one charge.success event'
+
+    def run(self, index):
+        from apps.payments.tasks import process_dva_deposit
+
+        user = self.context.user(index)
+        result = process_dva_deposit.apply(args=({
+            'event': 'charge.success',
+            'data': {
+                'id': 800000000 + index,
+                'reference': self.context.reference('DEP', index),
+                'amount': 250000,
+                'channel': 'dedicated_nuban',
+                'customer': {'email': user.email},
+            },
+        },))
+        if result.failed() or (result.result or {}).get('status') != 'success':
+            raise BenchmarkFailure(f'process_dva_deposit returned {result.result!r}'[:300])
+
+
+class CreateTransferScenario(Scenario):
+    name = 'create_transfer'
+    description = 'POST /payments/transfer/ (balance debit + Paystack transfer)'
+
+    def setup(self, total):
+        client = PaystackClient()
+        self.recipients = {}
+        for user in self.context.users:
+            response = client.create_transfer_recipient(
+                type='nuban',
+                name=user.email,
+                account_number='0123456789',
+                bank_code='058',
+            )
+            if not response.get('status'):
+                raise BenchmarkFailure(f'Could not create transfer recipient: {response}')
+            self.recipients[user.pk] = response['data']['recipient_code']
+
+    def run(self, index):
+        user = self.context.user(index)
+        response = self.context.client(user).post('/api/v1/payments/transfer/', {
+            'amount': '100.00',
+            'recipient_code': self.recipients[user.pk],
+            'reason': 'Benchmark',
+        }, format='json')
+        _expect(response, 200)
+
+
+class SyncPendingDVATransactionsScenario(Scenario):
+    name = 'sync_pending_dva_transactions'
+    description = f'sync_pending_dva_transactions run over {SYNC_BATCH_SIZE} pending deposits'
+    concurrency = 1
+
+    def setup(self, total):
+        transactions = []
+        for index in range(total * SYNC_BATCH_SIZE):
+            user = self.context.user(index)
+            reference = self.context.reference('SYN', index)
+            self.context.fake.state.add_charge(reference, user.email, 100000, 'success', channel='dedicated_nuban')
+            transactions.append(Transaction(
+                user=user,
+                transaction_type='DEPOSIT',
+                status='PENDING',
+                payment_method='DVA',
+                amount=Money.from_naira('1000.00'),
+                fee=ZERO,
+                net_amount=Money.from_naira('1000.00'),
+                reference=reference,
+                description='Benchmark pending deposit',
+            ))
+        Transaction.objects.bulk_create(transactions, batch_size=1000)
+        # The sweep only picks up deposits older than DEPOSIT_SWEEP_MIN_AGE
+        Transaction.objects.filter(reference__startswith=self.context.reference('SYN', '')).update(
+            created_at=timezone.now() - timedelta(seconds=settings.DEPOSIT_SWEEP_MIN_AGE + 300)
+        )
+
+    def run(self, index):
+        from apps.payments.tasks import sync_pending_dva_transactions
+
+        result = sync_pending_dva_transactions()
+        if result.get('status') != 'success':
+            raise BenchmarkFailure(f'sync_pending_dva_transactions returned {result!r}'[:300])
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        InitializePaymentScenario,
+        PaystackWebhookScenario,
+        ProcessDVADepositScenario,
+        CreateTransferScenario,
+        SyncPendingDVATransactionsScenario,
+    )
+}
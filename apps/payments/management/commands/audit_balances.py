@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.balance_audit import BalanceAuditor
+from apps.core.money import MoneyJSONEncoder, ZERO
+
+
+class Command(BaseCommand):
+    help = 'Recompute every wallet balance from its transactions and report drifted wallets as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per round trip and wallets re-checked per batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write drifted wallets to this file instead of stdout',
+        )
+
+    def handle(self, *args, **options):
+        auditor = BalanceAuditor(chunk_size=options['chunk_size'])
+        output = open(options['output'], 'w') if options['output'] else self.stdout
+        try:
+            for drift in auditor.drifts():
+                output.write(json.dumps(drift, cls=MoneyJSONEncoder) + '\n')
+        finally:
+            if options['output']:
+                output.close()
+
+        summary = auditor.summary
+        self.stderr.write(self.style.SUCCESS(
+            f"Audited {summary['checked']} wallets: {summary['drifted']} drifted, "
+            f"net drift ₦{summary.get('net_drift', ZERO):,.2f}"
+        ))
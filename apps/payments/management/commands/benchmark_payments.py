@@ -0,0 +1,160 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from apps.payments.benchmarks.fake_paystack import FakePaystackServer
+from apps.payments.benchmarks.runner import run_load
+from apps.payments.benchmarks.scenarios import SCENARIOS, BenchmarkContext
+
+BENCHMARK_SECRET_KEY = 'sk_test_benchmark'
+BENCHMARK_WEBHOOK_SECRET = 'whsec_benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-benchmark the payment paths against a local fake Paystack and report '
+        'p50/p95/p99 latency and throughput. Runs in a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help=f'Scenarios to run (default: all). Available: {", ".join(SCENARIOS)}',
+        )
+        parser.add_argument('--rate', type=float, default=50.0, help='Target operations per second (default: 50)')
+        parser.add_argument('--requests', type=int, default=500, help='Operations per scenario (default: 500)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Worker threads (default: 8)')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed operations before each scenario (default: 20)')
+        parser.add_argument('--users', type=int, default=50, help='Benchmark users to spread load over (default: 50)')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Fake Paystack response latency (default: 50)')
+        parser.add_argument('--jitter-ms', type=float, default=20.0, help='Fake Paystack latency jitter (default: 20)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake Paystack requests that fail (0-1)')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=20.0,
+            help='Fail if p95 or throughput is this many percent worse than the baseline (default: 20)',
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(unknown)}. Available: {", ".join(SCENARIOS)}')
+        if options['rate'] <= 0 or options['requests'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--rate, --requests and --concurrency must be positive')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], 'r', encoding='utf-8') as f:
+                baseline = {row['name']: row for row in json.load(f)['results']}
+
+        from celery import current_app
+        eager = (current_app.conf.task_always_eager, current_app.conf.task_eager_propagates)
+        # Tasks run inline so their cost is part of the measured path
+        current_app.conf.task_always_eager = True
+        current_app.conf.task_eager_propagates = False
+
+        # Per-operation INFO logging would dominate the measurements
+        logging.disable(logging.INFO)
+
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with FakePaystackServer(
+                secret_key=BENCHMARK_SECRET_KEY,
+                latency_ms=options['latency_ms'],
+                jitter_ms=options['jitter_ms'],
+                error_rate=options['error_rate'],
+            ) as fake, override_settings(
+                PAYSTACK_BASE_URL=fake.url,
+                PAYSTACK_SECRET_KEY=BENCHMARK_SECRET_KEY,
+                PAYSTACK_WEBHOOK_SECRET=BENCHMARK_WEBHOOK_SECRET,
+                RATELIMIT_ENABLE=False,
+                # Keep the velocity checks on the measured path without tripping them
+                WITHDRAWAL_USER_MAX_COUNT_PER_HOUR=10 ** 9,
+                WITHDRAWAL_USER_MAX_AMOUNT_PER_DAY=10 ** 12,
+                WITHDRAWAL_RECIPIENT_MAX_COUNT_PER_DAY=10 ** 9,
+                WITHDRAWAL_RECIPIENT_MAX_AMOUNT_PER_DAY=10 ** 12,
+                # Likewise the Paystack rate governor: take tokens, never wait
+                PAYSTACK_RATE_LIMIT=10 ** 6,
+                PAYSTACK_RATE_BURST=10 ** 6,
+                ALLOWED_HOSTS=['*'],
+            ):
+                context = BenchmarkContext(fake, BENCHMARK_WEBHOOK_SECRET, options['users'])
+                results = [self._run_scenario(SCENARIOS[name](context), options) for name in names]
+                fake_stats = fake.stats()
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0, keepdb=options['keepdb'])
+            logging.disable(logging.NOTSET)
+            current_app.conf.task_always_eager, current_app.conf.task_eager_propagates = eager
+
+        self._report(results, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'options': self._run_options(options), 'results': results, 'paystack': fake_stats}, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline:
+            regressions = self._regressions(results, baseline, options['max_regression'])
+            if regressions:
+                raise CommandError('Performance regression: ' + '; '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'No regression beyond {options["max_regression"]:g}% of the baseline.'))
+
+    def _run_scenario(self, scenario, options):
+        total = options['requests']
+        warmup = options['warmup']
+        concurrency = scenario.concurrency or options['concurrency']
+
+        self.stdout.write(f'Running {scenario.name}: {scenario.description}')
+        scenario.setup(total + warmup)
+        if warmup:
+            run_load(scenario.name, lambda index: scenario.run(total + index), options['rate'], warmup, concurrency)
+        summary = run_load(scenario.name, scenario.run, options['rate'], total, concurrency).summary()
+        if summary['errors']:
+            self.stdout.write(self.style.WARNING(f'  {summary["errors"]} errors, first: {summary["first_error"]}'))
+        return summary
+
+    def _report(self, results, baseline):
+        header = f'{"scenario":<32}{"ops":>7}{"err":>6}{"ops/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f'{row["name"]:<32}{row["requests"]:>7}{row["errors"]:>6}{row["throughput"]:>10.1f}'
+                f'{row["p50_ms"]:>10.1f}{row["p95_ms"]:>10.1f}{row["p99_ms"]:>10.1f}{row["max_ms"]:>10.1f}'
+            )
+            previous = (baseline or {}).get(row['name'])
+            if previous:
+                self.stdout.write(
+                    f'{"  baseline":<32}{previous["requests"]:>7}{previous["errors"]:>6}{previous["throughput"]:>10.1f}'
+                    f'{previous["p50_ms"]:>10.1f}{previous["p95_ms"]:>10.1f}{previous["p99_ms"]:>10.1f}{previous["max_ms"]:>10.1f}'
+                )
+
+    def _regressions(self, results, baseline, max_regression):
+        allowed = 1 + max_regression / 100
+        regressions = []
+        for row in results:
+            previous = baseline.get(row['name'])
+            if not previous:
+                continue
+            if previous['p95_ms'] and row['p95_ms'] > previous['p95_ms'] * allowed:
+                regressions.append(f'{row["name"]} p95 {row["p95_ms"]:.1f}ms vs {previous["p95_ms"]:.1f}ms')
+            if row['throughput'] * allowed < previous['throughput']:
+                regressions.append(f'{row["name"]} throughput {row["throughput"]:.1f}/s vs {previous["throughput"]:.1f}/s')
+            if row['errors'] > previous['errors']:
+                regressions.append(f'{row["name"]} errors {row["errors"]} vs {previous["errors"]}')
+        return regressions
+
+    def _run_options(self, options):
+        keys = ('rate', 'requests', 'concurrency', 'warmup', 'users', 'latency_ms', 'jitter_ms', 'error_rate')
+        return {key: options[key] for key in keys}
@@ -0,0 +1,107 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.payments.models import Transaction, DailyTransactionSummary
+from apps.core.money import ZERO
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily transaction summary rollup from SUCCESS transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of summary rows to write per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        days = set(
+            Transaction.objects.filter(status='SUCCESS').annotate(
+                day=TruncDate('created_at')
+            ).values_list('day', flat=True).distinct().order_by()
+        )
+        days.update(DailyTransactionSummary.objects.values_list('date', flat=True).distinct().order_by())
+
+        written = 0
+        for day in sorted(days):
+            written += self._rebuild_day(day, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} daily transaction summary rows over {len(days)} days.'
+        ))
+
+    def _rebuild_day(self, day, batch_size):
+        """
+        Recompute one day's summary rows while Transaction.save() keeps applying deltas.
+
+        Every bucket of the day first gets a row, then the day's rows are
+        locked before its transactions are aggregated. A delta committed
+        before the lock is part of the aggregate; one applied after it waits
+        for this transaction and lands on the rebuilt value. Either way it is
+        counted once.
+        """
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        transactions = Transaction.objects.filter(
+            status='SUCCESS',
+            created_at__gte=start,
+            created_at__lt=timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)),
+        )
+
+        DailyTransactionSummary.objects.bulk_create(
+            [
+                DailyTransactionSummary(user_id=user_id, date=day, transaction_type=transaction_type)
+                for user_id, transaction_type in transactions.values_list(
+                    'user_id', 'transaction_type'
+                ).distinct().order_by()
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+        with db_transaction.atomic():
+            rows = {
+                (row.user_id, row.transaction_type): row
+                for row in DailyTransactionSummary.objects.select_for_update().filter(date=day)
+            }
+            buckets = transactions.values('user_id', 'transaction_type').annotate(
+                count=Count('id'),
+                amount=Sum('amount'),
+                fee=Sum('fee'),
+                net_amount=Sum('net_amount'),
+            ).order_by()
+
+            now = timezone.now()
+            for row in rows.values():
+                row.transaction_count = 0
+                row.total_amount = row.total_fee = row.total_net_amount = ZERO
+                row.updated_at = now
+            for bucket in buckets:
+                # A bucket first seen after the rows were locked was created
+                # by apply_delta itself and already holds its transactions
+                row = rows.get((bucket['user_id'], bucket['transaction_type']))
+                if row is None:
+                    continue
+                row.transaction_count = bucket['count']
+                row.total_amount = bucket['amount']
+                row.total_fee = bucket['fee']
+                row.total_net_amount = bucket['net_amount']
+
+            DailyTransactionSummary.objects.filter(
+                pk__in=[row.pk for row in rows.values() if not row.transaction_count]
+            ).delete()
+            DailyTransactionSummary.objects.bulk_update(
+                [row for row in rows.values() if row.transaction_count],
+                ['transaction_count', 'total_amount', 'total_fee', 'total_net_amount', 'updated_at'],
+                batch_size=batch_size,
+            )
+
+        return sum(1 for row in rows.values() if row.transaction_count)
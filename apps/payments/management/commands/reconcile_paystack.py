@@ -0,0 +1,83 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.payments.services.reconciliation import KINDS, PaystackReconciler, ReconciliationError
+from apps.core.money import MoneyJSONEncoder
+
+
+class Command(BaseCommand):
+    help = 'Compare Paystack transactions and transfers with local Transactions and report discrepancies as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='First day to reconcile, YYYY-MM-DD (default: --days before today)',
+        )
+        parser.add_argument(
+            '--until',
+            help='Last day to reconcile, YYYY-MM-DD (default: up to now)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Number of days to reconcile when --since is not given (default: 1)',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=KINDS,
+            action='append',
+            help='Only reconcile this kind of record (repeatable; default: both)',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=None,
+            help='Paystack records per page (default: PAYSTACK_RECONCILIATION_PAGE_SIZE)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write discrepancies to this file instead of stdout',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        end = self._day_start(options['until']) + timedelta(days=1) if options['until'] else now
+        if options['since']:
+            start = self._day_start(options['since'])
+        else:
+            start = end - timedelta(days=options['days'])
+        if start >= end:
+            raise CommandError('--since must be before --until')
+
+        reconciler = PaystackReconciler(page_size=options['page_size'])
+        output = open(options['output'], 'w') if options['output'] else self.stdout
+        try:
+            # Discrepancies are written as they are found, so the report never
+            # has to be held in memory
+            for discrepancy in reconciler.discrepancies(start, end, kinds=options['kind'] or KINDS):
+                output.write(json.dumps(discrepancy, cls=MoneyJSONEncoder) + '\n')
+        except ReconciliationError as e:
+            raise CommandError(str(e))
+        finally:
+            if options['output']:
+                output.close()
+
+        summary = reconciler.summary
+        self.stderr.write(self.style.SUCCESS(
+            f"Reconciled {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}: "
+            f"{summary['transactions_checked']} transactions and {summary['transfers_checked']} transfers checked, "
+            f"{summary['discrepancies']} discrepancies "
+            f"({summary['missing']} missing, {summary['transaction_type']} type, "
+            f"{summary['status']} status, {summary['amount']} amount)"
+        ))
+
+    def _day_start(self, value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+        return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.payments.benchmarks.fake_paystack import FakePaystackServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Paystack API for load testing (set PAYSTACK_BASE_URL to its address)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8099, help='Port to listen on (default: 8099)')
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Fixed delay added to every response')
+        parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra delay of up to this many ms')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500 (0-1)')
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help='Share of requests stalled past the client timeout (0-1)')
+        parser.add_argument('--require-otp', action='store_true', help='Make transfers wait for OTP finalization')
+        parser.add_argument(
+            '--webhook-url',
+            default='',
+            help='Where to send signed webhooks, e.g. http://127.0.0.1:8000/api/v1/payments/webhook/',
+        )
+        parser.add_argument('--webhook-delay-ms', type=float, default=0.0, help='Delay before each webhook is sent')
+
+    def handle(self, *args, **options):
+        fake = FakePaystackServer(
+            host=options['host'],
+            port=options['port'],
+            secret_key=settings.PAYSTACK_SECRET_KEY,
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            timeout_rate=options['timeout_rate'],
+            require_otp=options['require_otp'],
+            webhook_url=options['webhook_url'],
+            webhook_secret=settings.PAYSTACK_WEBHOOK_SECRET or settings.PAYSTACK_SECRET_KEY,
+            webhook_delay_ms=options['webhook_delay_ms'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Fake Paystack listening on {fake.url}'))
+        self.stdout.write(f'Start the app with PAYSTACK_BASE_URL={fake.url}')
+        self.stdout.write('Send a deposit webhook: POST /_fake/charge {"email": ..., "amount": <kobo>}')
+        try:
+            fake.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.stop()
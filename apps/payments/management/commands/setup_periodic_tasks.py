@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from django_celery_beat.models import PeriodicTask, IntervalSchedule
+from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
+from django.conf import settings
 import json
 
 
@@ -7,10 +8,11 @@ class Command(BaseCommand):
     help = 'Set up periodic Celery tasks for DVA transaction syncing'
 
     def handle(self, *args, **options):
-        # Create interval schedule for every 10 seconds
+        # Pending deposits are verified by tasks scheduled when they are created;
+        # this is only a low-frequency safety sweep
         schedule, created = IntervalSchedule.objects.get_or_create(
             every=10,
-            period=IntervalSchedule.SECONDS,
+            period=IntervalSchedule.MINUTES,
         )
 
         if created:
@@ -37,6 +39,196 @@ class Command(BaseCommand):
             task.save()
             self.stdout.write(self.style.SUCCESS('Updated periodic task: Sync Pending DVA Transactions'))
 
+        # Withdrawals whose transfer call got no definite answer from Paystack
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Sync Pending Withdrawals',
+            defaults={
+                'task': 'apps.payments.tasks.sync_pending_withdrawals',
+                'interval': schedule,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Sync Pending Withdrawals'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Sync Pending Withdrawals'))
+
+        minute_schedule, _ = IntervalSchedule.objects.get_or_create(
+            every=1,
+            period=IntervalSchedule.MINUTES,
+        )
+
+        # Safety-net relay of outbox events (normally relayed right after their transaction commits)
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Relay Outbox Events',
+            defaults={
+                'task': 'apps.payments.tasks.relay_outbox_events',
+                'interval': minute_schedule,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Relay Outbox Events'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Relay Outbox Events'))
+
+        # Safety-net drain of queued deposit webhooks (normally drained right after they arrive)
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Drain DVA Deposit Events',
+            defaults={
+                'task': 'apps.payments.tasks.process_dva_deposit_batch',
+                'interval': minute_schedule,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Drain DVA Deposit Events'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Drain DVA Deposit Events'))
+
+        # Hourly reconciliation of unread notification counters
+        hourly_schedule, _ = IntervalSchedule.objects.get_or_create(
+            every=1,
+            period=IntervalSchedule.HOURS,
+        )
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Reconcile Notification Counters',
+            defaults={
+                'task': 'apps.payments.tasks.reconcile_notification_counters',
+                'interval': hourly_schedule,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Reconcile Notification Counters'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Reconcile Notification Counters'))
+
+        # Daily purge of expired idempotency keys
+        daily_schedule, _ = IntervalSchedule.objects.get_or_create(
+            every=1,
+            period=IntervalSchedule.DAYS,
+        )
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Purge Expired Idempotency Records',
+            defaults={
+                'task': 'apps.core.tasks.purge_expired_idempotency_records',
+                'interval': daily_schedule,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Purge Expired Idempotency Records'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Purge Expired Idempotency Records'))
+
+        # Daily purge of velocity counters for windows that have passed
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Purge Expired Velocity Counters',
+            defaults={
+                'task': 'apps.payments.tasks.purge_expired_velocity_counters',
+                'interval': daily_schedule,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Purge Expired Velocity Counters'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Purge Expired Velocity Counters'))
+
+        # Nightly courier earnings settlement at 00:30, ahead of payouts
+        settlement_schedule, _ = CrontabSchedule.objects.get_or_create(
+            minute='30',
+            hour='0',
+            day_of_week='*',
+            day_of_month='*',
+            month_of_year='*',
+            timezone=settings.TIME_ZONE,
+        )
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Settle Courier Earnings',
+            defaults={
+                'task': 'apps.payments.tasks.settle_courier_earnings',
+                'crontab': settlement_schedule,
+                'interval': None,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Settle Courier Earnings'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Settle Courier Earnings'))
+
+        # Nightly courier payouts at 01:00
+        nightly_schedule, _ = CrontabSchedule.objects.get_or_create(
+            minute='0',
+            hour='1',
+            day_of_week='*',
+            day_of_month='*',
+            month_of_year='*',
+            timezone=settings.TIME_ZONE,
+        )
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Process Courier Payouts',
+            defaults={
+                'task': 'apps.payments.tasks.process_courier_payouts',
+                'crontab': nightly_schedule,
+                'interval': None,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Process Courier Payouts'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Process Courier Payouts'))
+
+        # Nightly Paystack reconciliation at 03:00, after payouts have been submitted
+        reconciliation_schedule, _ = CrontabSchedule.objects.get_or_create(
+            minute='0',
+            hour='3',
+            day_of_week='*',
+            day_of_month='*',
+            month_of_year='*',
+            timezone=settings.TIME_ZONE,
+        )
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Reconcile Paystack Records',
+            defaults={
+                'task': 'apps.payments.tasks.reconcile_paystack_records',
+                'crontab': reconciliation_schedule,
+                'interval': None,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Reconcile Paystack Records'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Reconcile Paystack Records'))
+
+        # Nightly wallet balance audit at 04:00, once settlement and payouts are done
+        audit_schedule, _ = CrontabSchedule.objects.get_or_create(
+            minute='0',
+            hour='4',
+            day_of_week='*',
+            day_of_month='*',
+            month_of_year='*',
+            timezone=settings.TIME_ZONE,
+        )
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Audit Wallet Balances',
+            defaults={
+                'task': 'apps.payments.tasks.audit_wallet_balances',
+                'crontab': audit_schedule,
+                'interval': None,
+                'enabled': True,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Successfully created periodic task: Audit Wallet Balances'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Updated periodic task: Audit Wallet Balances'))
+
         self.stdout.write(self.style.SUCCESS('\n✅ Periodic task setup completed!'))
-        self.stdout.write(self.style.SUCCESS('Task will run every 10 seconds to sync pending DVA transactions.'))
+        self.stdout.write(self.style.SUCCESS('Pending DVA transactions will be swept every 10 minutes.'))
+        self.stdout.write(self.style.SUCCESS('Notification counters will be reconciled every hour.'))
 
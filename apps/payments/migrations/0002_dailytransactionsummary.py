@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTransactionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal')], max_length=20)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_fee', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_net_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_transaction_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Transaction Summary',
+                'verbose_name_plural': 'Daily Transaction Summaries',
+                'db_table': 'daily_transaction_summaries',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'transaction_type'], name='daily_trans_date_f52996_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailytransactionsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'transaction_type'), name='uniq_daily_txn_summary_user_date_type'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:09
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('reference', models.CharField(db_index=True, max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SUBMITTING', 'Submitting'), ('SUBMITTED', 'Submitted'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=20)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Payout Batch',
+                'verbose_name_plural': 'Payout Batches',
+                'db_table': 'payout_batches',
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='payout_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='payments.payoutbatch'),
+        ),
+    ]
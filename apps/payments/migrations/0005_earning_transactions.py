@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_payoutbatch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailytransactionsummary',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('EARNING', 'Courier Earning')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('TRANSACTION_SUCCESS', 'Transaction Success'), ('TRANSACTION_FAILED', 'Transaction Failed'), ('DEPOSIT_RECEIVED', 'Deposit Received'), ('WITHDRAWAL_SUCCESS', 'Withdrawal Success'), ('WITHDRAWAL_FAILED', 'Withdrawal Failed'), ('WITHDRAWAL_REVERSED', 'Withdrawal Reversed'), ('DVA_CREATED', 'DVA Created'), ('BALANCE_LOW', 'Balance Low'), ('TRANSFER_PENDING', 'Transfer Pending'), ('EARNINGS_SETTLED', 'Earnings Settled'), ('OTHER', 'Other')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='payment_method',
+            field=models.CharField(choices=[('CARD', 'Card'), ('BANK_TRANSFER', 'Bank Transfer'), ('DVA', 'Dedicated Virtual Account'), ('USSD', 'USSD'), ('MOBILE_MONEY', 'Mobile Money'), ('PAYSTACK_BALANCE', 'Paystack Balance'), ('WALLET', 'Wallet')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('EARNING', 'Courier Earning')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payments', '0005_earning_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DVAProvisioning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('IN_PROGRESS', 'In Progress'), ('AWAITING_WEBHOOK', 'Awaiting Webhook'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('create_if_missing', models.BooleanField(default=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dva_provisioning', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'DVA Provisioning',
+                'verbose_name_plural': 'DVA Provisioning',
+                'db_table': 'dva_provisioning',
+            },
+        ),
+    ]
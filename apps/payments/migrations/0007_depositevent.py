@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_dvaprovisioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepositEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('reference', models.CharField(max_length=255, unique=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSED', 'Processed'), ('DUPLICATE', 'Duplicate'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deposit_events', to='payments.transaction')),
+            ],
+            options={
+                'verbose_name': 'Deposit Event',
+                'verbose_name_plural': 'Deposit Events',
+                'db_table': 'deposit_events',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['created_at'], name='deposit_events_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('transaction_type', 'DEPOSIT')), fields=('paystack_reference',), name='uniq_deposit_paystack_reference'),
+        ),
+    ]
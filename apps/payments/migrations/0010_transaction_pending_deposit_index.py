@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_deposit_paystack_reference_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('status', 'PENDING'), ('transaction_type', 'DEPOSIT')), fields=['created_at'], name='transactions_pending_dep_idx'),
+        ),
+    ]
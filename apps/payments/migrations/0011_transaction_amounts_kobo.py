@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:39
+
+from decimal import Decimal
+
+import apps.core.money
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+# Model name -> {field name: MoneyField it becomes}
+AMOUNT_FIELDS = {
+    'transaction': {
+        'amount': apps.core.money.MoneyField(validators=[django.core.validators.MinValueValidator(apps.core.money.Money(1))]),
+        'fee': apps.core.money.MoneyField(default=0, help_text='Transaction fee'),
+        'net_amount': apps.core.money.MoneyField(help_text='Amount after fees (amount - fee)'),
+    },
+    'payoutbatch': {
+        'total_amount': apps.core.money.MoneyField(default=0),
+    },
+    'dailytransactionsummary': {
+        'total_amount': apps.core.money.MoneyField(default=0),
+        'total_fee': apps.core.money.MoneyField(default=0),
+        'total_net_amount': apps.core.money.MoneyField(default=0),
+    },
+}
+
+
+def naira_to_kobo(apps, schema_editor):
+    for model_name, fields in AMOUNT_FIELDS.items():
+        apps.get_model('payments', model_name).objects.update(
+            **{name: Round(F(name) * 100) for name in fields}
+        )
+
+
+def kobo_to_naira(apps, schema_editor):
+    for model_name, fields in AMOUNT_FIELDS.items():
+        apps.get_model('payments', model_name).objects.update(
+            **{name: F(name) * Decimal('0.01') for name in fields}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_transaction_pending_deposit_index'),
+    ]
+
+    # Widen the Naira columns so they can hold kobo, convert the values, then
+    # switch to integer kobo
+    operations = [
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=name,
+                field=models.DecimalField(decimal_places=2, max_digits=20),
+            )
+            for model_name, fields in AMOUNT_FIELDS.items()
+            for name in fields
+        ],
+        migrations.RunPython(naira_to_kobo, kobo_to_naira),
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=name,
+                field=field,
+            )
+            for model_name, fields in AMOUNT_FIELDS.items()
+            for name, field in fields.items()
+        ],
+    ]
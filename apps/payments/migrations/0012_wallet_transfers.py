@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0011_transaction_amounts_kobo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailytransactionsummary',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('EARNING', 'Courier Earning'), ('TRANSFER_OUT', 'Wallet Transfer Sent'), ('TRANSFER_IN', 'Wallet Transfer Received')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('TRANSACTION_SUCCESS', 'Transaction Success'), ('TRANSACTION_FAILED', 'Transaction Failed'), ('DEPOSIT_RECEIVED', 'Deposit Received'), ('WITHDRAWAL_SUCCESS', 'Withdrawal Success'), ('WITHDRAWAL_FAILED', 'Withdrawal Failed'), ('WITHDRAWAL_REVERSED', 'Withdrawal Reversed'), ('DVA_CREATED', 'DVA Created'), ('BALANCE_LOW', 'Balance Low'), ('TRANSFER_PENDING', 'Transfer Pending'), ('EARNINGS_SETTLED', 'Earnings Settled'), ('TRANSFER_RECEIVED', 'Transfer Received'), ('OTHER', 'Other')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('EARNING', 'Courier Earning'), ('TRANSFER_OUT', 'Wallet Transfer Sent'), ('TRANSFER_IN', 'Wallet Transfer Received')], max_length=20),
+        ),
+    ]
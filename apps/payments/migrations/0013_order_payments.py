@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0012_wallet_transfers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailytransactionsummary',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('EARNING', 'Courier Earning'), ('TRANSFER_OUT', 'Wallet Transfer Sent'), ('TRANSFER_IN', 'Wallet Transfer Received'), ('PAYMENT', 'Order Payment')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('EARNING', 'Courier Earning'), ('TRANSFER_OUT', 'Wallet Transfer Sent'), ('TRANSFER_IN', 'Wallet Transfer Received'), ('PAYMENT', 'Order Payment')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:55
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Metadata keys written by the application itself; everything else came from
+# a Paystack payload merged into metadata
+OWN_KEYS = {
+    'recipient_code', 'payout_batch', 'transfer_reference', 'note', 'counterparty_id',
+    'order_id', 'order_number', 'settlement_reference', 'order_count', 'sync_method',
+    'failure_reason',
+}
+# Paystack fields still kept in metadata (apps.payments.services.payloads.SUMMARY_FIELDS)
+SUMMARY_FIELDS = ('status', 'channel', 'gateway_response', 'paid_at', 'transfer_code', 'reason')
+LEGACY_SOURCE = 'legacy_metadata'
+BATCH_SIZE = 1000
+
+
+def archive_provider_metadata(apps, schema_editor):
+    Transaction = apps.get_model('payments', 'Transaction')
+    TransactionPayload = apps.get_model('payments', 'TransactionPayload')
+
+    compacted, payloads = [], []
+
+    def flush():
+        Transaction.objects.bulk_update(compacted, ['metadata'], batch_size=BATCH_SIZE)
+        TransactionPayload.objects.bulk_create(payloads, batch_size=BATCH_SIZE)
+        compacted.clear()
+        payloads.clear()
+
+    for transaction_obj in Transaction.objects.only('id', 'metadata').order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        metadata = transaction_obj.metadata or {}
+        provider_data = {key: value for key, value in metadata.items() if key not in OWN_KEYS}
+        if not set(provider_data) - set(SUMMARY_FIELDS):
+            continue
+        payloads.append(TransactionPayload(
+            transaction_id=transaction_obj.pk,
+            source=LEGACY_SOURCE,
+            data=zlib.compress(json.dumps(provider_data, separators=(',', ':')).encode()),
+        ))
+        transaction_obj.metadata = {
+            key: value for key, value in metadata.items()
+            if key in OWN_KEYS or (key in SUMMARY_FIELDS and value not in (None, ''))
+        }
+        compacted.append(transaction_obj)
+        if len(compacted) >= BATCH_SIZE:
+            flush()
+    flush()
+
+
+def restore_provider_metadata(apps, schema_editor):
+    Transaction = apps.get_model('payments', 'Transaction')
+    TransactionPayload = apps.get_model('payments', 'TransactionPayload')
+
+    for payload in TransactionPayload.objects.filter(source=LEGACY_SOURCE).iterator(chunk_size=BATCH_SIZE):
+        transaction_obj = Transaction.objects.only('id', 'metadata').get(pk=payload.transaction_id)
+        transaction_obj.metadata = {**json.loads(zlib.decompress(bytes(payload.data))), **transaction_obj.metadata}
+        transaction_obj.save(update_fields=['metadata'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0013_order_payments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionPayload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Where the payload came from, e.g. verify or transfer.success', max_length=50)),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payloads', to='payments.transaction')),
+            ],
+            options={
+                'verbose_name': 'Transaction Payload',
+                'verbose_name_plural': 'Transaction Payloads',
+                'db_table': 'transaction_payloads',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.RunPython(archive_provider_metadata, restore_provider_metadata),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0014_transaction_payloads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VelocityCounter',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Velocity Counter',
+                'verbose_name_plural': 'Velocity Counters',
+                'db_table': 'velocity_counters',
+            },
+        ),
+    ]
@@ -1,9 +1,17 @@
-from django.db import models
+import json
+import zlib
+
+from django.db import models, IntegrityError
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from decimal import Decimal
+from django.utils import timezone
 
 from apps.core.models import AbstractBaseModel
+from apps.core.money import Money, MoneyField, MoneyJSONEncoder
 
 
 class Transaction(AbstractBaseModel):
@@ -13,6 +21,10 @@ class Transaction(AbstractBaseModel):
     TRANSACTION_TYPE_CHOICES = [
         ('DEPOSIT', 'Deposit'),
         ('WITHDRAWAL', 'Withdrawal'),
+        ('EARNING', 'Courier Earning'),
+        ('TRANSFER_OUT', 'Wallet Transfer Sent'),
+        ('TRANSFER_IN', 'Wallet Transfer Received'),
+        ('PAYMENT', 'Order Payment'),
     ]
     
     STATUS_CHOICES = [
@@ -30,6 +42,7 @@ class Transaction(AbstractBaseModel):
         ('USSD', 'USSD'),
         ('MOBILE_MONEY', 'Mobile Money'),
         ('PAYSTACK_BALANCE', 'Paystack Balance'),
+        ('WALLET', 'Wallet'),
     ]
     
     user = models.ForeignKey(
@@ -40,20 +53,14 @@ class Transaction(AbstractBaseModel):
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
-    amount = models.DecimalField(
-        max_digits=12,
-        decimal_places=2,
-        validators=[MinValueValidator(Decimal('0.01'))]
+    amount = MoneyField(
+        validators=[MinValueValidator(Money(1))]
     )
-    fee = models.DecimalField(
-        max_digits=12,
-        decimal_places=2,
-        default=Decimal('0.00'),
+    fee = MoneyField(
+        default=0,
         help_text='Transaction fee'
     )
-    net_amount = models.DecimalField(
-        max_digits=12,
-        decimal_places=2,
+    net_amount = MoneyField(
         help_text='Amount after fees (amount - fee)'
     )
     reference = models.CharField(max_length=100, unique=True, db_index=True)
@@ -62,6 +69,13 @@ class Transaction(AbstractBaseModel):
     description = models.TextField(blank=True, null=True)
     metadata = models.JSONField(default=dict, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    payout_batch = models.ForeignKey(
+        'PayoutBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions'
+    )
     
     class Meta:
         db_table = 'transactions'
@@ -72,22 +86,107 @@ class Transaction(AbstractBaseModel):
             models.Index(fields=['paystack_reference']),
             models.Index(fields=['created_at']),
             models.Index(fields=['user', 'created_at']),
+            # Keeps the pending-deposit sweep cheap when nothing is pending
+            models.Index(
+                fields=['created_at'],
+                name='transactions_pending_dep_idx',
+                condition=models.Q(transaction_type='DEPOSIT', status='PENDING'),
+            ),
+        ]
+        constraints = [
+            # Lets deposit ingestion insert-or-skip instead of locking to find duplicates
+            models.UniqueConstraint(
+                fields=['paystack_reference'],
+                condition=models.Q(transaction_type='DEPOSIT'),
+                name='uniq_deposit_paystack_reference',
+            ),
         ]
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
     
+    # Status as last loaded from / written to the database; used to detect
+    # transitions into and out of SUCCESS for the daily summary rollup.
+    _loaded_status = None
+    
     def __str__(self):
         return f"{self.transaction_type} - {self.amount} - {self.status} - {self.reference}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or 'status' in fields:
+            self._loaded_status = self.status
+    
     def save(self, *args, **kwargs):
-        """Calculate net_amount before saving"""
+        """Calculate net_amount before saving and keep the daily summary in sync"""
         if not self.net_amount:
             self.net_amount = self.amount - self.fee
-        # Round to 2 decimal places
-        self.net_amount = Decimal(str(self.net_amount)).quantize(Decimal('0.01'))
-        self.amount = Decimal(str(self.amount)).quantize(Decimal('0.01'))
-        self.fee = Decimal(str(self.fee)).quantize(Decimal('0.01'))
-        super().save(*args, **kwargs)
+        
+        was_success = self._loaded_status == 'SUCCESS'
+        is_success = self.status == 'SUCCESS'
+        if was_success == is_success:
+            super().save(*args, **kwargs)
+        else:
+            with db_transaction.atomic():
+                super().save(*args, **kwargs)
+                DailyTransactionSummary.record(self, sign=1 if is_success else -1)
+        self._loaded_status = self.status
+    
+    def provider_payloads(self):
+        """
+        Full Paystack payloads archived for this transaction, oldest first.
+        
+        metadata only keeps a summary of each payload; the originals are
+        loaded from the archive (one query) when something needs them.
+        
+        Returns:
+            list: (source, payload dict) tuples
+        """
+        return [(archived.source, archived.payload) for archived in self.payloads.order_by('created_at', 'id')]
+
+
+class TransactionPayload(models.Model):
+    """
+    Compressed archive of a raw Paystack payload for a transaction.
+    
+    Verify responses, webhook events and transfer results are stored here in
+    full, zlib-compressed, while Transaction.metadata keeps only the fields
+    the application reads. The archive is append-only and is never loaded by
+    transaction lists.
+    """
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='payloads'
+    )
+    source = models.CharField(max_length=50, help_text='Where the payload came from, e.g. verify or transfer.success')
+    data = models.BinaryField(help_text='zlib-compressed JSON')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'transaction_payloads'
+        ordering = ['created_at']
+        verbose_name = 'Transaction Payload'
+        verbose_name_plural = 'Transaction Payloads'
+    
+    def __str__(self):
+        return f"{self.transaction_id} - {self.source}"
+    
+    @classmethod
+    def pack(cls, transaction_obj, source, payload):
+        """Build an unsaved archive row for payload"""
+        encoded = json.dumps(payload, cls=MoneyJSONEncoder, separators=(',', ':')).encode()
+        return cls(transaction=transaction_obj, source=source, data=zlib.compress(encoded))
+    
+    @property
+    def payload(self):
+        """The decompressed payload"""
+        return json.loads(zlib.decompress(bytes(self.data)))
 
 
 class DedicatedVirtualAccount(AbstractBaseModel):
@@ -115,6 +214,46 @@ class DedicatedVirtualAccount(AbstractBaseModel):
         return f"{self.account_name} - {self.account_number} ({self.bank_name})"
 
 
+class DVAProvisioning(AbstractBaseModel):
+    """
+    State of a user's background DVA provisioning request.
+    
+    Created by the create_dva/get_dva endpoints and advanced by the
+    provision_dedicated_account task and the dedicatedaccount.assign.success
+    webhook, so no request waits on the multi-step Paystack flow.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('IN_PROGRESS', 'In Progress'),
+        ('AWAITING_WEBHOOK', 'Awaiting Webhook'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('PENDING', 'IN_PROGRESS', 'AWAITING_WEBHOOK')
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='dva_provisioning'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    create_if_missing = models.BooleanField(default=True)  # False: only sync an existing Paystack DVA
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'dva_provisioning'
+        verbose_name = 'DVA Provisioning'
+        verbose_name_plural = 'DVA Provisioning'
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.status}"
+    
+    @property
+    def in_progress(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
 class TransferRecipient(AbstractBaseModel):
     """
     Transfer recipient model for storing Paystack transfer recipients.
@@ -147,6 +286,130 @@ class TransferRecipient(AbstractBaseModel):
         return f"{self.name} - {self.account_number} ({self.bank_name or 'N/A'})"
 
 
+class PayoutBatch(AbstractBaseModel):
+    """
+    A group of courier payout withdrawals submitted through Paystack bulk transfers.
+    
+    Each payout is a WITHDRAWAL Transaction linked to the batch; the batch is
+    submitted in chunks of up to PAYSTACK_BULK_TRANSFER_BATCH_SIZE transfers.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SUBMITTING', 'Submitting'),
+        ('SUBMITTED', 'Submitted'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    reference = models.CharField(max_length=100, unique=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', db_index=True)
+    item_count = models.PositiveIntegerField(default=0)
+    total_amount = MoneyField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'payout_batches'
+        verbose_name = 'Payout Batch'
+        verbose_name_plural = 'Payout Batches'
+    
+    def __str__(self):
+        return f"{self.reference} - {self.item_count} payouts - {self.status}"
+
+
+class DepositEvent(AbstractBaseModel):
+    """
+    A charge.success webhook waiting to be credited.
+    
+    Webhooks only insert a row here; process_dva_deposit_batch drains pending
+    events in groups, crediting each batch with a handful of bulk queries
+    instead of one task and transaction per deposit.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSED', 'Processed'),
+        ('DUPLICATE', 'Duplicate'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    reference = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='deposit_events'
+    )
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'deposit_events'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                name='deposit_events_pending_idx',
+                condition=models.Q(status='PENDING'),
+            ),
+        ]
+        verbose_name = 'Deposit Event'
+        verbose_name_plural = 'Deposit Events'
+    
+    def __str__(self):
+        return f"{self.reference} - {self.status}"
+
+
+class OutboxEvent(AbstractBaseModel):
+    """
+    A side effect recorded in the same transaction as the state change behind it.
+    
+    Handlers write notifications and Celery task requests here instead of
+    creating them inline; relay_outbox_events publishes pending events in
+    batches once the transaction has committed, so a rolled-back change emits
+    nothing and a committed one is never lost to a broker outage.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('NOTIFICATION', 'Notification'),
+        ('TASK', 'Celery Task'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PUBLISHED', 'Published'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Task events sharing a key are published once per relay batch
+    coalesce_key = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'outbox_events'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['available_at'],
+                name='outbox_events_pending_idx',
+                condition=models.Q(status='PENDING'),
+            ),
+        ]
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} - {self.status}"
+
+
 class Notification(AbstractBaseModel):
     """
     Notification model for recording important user activities.
@@ -161,6 +424,8 @@ class Notification(AbstractBaseModel):
         ('DVA_CREATED', 'DVA Created'),
         ('BALANCE_LOW', 'Balance Low'),
         ('TRANSFER_PENDING', 'Transfer Pending'),
+        ('EARNINGS_SETTLED', 'Earnings Settled'),
+        ('TRANSFER_RECEIVED', 'Transfer Received'),
         ('OTHER', 'Other'),
     ]
     
@@ -195,4 +460,211 @@ class Notification(AbstractBaseModel):
     
     def __str__(self):
         return f"{self.notification_type} - {self.user.email} - {self.title}"
+    
+    def save(self, *args, **kwargs):
+        """Count new unread notifications towards the user's unread counter"""
+        if self._state.adding and not self.is_read:
+            with db_transaction.atomic():
+                super().save(*args, **kwargs)
+                NotificationCounter.adjust(self.user_id, 1)
+        else:
+            super().save(*args, **kwargs)
+
+
+class NotificationCounter(models.Model):
+    """
+    Per-user unread notification counter.
+    
+    Lets the unread badge be served by a primary-key lookup instead of a COUNT
+    over the notifications table. Incremented when an unread Notification is
+    created, decremented by the mark-read endpoints, and periodically
+    reconciled against the real count by reconcile_notification_counters.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'notification_counters'
+        verbose_name = 'Notification Counter'
+        verbose_name_plural = 'Notification Counters'
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.unread_count} unread"
+    
+    @classmethod
+    def get_unread_count(cls, user_id):
+        """Return the user's unread count, initialising the counter on first use"""
+        unread_count = cls.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first()
+        if unread_count is None:
+            unread_count = cls._initialise(user_id)
+        return unread_count
+    
+    @classmethod
+    def adjust(cls, user_id, delta):
+        """
+        Atomically add delta (positive or negative) to a user's unread count.
+        
+        Call after the notification rows have been written; a missing counter is
+        initialised from the real count, which already includes the change.
+        """
+        if not delta:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(
+            unread_count=Greatest(F('unread_count') + delta, 0),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            cls._initialise(user_id)
+    
+    @classmethod
+    def _initialise(cls, user_id):
+        unread_count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        try:
+            with db_transaction.atomic():
+                cls.objects.create(user_id=user_id, unread_count=unread_count)
+        except IntegrityError:
+            # Created concurrently; that row already reflects the real count
+            pass
+        return unread_count
+
+
+class VelocityCounter(models.Model):
+    """
+    One fixed-window counter of the withdrawal velocity limits.
+    
+    Kept in the database rather than the cache, which is per-process in
+    production, so every worker counts against the same row. The window is
+    part of the key, so a row is only ever added to; expired rows are
+    deleted by purge_expired_velocity_counters.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'velocity_counters'
+        verbose_name = 'Velocity Counter'
+        verbose_name_plural = 'Velocity Counters'
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+    
+    @classmethod
+    def add(cls, key, delta, expires_at):
+        """
+        Atomically add delta (positive or negative) to a counter, creating it at 0 first.
+        
+        The row is locked before it is read, so concurrent additions are
+        serialised and each sees the total including its own delta.
+        
+        Returns:
+            int: The counter's new value
+        """
+        with db_transaction.atomic():
+            cls.objects.bulk_create([cls(key=key, value=0, expires_at=expires_at)], ignore_conflicts=True)
+            value = cls.objects.select_for_update().filter(key=key).values_list('value', flat=True).get()
+            cls.objects.filter(key=key).update(value=F('value') + delta)
+        return value + delta
 
+
+
+class DailyTransactionSummary(models.Model):
+    """
+    Per-user, per-day, per-type rollup of SUCCESS transactions.
+    
+    Maintained incrementally by Transaction.save() whenever a transaction
+    enters or leaves SUCCESS, so summary queries scan one row per day instead
+    of every transaction. Rows are bucketed by the transaction's created_at
+    date, which never changes, so a later reversal decrements the same row.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_transaction_summaries'
+    )
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    transaction_count = models.PositiveIntegerField(default=0)
+    total_amount = MoneyField(default=0)
+    total_fee = MoneyField(default=0)
+    total_net_amount = MoneyField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'daily_transaction_summaries'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'transaction_type'],
+                name='uniq_daily_txn_summary_user_date_type',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'transaction_type']),
+        ]
+        verbose_name = 'Daily Transaction Summary'
+        verbose_name_plural = 'Daily Transaction Summaries'
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.date} - {self.transaction_type} - {self.total_amount}"
+    
+    @classmethod
+    def record(cls, transaction_obj, sign=1):
+        """
+        Add (sign=1) or remove (sign=-1) a single transaction from its bucket.
+        
+        Args:
+            transaction_obj: Transaction instance
+            sign: 1 when the transaction reaches SUCCESS, -1 when it leaves it
+        """
+        created_at = transaction_obj.created_at or timezone.now()
+        cls.apply_delta(
+            user_id=transaction_obj.user_id,
+            date=timezone.localdate(created_at),
+            transaction_type=transaction_obj.transaction_type,
+            count=sign,
+            amount=sign * transaction_obj.amount,
+            fee=sign * transaction_obj.fee,
+            net_amount=sign * transaction_obj.net_amount,
+        )
+    
+    @classmethod
+    def apply_delta(cls, user_id, date, transaction_type, count, amount, fee, net_amount):
+        """
+        Atomically add pre-aggregated deltas to a summary bucket, creating it if needed.
+        
+        Bulk code paths aggregate per (user, date, type) and call this once per
+        bucket instead of once per transaction. Amounts are Money deltas.
+        """
+        lookup = {'user_id': user_id, 'date': date, 'transaction_type': transaction_type}
+        increments = {
+            'transaction_count': F('transaction_count') + count,
+            'total_amount': F('total_amount') + amount.kobo,
+            'total_fee': F('total_fee') + fee.kobo,
+            'total_net_amount': F('total_net_amount') + net_amount.kobo,
+            'updated_at': timezone.now(),
+        }
+        if cls.objects.filter(**lookup).update(**increments):
+            return
+        if count < 0:
+            # Nothing to remove from a bucket that was never recorded
+            return
+        
+        try:
+            with db_transaction.atomic():
+                cls.objects.create(
+                    transaction_count=count,
+                    total_amount=amount,
+                    total_fee=fee,
+                    total_net_amount=net_amount,
+                    **lookup
+                )
+        except IntegrityError:
+            # Another worker created the bucket first; fall back to the increment
+            cls.objects.filter(**lookup).update(**increments)
@@ -1,10 +1,14 @@
 from rest_framework import serializers
 from decimal import Decimal
-from .models import Transaction, Notification, DedicatedVirtualAccount, TransferRecipient
+from apps.core.money import MoneySerializerField
+from .models import Transaction, Notification, DedicatedVirtualAccount, DVAProvisioning, TransferRecipient
 
 
 class TransactionSerializer(serializers.ModelSerializer):
     """Serializer for transaction data"""
+    amount = MoneySerializerField(max_digits=12, min_value=Decimal('0.01'))
+    fee = MoneySerializerField(max_digits=12, required=False)
+    net_amount = MoneySerializerField(max_digits=12)
     
     class Meta:
         model = Transaction
@@ -47,6 +51,20 @@ class DedicatedVirtualAccountSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class DVAProvisioningSerializer(serializers.ModelSerializer):
+    """Serializer for background DVA provisioning state"""
+    
+    class Meta:
+        model = DVAProvisioning
+        fields = [
+            'status',
+            'last_error',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
+
+
 class TransferRecipientSerializer(serializers.ModelSerializer):
     """Serializer for transfer recipient data"""
     
@@ -89,9 +107,8 @@ class CreateTransferRecipientSerializer(serializers.Serializer):
 class CreateTransferSerializer(serializers.Serializer):
     """Serializer for creating transfer"""
     recipient_code = serializers.CharField(max_length=255, required=True)
-    amount = serializers.DecimalField(
+    amount = MoneySerializerField(
         max_digits=12,
-        decimal_places=2,
         min_value=Decimal('0.01'),
         required=True
     )
@@ -105,6 +122,21 @@ class CreateTransferSerializer(serializers.Serializer):
         return value
 
 
+class WalletTransferSerializer(serializers.Serializer):
+    """Serializer for an internal wallet-to-wallet transfer"""
+    recipient = serializers.CharField(
+        max_length=255,
+        required=True,
+        help_text='Email address or phone number of the Xcellar user to pay'
+    )
+    amount = MoneySerializerField(
+        max_digits=12,
+        min_value=Decimal('0.01'),
+        required=True
+    )
+    note = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+
 class FinalizeTransferSerializer(serializers.Serializer):
     """Serializer for finalizing transfer with OTP"""
     transfer_code = serializers.CharField(max_length=255, required=True)
@@ -0,0 +1,124 @@
+import heapq
+import logging
+from collections import Counter, defaultdict
+
+from django.db.models import Case, ExpressionWrapper, F, Q, Sum, Value, When
+
+from apps.payments.models import Transaction
+from apps.accounts.models import UserProfile, CourierProfile
+from apps.core.money import MoneyField, ZERO
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODELS = {
+    'USER': UserProfile,
+    'COURIER': CourierProfile,
+}
+
+# Transactions that have added to a wallet, and ones that have taken from it.
+# Withdrawals are debited when they are created and refunded when they fail
+# or are reversed, so every other withdrawal status counts.
+CREDITS = Q(status='SUCCESS', transaction_type__in=['DEPOSIT', 'EARNING', 'TRANSFER_IN'])
+DEBITS = (
+    Q(transaction_type='WITHDRAWAL') & ~Q(status__in=['FAILED', 'REVERSED'])
+) | Q(status='SUCCESS', transaction_type__in=['TRANSFER_OUT', 'PAYMENT'])
+
+
+class BalanceAuditor:
+    """
+    Recomputes every wallet balance from its transactions and reports drift.
+
+    One grouped aggregate computes the expected balance of every user and is
+    streamed in user id order alongside the user and courier profiles, so a
+    single merge pass covers all wallets with three streamed queries and
+    memory that does not grow with their number. Wallets that disagree are re-checked in
+    batches before being reported, so a balance change that committed
+    between the streams is not mistaken for drift.
+    """
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+        self.summary = Counter()
+
+    def drifts(self):
+        """
+        Yield wallets whose balance does not match their transactions.
+
+        Counts of wallets checked and drifted accumulate in self.summary
+        while the generator is consumed.
+
+        Yields:
+            dict: user_id, user_type, balance, expected and drift (balance - expected)
+        """
+        candidates = []
+        for user_id, user_type, balance, expected in self._merged():
+            self.summary['checked'] += 1
+            if balance != expected:
+                candidates.append((user_id, user_type))
+            if len(candidates) >= self.chunk_size:
+                yield from self._confirm(candidates)
+                candidates = []
+        if candidates:
+            yield from self._confirm(candidates)
+
+    def _merged(self):
+        """(user_id, user_type, balance, expected) for every wallet, in user id order"""
+        profiles = heapq.merge(*[
+            self._balances(profile_model, user_type)
+            for user_type, profile_model in PROFILE_MODELS.items()
+        ])
+        expected_balances = iter(self._expected_balances().iterator(chunk_size=self.chunk_size))
+
+        next_expected = next(expected_balances, None)
+        for user_id, user_type, balance in profiles:
+            while next_expected is not None and next_expected[0] < user_id:
+                # Transactions of a user without a wallet (e.g. an admin)
+                next_expected = next(expected_balances, None)
+            expected = ZERO
+            if next_expected is not None and next_expected[0] == user_id:
+                expected = next_expected[1] or ZERO
+                next_expected = next(expected_balances, None)
+            yield user_id, user_type, balance, expected
+
+    def _balances(self, profile_model, user_type, user_ids=None):
+        queryset = profile_model.objects.order_by('user_id')
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        for user_id, balance in queryset.values_list('user_id', 'balance').iterator(chunk_size=self.chunk_size):
+            yield user_id, user_type, balance
+
+    def _expected_balances(self, user_ids=None):
+        queryset = Transaction.objects.filter(CREDITS | DEBITS)
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        return queryset.values('user_id').annotate(
+            expected=Sum(Case(
+                When(CREDITS, then=F('amount')),
+                When(DEBITS, then=ExpressionWrapper(F('amount') * Value(-1), output_field=MoneyField())),
+                output_field=MoneyField(),
+            )),
+        ).order_by('user_id').values_list('user_id', 'expected')
+
+    def _confirm(self, candidates):
+        user_ids_by_type = defaultdict(list)
+        for user_id, user_type in candidates:
+            user_ids_by_type[user_type].append(user_id)
+
+        expected_balances = dict(self._expected_balances([user_id for user_id, _ in candidates]))
+        profiles = heapq.merge(*[
+            self._balances(PROFILE_MODELS[user_type], user_type, user_ids)
+            for user_type, user_ids in user_ids_by_type.items()
+        ])
+        for user_id, user_type, balance in profiles:
+            expected = expected_balances.get(user_id) or ZERO
+            if balance == expected:
+                continue
+            self.summary['drifted'] += 1
+            self.summary['net_drift'] = self.summary.get('net_drift', ZERO) + (balance - expected)
+            yield {
+                'user_id': user_id,
+                'user_type': user_type,
+                'balance': balance,
+                'expected': expected,
+                'drift': balance - expected,
+            }
@@ -0,0 +1,467 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction as db_transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from apps.payments.models import (
+    Transaction,
+    Notification,
+    NotificationCounter,
+    DailyTransactionSummary,
+    DepositEvent,
+)
+from apps.accounts.models import UserProfile, CourierProfile
+from apps.payments.services.outbox import enqueue_notification, enqueue_task
+from apps.payments.services.payloads import archive_payloads, record_payload, summarize_payload
+from apps.core.utils import add_balance, invalidate_cached_balance
+from apps.core.money import Money, MoneyField, ZERO
+
+logger = logging.getLogger(__name__)
+
+DRAIN_COALESCE_KEY = 'deposit_drain'
+
+# Metadata key tagging the rows one insert_deposit_transactions call inserted,
+# on databases without INSERT ... RETURNING for ignored conflicts
+INSERT_TOKEN_KEY = 'insert_token'
+
+# Paystack verify statuses that settle a PENDING deposit
+_SETTLED_PAYSTACK_STATUSES = {
+    'success': 'SUCCESS',
+    'failed': 'FAILED',
+    'reversed': 'REVERSED',
+}
+
+_PROFILE_MODELS = {
+    'USER': UserProfile,
+    'COURIER': CourierProfile,
+}
+
+
+def record_deposit_event(event_data):
+    """
+    Store a charge.success webhook for batched processing.
+
+    The event and an outbox request for process_dva_deposit_batch are written
+    in one transaction; drain requests from a burst are coalesced by the relay.
+    Redelivered webhooks hit the unique reference and are ignored.
+
+    Returns:
+        bool: False if the event had no reference
+    """
+    data = event_data.get('data', {})
+    reference = data.get('reference')
+    if not reference:
+        logger.error(f"Missing reference in charge.success webhook: {event_data}")
+        return False
+
+    with db_transaction.atomic():
+        DepositEvent.objects.bulk_create(
+            [DepositEvent(reference=reference, payload=data)],
+            ignore_conflicts=True,
+        )
+        enqueue_task('apps.payments.tasks.process_dva_deposit_batch', coalesce_key=DRAIN_COALESCE_KEY)
+    return True
+
+
+def deposit_verification_delay(attempt):
+    """Seconds to wait before verification attempt number attempt (1-based)"""
+    return getattr(settings, 'DEPOSIT_VERIFY_DELAY', 30) * 2 ** (attempt - 1)
+
+
+def deposit_sweep_min_age():
+    """
+    Seconds a PENDING deposit must age before the sweep verifies it.
+
+    Normally DEPOSIT_SWEEP_MIN_AGE, past the end of the verification chain.
+    Eager tasks cannot be delayed, so no chain runs and the sweep takes over
+    once the first verification would have been due.
+    """
+    from apps.payments.tasks import verify_dva_transaction
+
+    if verify_dva_transaction.app.conf.task_always_eager:
+        return deposit_verification_delay(1)
+    return getattr(settings, 'DEPOSIT_SWEEP_MIN_AGE', 3600)
+
+
+def schedule_deposit_verification(reference):
+    """
+    Queue the first Paystack verification of a new PENDING deposit.
+
+    Call inside the transaction that creates the deposit; the task is sent by
+    the outbox relay after commit and chains its own follow-up checks.
+    """
+    from apps.payments.tasks import verify_dva_transaction
+
+    if verify_dva_transaction.app.conf.task_always_eager:
+        # Eager tasks ignore the countdown; the sweep verifies the deposit
+        # once it is deposit_sweep_min_age() old
+        return
+    enqueue_task(
+        'apps.payments.tasks.verify_dva_transaction',
+        args=[reference],
+        kwargs={'attempt': 1},
+        countdown=deposit_verification_delay(1),
+    )
+
+
+def settle_pending_deposit(transaction_id, paystack_data, sync_method):
+    """
+    Apply a Paystack verification result to a PENDING deposit.
+
+    The row is locked and re-checked, so the verify endpoint, scheduled
+    verifications and the sweep cannot credit the same deposit twice.
+
+    Args:
+        transaction_id: Primary key of the deposit Transaction
+        paystack_data: 'data' of a Paystack verify response
+        sync_method: Recorded in the transaction and notification metadata
+
+    Returns:
+        str: The deposit's new status, or None if it was no longer PENDING
+            or Paystack has not settled it yet
+    """
+    paystack_status = (paystack_data.get('status') or '').lower()
+    if paystack_status not in _SETTLED_PAYSTACK_STATUSES:
+        return None
+
+    with db_transaction.atomic():
+        transaction_obj = Transaction.objects.select_for_update(of=('self',)).select_related('user').get(pk=transaction_id)
+        if transaction_obj.status != 'PENDING':
+            return None
+
+        transaction_obj.status = _SETTLED_PAYSTACK_STATUSES[paystack_status]
+        record_payload(transaction_obj, 'verify', paystack_data)
+        transaction_obj.metadata['sync_method'] = sync_method
+        if transaction_obj.status == 'SUCCESS':
+            amount = Money.from_kobo(paystack_data.get('amount', 0))
+            add_balance(transaction_obj.user, amount, transaction_obj.reference)
+            transaction_obj.completed_at = timezone.now()
+            enqueue_notification(
+                user=transaction_obj.user,
+                notification_type='DEPOSIT_RECEIVED',
+                title='Deposit Received',
+                message=f'You received ₦{amount:,.2f}',
+                related_transaction=transaction_obj,
+                metadata={'sync_method': sync_method},
+            )
+        transaction_obj.save()
+
+    logger.info(f"Deposit {transaction_obj.reference} settled as {transaction_obj.status} via {sync_method}")
+    return transaction_obj.status
+
+
+def insert_deposit_transactions(transactions):
+    """
+    Insert deposit Transactions, skipping those whose reference already exists.
+
+    Relies on the unique reference and deposit paystack_reference constraints,
+    so duplicates are detected without row locks and concurrent inserts of one
+    reference cannot both succeed. On PostgreSQL each batch is one
+    INSERT ... ON CONFLICT DO NOTHING RETURNING, which reports exactly the rows
+    it inserted. Elsewhere bulk_create(ignore_conflicts=True) returns no keys,
+    so every row is tagged with a token unique to this call and the inserted
+    rows are read back by it; rows recorded earlier or by a concurrent insert
+    carry another token or none. The token is removed again before returning,
+    within the caller's transaction. Like bulk_create, this bypasses
+    Transaction.save().
+
+    Args:
+        transactions: Unsaved Transaction instances
+
+    Returns:
+        list: The instances that were inserted, with their pk set
+    """
+    if not transactions:
+        return []
+
+    db = router.db_for_write(Transaction)
+    if connections[db].vendor == 'postgresql':
+        rows = _insert_returning(transactions, db)
+    else:
+        token = uuid.uuid4().hex
+        for transaction_obj in transactions:
+            transaction_obj.metadata[INSERT_TOKEN_KEY] = token
+        Transaction.objects.using(db).bulk_create(transactions, batch_size=500, ignore_conflicts=True)
+        rows = Transaction.objects.using(db).filter(
+            reference__in=[transaction_obj.reference for transaction_obj in transactions],
+            **{f'metadata__{INSERT_TOKEN_KEY}': token},
+        ).values_list('pk', 'reference')
+
+    pks = {reference: pk for pk, reference in rows}
+    inserted = []
+    for transaction_obj in transactions:
+        transaction_obj.metadata.pop(INSERT_TOKEN_KEY, None)
+        # A reference repeated within the call is inserted once, for its first instance
+        pk = pks.pop(transaction_obj.reference, None)
+        if pk is None:
+            continue
+        transaction_obj.pk = pk
+        transaction_obj._state.adding = False
+        transaction_obj._state.db = db
+        inserted.append(transaction_obj)
+
+    if connections[db].vendor != 'postgresql' and inserted:
+        # The token has done its job; keep it out of the stored metadata
+        Transaction.objects.using(db).bulk_update(inserted, ['metadata'], batch_size=500)
+    return inserted
+
+
+def _insert_returning(transactions, db):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING id, reference, in batches of 500"""
+    opts = Transaction._meta
+    fields = [field for field in opts.concrete_fields if field is not opts.pk]
+    returning = [opts.pk, opts.get_field('reference')]
+
+    rows = []
+    with connections[db].cursor() as cursor:
+        for start in range(0, len(transactions), 500):
+            query = InsertQuery(Transaction, on_conflict=OnConflict.IGNORE)
+            query.insert_values(fields, transactions[start:start + 500])
+            compiler = query.get_compiler(using=db)
+            # Set directly rather than via execute_sql, which expects a row per object
+            compiler.returning_fields = returning
+            for statement, params in compiler.as_sql():
+                cursor.execute(statement, params)
+                rows.extend(cursor.fetchall())
+    return rows
+
+
+class DepositBatchProcessor:
+    """
+    Credits queued DVA deposits in batches.
+
+    Each batch resolves users in one query, inserts the Transactions with one
+    insert-or-skip statement that drops already-recorded references,
+    bulk-creates the Notifications, and applies balance increments with one
+    UPDATE per profile table using per-user totals. A reference that matches
+    a PENDING deposit from initialize_payment settles that deposit instead.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, 'DVA_DEPOSIT_BATCH_SIZE', 200)
+        self.max_attempts = getattr(settings, 'DVA_DEPOSIT_MAX_ATTEMPTS', 5)
+        self.retry_delay = timedelta(seconds=getattr(settings, 'DVA_DEPOSIT_RETRY_DELAY', 300))
+
+    def process_batch(self):
+        """
+        Claim and process up to batch_size pending deposit events.
+
+        Returns:
+            dict: Counts of processed, duplicate, deferred and failed events
+        """
+        summary = {'claimed': 0, 'processed': 0, 'duplicates': 0, 'deferred': 0, 'failed': 0}
+        now = timezone.now()
+
+        with db_transaction.atomic():
+            events = list(
+                DepositEvent.objects.select_for_update(skip_locked=True).filter(
+                    Q(attempts=0) | Q(updated_at__lte=now - self.retry_delay),
+                    status='PENDING',
+                ).order_by('created_at')[:self.batch_size]
+            )
+            if not events:
+                return summary
+            summary['claimed'] = len(events)
+
+            parsed = {}
+            for event in events:
+                deposit = self._parse(event.payload)
+                if deposit is None:
+                    self._fail(event, 'Missing required fields', summary)
+                else:
+                    parsed[event.pk] = deposit
+
+            User = get_user_model()
+            emails = {deposit['email'] for deposit in parsed.values()}
+            users = {user.email: user for user in User.objects.filter(email__in=emails)}
+
+            to_credit = []
+            for event in events:
+                deposit = parsed.get(event.pk)
+                if deposit is None:
+                    continue
+
+                user = users.get(deposit['email'])
+                if user is None:
+                    event.attempts += 1
+                    event.last_error = f"User not found: {deposit['email']}"
+                    if event.attempts >= self.max_attempts:
+                        self._fail(event, event.last_error, summary)
+                    else:
+                        # The user may be created later; retried on a later drain
+                        summary['deferred'] += 1
+                    continue
+                if user.user_type not in _PROFILE_MODELS:
+                    self._fail(event, f"Unknown user type: {user.user_type}", summary)
+                    continue
+
+                to_credit.append((event, user, deposit))
+
+            if to_credit:
+                credited = self._credit(to_credit, now)
+                summary['processed'] = credited
+                summary['duplicates'] = len(to_credit) - credited
+
+            for event in events:
+                event.updated_at = now
+            DepositEvent.objects.bulk_update(
+                events,
+                ['status', 'attempts', 'last_error', 'transaction', 'processed_at', 'updated_at'],
+            )
+
+        logger.info(
+            f"Deposit batch: {summary['processed']} credited, {summary['duplicates']} duplicates, "
+            f"{summary['deferred']} deferred, {summary['failed']} failed"
+        )
+        return summary
+
+    def _parse(self, data):
+        reference = data.get('reference')
+        customer_email = (data.get('customer') or {}).get('email')
+        if not reference or not customer_email:
+            return None
+        return {
+            'reference': reference,
+            'email': customer_email,
+            'amount': Money.from_kobo(data.get('amount', 0)),
+            'channel': data.get('channel', ''),
+            'paystack_transaction_id': str(data.get('id', '')),
+            'data': data,
+        }
+
+    def _fail(self, event, error, summary):
+        event.status = 'FAILED'
+        event.last_error = error
+        summary['failed'] += 1
+        logger.error(f"Deposit event {event.reference} failed: {error}")
+
+    def _credit(self, to_credit, now):
+        transactions = []
+        for event, user, deposit in to_credit:
+            channel = deposit['channel']
+            transactions.append(Transaction(
+                user=user,
+                transaction_type='DEPOSIT',
+                status='SUCCESS',
+                payment_method='DVA' if channel == 'dedicated_nuban' else 'BANK_TRANSFER',
+                amount=deposit['amount'],
+                fee=ZERO,
+                net_amount=deposit['amount'],
+                reference=deposit['reference'],
+                paystack_transaction_id=deposit['paystack_transaction_id'],
+                paystack_reference=deposit['reference'],
+                description=f'Deposit via {channel}',
+                metadata=summarize_payload(deposit['data']),
+                completed_at=now,
+            ))
+        inserted = {transaction_obj.reference for transaction_obj in insert_deposit_transactions(transactions)}
+
+        # References that already had a Transaction were skipped by the insert
+        settled = self._settle_existing(
+            [item for item in to_credit if item[2]['reference'] not in inserted],
+            now,
+        )
+        to_credit = [item for item in to_credit if item[2]['reference'] in inserted]
+        transactions = [transaction_obj for transaction_obj in transactions if transaction_obj.reference in inserted]
+        if not to_credit:
+            return settled
+        archive_payloads(
+            (transaction_obj, 'charge.success', deposit['data'])
+            for transaction_obj, (event, user, deposit) in zip(transactions, to_credit)
+        )
+
+        notifications = []
+        for transaction_obj, (event, user, deposit) in zip(transactions, to_credit):
+            event.status = 'PROCESSED'
+            event.transaction = transaction_obj
+            event.processed_at = now
+            event.last_error = None
+            notifications.append(Notification(
+                user=user,
+                notification_type='DEPOSIT_RECEIVED',
+                title='Deposit Received',
+                message=f"You received ₦{deposit['amount']:,.2f} via {deposit['channel']}",
+                related_transaction=transaction_obj,
+                metadata={'channel': deposit['channel'], 'sync_method': 'webhook_batch'},
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=500)
+
+        totals = defaultdict(Money)
+        counts = defaultdict(int)
+        user_types = {}
+        for event, user, deposit in to_credit:
+            totals[user.pk] += deposit['amount']
+            counts[user.pk] += 1
+            user_types[user.pk] = user.user_type
+
+        for user_type, profile_model in _PROFILE_MODELS.items():
+            user_ids = [user_id for user_id, value in user_types.items() if value == user_type]
+            if not user_ids:
+                continue
+            profile_model.objects.filter(user_id__in=user_ids).update(
+                balance=F('balance') + Case(
+                    *[When(user_id=user_id, then=Value(totals[user_id].kobo)) for user_id in user_ids],
+                    output_field=MoneyField(),
+                )
+            )
+            for user_id in user_ids:
+                invalidate_cached_balance(user_id)
+
+        # bulk_create bypasses save(), so update the rollup and unread counters here
+        today = timezone.localdate(now)
+        for user_id, total in totals.items():
+            DailyTransactionSummary.apply_delta(
+                user_id=user_id,
+                date=today,
+                transaction_type='DEPOSIT',
+                count=counts[user_id],
+                amount=total,
+                fee=ZERO,
+                net_amount=total,
+            )
+            NotificationCounter.adjust(user_id, counts[user_id])
+
+        return settled + len(to_credit)
+
+    def _settle_existing(self, skipped, now):
+        """
+        Handle deposits whose reference already had a Transaction.
+
+        A PENDING deposit created by initialize_payment is settled from the
+        webhook payload like any other verification; anything else was
+        already recorded and the event is a duplicate.
+
+        Returns:
+            int: Number of pending deposits settled
+        """
+        if not skipped:
+            return 0
+        existing = Transaction.objects.filter(
+            reference__in=[deposit['reference'] for event, user, deposit in skipped],
+        ).only('pk', 'reference', 'transaction_type', 'status').in_bulk(field_name='reference')
+
+        settled = 0
+        for event, user, deposit in skipped:
+            event.processed_at = now
+            transaction_obj = existing.get(deposit['reference'])
+            if (
+                transaction_obj is not None
+                and transaction_obj.transaction_type == 'DEPOSIT'
+                and transaction_obj.status == 'PENDING'
+                and settle_pending_deposit(transaction_obj.pk, deposit['data'], 'webhook')
+            ):
+                event.status = 'PROCESSED'
+                event.transaction = transaction_obj
+                event.last_error = None
+                settled += 1
+            else:
+                event.status = 'DUPLICATE'
+        return settled
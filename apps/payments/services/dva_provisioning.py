@@ -0,0 +1,297 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.payments.models import DedicatedVirtualAccount, DVAProvisioning
+from apps.payments.services.paystack_client import PaystackClient
+from apps.payments.services.paystack_governor import BACKGROUND
+from apps.payments.services.outbox import enqueue_notification, enqueue_task
+
+logger = logging.getLogger(__name__)
+
+
+class DVAProvisioningError(Exception):
+    """A step of the Paystack DVA flow failed"""
+
+
+def first_dedicated_account(accounts_data):
+    """
+    Return the first dedicated account with an account number from a Paystack response.
+
+    Handles both list and single-object responses, and accounts that are either
+    nested under 'dedicated_account' or returned directly.
+    """
+    if not accounts_data:
+        return None
+    if not isinstance(accounts_data, list):
+        accounts_data = [accounts_data]
+
+    for account_data in accounts_data:
+        dedicated_account = None
+        if isinstance(account_data, dict):
+            if 'dedicated_account' in account_data:
+                dedicated_account = account_data['dedicated_account']
+            elif account_data.get('account_number'):
+                dedicated_account = account_data
+
+        if dedicated_account and isinstance(dedicated_account, dict) and dedicated_account.get('account_number'):
+            return dedicated_account
+    return None
+
+
+def save_customer(user, customer_code, customer_id=None):
+    """Persist the user's Paystack customer so later calls skip the lookup"""
+    update = {'paystack_customer_code': customer_code}
+    if customer_id:
+        update['paystack_customer_id'] = str(customer_id)
+    get_user_model().objects.filter(pk=user.pk).update(**update)
+    for field, value in update.items():
+        setattr(user, field, value)
+
+
+def mark_provisioning_completed(user):
+    DVAProvisioning.objects.filter(user=user).exclude(status='COMPLETED').update(
+        status='COMPLETED',
+        last_error=None,
+        updated_at=timezone.now(),
+    )
+
+
+class DVAProvisioningService:
+    """
+    Creates or syncs a user's dedicated virtual account outside the request cycle.
+
+    The endpoints only record a DVAProvisioning request; the
+    provision_dedicated_account task runs the Paystack customer lookup or
+    creation, the existing-DVA check and the assignment. Assignments Paystack
+    completes asynchronously finish through the dedicatedaccount.assign.success
+    webhook, with check_dva_assignment polling as a fallback.
+    """
+
+    def __init__(self, paystack_client=None):
+        self.paystack_client = paystack_client or PaystackClient(priority=BACKGROUND)
+
+    @staticmethod
+    def request_provisioning(user, create_if_missing=True):
+        """
+        Record a provisioning request and queue the task through the outbox.
+
+        An in-flight request is reused unless it has stalled for longer than
+        DVA_PROVISIONING_STALE_AFTER seconds.
+
+        Args:
+            user: User to provision a DVA for
+            create_if_missing: False to only sync a DVA that already exists in Paystack
+
+        Returns:
+            tuple: (DVAProvisioning, started) where started is True if a task was queued
+        """
+        stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'DVA_PROVISIONING_STALE_AFTER', 600))
+
+        with db_transaction.atomic():
+            provisioning, created = DVAProvisioning.objects.select_for_update().get_or_create(
+                user=user,
+                defaults={'create_if_missing': create_if_missing}
+            )
+            if not created:
+                if provisioning.in_progress and provisioning.updated_at >= stale_before:
+                    if create_if_missing and not provisioning.create_if_missing:
+                        # A sync-only request is upgraded; the running task reads the flag
+                        provisioning.create_if_missing = True
+                        provisioning.save(update_fields=['create_if_missing', 'updated_at'])
+                    return provisioning, False
+
+                # Restarting a stalled create keeps it a create
+                provisioning.create_if_missing = create_if_missing or (
+                    provisioning.in_progress and provisioning.create_if_missing
+                )
+                provisioning.status = 'PENDING'
+                provisioning.attempts = 0
+                provisioning.last_error = None
+                provisioning.save(update_fields=['status', 'create_if_missing', 'attempts', 'last_error', 'updated_at'])
+
+            # Sent by the outbox relay once this transaction commits; if the
+            # send keeps failing the request stays PENDING and is restarted once stale
+            enqueue_task('apps.payments.tasks.provision_dedicated_account', args=[user.pk])
+
+        return provisioning, True
+
+    def provision(self, provisioning):
+        """
+        Run the provisioning flow for a claimed request.
+
+        Args:
+            provisioning: DVAProvisioning in IN_PROGRESS state
+
+        Returns:
+            str: Resulting provisioning status
+
+        Raises:
+            DVAProvisioningError: If a Paystack step failed (the task retries)
+        """
+        user = provisioning.user
+
+        customer_code, customer_id = self._ensure_customer(user, create=provisioning.create_if_missing)
+        if customer_code and self.sync_existing(user, customer_code, customer_id):
+            return 'COMPLETED'
+
+        provisioning.refresh_from_db(fields=['create_if_missing'])
+        if not provisioning.create_if_missing:
+            self._set_status(provisioning, 'FAILED', 'No dedicated account found')
+            return 'FAILED'
+
+        if not customer_code:
+            customer_code, customer_id = self._ensure_customer(user, create=True)
+
+        first_name, last_name = self._split_name(user)
+        dva_response = self.paystack_client.assign_dedicated_account(
+            customer_code=customer_code,
+            email=user.email,
+            first_name=first_name,
+            last_name=last_name,
+            phone=user.phone_number,
+        )
+        if not dva_response.get('status'):
+            error_message = dva_response.get('message', 'Failed to assign DVA')
+            logger.error(f"Failed to assign DVA: {error_message}. Response: {dva_response}")
+            raise DVAProvisioningError(error_message)
+
+        dedicated_account = first_dedicated_account(dva_response.get('data'))
+        if dedicated_account:
+            self._save_dva(user, dedicated_account, customer_id, synced=False)
+            return 'COMPLETED'
+
+        # Paystack finishes single-step assignment asynchronously
+        logger.info(f"DVA assignment in progress for user {user.email}. Waiting for webhook.")
+        self._set_status(provisioning, 'AWAITING_WEBHOOK')
+        self._schedule_assignment_check(user.pk)
+        return 'AWAITING_WEBHOOK'
+
+    def sync_existing(self, user, customer_code, customer_id=None):
+        """
+        Save the customer's existing Paystack DVA locally, if there is one.
+
+        Returns:
+            DedicatedVirtualAccount or None
+        """
+        logger.info(f"Checking for existing DVA for customer {customer_code}...")
+        response = self.paystack_client.get_dedicated_accounts(customer_code=customer_code)
+        if not response.get('status'):
+            logger.warning(f"Failed to fetch dedicated accounts from Paystack: {response}")
+            return None
+
+        dedicated_account = first_dedicated_account(response.get('data'))
+        if not dedicated_account:
+            return None
+        return self._save_dva(user, dedicated_account, customer_id, synced=True)
+
+    def _ensure_customer(self, user, create):
+        """
+        Return the user's Paystack customer code and id, looking up or creating it once.
+
+        Returns:
+            tuple: (customer_code, customer_id), or (None, None) if the customer
+                does not exist and create is False
+        """
+        if user.paystack_customer_code:
+            return user.paystack_customer_code, user.paystack_customer_id or ''
+
+        customer_response = self.paystack_client.get_customer(email=user.email)
+
+        if not customer_response.get('status'):
+            if not create:
+                return None, None
+
+            first_name, last_name = self._split_name(user)
+            customer_response = self.paystack_client.create_customer(
+                email=user.email,
+                first_name=first_name,
+                last_name=last_name,
+                phone=user.phone_number,
+                metadata={
+                    'user_id': user.id,
+                    'user_type': user.user_type,
+                }
+            )
+            if not customer_response.get('status'):
+                error_message = customer_response.get('message', 'Failed to create customer')
+                logger.error(f"Failed to create Paystack customer: {error_message}. Response: {customer_response}")
+                raise DVAProvisioningError(error_message)
+
+        customer_data = customer_response.get('data') or {}
+        customer_code = customer_data.get('customer_code')
+        if not customer_code:
+            logger.error(f"Customer code not found in Paystack response: {customer_response}")
+            raise DVAProvisioningError('Failed to get customer code from Paystack')
+
+        customer_id = str(customer_data.get('id', ''))
+        save_customer(user, customer_code, customer_id)
+        return customer_code, customer_id
+
+    def _save_dva(self, user, dedicated_account, customer_id, synced):
+        bank = dedicated_account.get('bank') if isinstance(dedicated_account.get('bank'), dict) else {}
+
+        with db_transaction.atomic():
+            dva, created = DedicatedVirtualAccount.objects.update_or_create(
+                user=user,
+                defaults={
+                    'paystack_customer_id': customer_id or user.paystack_customer_id or '',
+                    'account_number': dedicated_account.get('account_number', ''),
+                    'bank_name': bank.get('name', ''),
+                    'bank_slug': bank.get('slug', ''),
+                    'account_name': dedicated_account.get('account_name', ''),
+                    'currency': dedicated_account.get('currency', 'NGN'),
+                }
+            )
+
+            if created:
+                if synced:
+                    title = 'Dedicated Account Synced'
+                    message = f'Your dedicated account {dva.account_number} has been synced from Paystack'
+                else:
+                    title = 'Dedicated Account Created'
+                    message = f'Your dedicated account {dva.account_number} has been created at {dva.bank_name}'
+                enqueue_notification(
+                    user=user,
+                    notification_type='DVA_CREATED',
+                    title=title,
+                    message=message,
+                    metadata={
+                        'account_number': dva.account_number,
+                        'bank_name': dva.bank_name,
+                    }
+                )
+
+            mark_provisioning_completed(user)
+
+        logger.info(f"DVA {'synced' if synced else 'created'}: {dva.account_number} for user {user.email}")
+        return dva
+
+    def _set_status(self, provisioning, status, error=None):
+        provisioning.status = status
+        provisioning.last_error = error
+        provisioning.save(update_fields=['status', 'last_error', 'updated_at'])
+
+    def _schedule_assignment_check(self, user_id):
+        from apps.payments.tasks import check_dva_assignment
+
+        if check_dva_assignment.app.conf.task_always_eager:
+            # Eager tasks ignore the countdown; leave completion to the webhook
+            # and to the next GET or POST once the request is stale
+            return
+        check_dva_assignment.apply_async(
+            (user_id,),
+            countdown=getattr(settings, 'DVA_ASSIGNMENT_CHECK_INTERVAL', 15)
+        )
+
+    @staticmethod
+    def _split_name(user):
+        full_name = user.get_full_name()
+        name_parts = full_name.split(' ', 1) if full_name else ['', '']
+        first_name = name_parts[0] if len(name_parts) > 0 else ''
+        last_name = name_parts[1] if len(name_parts) > 1 else ''
+        return first_name, last_name
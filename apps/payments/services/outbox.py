@@ -0,0 +1,249 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.payments.models import Notification, NotificationCounter, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+RELAY_SCHEDULED_CACHE_KEY = 'payments:outbox_relay_scheduled'
+
+
+def enqueue_notification(user, notification_type, title, message, related_transaction=None, metadata=None):
+    """
+    Record a notification to be created by the outbox relay.
+
+    Call inside the transaction that makes the change being notified about.
+
+    Args:
+        user: User to notify
+        notification_type: Notification.NOTIFICATION_TYPE_CHOICES value
+        title: Notification title
+        message: Notification message
+        related_transaction: Optional Transaction the notification is about
+        metadata: Optional notification metadata
+
+    Returns:
+        OutboxEvent: The recorded event
+    """
+    return _record(OutboxEvent(
+        event_type='NOTIFICATION',
+        payload={
+            'user_id': user.pk,
+            'notification_type': notification_type,
+            'title': title,
+            'message': message,
+            'related_transaction_id': related_transaction.pk if related_transaction else None,
+            'metadata': metadata or {},
+        },
+    ))
+
+
+def enqueue_task(task_name, args=None, kwargs=None, countdown=None, coalesce_key=''):
+    """
+    Record a Celery task to be sent by the outbox relay.
+
+    Tasks are delivered at least once, so they must be idempotent.
+
+    Args:
+        task_name: Registered task name, e.g. 'apps.payments.tasks.provision_dedicated_account'
+        args: Positional task arguments (JSON serialisable)
+        kwargs: Keyword task arguments (JSON serialisable)
+        countdown: Optional delay in seconds once relayed
+        coalesce_key: Events with the same key are sent once per relay batch
+
+    Returns:
+        OutboxEvent: The recorded event
+    """
+    return _record(OutboxEvent(
+        event_type='TASK',
+        payload={
+            'task': task_name,
+            'args': list(args or []),
+            'kwargs': kwargs or {},
+            'countdown': countdown,
+        },
+        coalesce_key=coalesce_key,
+    ))
+
+
+def _record(event):
+    event.save()
+    db_transaction.on_commit(_kick_relay)
+    return event
+
+
+def _kick_relay():
+    try:
+        schedule_outbox_relay()
+    except Exception as e:
+        # The event is stored; the periodic relay will publish it
+        logger.error(f"Error scheduling outbox relay: {e}", exc_info=True)
+
+
+def schedule_outbox_relay():
+    """
+    Queue relay_outbox_events to run after the relay window.
+
+    Only one relay is queued per window, so a burst of requests pays for a
+    single broker round trip and is published in one batch.
+    """
+    from apps.payments.tasks import relay_outbox_events
+
+    window = getattr(settings, 'OUTBOX_RELAY_WINDOW', 1)
+    if relay_outbox_events.app.conf.task_always_eager or not window:
+        # Eager tasks ignore the countdown, so relay now rather than strand events
+        relay_outbox_events.delay()
+        return
+    if cache.add(RELAY_SCHEDULED_CACHE_KEY, True, timeout=window):
+        relay_outbox_events.apply_async(countdown=window)
+
+
+class OutboxRelay:
+    """
+    Publishes pending outbox events in batches.
+
+    Notification events are bulk-created in the same transaction that marks
+    them published, so each is delivered exactly once. Task events are sent to
+    Celery before their rows are marked published; a crash in between resends
+    them, which is why relayed tasks must be idempotent. Failed sends are
+    retried with exponential backoff up to OUTBOX_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 200)
+        self.max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+        self.retry_delay = getattr(settings, 'OUTBOX_RETRY_DELAY', 30)
+
+    def relay_batch(self):
+        """
+        Claim and publish up to batch_size pending events.
+
+        Returns:
+            dict: Counts of claimed, published, coalesced, retried and failed events
+        """
+        summary = {'claimed': 0, 'published': 0, 'coalesced': 0, 'retried': 0, 'failed': 0}
+        now = timezone.now()
+
+        with db_transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                    status='PENDING',
+                    available_at__lte=now,
+                ).order_by('created_at')[:self.batch_size]
+            )
+            if not events:
+                return summary
+            summary['claimed'] = len(events)
+
+            notifications = [event for event in events if event.event_type == 'NOTIFICATION']
+            if notifications:
+                self._publish_notifications(notifications, now, summary)
+
+            sent_keys = set()
+            for event in events:
+                if event.event_type != 'TASK':
+                    continue
+                if event.coalesce_key and event.coalesce_key in sent_keys:
+                    self._mark_published(event, now)
+                    summary['coalesced'] += 1
+                    continue
+                try:
+                    # A savepoint keeps an eager task's database error from
+                    # aborting the rest of the batch
+                    with db_transaction.atomic():
+                        self._send_task(event)
+                except Exception as e:
+                    self._retry_or_fail(event, e, now, summary)
+                    continue
+                self._mark_published(event, now)
+                summary['published'] += 1
+                if event.coalesce_key:
+                    sent_keys.add(event.coalesce_key)
+
+            for event in events:
+                event.updated_at = now
+            OutboxEvent.objects.bulk_update(
+                events,
+                ['status', 'attempts', 'available_at', 'last_error', 'published_at', 'updated_at'],
+            )
+
+        logger.info(
+            f"Outbox batch: {summary['published']} published, {summary['coalesced']} coalesced, "
+            f"{summary['retried']} retried, {summary['failed']} failed"
+        )
+        return summary
+
+    def _publish_notifications(self, events, now, summary):
+        try:
+            with db_transaction.atomic():
+                Notification.objects.bulk_create(
+                    [self._build_notification(event) for event in events],
+                    batch_size=500,
+                )
+            published = events
+        except Exception as e:
+            # Find the offending rows (e.g. a deleted user) one at a time
+            logger.warning(f"Bulk notification publish failed, publishing individually: {e}")
+            published = []
+            for event in events:
+                try:
+                    with db_transaction.atomic():
+                        Notification.objects.bulk_create([self._build_notification(event)])
+                except Exception as error:
+                    self._retry_or_fail(event, error, now, summary)
+                    continue
+                published.append(event)
+
+        # bulk_create bypasses Notification.save(), so update the unread counters here
+        for user_id, count in Counter(event.payload['user_id'] for event in published).items():
+            NotificationCounter.adjust(user_id, count)
+        for event in published:
+            self._mark_published(event, now)
+        summary['published'] += len(published)
+
+    def _build_notification(self, event):
+        payload = event.payload
+        return Notification(
+            user_id=payload['user_id'],
+            notification_type=payload['notification_type'],
+            title=payload['title'],
+            message=payload['message'],
+            related_transaction_id=payload.get('related_transaction_id'),
+            metadata=payload.get('metadata') or {},
+        )
+
+    def _send_task(self, event):
+        payload = event.payload
+        options = {'task_id': f"outbox-{event.pk}"}
+        if payload.get('countdown'):
+            options['countdown'] = payload['countdown']
+
+        task = current_app.tasks.get(payload['task'])
+        if task is not None:
+            task.apply_async(args=payload.get('args') or [], kwargs=payload.get('kwargs') or {}, **options)
+        else:
+            current_app.send_task(payload['task'], args=payload.get('args') or [], kwargs=payload.get('kwargs') or {}, **options)
+
+    def _mark_published(self, event, now):
+        event.status = 'PUBLISHED'
+        event.published_at = now
+        event.last_error = None
+
+    def _retry_or_fail(self, event, error, now, summary):
+        event.attempts += 1
+        event.last_error = str(error)
+        if event.attempts >= self.max_attempts:
+            event.status = 'FAILED'
+            summary['failed'] += 1
+            logger.error(f"Outbox event {event.pk} failed after {event.attempts} attempts: {error}")
+        else:
+            event.available_at = now + timedelta(seconds=self.retry_delay * 2 ** (event.attempts - 1))
+            summary['retried'] += 1
+            logger.warning(f"Outbox event {event.pk} will be retried: {error}")
@@ -0,0 +1,42 @@
+from apps.payments.models import TransactionPayload
+
+# Paystack fields copied into Transaction.metadata. Everything else in a
+# payload is only kept in the compressed archive (TransactionPayload).
+SUMMARY_FIELDS = ('status', 'channel', 'gateway_response', 'paid_at', 'transfer_code', 'reason')
+
+
+def summarize_payload(payload):
+    """The summary fields of a Paystack payload, for Transaction.metadata"""
+    return {field: payload[field] for field in SUMMARY_FIELDS if payload.get(field) not in (None, '')}
+
+
+def record_payload(transaction_obj, source, payload):
+    """
+    Archive a Paystack payload and merge its summary into the transaction's metadata.
+
+    The transaction must already be saved; its metadata is updated in memory
+    and saved by the caller.
+
+    Args:
+        transaction_obj: Saved Transaction
+        source: Where the payload came from, e.g. 'verify' or 'transfer.success'
+        payload: Paystack data dict
+    """
+    transaction_obj.metadata.update(summarize_payload(payload))
+    TransactionPayload.pack(transaction_obj, source, payload).save()
+
+
+def archive_payloads(entries):
+    """
+    Archive many payloads with one bulk insert.
+
+    Unlike record_payload this leaves metadata alone, for bulk paths that
+    build it with summarize_payload themselves.
+
+    Args:
+        entries: Iterable of (saved Transaction, source, payload dict)
+    """
+    TransactionPayload.objects.bulk_create(
+        [TransactionPayload.pack(transaction_obj, source, payload) for transaction_obj, source, payload in entries],
+        batch_size=500,
+    )
@@ -0,0 +1,413 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from apps.payments.models import Transaction, TransferRecipient, PayoutBatch, DailyTransactionSummary
+from apps.payments.services.paystack_client import PaystackClient
+from apps.payments.services.paystack_governor import BACKGROUND
+from apps.payments.services.payloads import archive_payloads, summarize_payload
+from apps.accounts.models import CourierProfile
+from apps.core.utils import invalidate_cached_balance
+from apps.core.money import Money, ZERO
+from apps.core.id_generator import generate_reference
+
+logger = logging.getLogger(__name__)
+
+PAYOUT_REASON = 'Xcellar courier earnings payout'
+
+# A batch left SUBMITTING this long (e.g. worker crash) is picked up again
+STALE_SUBMISSION_AFTER = timedelta(hours=1)
+
+# Paystack per-item statuses that are final at submission time
+_ITEM_STATUS_MAPPING = {
+    'success': 'SUCCESS',
+    'failed': 'FAILED',
+}
+
+
+class CourierPayoutService:
+    """
+    Batches courier payouts into Paystack bulk transfers.
+
+    queue_payouts() sweeps eligible courier balances into PENDING WITHDRAWAL
+    transactions grouped under a PayoutBatch; submit_pending_batches() sends
+    each batch to Paystack in chunks and maps the per-item results back onto
+    the transactions with bulk_update. Final outcomes of accepted transfers
+    arrive through the usual transfer.* webhooks, matched by reference.
+    Payouts still unsent when a batch runs out of attempts are checked with
+    Paystack once more, then failed and refunded.
+    """
+
+    def __init__(self, paystack_client=None):
+        self.paystack_client = paystack_client or PaystackClient(priority=BACKGROUND)
+        self.chunk_size = getattr(settings, 'PAYSTACK_BULK_TRANSFER_BATCH_SIZE', 100)
+        self.max_attempts = getattr(settings, 'COURIER_PAYOUT_MAX_ATTEMPTS', 5)
+
+    def queue_payouts(self, min_amount=None, limit=None):
+        """
+        Move eligible courier balances into a new payout batch.
+
+        A courier is eligible when their balance is at least min_amount and they
+        have an active transfer recipient; the most recent one is paid.
+
+        Args:
+            min_amount: Minimum balance to pay out (default: COURIER_PAYOUT_MIN_AMOUNT)
+            limit: Maximum number of couriers to include (optional)
+
+        Returns:
+            PayoutBatch or None if no courier was eligible
+        """
+        if min_amount is None:
+            min_amount = getattr(settings, 'COURIER_PAYOUT_MIN_AMOUNT', '1000.00')
+        min_amount = Money.from_naira(min_amount)
+
+        has_recipient = TransferRecipient.objects.filter(user_id=OuterRef('user_id'), is_active=True)
+
+        with db_transaction.atomic():
+            profiles = CourierProfile.objects.select_for_update().filter(
+                Exists(has_recipient),
+                balance__gte=min_amount,
+            ).only('id', 'user_id', 'balance').order_by('pk')
+            if limit:
+                profiles = profiles[:limit]
+            profiles = list(profiles)
+            if not profiles:
+                return None
+
+            # Latest active recipient per courier (later rows overwrite earlier ones)
+            recipient_codes = dict(
+                TransferRecipient.objects.filter(
+                    user_id__in=[profile.user_id for profile in profiles],
+                    is_active=True
+                ).order_by('created_at').values_list('user_id', 'paystack_recipient_code')
+            )
+
+            batch = PayoutBatch.objects.create(reference=generate_reference('PYB'))
+            transactions = []
+            total_amount = ZERO
+            for profile in profiles:
+                amount = profile.balance
+                recipient_code = recipient_codes[profile.user_id]
+                transactions.append(Transaction(
+                    user_id=profile.user_id,
+                    transaction_type='WITHDRAWAL',
+                    status='PENDING',
+                    payment_method='PAYSTACK_BALANCE',
+                    amount=amount,
+                    fee=ZERO,
+                    net_amount=amount,
+                    reference=generate_reference('TXN'),
+                    description=f'Courier payout to {recipient_code}',
+                    metadata={'recipient_code': recipient_code, 'payout_batch': batch.reference},
+                    payout_batch=batch,
+                ))
+                profile.balance = ZERO
+                total_amount += amount
+
+            # Rows are locked, so zeroing the swept balances cannot lose a concurrent credit
+            Transaction.objects.bulk_create(transactions, batch_size=500)
+            CourierProfile.objects.bulk_update(profiles, ['balance'], batch_size=500)
+            for profile in profiles:
+                invalidate_cached_balance(profile.user_id)
+
+            batch.item_count = len(transactions)
+            batch.total_amount = total_amount
+            batch.save(update_fields=['item_count', 'total_amount', 'updated_at'])
+
+        logger.info(f"Queued payout batch {batch.reference}: {batch.item_count} payouts, ₦{total_amount:,.2f}")
+        return batch
+
+    def submit_pending_batches(self):
+        """
+        Submit every batch that is pending or has failed items left to retry,
+        then give up on the unsent payouts of batches out of attempts.
+
+        Returns:
+            list: Batches that were submitted in this run
+        """
+        batches = PayoutBatch.objects.filter(
+            self._submittable(),
+            attempts__lt=self.max_attempts
+        ).order_by('created_at')
+
+        submitted = []
+        for batch in batches:
+            if self.submit_batch(batch):
+                submitted.append(batch)
+
+        unsent = Transaction.objects.filter(
+            payout_batch=OuterRef('pk'),
+            status='PENDING',
+            paystack_transaction_id__isnull=True
+        )
+        exhausted = PayoutBatch.objects.filter(
+            Exists(unsent),
+            status='FAILED',
+            attempts__gte=self.max_attempts
+        ).order_by('created_at')
+        for batch in exhausted:
+            self.abandon_batch(batch)
+        return submitted
+
+    def submit_batch(self, batch):
+        """
+        Submit a batch's unsent payouts to Paystack.
+
+        Items are retried only while they have no transfer code; Paystack
+        rejects reused references, so a retry can never pay a courier twice.
+
+        Args:
+            batch: PayoutBatch instance
+
+        Returns:
+            bool: True if this call claimed and processed the batch
+        """
+        claimed = PayoutBatch.objects.filter(
+            self._submittable(),
+            pk=batch.pk
+        ).update(status='SUBMITTING', attempts=F('attempts') + 1, updated_at=timezone.now())
+        if not claimed:
+            return False
+
+        unsent = list(
+            batch.transactions.filter(status='PENDING', paystack_transaction_id__isnull=True).order_by('pk')
+        )
+
+        errors = []
+        unaccepted = 0
+        for start in range(0, len(unsent), self.chunk_size):
+            chunk = unsent[start:start + self.chunk_size]
+            try:
+                response = self.paystack_client.bulk_create_transfers([
+                    {
+                        'amount': transaction_obj.amount,
+                        'recipient': transaction_obj.metadata.get('recipient_code'),
+                        'reference': transaction_obj.reference,
+                        'reason': PAYOUT_REASON,
+                    }
+                    for transaction_obj in chunk
+                ])
+            except Exception as e:
+                logger.error(f"Error submitting payout chunk for {batch.reference}: {e}", exc_info=True)
+                response = {'status': False, 'message': str(e)}
+
+            if not response.get('status'):
+                errors.append(response.get('message', 'Bulk transfer failed'))
+                unaccepted += len(chunk)
+                continue
+
+            unaccepted += self._apply_results(chunk, response.get('data') or [])
+
+        batch.refresh_from_db()
+        batch.status = 'FAILED' if unaccepted else 'SUBMITTED'
+        batch.submitted_at = timezone.now()
+        batch.last_error = '; '.join(errors) or None
+        batch.save(update_fields=['status', 'submitted_at', 'last_error', 'updated_at'])
+
+        logger.info(
+            f"Payout batch {batch.reference} submitted: {len(unsent) - unaccepted} accepted, "
+            f"{unaccepted} pending retry (attempt {batch.attempts})"
+        )
+        return True
+
+    def abandon_batch(self, batch):
+        """
+        Settle the unsent payouts of a batch that has run out of attempts.
+
+        Each payout is looked up with verify_transfer first, since a chunk
+        whose response was lost (e.g. a timeout) may still have been accepted;
+        those are recorded like any accepted transfer. Payouts Paystack has no
+        record of are marked FAILED and refunded, and payouts whose lookup
+        failed are left for the next run.
+
+        Args:
+            batch: PayoutBatch that has used COURIER_PAYOUT_MAX_ATTEMPTS
+
+        Returns:
+            int: Number of payouts refunded
+        """
+        unsent = list(
+            batch.transactions.filter(status='PENDING', paystack_transaction_id__isnull=True).order_by('pk')
+        )
+
+        found = []
+        results = []
+        not_found = []
+        unresolved = 0
+        for transaction_obj in unsent:
+            try:
+                response = self.paystack_client.verify_transfer(transaction_obj.reference)
+            except Exception as e:
+                logger.error(f"Error looking up payout {transaction_obj.reference}: {e}", exc_info=True)
+                response = {'status': False, 'message': str(e)}
+
+            data = response.get('data') or {}
+            if response.get('status') and data.get('transfer_code'):
+                found.append(transaction_obj)
+                results.append(data)
+            elif response.get('http_status') == 404:
+                not_found.append(transaction_obj.pk)
+            else:
+                unresolved += 1
+
+        if found:
+            self._apply_results(found, results)
+        refunded = self._fail_unsent(not_found, timezone.now())
+
+        batch.last_error = (
+            f"Gave up after {batch.attempts} attempts: {len(found)} payouts found at Paystack, "
+            f"{refunded} refunded, {unresolved} left to look up"
+        )
+        batch.save(update_fields=['last_error', 'updated_at'])
+
+        logger.warning(f"Payout batch {batch.reference}: {batch.last_error}")
+        return refunded
+
+    def _fail_unsent(self, transaction_ids, now):
+        """Mark payouts Paystack never accepted as FAILED and refund them"""
+        if not transaction_ids:
+            return 0
+
+        with db_transaction.atomic():
+            # Re-checked under the lock, so a concurrent run cannot refund a payout twice
+            transactions = list(
+                Transaction.objects.select_for_update().filter(
+                    pk__in=transaction_ids,
+                    status='PENDING',
+                    paystack_transaction_id__isnull=True
+                )
+            )
+            refunds = defaultdict(Money)
+            for transaction_obj in transactions:
+                transaction_obj.status = 'FAILED'
+                transaction_obj.completed_at = now
+                transaction_obj.metadata['failure_reason'] = 'Not accepted by Paystack'
+                refunds[transaction_obj.user_id] += transaction_obj.amount
+
+            Transaction.objects.bulk_update(transactions, ['status', 'completed_at', 'metadata'], batch_size=500)
+            self._refund(refunds)
+
+        return len(transactions)
+
+    def _submittable(self):
+        return Q(status__in=['PENDING', 'FAILED']) | Q(
+            status='SUBMITTING',
+            updated_at__lt=timezone.now() - STALE_SUBMISSION_AFTER
+        )
+
+    def _apply_results(self, chunk, results):
+        """
+        Map per-item bulk transfer results onto the chunk's transactions.
+
+        Returns:
+            int: Number of transactions Paystack did not accept
+        """
+        results_by_reference = {item.get('reference'): item for item in results if item.get('reference')}
+        now = timezone.now()
+
+        accepted = []
+        final_statuses = {}
+        for index, transaction_obj in enumerate(chunk):
+            item = results_by_reference.get(transaction_obj.reference)
+            if item is None and not results_by_reference and index < len(results):
+                # Results without references are returned in request order
+                item = results[index]
+            if not item or not item.get('transfer_code'):
+                continue
+
+            transaction_obj.paystack_transaction_id = item['transfer_code']
+            transaction_obj.paystack_reference = item.get('reference') or transaction_obj.reference
+            transaction_obj.metadata.update(summarize_payload(item))
+            transaction_obj.updated_at = now
+            accepted.append((transaction_obj, item))
+
+            new_status = _ITEM_STATUS_MAPPING.get(str(item.get('status', '')).lower())
+            if new_status:
+                final_statuses[transaction_obj.pk] = new_status
+
+        with db_transaction.atomic():
+            # Status is left out so a transfer.* webhook that already finalised a payout wins
+            Transaction.objects.bulk_update(
+                [transaction_obj for transaction_obj, _ in accepted],
+                ['paystack_transaction_id', 'paystack_reference', 'metadata', 'updated_at'],
+                batch_size=500,
+            )
+            archive_payloads((transaction_obj, 'bulk_transfer', item) for transaction_obj, item in accepted)
+            if final_statuses:
+                self._finalise(
+                    [transaction_obj for transaction_obj, _ in accepted if transaction_obj.pk in final_statuses],
+                    final_statuses,
+                    now,
+                )
+
+        return len(chunk) - len(accepted)
+
+    def _finalise(self, transactions, final_statuses, now):
+        """Apply success/failed item statuses to payouts that are still PENDING"""
+        still_pending = set(
+            Transaction.objects.select_for_update().filter(
+                pk__in=final_statuses,
+                status='PENDING'
+            ).values_list('pk', flat=True)
+        )
+
+        succeeded = []
+        refunds = defaultdict(Money)
+        for transaction_obj in transactions:
+            if transaction_obj.pk not in still_pending:
+                continue
+            transaction_obj.status = final_statuses[transaction_obj.pk]
+            transaction_obj.completed_at = now
+            if transaction_obj.status == 'SUCCESS':
+                succeeded.append(transaction_obj)
+            else:
+                refunds[transaction_obj.user_id] += transaction_obj.amount
+
+        Transaction.objects.bulk_update(
+            [transaction_obj for transaction_obj in transactions if transaction_obj.pk in still_pending],
+            ['status', 'completed_at'],
+            batch_size=500,
+        )
+        # bulk_update bypasses Transaction.save(), so keep the rollup in sync here
+        self._record_successes(succeeded)
+        self._refund(refunds)
+
+    def _record_successes(self, transactions):
+        buckets = defaultdict(lambda: [0, ZERO, ZERO, ZERO])
+        for transaction_obj in transactions:
+            transaction_obj._loaded_status = transaction_obj.status
+            bucket = buckets[(transaction_obj.user_id, timezone.localdate(transaction_obj.created_at))]
+            bucket[0] += 1
+            bucket[1] += transaction_obj.amount
+            bucket[2] += transaction_obj.fee
+            bucket[3] += transaction_obj.net_amount
+
+        for (user_id, date), (count, amount, fee, net_amount) in buckets.items():
+            DailyTransactionSummary.apply_delta(
+                user_id=user_id,
+                date=date,
+                transaction_type='WITHDRAWAL',
+                count=count,
+                amount=amount,
+                fee=fee,
+                net_amount=net_amount,
+            )
+
+    def _refund(self, refunds):
+        """Return rejected payout amounts to the couriers' balances"""
+        if not refunds:
+            return
+
+        for user_id, amount in refunds.items():
+            CourierProfile.objects.filter(user_id=user_id).update(
+                balance=F('balance') + amount.kobo
+            )
+        for user_id in refunds:
+            invalidate_cached_balance(user_id)
+
+        logger.warning(f"Refunded {len(refunds)} rejected courier payouts")
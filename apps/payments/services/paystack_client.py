@@ -1,20 +1,68 @@
 import requests
 import logging
-from decimal import Decimal
 from django.conf import settings
+from django.core.cache import cache
+from apps.core.money import Money
+from apps.payments.services.paystack_governor import PaystackRateGovernor, INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
+# Bump when the cached response format changes so stale entries are ignored
+RESPONSE_CACHE_VERSION = 1
+
+# Transaction and transfer statuses Paystack does not move out of again
+TERMINAL_STATUSES = frozenset({'success', 'failed', 'reversed'})
+
+
+def _response_cache_key(kind, key):
+    return f"paystack_response:{kind}:{key}"
+
+
+def paystack_error_status(response):
+    """
+    HTTP status for an API response reporting a failed Paystack call.
+
+    Paystack's own 4xx answers (validation errors, unknown references) are
+    final and reported as 400. Anything else - no rate governor slot, a
+    timeout, a network error, a Paystack 5xx or 429 - is temporary and
+    reported as 503, so clients retry and idempotency keys are released.
+    """
+    http_status = response.get('http_status')
+    if http_status is not None and 400 <= http_status < 500 and http_status != 429:
+        return 400
+    return 503
+
+
+def paystack_outcome_unknown(response):
+    """
+    Whether a failed Paystack call may still have been carried out.
+    
+    A timeout, a network error or a Paystack 5xx gives no answer, so a
+    transfer may have been made anyway and must be looked up before it is
+    refunded. Paystack's 4xx answers, including 429, and requests that were
+    never sent (no governor slot, no secret key) are definite.
+    """
+    if response.get('status') or response.get('not_sent'):
+        return False
+    http_status = response.get('http_status')
+    return http_status is None or http_status >= 500
+
 
 class PaystackClient:
     """
     Paystack API client for handling payment operations.
+    
+    Every request first takes a slot from the shared rate governor. Pass
+    priority=BACKGROUND for calls made by sweeps and batches so that they
+    yield to requests a user is waiting on.
     """
     
-    def __init__(self):
+    def __init__(self, priority=INTERACTIVE):
+        self.priority = priority
+        self.governor = PaystackRateGovernor()
         self.secret_key = settings.PAYSTACK_SECRET_KEY
         self.public_key = settings.PAYSTACK_PUBLIC_KEY
-        self.base_url = 'https://api.paystack.co'
+        self.base_url = getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
         self.headers = {
             'Authorization': f'Bearer {self.secret_key}',
             'Content-Type': 'application/json'
@@ -24,7 +72,10 @@ class PaystackClient:
         """Make HTTP request to Paystack API"""
         if not self.secret_key:
             logger.error("Paystack secret key not configured")
-            return {'status': False, 'message': 'Paystack secret key not configured'}
+            return {'status': False, 'message': 'Paystack secret key not configured', 'not_sent': True}
+        
+        if not self.governor.acquire(self.priority):
+            return {'status': False, 'message': 'Paystack is busy. Please try again shortly.', 'not_sent': True}
         
         url = f"{self.base_url}{endpoint}"
         
@@ -38,17 +89,22 @@ class PaystackClient:
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
+            if response.status_code == 429:
+                self.governor.throttle()
+            
             # Parse response
             try:
                 response_data = response.json()
             except ValueError as e:
                 logger.error(f"Invalid JSON response from Paystack: {response.text}")
-                return {'status': False, 'message': 'Invalid response from Paystack'}
+                return {'status': False, 'message': 'Invalid response from Paystack', 'http_status': response.status_code}
             
             # Log error responses for debugging
             if not response_data.get('status', False):
                 error_message = response_data.get('message', 'Unknown error')
                 logger.error(f"Paystack API error ({endpoint}): {error_message}. Response: {response_data}")
+                # Lets callers tell Paystack's answer (e.g. 404) from a failed request
+                response_data['http_status'] = response.status_code
             
             # Always return the response (even if status is False)
             # This allows the caller to handle errors appropriately
@@ -64,18 +120,87 @@ class PaystackClient:
                 try:
                     error_response = e.response.json()
                     logger.error(f"Paystack error response: {error_response}")
+                    error_response['http_status'] = e.response.status_code
                     return error_response
                 except (ValueError, AttributeError):
                     pass
             return {'status': False, 'message': str(e)}
     
+    def _cached_get(self, method, endpoint, key, aliases=None):
+        """
+        Make a read request through the response cache.
+        
+        Successful responses are cached under key and any keys aliases(data)
+        returns, so a transfer verified by reference is also found by its
+        transfer code. Responses in a terminal status are kept for
+        PAYSTACK_TERMINAL_RESPONSE_TTL (by default until evicted), others for
+        PAYSTACK_PENDING_RESPONSE_TTL, so polling a pending payment still
+        sees it settle. Failed requests are never cached.
+        """
+        if not getattr(settings, 'PAYSTACK_RESPONSE_CACHE_ENABLED', True):
+            return self._make_request(method, endpoint)
+        
+        cache_key = _response_cache_key(*key)
+        try:
+            cached = cache.get(cache_key, version=RESPONSE_CACHE_VERSION)
+        except Exception as e:
+            logger.warning(f"Paystack response cache read failed for {cache_key}: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+        
+        response = self._make_request(method, endpoint)
+        data = response.get('data')
+        if not response.get('status') or not isinstance(data, dict) or not data.get('status'):
+            return response
+        
+        if str(data['status']).lower() in TERMINAL_STATUSES:
+            timeout = getattr(settings, 'PAYSTACK_TERMINAL_RESPONSE_TTL', None)
+        else:
+            timeout = getattr(settings, 'PAYSTACK_PENDING_RESPONSE_TTL', 10)
+            if not timeout:
+                return response
+        
+        keys = {cache_key}
+        if aliases:
+            keys.update(_response_cache_key(*alias) for alias in aliases(data) if alias[1])
+        try:
+            cache.set_many({k: response for k in keys}, timeout=timeout, version=RESPONSE_CACHE_VERSION)
+        except Exception as e:
+            logger.warning(f"Paystack response cache write failed for {cache_key}: {e}")
+        return response
+    
+    @staticmethod
+    def _transfer_cache_keys(data):
+        return [('transfer', data.get('reference')), ('transfer_code', data.get('transfer_code'))]
+    
+    @staticmethod
+    def forget_transfer(reference=None, transfer_code=None):
+        """
+        Drop cached verify_transfer/get_transfer responses for a transfer.
+        
+        Called when a webhook or finalization changes a transfer, since even
+        a successful transfer can still be reversed.
+        """
+        keys = []
+        if reference:
+            keys.append(_response_cache_key('transfer', reference))
+        if transfer_code:
+            keys.append(_response_cache_key('transfer_code', transfer_code))
+        if not keys:
+            return
+        try:
+            cache.delete_many(keys, version=RESPONSE_CACHE_VERSION)
+        except Exception as e:
+            logger.warning(f"Paystack response cache delete failed for {keys}: {e}")
+    
     def initialize_transaction(self, email, amount, reference=None, callback_url=None, metadata=None):
         """
         Initialize a transaction.
         
         Args:
             email: Customer email
-            amount: Amount in NGN (will be converted to kobo)
+            amount: Amount in NGN or Money (sent to Paystack in kobo)
             reference: Transaction reference (optional)
             callback_url: Callback URL after payment (optional)
             metadata: Additional metadata (optional)
@@ -85,15 +210,15 @@ class PaystackClient:
         """
         # Validate amount
         try:
-            amount_decimal = Decimal(str(amount))
-            if amount_decimal <= 0:
+            amount = Money.from_naira(amount)
+            if amount <= 0:
                 return {'status': False, 'message': 'Amount must be greater than 0'}
         except (ValueError, TypeError):
             return {'status': False, 'message': 'Invalid amount'}
         
         data = {
             'email': email,
-            'amount': int(amount_decimal * 100),  # Convert to kobo
+            'amount': amount.kobo,
         }
         
         if reference:
@@ -115,7 +240,10 @@ class PaystackClient:
         Returns:
             dict: Transaction details
         """
-        return self._make_request('GET', f'/transaction/verify/{reference}')
+        return self._cached_get(
+            'GET', f'/transaction/verify/{reference}',
+            key=('transaction', reference),
+        )
     
     def create_customer(self, email, first_name=None, last_name=None, phone=None, metadata=None):
         """
@@ -212,7 +340,7 @@ class PaystackClient:
         
         Args:
             source: Balance source (balance)
-            amount: Amount in NGN (will be converted to kobo)
+            amount: Amount in NGN or Money (sent to Paystack in kobo)
             recipient: Recipient code
             reason: Transfer reason (optional)
             reference: Transfer reference (optional)
@@ -223,15 +351,15 @@ class PaystackClient:
         """
         # Validate amount
         try:
-            amount_decimal = Decimal(str(amount))
-            if amount_decimal <= 0:
+            amount = Money.from_naira(amount)
+            if amount <= 0:
                 return {'status': False, 'message': 'Amount must be greater than 0'}
         except (ValueError, TypeError):
             return {'status': False, 'message': 'Invalid amount'}
         
         data = {
             'source': source,
-            'amount': int(amount_decimal * 100),  # Convert to kobo
+            'amount': amount.kobo,
             'recipient': recipient,
             'currency': currency,
         }
@@ -243,6 +371,48 @@ class PaystackClient:
         
         return self._make_request('POST', '/transfer', data=data)
     
+    def bulk_create_transfers(self, transfers, source='balance', currency='NGN'):
+        """
+        Create multiple transfers in a single request.
+        
+        Bulk transfers skip OTP, so OTP must be disabled on the Paystack
+        integration. Paystack accepts at most 100 transfers per request.
+        
+        Args:
+            transfers: List of dicts with 'amount' (NGN or Money, sent in kobo),
+                'recipient' (recipient code), 'reference' and optional 'reason'
+            source: Balance source (balance)
+            currency: Currency code (default: NGN)
+        
+        Returns:
+            dict: Per-transfer results in 'data', in request order
+        """
+        items = []
+        for transfer in transfers:
+            try:
+                amount = Money.from_naira(transfer['amount'])
+                if amount <= 0:
+                    return {'status': False, 'message': 'Amount must be greater than 0'}
+            except (ValueError, TypeError, KeyError):
+                return {'status': False, 'message': 'Invalid amount'}
+            
+            item = {
+                'amount': amount.kobo,
+                'recipient': transfer['recipient'],
+                'reference': transfer['reference'],
+            }
+            if transfer.get('reason'):
+                item['reason'] = transfer['reason']
+            items.append(item)
+        
+        data = {
+            'source': source,
+            'currency': currency,
+            'transfers': items,
+        }
+        
+        return self._make_request('POST', '/transfer/bulk', data=data)
+    
     def finalize_transfer(self, transfer_code, otp):
         """
         Finalize a transfer with OTP.
@@ -259,6 +429,7 @@ class PaystackClient:
             'otp': otp,
         }
         
+        self.forget_transfer(transfer_code=transfer_code)
         return self._make_request('POST', '/transfer/finalize_transfer', data=data)
     
     def verify_transfer(self, reference):
@@ -271,7 +442,11 @@ class PaystackClient:
         Returns:
             dict: Transfer details
         """
-        return self._make_request('GET', f'/transfer/verify/{reference}')
+        return self._cached_get(
+            'GET', f'/transfer/verify/{reference}',
+            key=('transfer', reference),
+            aliases=self._transfer_cache_keys,
+        )
     
     def get_transfer(self, transfer_code):
         """
@@ -283,9 +458,38 @@ class PaystackClient:
         Returns:
             dict: Transfer details
         """
-        return self._make_request('GET', f'/transfer/{transfer_code}')
+        return self._cached_get(
+            'GET', f'/transfer/{transfer_code}',
+            key=('transfer_code', transfer_code),
+            aliases=self._transfer_cache_keys,
+        )
     
-    def list_transfers(self, page=1, per_page=50, status=None, recipient=None):
+    def list_transactions(self, page=1, per_page=50, status=None, from_date=None, to_date=None):
+        """
+        List transactions.
+        
+        Args:
+            page: Page number
+            per_page: Items per page
+            status: Filter by status (optional)
+            from_date: Only transactions created at or after this datetime (optional)
+            to_date: Only transactions created before this datetime (optional)
+        
+        Returns:
+            dict: List of transactions
+        """
+        params = {
+            'page': page,
+            'perPage': per_page,
+        }
+        
+        if status:
+            params['status'] = status
+        params.update(self._date_range_params(from_date, to_date))
+        
+        return self._make_request('GET', '/transaction', params=params)
+    
+    def list_transfers(self, page=1, per_page=50, status=None, recipient=None, from_date=None, to_date=None):
         """
         List transfers.
         
@@ -294,6 +498,8 @@ class PaystackClient:
             per_page: Items per page
             status: Filter by status (optional)
             recipient: Filter by recipient code (optional)
+            from_date: Only transfers created at or after this datetime (optional)
+            to_date: Only transfers created before this datetime (optional)
         
         Returns:
             dict: List of transfers
@@ -307,9 +513,19 @@ class PaystackClient:
             params['status'] = status
         if recipient:
             params['recipient'] = recipient
+        params.update(self._date_range_params(from_date, to_date))
         
         return self._make_request('GET', '/transfer', params=params)
     
+    @staticmethod
+    def _date_range_params(from_date, to_date):
+        params = {}
+        if from_date:
+            params['from'] = from_date.isoformat()
+        if to_date:
+            params['to'] = to_date.isoformat()
+        return params
+    
     def list_banks(self, country='nigeria'):
         """
         List supported banks.
@@ -0,0 +1,190 @@
+"""
+Rate governor for outbound Paystack calls.
+
+With a Redis cache backend (django-redis) the token bucket lives in Redis
+and every process draws from it, so the whole deployment stays under
+PAYSTACK_RATE_LIMIT. Any other backend, including the LocMemCache that
+production.py configures today, cannot run the Lua scripts, and each process
+falls back to its own bucket refilling at PAYSTACK_RATE_LOCAL_SHARE of the
+rate. The limit is then per worker process: N processes together may send
+up to N x PAYSTACK_RATE_LOCAL_SHARE x PAYSTACK_RATE_LIMIT requests per
+second, so choose the share to suit the number of web and Celery processes.
+A 429 from Paystack only drains the bucket of the process that received it.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, highest first. Interactive calls serve a user waiting on
+# a response; background calls come from Celery sweeps, retries and batches.
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+BUCKET_KEY = 'paystack:rate_governor'
+
+# Refill the bucket from the time elapsed since the last call, then take one
+# token if doing so leaves at least `floor` tokens. Returns 0 when a token was
+# taken, otherwise the milliseconds until one will be available at this floor.
+# Redis' own clock is used so that workers with skewed clocks agree.
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local floor = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens - 1 >= floor then
+    tokens = tokens - 1
+else
+    wait = math.ceil((floor + 1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+# Empty the bucket after Paystack answers 429, so every process pauses until
+# it refills instead of retrying into the limit
+DRAIN_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+redis.call('HSET', KEYS[1], 'tokens', '0', 'ts', now)
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[1]))
+return 1
+"""
+
+
+class _LocalBucket:
+    """Per-process token bucket used while Redis is unavailable"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._updated_at = 0
+
+    def acquire(self, rate, capacity, floor):
+        now = time.monotonic()
+        with self._lock:
+            if self._tokens is None:
+                self._tokens = capacity
+            else:
+                self._tokens = min(capacity, self._tokens + (now - self._updated_at) * rate)
+            self._updated_at = now
+            if self._tokens - 1 >= floor:
+                self._tokens -= 1
+                return 0
+            return int((floor + 1 - self._tokens) * 1000 / rate) + 1
+
+    def drain(self):
+        with self._lock:
+            self._tokens = 0
+            self._updated_at = time.monotonic()
+
+
+_local_bucket = _LocalBucket()
+_scripts = {}
+
+
+class PaystackRateGovernor:
+    """
+    Token bucket shared by every process that calls Paystack.
+
+    Tokens refill at PAYSTACK_RATE_LIMIT per second up to PAYSTACK_RATE_BURST,
+    and each request takes one before it is sent. Background calls may only
+    take a token while more than PAYSTACK_BACKGROUND_RESERVE of the bucket
+    is left, so a sync sweep or payout batch running at full speed still
+    leaves room for interactive calls, which can drain the bucket completely.
+    The bucket lives in Redis and is updated by one Lua script per attempt;
+    without Redis, or while it is unreachable, each process falls back to a
+    local bucket limited to PAYSTACK_RATE_LOCAL_SHARE of the shared rate
+    (see the module docstring for what that means across workers).
+    """
+
+    def __init__(self):
+        self.enabled = getattr(settings, 'PAYSTACK_RATE_GOVERNOR_ENABLED', True)
+        self.rate = float(getattr(settings, 'PAYSTACK_RATE_LIMIT', 20))
+        self.capacity = max(1, int(getattr(settings, 'PAYSTACK_RATE_BURST', 40)))
+        self.reserve = float(getattr(settings, 'PAYSTACK_BACKGROUND_RESERVE', 0.5))
+        self.local_share = float(getattr(settings, 'PAYSTACK_RATE_LOCAL_SHARE', 0.25))
+        self.max_wait = {
+            INTERACTIVE: float(getattr(settings, 'PAYSTACK_INTERACTIVE_MAX_WAIT', 2)),
+            BACKGROUND: float(getattr(settings, 'PAYSTACK_BACKGROUND_MAX_WAIT', 30)),
+        }
+
+    def acquire(self, priority=INTERACTIVE):
+        """
+        Wait for a request slot.
+
+        Args:
+            priority: INTERACTIVE or BACKGROUND
+
+        Returns:
+            bool: True once a token is taken, False if none became available
+                within the priority's maximum wait
+        """
+        if not self.enabled or self.rate <= 0:
+            return True
+
+        floor = self._floor(priority)
+        deadline = time.monotonic() + self.max_wait.get(priority, self.max_wait[BACKGROUND])
+        while True:
+            wait_ms = self._take(floor)
+            if not wait_ms:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Paystack rate governor: no {priority} slot within {self.max_wait.get(priority)}s")
+                return False
+            time.sleep(min(wait_ms / 1000, remaining))
+
+    def throttle(self):
+        """Empty the bucket after Paystack rejected a request with 429"""
+        if not self.enabled or self.rate <= 0:
+            return
+        logger.warning("Paystack returned 429; pausing all Paystack calls until the rate governor refills")
+        script = self._script('drain', DRAIN_SCRIPT)
+        if script is not None:
+            try:
+                script(keys=[BUCKET_KEY], args=[int(self.capacity * 1000 / self.rate) + 1000])
+                return
+            except Exception as e:
+                logger.warning(f"Paystack rate governor unavailable, draining local bucket: {e}")
+        _local_bucket.drain()
+
+    def _floor(self, priority):
+        if priority == INTERACTIVE:
+            return 0
+        return self.capacity * self.reserve
+
+    def _take(self, floor):
+        script = self._script('acquire', ACQUIRE_SCRIPT)
+        if script is not None:
+            try:
+                return int(script(keys=[BUCKET_KEY], args=[self.rate, self.capacity, floor]))
+            except Exception as e:
+                logger.warning(f"Paystack rate governor unavailable, using local bucket: {e}")
+        return _local_bucket.acquire(self.rate * self.local_share, self.capacity, floor)
+
+    def _script(self, name, source):
+        """Registered Lua script, or None when the cache backend is not Redis"""
+        if name not in _scripts:
+            from django_redis import get_redis_connection
+            try:
+                _scripts[name] = get_redis_connection('default').register_script(source)
+            except NotImplementedError:
+                if name == 'acquire':
+                    logger.warning(
+                        f"Paystack rate governor: cache backend is not Redis; limiting this process to "
+                        f"{self.rate * self.local_share:g} requests/s"
+                    )
+                _scripts[name] = None
+        return _scripts[name]
@@ -0,0 +1,154 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+
+from apps.payments.models import Transaction
+from apps.payments.services.paystack_client import PaystackClient
+from apps.payments.services.paystack_governor import BACKGROUND
+from apps.core.money import Money
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('transactions', 'transfers')
+
+# Local statuses consistent with a final Paystack status. Other Paystack
+# statuses are still in flight and only need a local record to exist.
+_EXPECTED_LOCAL_STATUSES = {
+    'transactions': {
+        'success': {'SUCCESS'},
+        'reversed': {'REVERSED'},
+        'failed': {'FAILED', 'PENDING'},
+        'abandoned': {'FAILED', 'PENDING'},
+    },
+    'transfers': {
+        'success': {'SUCCESS'},
+        'reversed': {'REVERSED'},
+        'failed': {'FAILED'},
+    },
+}
+
+_LOCAL_TRANSACTION_TYPES = {
+    'transactions': 'DEPOSIT',
+    'transfers': 'WITHDRAWAL',
+}
+
+
+class ReconciliationError(Exception):
+    """Paystack could not be paged through; the run is incomplete"""
+
+
+class PaystackReconciler:
+    """
+    Compares Paystack's transaction and transfer records with ours.
+
+    Paystack's listings are read one page at a time and each page is matched
+    with a single in_bulk lookup on Transaction.reference, so memory stays
+    bounded by the page size however long the period is. Discrepancies are
+    yielded as they are found:
+
+    - missing: a successful charge or any transfer with no local Transaction
+    - transaction_type: the reference belongs to a different kind of Transaction
+    - status: the local status contradicts Paystack's final status
+    - amount: the amounts differ
+
+    Local Transactions Paystack has never seen are not reported, since
+    finding them would mean holding every reference of the period.
+    """
+
+    def __init__(self, paystack_client=None, page_size=None):
+        self.paystack_client = paystack_client or PaystackClient(priority=BACKGROUND)
+        self.page_size = page_size or getattr(settings, 'PAYSTACK_RECONCILIATION_PAGE_SIZE', 100)
+        self.summary = Counter()
+
+    def discrepancies(self, start, end, kinds=KINDS):
+        """
+        Yield discrepancies between Paystack and local records created in [start, end).
+
+        Counts of records checked and discrepancies found accumulate in
+        self.summary while the generator is consumed.
+
+        Args:
+            start: Start of the period (datetime)
+            end: End of the period (datetime); fixing it keeps Paystack's
+                pages stable while new records arrive
+            kinds: Any of 'transactions' and 'transfers'
+
+        Yields:
+            dict: One discrepancy
+
+        Raises:
+            ReconciliationError: A Paystack page could not be fetched
+        """
+        for kind in kinds:
+            yield from self._match(kind, self._pages(kind, start, end))
+
+    def _pages(self, kind, start, end):
+        fetch = self.paystack_client.list_transactions if kind == 'transactions' else self.paystack_client.list_transfers
+        page = 1
+        while True:
+            response = fetch(page=page, per_page=self.page_size, from_date=start, to_date=end)
+            if not response.get('status'):
+                raise ReconciliationError(
+                    f"Could not list Paystack {kind} (page {page}): {response.get('message', 'Unknown error')}"
+                )
+            records = response.get('data') or []
+            if not records:
+                return
+            yield records
+
+            page_count = (response.get('meta') or {}).get('pageCount')
+            if page_count is not None and page >= int(page_count):
+                return
+            page += 1
+
+    def _match(self, kind, pages):
+        for records in pages:
+            records_by_reference = {record['reference']: record for record in records if record.get('reference')}
+            local_transactions = Transaction.objects.only(
+                'id', 'reference', 'transaction_type', 'status', 'amount'
+            ).in_bulk(list(records_by_reference), field_name='reference')
+
+            self.summary[f'{kind}_checked'] += len(records_by_reference)
+            for reference, record in records_by_reference.items():
+                discrepancy = self._compare(kind, record, local_transactions.get(reference))
+                if discrepancy is not None:
+                    self.summary['discrepancies'] += 1
+                    self.summary[discrepancy['type']] += 1
+                    yield discrepancy
+
+    def _compare(self, kind, record, transaction_obj):
+        paystack_status = str(record.get('status', '')).lower()
+        paystack_amount = Money.from_kobo(record['amount']) if record.get('amount') is not None else None
+
+        if transaction_obj is None:
+            if kind == 'transactions' and paystack_status != 'success':
+                return None
+            return self._discrepancy('missing', kind, record, paystack_status, paystack_amount)
+
+        if transaction_obj.transaction_type != _LOCAL_TRANSACTION_TYPES[kind]:
+            return self._discrepancy('transaction_type', kind, record, paystack_status, paystack_amount, transaction_obj)
+
+        expected = _EXPECTED_LOCAL_STATUSES[kind].get(paystack_status)
+        if expected is not None and transaction_obj.status not in expected:
+            return self._discrepancy('status', kind, record, paystack_status, paystack_amount, transaction_obj)
+
+        if paystack_amount is not None and paystack_amount != transaction_obj.amount:
+            return self._discrepancy('amount', kind, record, paystack_status, paystack_amount, transaction_obj)
+
+        return None
+
+    def _discrepancy(self, discrepancy_type, kind, record, paystack_status, paystack_amount, transaction_obj=None):
+        return {
+            'type': discrepancy_type,
+            'kind': kind,
+            'reference': record['reference'],
+            'paystack_id': record.get('transfer_code') or record.get('id'),
+            'paystack_status': paystack_status,
+            'paystack_amount': paystack_amount,
+            'paystack_created_at': record.get('createdAt') or record.get('created_at'),
+            'transaction_id': transaction_obj.pk if transaction_obj else None,
+            'local_type': transaction_obj.transaction_type if transaction_obj else None,
+            'local_status': transaction_obj.status if transaction_obj else None,
+            'local_amount': transaction_obj.amount if transaction_obj else None,
+        }
@@ -0,0 +1,168 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, When
+from django.utils import timezone
+
+from apps.payments.models import Transaction, Notification, NotificationCounter, DailyTransactionSummary
+from apps.orders.models import Order
+from apps.accounts.models import CourierProfile
+from apps.core.utils import invalidate_cached_balance
+from apps.core.money import MoneyField, ZERO
+from apps.core.id_generator import generate_reference
+
+logger = logging.getLogger(__name__)
+
+
+class CourierSettlementService:
+    """
+    Credits couriers for delivered orders in periodic settlement runs.
+
+    Each run claims every delivered, paid and unsettled order with a single
+    UPDATE (stamping a run reference and filling in any missing
+    courier_payout), aggregates the payouts per courier in one grouped query,
+    credits all courier balances with one UPDATE and writes one EARNING
+    transaction per courier. Work after the claim scales with the number of
+    couriers, not deliveries.
+    """
+
+    def __init__(self):
+        self.payout_rate = Decimal(str(getattr(settings, 'COURIER_PAYOUT_RATE', '0.80')))
+        self.hold_period = timedelta(hours=getattr(settings, 'COURIER_SETTLEMENT_HOLD_HOURS', 0))
+
+    def settle(self):
+        """
+        Run a settlement.
+
+        Returns:
+            dict: Settlement summary, or None if there was nothing to settle
+        """
+        now = timezone.now()
+        run_reference = generate_reference('STL')
+
+        with db_transaction.atomic():
+            settled_orders = Order.objects.filter(
+                status='DELIVERED',
+                settled_at__isnull=True,
+                delivered_at__lte=now - self.hold_period,
+                payment_status='PAID',
+                assigned_courier__isnull=False,
+            ).update(
+                settled_at=now,
+                settlement_reference=run_reference,
+                courier_payout=Case(
+                    When(courier_payout=0, then=self._payout_expression()),
+                    default=F('courier_payout'),
+                    output_field=MoneyField(),
+                ),
+            )
+            if not settled_orders:
+                return None
+
+            run_orders = Order.objects.filter(settlement_reference=run_reference)
+            earnings = {
+                row['assigned_courier_id']: row
+                for row in run_orders.filter(courier_payout__gt=0).values('assigned_courier_id').annotate(
+                    order_count=Count('id'),
+                    total=Sum('courier_payout'),
+                ).order_by()
+            }
+
+            courier_ids = set(
+                CourierProfile.objects.filter(user_id__in=earnings).values_list('user_id', flat=True)
+            )
+            missing_profiles = set(earnings) - courier_ids
+            if missing_profiles:
+                # Leave these orders for a later run rather than settle them without a credit
+                logger.warning(f"Settlement {run_reference}: no courier profile for users {sorted(missing_profiles)}")
+                settled_orders -= run_orders.filter(assigned_courier_id__in=missing_profiles).update(
+                    settled_at=None,
+                    settlement_reference=None,
+                )
+                for user_id in missing_profiles:
+                    del earnings[user_id]
+
+            if earnings:
+                self._credit_couriers(run_reference, earnings, now)
+
+        total = sum((row['total'] for row in earnings.values()), ZERO)
+        logger.info(
+            f"Settlement {run_reference}: {settled_orders} orders, {len(earnings)} couriers, ₦{total:,.2f}"
+        )
+        return {
+            'reference': run_reference,
+            'orders': settled_orders,
+            'couriers': len(earnings),
+            'total_amount': total,
+        }
+
+    def _payout_expression(self):
+        """
+        delivery_fee * COURIER_PAYOUT_RATE in integer kobo, rounded half up.
+
+        Matches Order.calculate_courier_payout() without leaving integer
+        arithmetic in the database.
+        """
+        numerator, denominator = self.payout_rate.as_integer_ratio()
+        return (F('delivery_fee') * (2 * numerator) + denominator) / (2 * denominator)
+
+    def _credit_couriers(self, run_reference, earnings, now):
+        """Credit balances and write one ledger entry and notification per courier"""
+        run_total = Order.objects.filter(
+            settlement_reference=run_reference,
+            assigned_courier_id=OuterRef('user_id'),
+        ).values('assigned_courier_id').annotate(total=Sum('courier_payout')).values('total')
+
+        CourierProfile.objects.filter(user_id__in=earnings).update(
+            balance=F('balance') + Subquery(run_total, output_field=MoneyField())
+        )
+
+        transactions = []
+        for user_id, row in earnings.items():
+            amount = row['total']
+            transactions.append(Transaction(
+                user_id=user_id,
+                transaction_type='EARNING',
+                status='SUCCESS',
+                payment_method='WALLET',
+                amount=amount,
+                fee=ZERO,
+                net_amount=amount,
+                reference=generate_reference('TXN'),
+                description=f"Earnings for {row['order_count']} deliveries",
+                metadata={'settlement_reference': run_reference, 'order_count': row['order_count']},
+                completed_at=now,
+            ))
+        transactions = Transaction.objects.bulk_create(transactions, batch_size=500)
+
+        notifications = []
+        for transaction_obj in transactions:
+            order_count = transaction_obj.metadata['order_count']
+            notifications.append(Notification(
+                user_id=transaction_obj.user_id,
+                notification_type='EARNINGS_SETTLED',
+                title='Earnings Settled',
+                message=f'₦{transaction_obj.amount:,.2f} for {order_count} deliveries has been added to your balance',
+                related_transaction=transaction_obj,
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=500)
+
+        # bulk_create bypasses save(), so update the rollup and unread counters here
+        today = timezone.localdate(now)
+        for transaction_obj in transactions:
+            DailyTransactionSummary.apply_delta(
+                user_id=transaction_obj.user_id,
+                date=today,
+                transaction_type='EARNING',
+                count=1,
+                amount=transaction_obj.amount,
+                fee=transaction_obj.fee,
+                net_amount=transaction_obj.net_amount,
+            )
+            NotificationCounter.adjust(transaction_obj.user_id, 1)
+
+        for user_id in earnings:
+            invalidate_cached_balance(user_id)
@@ -0,0 +1,136 @@
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from apps.payments.models import VelocityCounter
+from apps.core.money import Money
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 86400
+
+# scope: key of the subjects dict the rule is counted against
+# metric: 'count' (attempts) or 'amount' (kobo)
+# setting: settings name holding the limit (a count, or a Naira amount); empty/0 disables the rule
+VelocityRule = namedtuple('VelocityRule', ['scope', 'metric', 'window', 'setting', 'default', 'message'])
+
+VELOCITY_RULES = {
+    'withdrawal': (
+        VelocityRule(
+            'user', 'count', HOUR, 'WITHDRAWAL_USER_MAX_COUNT_PER_HOUR', 10,
+            'You have made too many withdrawals in the last hour. Please try again later.',
+        ),
+        VelocityRule(
+            'user', 'amount', DAY, 'WITHDRAWAL_USER_MAX_AMOUNT_PER_DAY', '1000000.00',
+            'This withdrawal would exceed your daily withdrawal limit.',
+        ),
+        VelocityRule(
+            'recipient', 'count', DAY, 'WITHDRAWAL_RECIPIENT_MAX_COUNT_PER_DAY', 10,
+            'Too many withdrawals to this bank account today. Please try again tomorrow.',
+        ),
+        VelocityRule(
+            'recipient', 'amount', DAY, 'WITHDRAWAL_RECIPIENT_MAX_AMOUNT_PER_DAY', '500000.00',
+            'This withdrawal would exceed the daily limit for this bank account.',
+        ),
+    ),
+    'recipient_create': (
+        VelocityRule(
+            'user', 'count', DAY, 'TRANSFER_RECIPIENT_MAX_CREATES_PER_DAY', 5,
+            'You have added too many bank accounts today. Please try again tomorrow.',
+        ),
+    ),
+}
+
+
+class VelocityLimitExceeded(Exception):
+    """An attempt would break a velocity rule; the message is safe to show to the user"""
+
+
+class VelocityEngine:
+    """
+    Sliding-window velocity limits backed by VelocityCounter rows.
+
+    Each rule keeps one counter per fixed window and estimates the sliding
+    window as the current counter plus the previous one weighted by how much
+    of it still overlaps. A check therefore touches two rows per rule, by
+    primary key, no matter how many transactions the user has made. The
+    counters live in the database because the production cache is
+    per-process; with N workers, cache counters would allow N times each limit.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules or VELOCITY_RULES
+        self.enabled = getattr(settings, 'VELOCITY_LIMITS_ENABLED', True)
+
+    def consume(self, action, subjects, amount=None):
+        """
+        Count an attempt against every rule for action.
+
+        Counters are incremented under a row lock before they are compared,
+        so concurrent attempts cannot both slip under a limit. If any rule is
+        broken the increments are rolled back and nothing is counted.
+
+        Args:
+            action: Key of VELOCITY_RULES, e.g. 'withdrawal'
+            subjects: Dict of scope -> identifier, e.g. {'user': 1, 'recipient': 'RCP_x'}
+            amount: Money for amount rules
+
+        Returns:
+            list: Applied increments; pass to release() if the attempt fails
+
+        Raises:
+            VelocityLimitExceeded: A rule's limit would be exceeded
+        """
+        applied = []
+        if not self.enabled:
+            return applied
+
+        now = time.time()
+        with db_transaction.atomic():
+            for rule in self.rules.get(action, ()):
+                limit = self._limit(rule)
+                subject = subjects.get(rule.scope)
+                if not limit or subject is None:
+                    continue
+                delta = 1 if rule.metric == 'count' else Money.from_naira(amount).kobo
+                if not delta:
+                    continue
+
+                window_index, elapsed = divmod(now, rule.window)
+                current_key = self._key(action, rule, subject, int(window_index))
+                previous_key = self._key(action, rule, subject, int(window_index) - 1)
+                # Kept until the following window no longer looks back at it
+                expires_at = datetime.fromtimestamp((window_index + 2) * rule.window, tz=dt_timezone.utc)
+
+                current = VelocityCounter.add(current_key, delta, expires_at)
+                applied.append((current_key, delta, expires_at))
+                previous = self._get(previous_key)
+                estimate = current + previous * (1 - elapsed / rule.window)
+                if estimate > limit:
+                    logger.warning(f"Velocity limit {rule.setting} hit for {rule.scope} {subject} ({action})")
+                    raise VelocityLimitExceeded(rule.message)
+        return applied
+
+    def release(self, applied):
+        """Undo the increments returned by consume() for an attempt that did not go through"""
+        for key, delta, expires_at in applied:
+            VelocityCounter.add(key, -delta, expires_at)
+
+    def _limit(self, rule):
+        value = getattr(settings, rule.setting, rule.default)
+        if not value:
+            return None
+        if rule.metric == 'count':
+            return int(value)
+        return Money.from_naira(value).kobo
+
+    def _key(self, action, rule, subject, window_index):
+        return f"velocity:{action}:{rule.scope}:{subject}:{rule.metric}:{rule.window}:{window_index}"
+
+    def _get(self, key):
+        return VelocityCounter.objects.filter(key=key).values_list('value', flat=True).first() or 0
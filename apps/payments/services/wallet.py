@@ -0,0 +1,215 @@
+import logging
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.payments.models import Transaction
+from apps.payments.services.outbox import enqueue_notification
+from apps.orders.models import Order
+from apps.accounts.models import UserProfile, CourierProfile
+from apps.core.utils import invalidate_cached_balance
+from apps.core.money import Money, ZERO
+from apps.core.id_generator import generate_reference
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODELS = {
+    'USER': UserProfile,
+    'COURIER': CourierProfile,
+}
+
+
+class WalletError(Exception):
+    """A wallet operation was refused; the message is safe to show to the user"""
+
+
+def lock_wallets(users):
+    """
+    Lock the balance rows of the given users, in ascending user id order.
+
+    Every caller that locks more than one wallet goes through here, so two
+    transfers in opposite directions wait for each other instead of deadlocking.
+    Must be called inside a transaction.
+
+    Args:
+        users: Users whose wallets to lock
+
+    Returns:
+        dict: user id -> locked profile (id, user_id, full_name and balance loaded)
+    """
+    users_by_id = {user.pk: user for user in users}
+    profiles = {}
+    for user_id in sorted(users_by_id):
+        profile_model = PROFILE_MODELS.get(users_by_id[user_id].user_type)
+        profile = None
+        if profile_model is not None:
+            profile = profile_model.objects.select_for_update().only(
+                'id', 'user_id', 'full_name', 'balance'
+            ).filter(user_id=user_id).first()
+        if profile is None:
+            raise WalletError(f'{users_by_id[user_id].email} does not have a wallet.')
+        profiles[user_id] = profile
+    return profiles
+
+
+def adjust_wallet(profile, amount):
+    """
+    Add a (possibly negative) Money amount to a locked profile's balance.
+
+    The row must already be locked, so the in-memory balance is kept exact;
+    the cached balance is invalidated on commit.
+    """
+    profile.__class__.objects.filter(pk=profile.pk).update(balance=F('balance') + amount.kobo)
+    profile.balance += amount
+    invalidate_cached_balance(profile.user_id)
+
+
+def transfer_between_wallets(sender, recipient, amount, note=''):
+    """
+    Move money from one Xcellar wallet to another.
+
+    Both balances change in one database transaction with no external calls,
+    and a TRANSFER_OUT/TRANSFER_IN pair of successful Transactions is written,
+    linked by a shared transfer reference in their metadata.
+
+    Args:
+        sender: User paying
+        recipient: User being paid
+        amount: Money or Naira amount
+        note: Optional note shown to both parties
+
+    Returns:
+        tuple: (debit Transaction, credit Transaction)
+
+    Raises:
+        WalletError: Invalid amount or recipient, missing wallet or insufficient balance
+    """
+    amount = Money.from_naira(amount)
+    if amount <= 0:
+        raise WalletError('Amount must be greater than 0.')
+    if sender.pk == recipient.pk:
+        raise WalletError('You cannot transfer money to yourself.')
+
+    transfer_reference = generate_reference('WTR')
+    now = timezone.now()
+
+    with db_transaction.atomic():
+        profiles = lock_wallets([sender, recipient])
+        sender_profile = profiles[sender.pk]
+        recipient_profile = profiles[recipient.pk]
+        if sender_profile.balance < amount:
+            raise WalletError('Insufficient balance.')
+
+        adjust_wallet(sender_profile, -amount)
+        adjust_wallet(recipient_profile, amount)
+
+        sender_name = sender_profile.full_name or sender.email
+        recipient_name = recipient_profile.full_name or recipient.email
+        metadata = {'transfer_reference': transfer_reference}
+        if note:
+            metadata['note'] = note
+
+        debit = Transaction.objects.create(
+            user=sender,
+            transaction_type='TRANSFER_OUT',
+            status='SUCCESS',
+            payment_method='WALLET',
+            amount=amount,
+            fee=ZERO,
+            net_amount=amount,
+            reference=generate_reference('TXN'),
+            description=f'Transfer to {recipient_name}',
+            metadata={**metadata, 'counterparty_id': recipient.pk},
+            completed_at=now,
+        )
+        credit = Transaction.objects.create(
+            user=recipient,
+            transaction_type='TRANSFER_IN',
+            status='SUCCESS',
+            payment_method='WALLET',
+            amount=amount,
+            fee=ZERO,
+            net_amount=amount,
+            reference=generate_reference('TXN'),
+            description=f'Transfer from {sender_name}',
+            metadata={**metadata, 'counterparty_id': sender.pk},
+            completed_at=now,
+        )
+
+        enqueue_notification(
+            user=recipient,
+            notification_type='TRANSFER_RECEIVED',
+            title='Money Received',
+            message=f'You received ₦{amount:,.2f} from {sender_name}',
+            related_transaction=credit,
+            metadata={'transfer_reference': transfer_reference},
+        )
+
+    logger.info(f"Wallet transfer {transfer_reference}: ₦{amount:,.2f} from {sender.email} to {recipient.email}")
+    return debit, credit
+
+
+def pay_order_from_wallet(user, order):
+    """
+    Pay for an order from the sender's balance.
+
+    The order is claimed with a conditional UPDATE (only a PENDING, unpaid
+    order is marked PAID) and the balance is debited with another
+    (UPDATE ... WHERE balance >= total_amount), so no row has to be read and
+    locked first and a second attempt can never charge twice. Call inside a
+    transaction to combine payment with further order changes.
+
+    Args:
+        user: The order's sender
+        order: Order to pay; payment_status is updated in place
+
+    Returns:
+        Transaction: The successful PAYMENT transaction
+
+    Raises:
+        WalletError: The order is not payable, or the balance is insufficient
+    """
+    amount = order.total_amount
+    if not amount or amount <= 0:
+        raise WalletError('This order has no amount to pay.')
+    profile_model = PROFILE_MODELS.get(user.user_type)
+    if profile_model is None:
+        raise WalletError(f'{user.email} does not have a wallet.')
+    now = timezone.now()
+
+    with db_transaction.atomic():
+        claimed = Order.objects.filter(
+            pk=order.pk,
+            sender=user,
+            status='PENDING',
+        ).exclude(payment_status='PAID').update(payment_status='PAID', updated_at=now)
+        if not claimed:
+            raise WalletError('This order has already been paid or can no longer be paid.')
+
+        debited = profile_model.objects.filter(
+            user_id=user.pk,
+            balance__gte=amount,
+        ).update(balance=F('balance') - amount.kobo)
+        if not debited:
+            raise WalletError('Insufficient balance. Please add funds to your account to pay for this order.')
+        invalidate_cached_balance(user.pk)
+
+        transaction_obj = Transaction.objects.create(
+            user=user,
+            transaction_type='PAYMENT',
+            status='SUCCESS',
+            payment_method='WALLET',
+            amount=amount,
+            fee=ZERO,
+            net_amount=amount,
+            reference=generate_reference('TXN'),
+            description=f'Payment for order {order.order_number}',
+            metadata={'order_id': order.pk, 'order_number': order.order_number},
+            completed_at=now,
+        )
+
+    order.payment_status = 'PAID'
+    order.updated_at = now
+    logger.info(f"Order {order.order_number} paid from wallet by {user.email}: ₦{amount:,.2f}")
+    return transaction_obj
@@ -4,12 +4,11 @@ import json
 import logging
 from django.conf import settings
 from django.db import transaction as db_transaction
-from django.utils import timezone
-from decimal import Decimal
 
-from apps.payments.models import Transaction, Notification, DedicatedVirtualAccount
+from apps.payments.models import Transaction, DedicatedVirtualAccount
 from apps.payments.services.paystack_client import PaystackClient
-from apps.accounts.models import UserProfile, CourierProfile
+from apps.payments.services.outbox import enqueue_notification
+from apps.payments.services.withdrawals import settle_withdrawal
 
 logger = logging.getLogger(__name__)
 
@@ -55,22 +54,18 @@ class PaystackWebhookHandler:
     def handle_charge_success(self, event_data):
         """
         Handle charge.success webhook event.
-        Now dispatches to Celery task for async processing.
+        Queues the deposit for batched processing by process_dva_deposit_batch.
+        
+        Errors propagate so the webhook is answered with a 500 and Paystack
+        redelivers it; redeliveries of stored events are ignored.
         
         Args:
             event_data: Webhook event data
         """
-        # Dispatch to Celery task for async processing
-        from apps.payments.tasks import process_dva_deposit
+        from apps.payments.services.deposits import record_deposit_event
         
-        try:
-            # Enqueue task for async processing
-            task_result = process_dva_deposit.delay(event_data)
-            logger.info(f"Enqueued DVA deposit processing task: {task_result.id} for event: {event_data.get('data', {}).get('reference')}")
-        except Exception as e:
-            logger.error(f"Error enqueueing DVA deposit task: {e}", exc_info=True)
-            # Fallback to synchronous processing if Celery fails
-            self._handle_charge_success_sync(event_data)
+        if record_deposit_event(event_data):
+            logger.info(f"Queued DVA deposit event: {event_data.get('data', {}).get('reference')}")
     
     def handle_transfer_success(self, event_data):
         """
@@ -79,41 +74,7 @@ class PaystackWebhookHandler:
         Args:
             event_data: Webhook event data
         """
-        try:
-            data = event_data.get('data', {})
-            transfer_code = data.get('transfer_code')
-            reference = data.get('reference')
-            amount = data.get('amount', 0) / 100  # Convert from kobo
-            
-            # Find transaction by reference
-            try:
-                transaction_obj = Transaction.objects.get(reference=reference)
-            except Transaction.DoesNotExist:
-                logger.error(f"Transaction not found for reference: {reference}")
-                return
-            
-            # Use database transaction to ensure atomicity
-            with db_transaction.atomic():
-                # Update transaction status
-                transaction_obj.status = 'SUCCESS'
-                transaction_obj.paystack_transaction_id = transfer_code
-                transaction_obj.completed_at = timezone.now()
-                transaction_obj.metadata.update(data)
-                transaction_obj.save()
-                
-                # Create notification
-                Notification.objects.create(
-                    user=transaction_obj.user,
-                    notification_type='WITHDRAWAL_SUCCESS',
-                    title='Withdrawal Successful',
-                    message=f'Your withdrawal of ₦{amount:,.2f} was successful',
-                    related_transaction=transaction_obj,
-                )
-            
-            logger.info(f"Withdrawal processed: {reference}")
-            
-        except Exception as e:
-            logger.error(f"Error handling transfer.success: {e}", exc_info=True)
+        self._settle_transfer(event_data, 'SUCCESS')
     
     def handle_transfer_failed(self, event_data):
         """
@@ -122,43 +83,7 @@ class PaystackWebhookHandler:
         Args:
             event_data: Webhook event data
         """
-        try:
-            data = event_data.get('data', {})
-            reference = data.get('reference')
-            reason = data.get('reason', 'Transfer failed')
-            
-            # Find transaction by reference
-            try:
-                transaction_obj = Transaction.objects.get(reference=reference)
-            except Transaction.DoesNotExist:
-                logger.error(f"Transaction not found for reference: {reference}")
-                return
-            
-            # Use database transaction to ensure atomicity
-            with db_transaction.atomic():
-                # Reverse balance if not already reversed
-                if transaction_obj.status == 'PENDING':
-                    self._add_balance(transaction_obj.user, transaction_obj.amount, transaction_obj.reference)
-                
-                # Update transaction status
-                transaction_obj.status = 'FAILED'
-                transaction_obj.completed_at = timezone.now()
-                transaction_obj.metadata.update({'failure_reason': reason})
-                transaction_obj.save()
-                
-                # Create notification
-                Notification.objects.create(
-                    user=transaction_obj.user,
-                    notification_type='WITHDRAWAL_FAILED',
-                    title='Withdrawal Failed',
-                    message=f'Your withdrawal of ₦{transaction_obj.amount:,.2f} failed: {reason}',
-                    related_transaction=transaction_obj,
-                )
-            
-            logger.info(f"Withdrawal failed: {reference} - {reason}")
-            
-        except Exception as e:
-            logger.error(f"Error handling transfer.failed: {e}", exc_info=True)
+        self._settle_transfer(event_data, 'FAILED')
     
     def handle_transfer_reversed(self, event_data):
         """
@@ -167,41 +92,31 @@ class PaystackWebhookHandler:
         Args:
             event_data: Webhook event data
         """
+        self._settle_transfer(event_data, 'REVERSED')
+    
+    def _settle_transfer(self, event_data, new_status):
+        """
+        Settle the withdrawal a transfer.* event is about.
+        
+        settle_withdrawal locks the row and changes its status conditionally,
+        so redelivered events and a payout batch settling the same transfer
+        refund it at most once.
+        """
+        event_type = event_data.get('event') or f"transfer.{new_status.lower()}"
         try:
             data = event_data.get('data', {})
             reference = data.get('reference')
             
-            # Find transaction by reference
-            try:
-                transaction_obj = Transaction.objects.get(reference=reference)
-            except Transaction.DoesNotExist:
+            transaction_id = Transaction.objects.filter(reference=reference).values_list('pk', flat=True).first()
+            if transaction_id is None:
                 logger.error(f"Transaction not found for reference: {reference}")
                 return
             
-            # Use database transaction to ensure atomicity
-            with db_transaction.atomic():
-                # Reverse balance
-                self._add_balance(transaction_obj.user, transaction_obj.amount, transaction_obj.reference)
-                
-                # Update transaction status
-                transaction_obj.status = 'REVERSED'
-                transaction_obj.completed_at = timezone.now()
-                transaction_obj.metadata.update(data)
-                transaction_obj.save()
-                
-                # Create notification
-                Notification.objects.create(
-                    user=transaction_obj.user,
-                    notification_type='WITHDRAWAL_REVERSED',
-                    title='Withdrawal Reversed',
-                    message=f'Your withdrawal of ₦{transaction_obj.amount:,.2f} was reversed',
-                    related_transaction=transaction_obj,
-                )
-            
-            logger.info(f"Withdrawal reversed: {reference}")
+            if settle_withdrawal(transaction_id, new_status, event_type, data, reason=data.get('reason')):
+                logger.info(f"Withdrawal {new_status.lower()}: {reference}")
             
         except Exception as e:
-            logger.error(f"Error handling transfer.reversed: {e}", exc_info=True)
+            logger.error(f"Error handling {event_type}: {e}", exc_info=True)
     
     def handle_dva_assigned(self, event_data):
         """
@@ -212,11 +127,13 @@ class PaystackWebhookHandler:
         """
         try:
             data = event_data.get('data', {})
-            customer_email = data.get('customer', {}).get('email')
+            customer = data.get('customer', {})
+            customer_email = customer.get('email')
             dedicated_account = data.get('dedicated_account', {})
             
             # Find user by email
             from django.contrib.auth import get_user_model
+            from apps.payments.services.dva_provisioning import save_customer, mark_provisioning_completed
             User = get_user_model()
             
             try:
@@ -227,11 +144,14 @@ class PaystackWebhookHandler:
             
             # Use database transaction to ensure atomicity
             with db_transaction.atomic():
+                if customer.get('customer_code'):
+                    save_customer(user, customer['customer_code'], customer.get('id'))
+                
                 # Create or update DVA
                 dva, created = DedicatedVirtualAccount.objects.update_or_create(
                     user=user,
                     defaults={
-                        'paystack_customer_id': str(data.get('customer', {}).get('id', '')),
+                        'paystack_customer_id': str(customer.get('id', '')),
                         'account_number': dedicated_account.get('account_number', ''),
                         'bank_name': dedicated_account.get('bank', {}).get('name', ''),
                         'bank_slug': dedicated_account.get('bank', {}).get('slug', ''),
@@ -240,14 +160,17 @@ class PaystackWebhookHandler:
                     }
                 )
                 
-                # Create notification
-                Notification.objects.create(
-                    user=user,
-                    notification_type='DVA_CREATED',
-                    title='Dedicated Account Created',
-                    message=f'Your dedicated account {dva.account_number} has been created at {dva.bank_name}',
-                    metadata={'account_number': dva.account_number, 'bank_name': dva.bank_name}
-                )
+                # Create notification (the provisioning fallback check may have synced it first)
+                if created:
+                    enqueue_notification(
+                        user=user,
+                        notification_type='DVA_CREATED',
+                        title='Dedicated Account Created',
+                        message=f'Your dedicated account {dva.account_number} has been created at {dva.bank_name}',
+                        metadata={'account_number': dva.account_number, 'bank_name': dva.bank_name}
+                    )
+                
+                mark_provisioning_completed(user)
             
             logger.info(f"DVA assigned: {dva.account_number} for user {user.email}")
             
@@ -270,110 +193,13 @@ class PaystackWebhookHandler:
             'dedicatedaccount.assign.success': self.handle_dva_assigned,
         }
         
+        if event_type.startswith('transfer.'):
+            # A cached verify_transfer response may predate this event
+            data = event_data.get('data', {})
+            PaystackClient.forget_transfer(data.get('reference'), data.get('transfer_code'))
+        
         handler = handlers.get(event_type)
         if handler:
             handler(event_data)
         else:
             logger.warning(f"Unhandled webhook event type: {event_type}")
-    
-    def _handle_charge_success_sync(self, event_data):
-        """
-        Fallback synchronous handler for charge.success webhook event.
-        Used when Celery is unavailable.
-        
-        Args:
-            event_data: Webhook event data
-        """
-        try:
-            data = event_data.get('data', {})
-            reference = data.get('reference')
-            amount = data.get('amount', 0) / 100  # Convert from kobo
-            customer_email = data.get('customer', {}).get('email')
-            channel = data.get('channel')
-            
-            # Find user by email
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            
-            try:
-                user = User.objects.get(email=customer_email)
-            except User.DoesNotExist:
-                logger.error(f"User not found for email: {customer_email}")
-                return
-            
-            # Use database transaction to ensure atomicity
-            with db_transaction.atomic():
-                # Check if transaction already exists
-                transaction_obj, created = Transaction.objects.get_or_create(
-                    paystack_reference=reference,
-                    defaults={
-                        'user': user,
-                        'transaction_type': 'DEPOSIT',
-                        'status': 'SUCCESS',
-                        'payment_method': 'DVA' if channel == 'dedicated_nuban' else 'BANK_TRANSFER',
-                        'amount': Decimal(str(amount)),
-                        'fee': Decimal('0.00'),
-                        'net_amount': Decimal(str(amount)),
-                        'reference': reference,
-                        'paystack_transaction_id': str(data.get('id', '')),
-                        'paystack_reference': reference,
-                        'description': f'Deposit via {channel}',
-                        'metadata': data,
-                        'completed_at': timezone.now(),
-                    }
-                )
-                
-                if created:
-                    # Update user balance
-                    self._add_balance(user, Decimal(str(amount)), transaction_obj.reference)
-                    
-                    # Create notification
-                    Notification.objects.create(
-                        user=user,
-                        notification_type='DEPOSIT_RECEIVED',
-                        title='Deposit Received',
-                        message=f'You received ₦{amount:,.2f} via {channel}',
-                        related_transaction=transaction_obj,
-                        metadata={'channel': channel}
-                    )
-                    
-                    logger.info(f"Deposit processed synchronously: {reference} for user {user.email}")
-                else:
-                    logger.info(f"Transaction already exists: {reference}")
-                
-        except Exception as e:
-            logger.error(f"Error handling charge.success synchronously: {e}", exc_info=True)
-    
-    def _add_balance(self, user, amount, reference):
-        """
-        Add balance to user profile atomically.
-        
-        Args:
-            user: User instance
-            amount: Amount to add
-            reference: Transaction reference for logging
-        """
-        from django.db.models import F
-        
-        try:
-            if user.user_type == 'USER':
-                profile = user.user_profile
-            elif user.user_type == 'COURIER':
-                profile = user.courier_profile
-            else:
-                logger.error(f"Unknown user type: {user.user_type}")
-                return
-            
-            # Atomic balance update
-            profile.__class__.objects.filter(pk=profile.pk).update(
-                balance=F('balance') + Decimal(str(amount)).quantize(Decimal('0.01'))
-            )
-            
-            # Refresh from database
-            profile.refresh_from_db()
-            
-            logger.info(f"Balance updated for {user.email}: +₦{amount:,.2f} (Reference: {reference})")
-            
-        except Exception as e:
-            logger.error(f"Error updating balance for {user.email}: {e}", exc_info=True)
-
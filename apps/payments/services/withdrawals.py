@@ -0,0 +1,157 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.payments.models import Transaction
+from apps.payments.services.outbox import enqueue_notification
+from apps.payments.services.payloads import record_payload
+from apps.core.utils import add_balance
+
+logger = logging.getLogger(__name__)
+
+# Statuses a withdrawal can still move out of into each settled status. A
+# withdrawal is refunded when it becomes FAILED or REVERSED, and those are
+# never left again, so it is refunded at most once.
+_SETTLE_FROM = {
+    'SUCCESS': ('PENDING', 'PROCESSING'),
+    'FAILED': ('PENDING', 'PROCESSING'),
+    'REVERSED': ('PENDING', 'PROCESSING', 'SUCCESS'),
+}
+
+# Paystack transfer statuses that settle a withdrawal
+SETTLED_TRANSFER_STATUSES = {
+    'success': 'SUCCESS',
+    'failed': 'FAILED',
+    'reversed': 'REVERSED',
+}
+
+_NOTIFICATIONS = {
+    'SUCCESS': ('WITHDRAWAL_SUCCESS', 'Withdrawal Successful', 'Your withdrawal of ₦{amount:,.2f} was successful'),
+    'FAILED': ('WITHDRAWAL_FAILED', 'Withdrawal Failed', 'Your withdrawal of ₦{amount:,.2f} failed: {reason}'),
+    'REVERSED': ('WITHDRAWAL_REVERSED', 'Withdrawal Reversed', 'Your withdrawal of ₦{amount:,.2f} was reversed'),
+}
+
+
+def withdrawal_sweep_min_age():
+    """Seconds a PENDING withdrawal is left alone before it is looked up on Paystack"""
+    return getattr(settings, 'WITHDRAWAL_SWEEP_MIN_AGE', 600)
+
+
+def settle_withdrawal(transaction_id, new_status, source, paystack_data=None, reason=None, notify=True):
+    """
+    Move a withdrawal to SUCCESS, FAILED or REVERSED, refunding it if it failed or was reversed.
+
+    The row is locked and its status changed with a conditional UPDATE, so
+    webhook redeliveries, the pending-withdrawal sweep and courier payout
+    batches cannot settle the same withdrawal twice; only the call whose
+    UPDATE changed the row refunds and notifies.
+
+    Args:
+        transaction_id: Primary key of the WITHDRAWAL Transaction
+        new_status: 'SUCCESS', 'FAILED' or 'REVERSED'
+        source: Where the outcome came from, e.g. 'transfer.failed' or 'verify'
+        paystack_data: Paystack transfer data to archive, if any
+        reason: Failure reason shown to the user
+        notify: Whether to notify the user (not needed when they are told in the response)
+
+    Returns:
+        bool: True if this call settled the withdrawal
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        transaction_obj = Transaction.objects.select_for_update(of=('self',)).select_related('user').filter(
+            pk=transaction_id
+        ).first()
+        if transaction_obj is None:
+            return False
+
+        updated = Transaction.objects.filter(
+            pk=transaction_id,
+            status__in=_SETTLE_FROM[new_status],
+        ).update(status=new_status, completed_at=now, updated_at=now)
+        if not updated:
+            logger.info(f"Withdrawal {transaction_obj.reference} already {transaction_obj.status}; ignoring {source}")
+            return False
+
+        # Saved with the status loaded under the lock, so the daily rollup sees the transition
+        transaction_obj.status = new_status
+        transaction_obj.completed_at = now
+        if paystack_data:
+            if paystack_data.get('transfer_code'):
+                transaction_obj.paystack_transaction_id = paystack_data['transfer_code']
+            record_payload(transaction_obj, source, paystack_data)
+        if new_status == 'FAILED':
+            reason = reason or 'Transfer failed'
+            transaction_obj.metadata['failure_reason'] = reason
+        transaction_obj.save()
+
+        if new_status in ('FAILED', 'REVERSED'):
+            add_balance(transaction_obj.user, transaction_obj.amount, transaction_obj.reference)
+
+        if notify:
+            notification_type, title, message = _NOTIFICATIONS[new_status]
+            enqueue_notification(
+                user=transaction_obj.user,
+                notification_type=notification_type,
+                title=title,
+                message=message.format(amount=transaction_obj.amount, reason=reason),
+                related_transaction=transaction_obj,
+            )
+
+    logger.info(f"Withdrawal {transaction_obj.reference} settled as {new_status} via {source}")
+    return True
+
+
+def sync_pending_withdrawal(transaction_obj, paystack_client):
+    """
+    Look up a PENDING withdrawal on Paystack by its reference and settle it.
+
+    Used for withdrawals whose create_transfer call timed out or failed
+    without a definite answer. A transfer Paystack has never heard of was
+    not made and is failed and refunded; one still in flight is left for
+    its webhook or the next sweep.
+
+    Args:
+        transaction_obj: PENDING WITHDRAWAL Transaction
+        paystack_client: PaystackClient to look the transfer up with
+
+    Returns:
+        str: The withdrawal's new status, or None if it is still unsettled
+    """
+    response = paystack_client.verify_transfer(transaction_obj.reference)
+    data = response.get('data') or {}
+
+    if response.get('status'):
+        new_status = SETTLED_TRANSFER_STATUSES.get(str(data.get('status', '')).lower())
+        if new_status is None:
+            if data.get('transfer_code') and not transaction_obj.paystack_transaction_id:
+                Transaction.objects.filter(pk=transaction_obj.pk).update(
+                    paystack_transaction_id=data['transfer_code'],
+                    paystack_reference=data.get('reference') or transaction_obj.reference,
+                )
+            return None
+        settled = settle_withdrawal(transaction_obj.pk, new_status, 'verify', data, reason=data.get('reason'))
+    elif response.get('http_status') == 404:
+        settled = settle_withdrawal(transaction_obj.pk, 'FAILED', 'verify', reason='Not accepted by Paystack')
+        new_status = 'FAILED'
+    else:
+        logger.warning(
+            f"Could not look up withdrawal {transaction_obj.reference}: {response.get('message', 'Unknown error')}"
+        )
+        return None
+
+    return new_status if settled else None
+
+
+def pending_withdrawals(now=None):
+    """PENDING wallet withdrawals old enough to be looked up on Paystack"""
+    now = now or timezone.now()
+    return Transaction.objects.filter(
+        transaction_type='WITHDRAWAL',
+        status='PENDING',
+        payout_batch__isnull=True,
+        created_at__lt=now - timedelta(seconds=withdrawal_sweep_min_age()),
+    ).order_by('created_at')
@@ -1,14 +1,15 @@
 from celery import shared_task
 from django.db import transaction as db_transaction
-from django.db.models import Q, F
+from django.db.models import F, Count
 from django.utils import timezone
 from django.conf import settings
-from decimal import Decimal
 import logging
 
-from apps.payments.models import Transaction, Notification
+from apps.payments.models import Transaction, Notification, NotificationCounter, VelocityCounter
 from apps.payments.services.paystack_client import PaystackClient
-from apps.accounts.models import UserProfile, CourierProfile
+from apps.payments.services.paystack_governor import BACKGROUND
+from apps.core.utils import invalidate_cached_balance
+from apps.core.money import Money, ZERO
 
 logger = logging.getLogger(__name__)
 
@@ -21,11 +22,11 @@ def process_dva_deposit(self, event_data):
     This task:
     1. Extracts transaction data from webhook
     2. Finds user by email/customer_code
-    3. Checks for duplicate transactions (idempotency)
-    4. Creates Transaction record
-    5. Adds balance to user profile atomically
-    6. Creates notification
-    7. Logs the transaction
+    3. Inserts the Transaction record, skipping references already
+       recorded (idempotency)
+    4. Adds balance to user profile atomically
+    5. Creates notification
+    6. Logs the transaction
     
     Args:
         event_data: Paystack webhook event data containing transaction details
@@ -36,7 +37,7 @@ def process_dva_deposit(self, event_data):
     try:
         data = event_data.get('data', {})
         reference = data.get('reference')
-        amount = data.get('amount', 0) / 100  # Convert from kobo to NGN
+        amount = Money.from_kobo(data.get('amount', 0))
         customer_email = data.get('customer', {}).get('email')
         channel = data.get('channel', '')
         paystack_transaction_id = str(data.get('id', ''))
@@ -48,6 +49,8 @@ def process_dva_deposit(self, event_data):
         
         # Find user by email
         from django.contrib.auth import get_user_model
+        from apps.payments.services.deposits import insert_deposit_transactions
+        from apps.payments.services.payloads import archive_payloads, summarize_payload
         User = get_user_model()
         
         try:
@@ -59,40 +62,33 @@ def process_dva_deposit(self, event_data):
         
         # Use database transaction to ensure atomicity
         with db_transaction.atomic():
-            # Check if transaction already exists (idempotency check)
-            # Note: select_for_update() doesn't work with exists(), so we use get() in a try-except
-            try:
-                existing_transaction = Transaction.objects.select_for_update().get(
-                    Q(reference=reference) | Q(paystack_reference=reference)
-                )
-                logger.info(f"Transaction already exists: {reference} (Status: {existing_transaction.status})")
-                return {
-                    'status': 'skipped',
-                    'message': 'Transaction already processed',
-                    'reference': reference,
-                    'current_status': existing_transaction.status
-                }
-            except Transaction.DoesNotExist:
-                pass  # Transaction doesn't exist, proceed with creation
-            
             # Determine payment method
             payment_method = 'DVA' if channel == 'dedicated_nuban' else 'BANK_TRANSFER'
             
-            # Create transaction record
-            transaction_obj = Transaction.objects.create(
+            # Insert the transaction record, or skip it if the reference was
+            # already recorded (idempotency check without row locks)
+            transaction_obj = Transaction(
                 user=user,
                 transaction_type='DEPOSIT',
                 status='PENDING',  # Will be updated to SUCCESS after balance update
                 payment_method=payment_method,
-                amount=Decimal(str(amount)),
-                fee=Decimal('0.00'),
-                net_amount=Decimal(str(amount)),
+                amount=amount,
+                fee=ZERO,
+                net_amount=amount,
                 reference=reference,
                 paystack_transaction_id=paystack_transaction_id,
                 paystack_reference=reference,
                 description=f'Deposit via {channel}',
-                metadata=data,
+                metadata=summarize_payload(data),
             )
+            if not insert_deposit_transactions([transaction_obj]):
+                logger.info(f"Transaction already exists: {reference}")
+                return {
+                    'status': 'skipped',
+                    'message': 'Transaction already processed',
+                    'reference': reference,
+                }
+            archive_payloads([(transaction_obj, 'charge.success', data)])
             
             # Add balance to user profile atomically
             try:
@@ -108,7 +104,7 @@ def process_dva_deposit(self, event_data):
                 updated = profile.__class__.objects.filter(
                     pk=profile.pk
                 ).update(
-                    balance=F('balance') + Decimal(str(amount)).quantize(Decimal('0.01'))
+                    balance=F('balance') + amount.kobo
                 )
                 
                 if updated != 1:
@@ -116,6 +112,7 @@ def process_dva_deposit(self, event_data):
                 
                 # Refresh from database
                 profile.refresh_from_db()
+                invalidate_cached_balance(user.pk)
                 
                 # Update transaction status to SUCCESS
                 transaction_obj.status = 'SUCCESS'
@@ -141,9 +138,9 @@ def process_dva_deposit(self, event_data):
                     'status': 'success',
                     'message': 'Deposit processed successfully',
                     'reference': reference,
-                    'amount': float(amount),
+                    'amount': str(amount),
                     'user_email': user.email,
-                    'new_balance': float(profile.balance)
+                    'new_balance': str(profile.balance)
                 }
                 
             except Exception as e:
@@ -160,99 +157,191 @@ def process_dva_deposit(self, event_data):
 
 
 @shared_task
-def verify_dva_transaction(reference):
+def process_dva_deposit_batch():
     """
-    Verify a DVA transaction by calling Paystack API.
+    Drain queued charge.success events in batches.
     
-    This task can be used to verify transaction status
-    if webhook processing fails or needs verification.
+    Webhooks store deposits as DepositEvent rows and schedule this task; it
+    keeps taking batches of DVA_DEPOSIT_BATCH_SIZE events until the queue is
+    empty or DVA_DEPOSIT_MAX_BATCHES_PER_RUN is reached. Also runs every
+    minute from beat as a safety net.
+    """
+    from apps.payments.services.deposits import DepositBatchProcessor
+    
+    try:
+        processor = DepositBatchProcessor()
+        totals = {'batches': 0, 'claimed': 0, 'processed': 0, 'duplicates': 0, 'deferred': 0, 'failed': 0}
+        
+        for _ in range(getattr(settings, 'DVA_DEPOSIT_MAX_BATCHES_PER_RUN', 50)):
+            summary = processor.process_batch()
+            if not summary['claimed']:
+                break
+            totals['batches'] += 1
+            for key, value in summary.items():
+                totals[key] += value
+            if summary['claimed'] < processor.batch_size:
+                break
+        
+        return {'status': 'success', **totals}
+    
+    except Exception as e:
+        logger.error(f"Error draining DVA deposit events: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def relay_outbox_events():
+    """
+    Publish pending outbox events in batches.
+
+    Scheduled once per OUTBOX_RELAY_WINDOW after a transaction records events,
+    and every minute from beat as a safety net. Keeps taking batches of
+    OUTBOX_BATCH_SIZE events until none are due or OUTBOX_MAX_BATCHES_PER_RUN
+    is reached.
+    """
+    from apps.payments.services.outbox import OutboxRelay
+
+    try:
+        relay = OutboxRelay()
+        totals = {'batches': 0, 'claimed': 0, 'published': 0, 'coalesced': 0, 'retried': 0, 'failed': 0}
+
+        for _ in range(getattr(settings, 'OUTBOX_MAX_BATCHES_PER_RUN', 50)):
+            summary = relay.relay_batch()
+            if not summary['claimed']:
+                break
+            totals['batches'] += 1
+            for key, value in summary.items():
+                totals[key] += value
+            if summary['claimed'] < relay.batch_size:
+                break
+
+        return {'status': 'success', **totals}
+
+    except Exception as e:
+        logger.error(f"Error relaying outbox events: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task(bind=True)
+def verify_dva_transaction(self, reference, attempt=1):
+    """
+    Verify a pending deposit by calling Paystack API.
+    
+    Scheduled with a countdown when initialize_payment creates a PENDING
+    deposit. While Paystack has not settled the payment the task schedules
+    itself again with a doubling delay, up to DEPOSIT_VERIFY_MAX_ATTEMPTS;
+    deposits still pending after that are left to the sync sweep.
     
     Args:
         reference: Transaction reference to verify
+        attempt: 1-based number of this check in the chain
         
     Returns:
         dict: Verification result
     """
+    from apps.payments.services.deposits import settle_pending_deposit
+    
     try:
-        paystack_client = PaystackClient()
+        transaction_obj = Transaction.objects.filter(reference=reference).only('pk', 'status').first()
+        if transaction_obj is None:
+            logger.warning(f"Transaction not found in database: {reference}")
+            return {'status': 'error', 'message': 'Transaction not found'}
+        
+        if transaction_obj.status != 'PENDING':
+            # Settled by the webhook, the verify endpoint or an earlier check
+            return {'status': 'success', 'reference': reference, 'mapped_status': transaction_obj.status}
+        
+        paystack_client = PaystackClient(priority=BACKGROUND)
         response = paystack_client.verify_transaction(reference)
         
         if not response.get('status'):
             logger.warning(f"Transaction verification failed: {reference}")
+            _schedule_next_verification(self, reference, attempt)
             return {'status': 'error', 'message': response.get('message', 'Verification failed')}
         
         transaction_data = response.get('data', {})
         paystack_status = transaction_data.get('status', '').lower()  # Paystack returns lowercase
-        amount = transaction_data.get('amount', 0) / 100
-        
-        # Map Paystack status to our Transaction model status
-        status_mapping = {
-            'success': 'SUCCESS',
-            'failed': 'FAILED',
-            'pending': 'PENDING',
-            'reversed': 'REVERSED',
-        }
-        mapped_status = status_mapping.get(paystack_status, 'PENDING')
         
-        # Find transaction in database
-        try:
-            transaction_obj = Transaction.objects.get(reference=reference)
-            
-            # Update status if different
-            if transaction_obj.status != mapped_status:
-                transaction_obj.status = mapped_status
-                if mapped_status == 'SUCCESS':
-                    transaction_obj.completed_at = timezone.now()
-                transaction_obj.save()
-                
-                logger.info(f"Transaction {reference} status updated to {mapped_status} (Paystack: {paystack_status})")
-            
-            return {
-                'status': 'success',
-                'reference': reference,
-                'paystack_status': paystack_status,
-                'mapped_status': mapped_status,
-                'amount': float(amount)
-            }
-            
-        except Transaction.DoesNotExist:
-            logger.warning(f"Transaction not found in database: {reference}")
-            return {'status': 'error', 'message': 'Transaction not found'}
+        mapped_status = settle_pending_deposit(transaction_obj.pk, transaction_data, sync_method='scheduled_verification')
+        if mapped_status is None:
+            transaction_obj.refresh_from_db(fields=['status'])
+            mapped_status = transaction_obj.status
+            if mapped_status == 'PENDING':
+                _schedule_next_verification(self, reference, attempt)
+        
+        return {
+            'status': 'success',
+            'reference': reference,
+            'paystack_status': paystack_status,
+            'mapped_status': mapped_status,
+            'attempt': attempt,
+        }
         
     except Exception as e:
         logger.error(f"Error verifying transaction {reference}: {e}", exc_info=True)
+        _schedule_next_verification(self, reference, attempt)
         return {'status': 'error', 'message': str(e)}
 
 
+def _schedule_next_verification(task, reference, attempt):
+    from apps.payments.services.deposits import deposit_verification_delay
+    
+    if task.request.is_eager:
+        # Eager tasks ignore the countdown; the sweep verifies the deposit
+        # once it is deposit_sweep_min_age() old
+        return
+    if attempt >= getattr(settings, 'DEPOSIT_VERIFY_MAX_ATTEMPTS', 6):
+        logger.info(f"Deposit {reference} still pending after {attempt} checks; leaving it to the sweep")
+        return
+    
+    try:
+        task.apply_async(
+            (reference,),
+            {'attempt': attempt + 1},
+            countdown=deposit_verification_delay(attempt + 1)
+        )
+    except Exception as e:
+        logger.error(f"Failed to schedule verification of {reference}: {e}", exc_info=True)
+
+
 @shared_task
 def sync_pending_dva_transactions():
     """
-    Periodic task to sync pending DVA transactions.
+    Periodic safety sweep of pending deposits.
     
     This task:
-    1. Finds transactions in PENDING status older than 30 seconds
+    1. Finds PENDING deposits older than DEPOSIT_SWEEP_MIN_AGE, i.e. ones
+       whose scheduled verification chain has already finished, and younger
+       than DEPOSIT_SWEEP_MAX_AGE. With eager tasks there is no chain, so
+       deposits are picked up after DEPOSIT_VERIFY_DELAY instead
     2. Verifies them with Paystack API
-    3. Updates status accordingly
+    3. Updates status and balance accordingly
     
-    This handles cases where webhooks are missed or delayed.
+    This handles cases where webhooks are missed or delayed and the
+    scheduled verifications did not run or gave up.
     
-    Runs every 10 seconds via Celery Beat.
+    Runs every 10 minutes via Celery Beat.
     """
+    from datetime import timedelta
+    from apps.payments.services.deposits import deposit_sweep_min_age, settle_pending_deposit
+    
     try:
-        from datetime import timedelta
+        now = timezone.now()
+        pending_transactions = list(
+            Transaction.objects.filter(
+                transaction_type='DEPOSIT',
+                status='PENDING',
+                created_at__lt=now - timedelta(seconds=deposit_sweep_min_age()),
+                created_at__gte=now - timedelta(seconds=getattr(settings, 'DEPOSIT_SWEEP_MAX_AGE', 86400)),
+            ).order_by('created_at').only('pk', 'reference')[:getattr(settings, 'DEPOSIT_SWEEP_BATCH_SIZE', 50)]
+        )
         
-        # Find pending transactions older than 30 seconds
-        # This prevents checking very recent transactions that might still be processing
-        cutoff_time = timezone.now() - timedelta(seconds=30)
-        pending_transactions = Transaction.objects.filter(
-            transaction_type='DEPOSIT',
-            status='PENDING',
-            created_at__lt=cutoff_time
-        )[:50]  # Process max 50 at a time
+        if not pending_transactions:
+            return {'status': 'success', 'synced_count': 0, 'total_checked': 0}
         
-        logger.info(f"Syncing {pending_transactions.count()} pending transactions")
+        logger.info(f"Syncing {len(pending_transactions)} pending transactions")
         
-        paystack_client = PaystackClient()
+        paystack_client = PaystackClient(priority=BACKGROUND)
         synced_count = 0
         
         for transaction in pending_transactions:
@@ -261,70 +350,16 @@ def sync_pending_dva_transactions():
                 response = paystack_client.verify_transaction(transaction.reference)
                 
                 if response.get('status'):
-                    transaction_data = response.get('data', {})
-                    paystack_status = transaction_data.get('status', '').lower()  # Paystack returns lowercase
-                    
-                    # Map Paystack status to our Transaction model status
-                    status_mapping = {
-                        'success': 'SUCCESS',
-                        'failed': 'FAILED',
-                        'pending': 'PENDING',
-                        'reversed': 'REVERSED',
-                    }
-                    mapped_status = status_mapping.get(paystack_status, 'PENDING')
-                    
-                    if mapped_status == 'SUCCESS' and transaction.status == 'PENDING':
-                        # Transaction was successful, update it
-                        with db_transaction.atomic():
-                            # Check again to avoid race condition
-                            transaction.refresh_from_db()
-                            if transaction.status != 'PENDING':
-                                logger.info(f"Transaction {transaction.reference} already processed, skipping")
-                                continue
-                            
-                            # Re-process the transaction
-                            amount = Decimal(str(transaction_data.get('amount', 0) / 100))
-                            
-                            # Add balance
-                            user = transaction.user
-                            if user.user_type == 'USER':
-                                profile = user.user_profile
-                            elif user.user_type == 'COURIER':
-                                profile = user.courier_profile
-                            else:
-                                continue
-                            
-                            profile.__class__.objects.filter(pk=profile.pk).update(
-                                balance=F('balance') + amount.quantize(Decimal('0.01'))
-                            )
-                            
-                            # Update transaction
-                            transaction.status = 'SUCCESS'
-                            transaction.completed_at = timezone.now()
-                            transaction.metadata.update({'sync_method': 'periodic_sync'})
-                            transaction.save()
-                            
-                            # Create notification if not exists
-                            if not Notification.objects.filter(
-                                related_transaction=transaction,
-                                notification_type='DEPOSIT_RECEIVED'
-                            ).exists():
-                                Notification.objects.create(
-                                    user=user,
-                                    notification_type='DEPOSIT_RECEIVED',
-                                    title='Deposit Received',
-                                    message=f'You received ₦{amount:,.2f}',
-                                    related_transaction=transaction,
-                                    metadata={'sync_method': 'periodic_sync'}
-                                )
-                            
-                            synced_count += 1
-                            logger.info(f"Synced transaction {transaction.reference} via periodic sync")
-                            
-                    elif mapped_status == 'FAILED':
-                        transaction.status = 'FAILED'
-                        transaction.save()
-                        logger.info(f"Transaction {transaction.reference} marked as failed")
+                    mapped_status = settle_pending_deposit(
+                        transaction.pk,
+                        response.get('data', {}),
+                        sync_method='periodic_sync'
+                    )
+                    if mapped_status == 'SUCCESS':
+                        synced_count += 1
+                        logger.info(f"Synced transaction {transaction.reference} via periodic sync")
+                    elif mapped_status:
+                        logger.info(f"Transaction {transaction.reference} marked as {mapped_status.lower()}")
                         
             except Exception as e:
                 logger.error(f"Error syncing transaction {transaction.reference}: {e}", exc_info=True)
@@ -334,10 +369,379 @@ def sync_pending_dva_transactions():
         return {
             'status': 'success',
             'synced_count': synced_count,
-            'total_checked': pending_transactions.count()
+            'total_checked': len(pending_transactions)
         }
         
     except Exception as e:
         logger.error(f"Error in periodic sync task: {e}", exc_info=True)
         return {'status': 'error', 'message': str(e)}
 
+
+@shared_task
+def sync_pending_withdrawals():
+    """
+    Periodic sweep of withdrawals whose Paystack outcome is unknown.
+    
+    create_transfer leaves a withdrawal PENDING when its Paystack call timed
+    out or failed without a definite answer. Withdrawals still PENDING after
+    WITHDRAWAL_SWEEP_MIN_AGE (i.e. no webhook settled them) are looked up by
+    reference with verify_transfer: transfers Paystack made are settled, and
+    ones it has never heard of are failed and refunded.
+    
+    Runs every 10 minutes via Celery Beat.
+    """
+    from apps.payments.services.withdrawals import pending_withdrawals, sync_pending_withdrawal
+    
+    try:
+        withdrawals = list(
+            pending_withdrawals().only('pk', 'reference', 'paystack_transaction_id')[
+                :getattr(settings, 'WITHDRAWAL_SWEEP_BATCH_SIZE', 50)
+            ]
+        )
+        
+        paystack_client = PaystackClient(priority=BACKGROUND)
+        settled = 0
+        for transaction_obj in withdrawals:
+            try:
+                if sync_pending_withdrawal(transaction_obj, paystack_client):
+                    settled += 1
+            except Exception as e:
+                logger.error(f"Error syncing withdrawal {transaction_obj.reference}: {e}", exc_info=True)
+        
+        if withdrawals:
+            logger.info(f"Withdrawal sync completed: {settled} of {len(withdrawals)} settled")
+        return {'status': 'success', 'settled_count': settled, 'total_checked': len(withdrawals)}
+    
+    except Exception as e:
+        logger.error(f"Error in withdrawal sync task: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def reconcile_notification_counters(chunk_size=1000):
+    """
+    Periodic task to reconcile unread notification counters.
+    
+    Corrects any counter that has drifted (e.g. notifications deleted or
+    bulk-updated outside the counted paths). Users with unread notifications
+    but no counter get an empty one first. Counters are then locked a chunk
+    at a time before their notifications are counted, so an increment
+    committed before the lock is part of the count and one made after it
+    waits and lands on the corrected value.
+    
+    Runs hourly via Celery Beat.
+    """
+    try:
+        missing_user_ids = list(
+            Notification.objects.filter(is_read=False)
+            .exclude(user_id__in=NotificationCounter.objects.values('user_id'))
+            .values_list('user_id', flat=True)
+            .distinct()
+            .order_by()
+        )
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in missing_user_ids],
+            batch_size=chunk_size,
+            ignore_conflicts=True,
+        )
+        
+        user_ids = list(NotificationCounter.objects.order_by('user_id').values_list('user_id', flat=True))
+        corrected = 0
+        for offset in range(0, len(user_ids), chunk_size):
+            corrected += _reconcile_counter_chunk(user_ids[offset:offset + chunk_size])
+        
+        logger.info(
+            f"Notification counter reconciliation: {corrected} corrected, "
+            f"{len(missing_user_ids)} created"
+        )
+        return {'status': 'success', 'corrected': corrected, 'created': len(missing_user_ids)}
+    
+    except Exception as e:
+        logger.error(f"Error reconciling notification counters: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+def _reconcile_counter_chunk(user_ids):
+    """Recount the unread notifications of locked counters; returns how many were corrected"""
+    with db_transaction.atomic():
+        counters = list(
+            NotificationCounter.objects.select_for_update()
+            .filter(user_id__in=user_ids)
+            .order_by('user_id')
+            .only('user_id', 'unread_count')
+        )
+        actual_counts = dict(
+            Notification.objects.filter(user_id__in=user_ids, is_read=False)
+            .values('user_id')
+            .annotate(unread=Count('id'))
+            .order_by()
+            .values_list('user_id', 'unread')
+        )
+        
+        now = timezone.now()
+        stale_counters = []
+        for counter in counters:
+            actual = actual_counts.get(counter.user_id, 0)
+            if counter.unread_count != actual:
+                counter.unread_count = actual
+                counter.updated_at = now
+                stale_counters.append(counter)
+        
+        NotificationCounter.objects.bulk_update(stale_counters, ['unread_count', 'updated_at'])
+    return len(stale_counters)
+
+
+@shared_task
+def purge_expired_velocity_counters():
+    """
+    Periodic task to delete velocity counters of windows that have passed.
+    
+    A counter is keyed by its window and no longer read once the following
+    window ends; this keeps the table small.
+    
+    Runs daily via Celery Beat.
+    """
+    try:
+        deleted, _ = VelocityCounter.objects.filter(expires_at__lte=timezone.now()).delete()
+        logger.info(f"Purged {deleted} expired velocity counters")
+        return {'status': 'success', 'deleted': deleted}
+    except Exception as e:
+        logger.error(f"Error purging velocity counters: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def settle_courier_earnings():
+    """
+    Nightly task to credit couriers for delivered orders.
+    
+    Runs before process_courier_payouts so the same night's earnings are
+    included in the payout batch.
+    """
+    from apps.payments.services.settlement import CourierSettlementService
+    
+    try:
+        summary = CourierSettlementService().settle()
+        if summary is None:
+            return {'status': 'success', 'orders': 0}
+        summary['total_amount'] = str(summary['total_amount'])
+        return {'status': 'success', **summary}
+    
+    except Exception as e:
+        logger.error(f"Error settling courier earnings: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def process_courier_payouts():
+    """
+    Nightly task to pay out courier earnings through Paystack bulk transfers.
+    
+    Sweeps eligible courier balances into a payout batch, then submits all
+    pending batches (including earlier ones with items left to retry).
+    """
+    from apps.payments.services.payouts import CourierPayoutService
+    
+    try:
+        service = CourierPayoutService()
+        
+        batch = None
+        if getattr(settings, 'COURIER_AUTO_PAYOUT_ENABLED', True):
+            batch = service.queue_payouts()
+        
+        submitted = service.submit_pending_batches()
+        
+        return {
+            'status': 'success',
+            'queued_batch': batch.reference if batch else None,
+            'submitted_batches': [submitted_batch.reference for submitted_batch in submitted],
+        }
+    
+    except Exception as e:
+        logger.error(f"Error processing courier payouts: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def reconcile_paystack_records():
+    """
+    Nightly task to compare recent Paystack transactions and transfers with ours.
+    
+    Covers the last PAYSTACK_RECONCILIATION_LOOKBACK_HOURS, so each record is
+    checked on more than one night and a late webhook gets a chance to settle
+    it before the next run. Discrepancies are logged; one that is still
+    there on a later night is remembered in the cache for the lookback
+    period and not logged again. Run the reconcile_paystack command for a
+    full report over any period.
+    """
+    from datetime import timedelta
+    from django.core.cache import cache
+    from apps.payments.services.reconciliation import PaystackReconciler
+    
+    try:
+        lookback = timedelta(hours=getattr(settings, 'PAYSTACK_RECONCILIATION_LOOKBACK_HOURS', 48))
+        end = timezone.now()
+        start = end - lookback
+        
+        reconciler = PaystackReconciler()
+        already_reported = 0
+        for discrepancy in reconciler.discrepancies(start, end):
+            reported_key = (
+                f"paystack_reconciliation_reported:{discrepancy['kind']}:"
+                f"{discrepancy['reference']}:{discrepancy['type']}"
+            )
+            try:
+                first_report = cache.add(reported_key, 1, timeout=int(lookback.total_seconds()))
+            except Exception as e:
+                logger.warning(f"Reconciliation report cache unavailable: {e}")
+                first_report = True
+            if not first_report:
+                already_reported += 1
+                continue
+            logger.warning(
+                f"Paystack reconciliation: {discrepancy['type']} discrepancy for {discrepancy['kind']} "
+                f"{discrepancy['reference']} (Paystack {discrepancy['paystack_status']} "
+                f"{discrepancy['paystack_amount']}, local {discrepancy['local_status']} {discrepancy['local_amount']})"
+            )
+        
+        logger.info(
+            f"Paystack reconciliation {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}: "
+            f"{dict(reconciler.summary)}, {already_reported} already reported"
+        )
+        return {'status': 'success', **reconciler.summary, 'already_reported': already_reported}
+    
+    except Exception as e:
+        logger.error(f"Error reconciling Paystack records: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def audit_wallet_balances():
+    """
+    Nightly task to check every wallet balance against its transactions.
+    
+    Drifted wallets are logged, not corrected; run the audit_balances command
+    for a full report.
+    """
+    from apps.payments.services.balance_audit import BalanceAuditor
+    
+    try:
+        auditor = BalanceAuditor()
+        for drift in auditor.drifts():
+            logger.warning(
+                f"Balance drift for {drift['user_type']} {drift['user_id']}: balance {drift['balance']}, "
+                f"transactions {drift['expected']} (drift {drift['drift']})"
+            )
+        
+        summary = auditor.summary
+        logger.info(f"Balance audit: {summary['checked']} wallets checked, {summary['drifted']} drifted")
+        return {
+            'status': 'success',
+            'checked': summary['checked'],
+            'drifted': summary['drifted'],
+            'net_drift': str(summary.get('net_drift', ZERO)),
+        }
+    
+    except Exception as e:
+        logger.error(f"Error auditing wallet balances: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def provision_dedicated_account(self, user_id):
+    """
+    Create or sync a user's dedicated virtual account in the background.
+    
+    Claims the user's PENDING DVAProvisioning request and runs the Paystack
+    flow. Failed Paystack calls are retried; once retries are exhausted the
+    request is marked FAILED with the last error.
+    
+    Args:
+        user_id: ID of the user to provision
+    """
+    from apps.payments.models import DVAProvisioning
+    from apps.payments.services.dva_provisioning import DVAProvisioningService
+    
+    claimed = DVAProvisioning.objects.filter(user_id=user_id, status='PENDING').update(
+        status='IN_PROGRESS',
+        attempts=F('attempts') + 1,
+        updated_at=timezone.now()
+    )
+    if not claimed:
+        return {'status': 'skipped', 'message': 'No pending provisioning request'}
+    
+    provisioning = DVAProvisioning.objects.select_related('user').get(user_id=user_id)
+    
+    try:
+        result = DVAProvisioningService().provision(provisioning)
+        return {'status': 'success', 'provisioning_status': result}
+    
+    except Exception as e:
+        # Eager runs (CELERY_TASK_ALWAYS_EAGER) fail straight away so the request sees the error
+        if not self.request.is_eager and self.request.retries < self.max_retries:
+            logger.warning(f"DVA provisioning for user {user_id} failed, retrying: {e}")
+            DVAProvisioning.objects.filter(pk=provisioning.pk).update(
+                status='PENDING',
+                last_error=str(e),
+                updated_at=timezone.now()
+            )
+            raise self.retry(exc=e)
+        
+        logger.error(f"DVA provisioning for user {user_id} failed: {e}", exc_info=True)
+        DVAProvisioning.objects.filter(pk=provisioning.pk).update(
+            status='FAILED',
+            last_error=str(e),
+            updated_at=timezone.now()
+        )
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def check_dva_assignment(user_id, attempt=1):
+    """
+    Poll Paystack for a DVA whose assignment is still awaiting its webhook.
+    
+    The dedicatedaccount.assign.success webhook normally completes the request
+    first; this is the fallback if it is delayed or lost. Re-schedules itself
+    with a growing countdown up to DVA_ASSIGNMENT_MAX_CHECKS times, after
+    which the request goes stale and is restarted by the next DVA call.
+    
+    Args:
+        user_id: ID of the user being provisioned
+        attempt: Check number, starting at 1
+    """
+    from apps.payments.models import DVAProvisioning
+    from apps.payments.services.dva_provisioning import DVAProvisioningService
+    
+    try:
+        provisioning = DVAProvisioning.objects.select_related('user').filter(
+            user_id=user_id,
+            status='AWAITING_WEBHOOK'
+        ).first()
+        if provisioning is None:
+            return {'status': 'skipped', 'message': 'Provisioning no longer awaiting assignment'}
+        
+        user = provisioning.user
+        if user.paystack_customer_code and DVAProvisioningService().sync_existing(user, user.paystack_customer_code):
+            return {'status': 'success', 'provisioning_status': 'COMPLETED'}
+        
+        max_checks = getattr(settings, 'DVA_ASSIGNMENT_MAX_CHECKS', 5)
+        if attempt >= max_checks:
+            # Left to the webhook; a stale request is restarted by the next GET or POST
+            logger.warning(f"DVA for user {user_id} still unassigned after {attempt} checks")
+            return {'status': 'success', 'provisioning_status': 'AWAITING_WEBHOOK', 'attempt': attempt}
+        
+        if check_dva_assignment.app.conf.task_always_eager:
+            # Eager tasks ignore the countdown; leave completion to the webhook
+            # and to the next GET or POST once the request is stale
+            return {'status': 'success', 'provisioning_status': 'AWAITING_WEBHOOK', 'attempt': attempt}
+        
+        check_dva_assignment.apply_async(
+            (user_id, attempt + 1),
+            countdown=getattr(settings, 'DVA_ASSIGNMENT_CHECK_INTERVAL', 15) * (attempt + 1)
+        )
+        return {'status': 'success', 'provisioning_status': 'AWAITING_WEBHOOK', 'attempt': attempt}
+    
+    except Exception as e:
+        logger.error(f"Error checking DVA assignment for user {user_id}: {e}", exc_info=True)
+        return {'status': 'error', 'message': str(e)}
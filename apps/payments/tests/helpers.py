@@ -0,0 +1,42 @@
+from itertools import count
+
+from apps.accounts.models import User, UserProfile, CourierProfile
+from apps.payments.models import Transaction
+from apps.core.money import Money, ZERO
+
+_numbers = count(1)
+
+
+def make_user(user_type='USER', balance='0.00'):
+    """Create a user of user_type with a wallet holding balance (naira)"""
+    number = next(_numbers)
+    user = User.objects.create_user(
+        email=f'{user_type.lower()}{number}@example.com',
+        password='x',
+        phone_number=f'+23480{number:08d}',
+        user_type=user_type,
+    )
+    profile_model = CourierProfile if user_type == 'COURIER' else UserProfile
+    profile_model.objects.create(user=user, full_name=f'{user_type.title()} {number}', balance=Money.from_naira(balance))
+    return user
+
+
+def make_transaction(user, reference, transaction_type='DEPOSIT', status='SUCCESS', amount='100.00', **fields):
+    amount = Money.from_naira(amount)
+    fields.setdefault('payment_method', 'CARD')
+    return Transaction.objects.create(
+        user=user,
+        transaction_type=transaction_type,
+        status=status,
+        amount=amount,
+        fee=ZERO,
+        net_amount=amount,
+        reference=reference,
+        **fields
+    )
+
+
+def wallet_balance(user):
+    """The balance stored on the user's profile row"""
+    profile_model = CourierProfile if user.user_type == 'COURIER' else UserProfile
+    return profile_model.objects.get(user=user).balance
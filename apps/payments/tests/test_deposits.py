@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.payments.models import Transaction, Notification, DailyTransactionSummary, DepositEvent
+from apps.payments.services.deposits import DepositBatchProcessor, insert_deposit_transactions, record_deposit_event
+from apps.payments.tests.helpers import make_user, make_transaction, wallet_balance
+from apps.core.money import Money, ZERO
+
+
+def charge_success(reference, email, kobo=10000):
+    return {
+        'event': 'charge.success',
+        'data': {
+            'reference': reference,
+            'amount': kobo,
+            'status': 'success',
+            'channel': 'dedicated_nuban',
+            'id': 1,
+            'customer': {'email': email},
+        },
+    }
+
+
+class DepositBatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.courier = make_user('COURIER')
+
+    def _record(self, *events):
+        with self.captureOnCommitCallbacks():
+            for event in events:
+                record_deposit_event(event)
+
+    def _process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return DepositBatchProcessor().process_batch()
+
+    def _statuses(self):
+        return dict(DepositEvent.objects.values_list('reference', 'status'))
+
+    def test_batch_credits_each_user_with_their_total(self):
+        self._record(
+            charge_success('REF-1', self.user.email, 10000),
+            charge_success('REF-2', self.user.email, 2550),
+            charge_success('REF-3', self.courier.email, 5000),
+        )
+
+        summary = self._process()
+
+        self.assertEqual((summary['processed'], summary['duplicates']), (3, 0))
+        self.assertEqual(wallet_balance(self.user), Money(12550))
+        self.assertEqual(wallet_balance(self.courier), Money(5000))
+        self.assertEqual(Notification.objects.filter(user=self.user, notification_type='DEPOSIT_RECEIVED').count(), 2)
+        summary_row = DailyTransactionSummary.objects.get(user=self.user, transaction_type='DEPOSIT')
+        self.assertEqual((summary_row.transaction_count, summary_row.total_amount), (2, Money(12550)))
+
+    def test_redelivered_webhook_is_stored_once(self):
+        self._record(charge_success('REF-1', self.user.email), charge_success('REF-1', self.user.email))
+        self._process()
+        self._record(charge_success('REF-1', self.user.email))
+        self._process()
+
+        self.assertEqual(DepositEvent.objects.count(), 1)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(wallet_balance(self.user), Money(10000))
+
+    def test_reference_already_recorded_is_a_duplicate(self):
+        make_transaction(self.user, 'REF-1', amount='100.00', payment_method='DVA')
+        self._record(charge_success('REF-1', self.user.email), charge_success('REF-2', self.user.email))
+
+        summary = self._process()
+
+        self.assertEqual((summary['processed'], summary['duplicates']), (1, 1))
+        self.assertEqual(self._statuses(), {'REF-1': 'DUPLICATE', 'REF-2': 'PROCESSED'})
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(wallet_balance(self.user), Money(10000))
+
+    def test_pending_deposit_is_settled_by_its_webhook(self):
+        pending = make_transaction(self.user, 'REF-1', status='PENDING', amount='100.00')
+        self._record(charge_success('REF-1', self.user.email))
+
+        self._process()
+
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'SUCCESS')
+        self.assertEqual(self._statuses(), {'REF-1': 'PROCESSED'})
+        self.assertEqual(wallet_balance(self.user), Money(10000))
+
+    @override_settings(DVA_DEPOSIT_MAX_ATTEMPTS=2, DVA_DEPOSIT_RETRY_DELAY=0)
+    def test_deposit_for_an_unknown_user_is_retried_then_failed(self):
+        self._record(charge_success('REF-1', 'nobody@example.com'))
+
+        self.assertEqual(self._process()['deferred'], 1)
+        self.assertEqual(self._process()['failed'], 1)
+        self.assertEqual(self._statuses(), {'REF-1': 'FAILED'})
+        self.assertFalse(Transaction.objects.exists())
+
+
+class InsertDepositTransactionsTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+
+    def _deposit(self, reference):
+        return Transaction(
+            user=self.user, transaction_type='DEPOSIT', status='SUCCESS', payment_method='DVA',
+            amount=Money(10000), fee=ZERO, net_amount=Money(10000),
+            reference=reference, paystack_reference=reference,
+        )
+
+    def test_only_rows_this_call_inserted_are_returned(self):
+        now = timezone.now()
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            # Recorded earlier with the same timestamp this call stamps on its rows
+            existing = make_transaction(self.user, 'REF-1', payment_method='DVA')
+            deposits = [self._deposit('REF-1'), self._deposit('REF-2'), self._deposit('REF-2')]
+
+            inserted = insert_deposit_transactions(deposits)
+
+        self.assertEqual(inserted, [deposits[1]])
+        self.assertEqual(Transaction.objects.get(reference='REF-2').pk, deposits[1].pk)
+        self.assertIsNone(deposits[0].pk)
+        self.assertEqual(Transaction.objects.get(reference='REF-2').metadata, {})
+        self.assertEqual(Transaction.objects.get(reference='REF-1').pk, existing.pk)
+        self.assertEqual(Transaction.objects.count(), 2)
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.payments.services import paystack_governor
+from apps.payments.services.paystack_governor import BACKGROUND, INTERACTIVE, PaystackRateGovernor
+
+
+# LocMemCache, as in production: every call goes to the per-process bucket
+@override_settings(
+    PAYSTACK_RATE_LIMIT=40,
+    PAYSTACK_RATE_BURST=4,
+    PAYSTACK_RATE_LOCAL_SHARE=0.25,
+    PAYSTACK_BACKGROUND_RESERVE=0.5,
+    PAYSTACK_INTERACTIVE_MAX_WAIT=0,
+    PAYSTACK_BACKGROUND_MAX_WAIT=0,
+)
+class LocalFallbackTests(SimpleTestCase):
+
+    def setUp(self):
+        patches = (
+            mock.patch.object(paystack_governor, '_local_bucket', paystack_governor._LocalBucket()),
+            mock.patch.dict(paystack_governor._scripts, clear=True),
+            mock.patch('apps.payments.services.paystack_governor.time.monotonic', return_value=1000.0),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.clock = paystack_governor.time.monotonic
+        self.governor = PaystackRateGovernor()
+
+    def _acquire(self, priority, times):
+        return [self.governor.acquire(priority) for _ in range(times)]
+
+    def test_refills_at_the_local_share_of_the_rate(self):
+        with self.assertLogs('apps.payments.services.paystack_governor', 'WARNING') as logs:
+            self.assertEqual(self._acquire(INTERACTIVE, 5), [True, True, True, True, False])
+        self.assertIn('limiting this process to 10 requests/s', logs.output[0])
+
+        # 40/s x 0.25 = one token every 100ms
+        self.clock.return_value += 0.1
+        self.assertEqual(self._acquire(INTERACTIVE, 2), [True, False])
+
+    def test_background_calls_leave_the_reserve_for_interactive_ones(self):
+        self.assertEqual(self._acquire(BACKGROUND, 3), [True, True, False])
+        self.assertEqual(self._acquire(INTERACTIVE, 3), [True, True, False])
+
+    def test_429_drains_the_local_bucket(self):
+        self.governor.throttle()
+
+        self.assertEqual(self._acquire(INTERACTIVE, 1), [False])
+        self.clock.return_value += 0.1
+        self.assertEqual(self._acquire(INTERACTIVE, 1), [True])
+
+    @override_settings(PAYSTACK_RATE_GOVERNOR_ENABLED=False)
+    def test_disabled_governor_never_waits(self):
+        self.governor = PaystackRateGovernor()
+        self.assertEqual(self._acquire(INTERACTIVE, 10), [True] * 10)
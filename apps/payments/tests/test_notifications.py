@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.payments.models import Notification, NotificationCounter
+from apps.payments.tasks import reconcile_notification_counters
+from apps.payments.tests.helpers import make_user
+
+
+class NotificationCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _notify(self, user=None, **fields):
+        return Notification.objects.create(
+            user=user or self.user, notification_type='PAYMENT_SUCCESS', title='Paid', message='Paid', **fields
+        )
+
+    def _unread_count(self):
+        response = self.client.get('/api/v1/payments/notifications/unread-count/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['unread_count']
+
+    def test_counter_follows_creates_and_mark_read(self):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='PAYMENT_SUCCESS', title='Paid', message='Paid')
+            for _ in range(3)
+        ])
+        notification = self._notify()
+        self._notify(is_read=True)
+        self.assertEqual(self._unread_count(), 4)
+
+        self.client.put(f'/api/v1/payments/notifications/{notification.pk}/mark_read/')
+        self.client.put(f'/api/v1/payments/notifications/{notification.pk}/mark_read/')
+        self.assertEqual(self._unread_count(), 3)
+
+        self.client.post('/api/v1/payments/notifications/mark_all_read/')
+        self.assertEqual(self._unread_count(), 0)
+
+    def test_reconcile_corrects_drift_and_creates_missing_counters(self):
+        self._notify()
+        NotificationCounter.objects.filter(user=self.user).update(unread_count=9)
+        other = make_user()
+        Notification.objects.bulk_create([
+            Notification(user=other, notification_type='PAYMENT_SUCCESS', title='Paid', message='Paid')
+        ])
+
+        result = reconcile_notification_counters()
+
+        self.assertEqual((result['corrected'], result['created']), (2, 1))
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread_count, 1)
+        self.assertEqual(NotificationCounter.objects.get(user=other).unread_count, 1)
+
+    def test_increment_during_reconcile_is_kept(self):
+        self._notify()
+        counters = NotificationCounter.objects.select_for_update
+
+        def notify_then_lock(*args, **kwargs):
+            # Committed just before the counters are locked
+            self._notify()
+            return counters(*args, **kwargs)
+
+        with mock.patch.object(NotificationCounter.objects, 'select_for_update', side_effect=notify_then_lock):
+            reconcile_notification_counters()
+
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread_count, 2)
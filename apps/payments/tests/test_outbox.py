@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.db import transaction as db_transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.payments.models import Notification, NotificationCounter, OutboxEvent
+from apps.payments.services.outbox import enqueue_notification, enqueue_task, OutboxRelay
+from apps.payments.tasks import relay_outbox_events
+from apps.payments.tests.helpers import make_user
+
+TASK = 'apps.payments.tasks.provision_dedicated_account'
+
+
+class OutboxRelayTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+
+    def _notify(self, title='Title'):
+        return enqueue_notification(self.user, 'OTHER', title, 'Message')
+
+    def _make_due(self):
+        OutboxEvent.objects.filter(status='PENDING').update(available_at=timezone.now())
+
+    def test_rolled_back_change_records_nothing(self):
+        with self.assertRaises(ValueError):
+            with db_transaction.atomic():
+                self._notify()
+                raise ValueError
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_notifications_are_published_once(self):
+        for index in range(3):
+            self._notify(f'Title {index}')
+
+        first = relay_outbox_events()
+        second = relay_outbox_events()
+
+        self.assertEqual((first['claimed'], first['published']), (3, 3))
+        self.assertEqual(second['claimed'], 0)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(NotificationCounter.get_unread_count(self.user.pk), 3)
+        self.assertFalse(OutboxEvent.objects.exclude(status='PUBLISHED').exists())
+
+    def test_failed_send_is_retried_until_published(self):
+        event = enqueue_task(TASK, args=[self.user.pk])
+        self._notify()
+
+        with mock.patch.object(OutboxRelay, '_send_task', side_effect=RuntimeError('broker down')):
+            summary = OutboxRelay().relay_batch()
+
+        event.refresh_from_db()
+        self.assertEqual((summary['published'], summary['retried']), (1, 1))
+        self.assertEqual((event.status, event.attempts, event.last_error), ('PENDING', 1, 'broker down'))
+        self.assertGreater(event.available_at, timezone.now())
+        # Not due yet, so the next run leaves it alone
+        self.assertEqual(OutboxRelay().relay_batch()['claimed'], 0)
+
+        self._make_due()
+        with mock.patch.object(OutboxRelay, '_send_task') as send:
+            OutboxRelay().relay_batch()
+            OutboxRelay().relay_batch()
+
+        event.refresh_from_db()
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual((event.status, event.last_error), ('PUBLISHED', None))
+        self.assertEqual(Notification.objects.count(), 1)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_send_failing_every_attempt_is_marked_failed(self):
+        event = enqueue_task(TASK, args=[self.user.pk])
+
+        with mock.patch.object(OutboxRelay, '_send_task', side_effect=RuntimeError('broker down')):
+            OutboxRelay().relay_batch()
+            self._make_due()
+            summary = OutboxRelay().relay_batch()
+
+        event.refresh_from_db()
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual((event.status, event.attempts), ('FAILED', 2))
+
+    def test_tasks_sharing_a_coalesce_key_are_sent_once_per_batch(self):
+        for _ in range(3):
+            enqueue_task(TASK, args=[self.user.pk], coalesce_key=f'provision:{self.user.pk}')
+        enqueue_task(TASK, args=[0])
+
+        with mock.patch.object(OutboxRelay, '_send_task') as send:
+            summary = OutboxRelay().relay_batch()
+
+        self.assertEqual((summary['published'], summary['coalesced']), (2, 2))
+        self.assertEqual(send.call_count, 2)
+        self.assertFalse(OutboxEvent.objects.exclude(status='PUBLISHED').exists())
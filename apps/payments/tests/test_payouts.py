@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.payments.models import Transaction, TransferRecipient, PayoutBatch
+from apps.payments.services.payouts import CourierPayoutService
+from apps.payments.services.webhook_handler import PaystackWebhookHandler
+from apps.payments.tests.helpers import make_user, wallet_balance
+from apps.core.money import Money, ZERO
+
+NOT_FOUND = {'status': False, 'message': 'Transfer not found', 'http_status': 404}
+TIMEOUT = {'status': False, 'message': 'Request timeout'}
+
+
+class PayoutTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.couriers = []
+        for index in range(3):
+            courier = make_user('COURIER', balance='1500.00')
+            TransferRecipient.objects.create(
+                user=courier, paystack_recipient_code=f'RCP_{index}', recipient_type='nuban',
+                name='Courier', account_number='0123456789',
+            )
+            self.couriers.append(courier)
+        self.paystack = mock.Mock()
+        self.service = CourierPayoutService(paystack_client=self.paystack)
+
+    def _run(self, method, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            return method(*args)
+
+    def _balances(self):
+        return [wallet_balance(courier) for courier in self.couriers]
+
+
+class AbandonBatchTests(PayoutTestCase):
+
+    def test_unsent_payouts_are_looked_up_before_being_refunded(self):
+        self.paystack.bulk_create_transfers.return_value = TIMEOUT
+        self.service.max_attempts = 2
+        batch = self._run(self.service.queue_payouts)
+        references = list(batch.transactions.order_by('pk').values_list('reference', flat=True))
+        self.assertEqual(self._balances(), [ZERO, ZERO, ZERO])
+
+        def verify(reference):
+            if reference == references[0]:
+                return {'status': True, 'data': {'reference': reference, 'transfer_code': 'TRF_0', 'status': 'success'}}
+            if reference == references[1]:
+                return NOT_FOUND
+            return TIMEOUT
+
+        self.paystack.verify_transfer.side_effect = verify
+        for _ in range(3):
+            self._run(self.service.submit_pending_batches)
+
+        self.assertEqual(self.paystack.bulk_create_transfers.call_count, 2)
+        self.assertEqual(
+            list(batch.transactions.order_by('pk').values_list('status', 'paystack_transaction_id')),
+            [('SUCCESS', 'TRF_0'), ('FAILED', None), ('PENDING', None)],
+        )
+        self.assertEqual(self._balances(), [ZERO, Money(150000), ZERO])
+
+        self.paystack.verify_transfer.side_effect = lambda reference: NOT_FOUND
+        self._run(self.service.submit_pending_batches)
+        self._run(self.service.submit_pending_batches)
+
+        self.assertEqual(self._balances(), [ZERO, Money(150000), Money(150000)])
+        self.assertIn('refunded', PayoutBatch.objects.get().last_error)
+
+
+class TransferWebhookTests(PayoutTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.paystack.bulk_create_transfers.return_value = {
+            'status': True,
+            'data': [{'reference': None, 'transfer_code': f'TRF_{index}', 'status': 'pending'} for index in range(3)],
+        }
+        batch = self._run(self.service.queue_payouts)
+        self._run(self.service.submit_batch, batch)
+        self.payout = batch.transactions.order_by('pk').first()
+        self.handler = PaystackWebhookHandler()
+
+    def _event(self, event_type, **data):
+        data.setdefault('reference', self.payout.reference)
+        data.setdefault('transfer_code', self.payout.paystack_transaction_id)
+        self._run(self.handler.process_webhook, event_type, {'event': event_type, 'data': data})
+
+    def _status(self):
+        self.payout.refresh_from_db()
+        return self.payout.status
+
+    def test_redelivered_failure_is_refunded_once(self):
+        self._event('transfer.failed', reason='Account closed')
+        self._event('transfer.failed', reason='Account closed')
+
+        self.assertEqual(self._status(), 'FAILED')
+        self.assertEqual(self.payout.metadata['failure_reason'], 'Account closed')
+        self.assertEqual(wallet_balance(self.couriers[0]), Money(150000))
+
+    def test_redelivered_reversal_is_refunded_once(self):
+        self._event('transfer.success')
+        self._event('transfer.reversed')
+        self._event('transfer.reversed')
+
+        self.assertEqual(self._status(), 'REVERSED')
+        self.assertEqual(wallet_balance(self.couriers[0]), Money(150000))
+
+    def test_failure_after_the_batch_refunded_is_ignored(self):
+        self.service._apply_results([self.payout], [{
+            'reference': self.payout.reference, 'transfer_code': self.payout.paystack_transaction_id, 'status': 'failed',
+        }])
+        self.assertEqual(wallet_balance(self.couriers[0]), Money(150000))
+
+        self._event('transfer.failed')
+        self._event('transfer.reversed')
+
+        self.assertEqual(self._status(), 'FAILED')
+        self.assertEqual(wallet_balance(self.couriers[0]), Money(150000))
+
+    def test_late_failure_cannot_undo_a_success(self):
+        self._event('transfer.success')
+        self._event('transfer.failed')
+
+        self.assertEqual(self._status(), 'SUCCESS')
+        self.assertEqual(wallet_balance(self.couriers[0]), ZERO)
+        self.assertEqual(Transaction.objects.filter(status='SUCCESS').count(), 1)
@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.payments.models import Transaction, Notification, DailyTransactionSummary
+from apps.payments.tasks import settle_courier_earnings
+from apps.payments.tests.helpers import make_user, wallet_balance
+from apps.core.money import Money
+
+
+class CourierSettlementTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.sender = make_user()
+        self.couriers = [make_user('COURIER', balance='5.00') for _ in range(2)]
+
+    def _order(self, courier, delivery_fee='1000.00', courier_payout='0.00', status='DELIVERED', payment_status='PAID'):
+        return Order.objects.create(
+            sender=self.sender,
+            assigned_courier=courier,
+            pickup_address='Pickup',
+            dropoff_address='Dropoff',
+            recipient_name='Recipient',
+            recipient_phone='+2348000000000',
+            parcel_type='DOCUMENTS',
+            parcel_description='Documents',
+            parcel_condition='Normal',
+            parcel_weight_kg='1.00',
+            parcel_financial_worth=Money.from_naira('1.00'),
+            delivery_fee=Money.from_naira(delivery_fee),
+            service_charge=Money.from_naira('0.00'),
+            courier_payout=Money.from_naira(courier_payout),
+            status=status,
+            payment_status=payment_status,
+            delivered_at=timezone.now(),
+        )
+
+    def _settle(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return settle_courier_earnings()
+
+    def test_settles_each_courier_once_per_run(self):
+        first, second = self.couriers
+        for _ in range(3):
+            self._order(first)
+        self._order(first, courier_payout='100.00')
+        self._order(second, delivery_fee='999.99')
+        unpaid = self._order(second, payment_status='PENDING')
+        in_transit = self._order(second, status='IN_TRANSIT')
+
+        result = self._settle()
+
+        self.assertEqual((result['orders'], result['couriers']), (5, 2))
+        # 3 x 800.00 + 100.00, and 999.99 x 0.80 rounded half up
+        self.assertEqual(wallet_balance(first), Money(250500))
+        self.assertEqual(wallet_balance(second), Money(80499))
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('user_id', 'transaction_type', 'amount')),
+            sorted([(first.pk, 'EARNING', Money(250000)), (second.pk, 'EARNING', Money(79999))]),
+        )
+        self.assertEqual(Notification.objects.filter(notification_type='EARNINGS_SETTLED').count(), 2)
+        self.assertEqual(
+            DailyTransactionSummary.objects.get(user=first, transaction_type='EARNING').total_amount, Money(250000)
+        )
+        self.assertFalse(Order.objects.filter(pk__in=[unpaid.pk, in_transit.pk], settled_at__isnull=False).exists())
+
+    def test_second_run_settles_nothing_again(self):
+        self._order(self.couriers[0])
+        self._settle()
+
+        self.assertEqual(self._settle(), {'status': 'success', 'orders': 0})
+        self.assertEqual(Transaction.objects.filter(transaction_type='EARNING').count(), 1)
+        self.assertEqual(wallet_balance(self.couriers[0]), Money(80500))
+
+        self._order(self.couriers[0])
+        self._settle()
+        self.assertEqual(Transaction.objects.filter(transaction_type='EARNING').count(), 2)
+        self.assertEqual(wallet_balance(self.couriers[0]), Money(160500))
+
+    def test_orders_of_a_courier_without_a_wallet_wait_for_a_later_run(self):
+        courier_without_wallet = make_user('COURIER')
+        courier_without_wallet.courier_profile.delete()
+        order = self._order(courier_without_wallet)
+
+        self._settle()
+
+        order.refresh_from_db()
+        self.assertIsNone(order.settled_at)
+        self.assertFalse(Transaction.objects.exists())
@@ -0,0 +1,96 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.payments.models import Transaction, DailyTransactionSummary
+from apps.payments.tests.helpers import make_user, make_transaction
+from apps.core.money import Money
+
+
+class DailyTransactionSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+
+    def _bucket(self, transaction_type='DEPOSIT'):
+        row = DailyTransactionSummary.objects.get(user=self.user, transaction_type=transaction_type)
+        return row.transaction_count, row.total_amount
+
+    def test_success_transitions_are_counted_once(self):
+        transaction_obj = make_transaction(self.user, 'TXN-1', status='PENDING')
+        self.assertFalse(DailyTransactionSummary.objects.exists())
+
+        transaction_obj.status = 'SUCCESS'
+        transaction_obj.save()
+        transaction_obj.save()
+        reloaded = Transaction.objects.get(pk=transaction_obj.pk)
+        reloaded.status = 'SUCCESS'
+        reloaded.save()
+        make_transaction(self.user, 'TXN-2', amount='50.00')
+        self.assertEqual(self._bucket(), (2, Money(15000)))
+
+        withdrawal = make_transaction(self.user, 'TXN-3', transaction_type='WITHDRAWAL', amount='30.00')
+        withdrawal.status = 'REVERSED'
+        withdrawal.save()
+        self.assertEqual(self._bucket('WITHDRAWAL'), (0, Money(0)))
+
+    def test_summary_endpoint_reads_the_rollup(self):
+        make_transaction(self.user, 'TXN-1', amount='100.00')
+        make_transaction(self.user, 'TXN-2', amount='50.00')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/v1/payments/transactions/summary/?period=month')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['DEPOSIT'], {
+            'transaction_count': 2,
+            'total_amount': '150.00',
+            'total_fee': '0.00',
+            'total_net_amount': '150.00',
+        })
+        self.assertEqual(client.get('/api/v1/payments/transactions/summary/?start_date=bad').status_code, 400)
+
+
+class RebuildTransactionSummariesTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        make_transaction(self.user, 'TXN-1', amount='100.00')
+        make_transaction(self.user, 'TXN-2', amount='50.00')
+
+    def _rebuild(self):
+        call_command('rebuild_transaction_summaries', stdout=StringIO())
+
+    def _buckets(self):
+        return sorted(DailyTransactionSummary.objects.values_list('transaction_type', 'transaction_count', 'total_amount'))
+
+    def test_rebuild_repairs_drifted_missing_and_stale_rows(self):
+        DailyTransactionSummary.objects.update(transaction_count=7, total_amount=Money(1))
+        withdrawal = make_transaction(self.user, 'TXN-3', transaction_type='WITHDRAWAL', amount='20.00')
+        DailyTransactionSummary.objects.filter(transaction_type='WITHDRAWAL').delete()
+        DailyTransactionSummary.objects.create(
+            user=self.user, date=timezone.localdate(withdrawal.created_at), transaction_type='TRANSFER_IN',
+            transaction_count=1, total_amount=Money(500),
+        )
+
+        self._rebuild()
+
+        self.assertEqual(self._buckets(), [('DEPOSIT', 2, Money(15000)), ('WITHDRAWAL', 1, Money(2000))])
+
+    def test_delta_applied_during_the_rebuild_is_counted_once(self):
+        bulk_create = DailyTransactionSummary.objects.bulk_create
+
+        def bulk_create_then_deposit(*args, **kwargs):
+            # Lands after the buckets are created but before the day is locked
+            created = bulk_create(*args, **kwargs)
+            make_transaction(self.user, 'TXN-3', amount='25.00')
+            return created
+
+        with mock.patch.object(DailyTransactionSummary.objects, 'bulk_create', side_effect=bulk_create_then_deposit):
+            self._rebuild()
+
+        self.assertEqual(self._buckets(), [('DEPOSIT', 3, Money(17500))])
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.payments.models import VelocityCounter
+from apps.payments.services.velocity import DAY, HOUR, VelocityEngine, VelocityLimitExceeded
+from apps.payments.tasks import purge_expired_velocity_counters
+from apps.payments.tests.helpers import make_user
+from apps.core.money import Money
+
+REFUSED = {'status': False, 'message': 'Invalid recipient', 'http_status': 400}
+
+
+def transfer_response(reference):
+    return {'status': True, 'data': {'transfer_code': 'TRF_1', 'reference': reference, 'status': 'pending'}}
+
+
+@override_settings(WITHDRAWAL_USER_MAX_COUNT_PER_HOUR=3, WITHDRAWAL_RECIPIENT_MAX_AMOUNT_PER_DAY='100.00')
+class VelocityEngineTests(TestCase):
+
+    def setUp(self):
+        self.engine = VelocityEngine()
+
+    def _withdraw(self, recipient, naira, user=1):
+        return self.engine.consume('withdrawal', {'user': user, 'recipient': recipient}, Money.from_naira(naira))
+
+    def _counters(self):
+        return dict(VelocityCounter.objects.values_list('key', 'value'))
+
+    def test_refused_attempt_counts_nothing(self):
+        self._withdraw('RCP_A', '60.00')
+        counters = self._counters()
+
+        with self.assertRaises(VelocityLimitExceeded):
+            self._withdraw('RCP_A', '50.00')
+
+        self.assertEqual(self._counters(), counters)
+        self._withdraw('RCP_A', '40.00')
+
+    def test_released_attempt_frees_its_share_of_every_limit(self):
+        for _ in range(2):
+            self.engine.release(self._withdraw('RCP_A', '100.00'))
+        self._withdraw('RCP_A', '100.00')
+
+        self.assertEqual(set(self._counters().values()), {1, 10000})
+        self._withdraw('RCP_B', '1.00')
+        self._withdraw('RCP_C', '1.00')
+        with self.assertRaises(VelocityLimitExceeded):
+            self._withdraw('RCP_D', '1.00')
+
+    def test_previous_window_counts_by_its_remaining_overlap(self):
+        start = 1000 * HOUR
+        with mock.patch('apps.payments.services.velocity.time.time', return_value=start - 1):
+            for _ in range(3):
+                self._withdraw(f'RCP_{_}', '1.00')
+        # Half an hour in, the previous hour's three withdrawals count as 1.5
+        with mock.patch('apps.payments.services.velocity.time.time', return_value=start + HOUR / 2):
+            self._withdraw('RCP_X', '1.00')
+            with self.assertRaises(VelocityLimitExceeded):
+                self._withdraw('RCP_Y', '1.00')
+        # Once the previous hour no longer overlaps, the limit is free again
+        with mock.patch('apps.payments.services.velocity.time.time', return_value=start + 2 * HOUR):
+            self._withdraw('RCP_Z', '1.00')
+
+    def test_expired_counters_are_purged(self):
+        with mock.patch('apps.payments.services.velocity.time.time', return_value=100 * DAY):
+            self._withdraw('RCP_A', '1.00')
+        self._withdraw('RCP_A', '1.00')
+
+        result = purge_expired_velocity_counters()
+
+        # One counter per withdrawal rule for each of the two windows
+        self.assertEqual(result['deleted'], 4)
+        self.assertFalse(VelocityCounter.objects.filter(expires_at__lte=timezone.now()).exists())
+        self.assertEqual(VelocityCounter.objects.count(), 4)
+
+
+@override_settings(WITHDRAWAL_USER_MAX_COUNT_PER_HOUR=2)
+class WithdrawalVelocityTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(balance='1000.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        paystack = mock.patch('apps.payments.views.PaystackClient')
+        self.paystack = paystack.start().return_value
+        self.addCleanup(paystack.stop)
+
+    def _transfer(self, key):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/v1/payments/transfer/',
+                {'amount': '10.00', 'recipient_code': 'RCP_1'},
+                format='json',
+                HTTP_IDEMPOTENCY_KEY=key,
+            ).status_code
+
+    def test_refused_withdrawals_do_not_use_up_the_limit(self):
+        self.paystack.create_transfer.return_value = REFUSED
+        self.assertEqual([self._transfer(f'refused-{index}') for index in range(3)], [400, 400, 400])
+
+        self.paystack.create_transfer.side_effect = lambda **kwargs: transfer_response(kwargs.get('reference'))
+        self.assertEqual([self._transfer(f'key-{index}') for index in range(3)], [200, 200, 429])
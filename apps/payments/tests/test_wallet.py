@@ -0,0 +1,165 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.orders.models import Order
+from apps.payments.models import Transaction, Notification
+from apps.payments.services.wallet import WalletError, pay_order_from_wallet, transfer_between_wallets
+from apps.payments.tests.helpers import make_user, wallet_balance
+from apps.core.money import Money
+from apps.core.utils import get_user_balance
+
+
+class WalletTransferTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Created first, so the courier's user id is the lower one
+        self.courier = make_user('COURIER', balance='10.00')
+        self.user = make_user(balance='100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _transfer(self, recipient, amount, key):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/v1/payments/wallet/transfer/',
+                {'recipient': recipient, 'amount': amount, 'note': 'Lunch'},
+                format='json',
+                HTTP_IDEMPOTENCY_KEY=key,
+            )
+
+    def test_transfer_moves_money_between_wallets(self):
+        response = self._transfer(self.courier.phone_number, '25.50', 'key-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(wallet_balance(self.user), Money(7450))
+        self.assertEqual(wallet_balance(self.courier), Money(3550))
+        self.assertEqual((get_user_balance(self.user), get_user_balance(self.courier)), (Money(7450), Money(3550)))
+        debit, credit = Transaction.objects.order_by('pk')
+        self.assertEqual((debit.user, debit.transaction_type, debit.amount), (self.user, 'TRANSFER_OUT', Money(2550)))
+        self.assertEqual((credit.user, credit.transaction_type, credit.amount), (self.courier, 'TRANSFER_IN', Money(2550)))
+        self.assertEqual(debit.metadata['transfer_reference'], response.json()['transfer_reference'])
+        self.assertEqual(credit.metadata['transfer_reference'], response.json()['transfer_reference'])
+        self.assertEqual(Notification.objects.get().user, self.courier)
+
+    def test_transfer_beyond_the_balance_is_refused_without_side_effects(self):
+        self.assertEqual(self._transfer(self.courier.email, '60.00', 'key-1').status_code, 200)
+        # A second transfer checks the balance left by the first, not the one it started with
+        response = self._transfer(self.courier.email, '60.00', 'key-2')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(wallet_balance(self.user), Money(4000))
+        self.assertEqual(wallet_balance(self.courier), Money(7000))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_invalid_recipients_are_refused(self):
+        self.assertEqual(self._transfer(self.user.email, '1.00', 'key-1').status_code, 400)
+        self.assertEqual(self._transfer('nobody@example.com', '1.00', 'key-2').status_code, 404)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_wallets_are_locked_in_user_id_order_in_both_directions(self):
+        tables = {'user_profiles': self.user.pk, 'courier_profiles': self.courier.pk}
+        for sender, recipient in ((self.user, self.courier), (self.courier, self.user)):
+            with CaptureQueriesContext(connection) as queries:
+                transfer_between_wallets(sender, recipient, Money(100))
+            locked = [
+                user_id
+                for query in queries.captured_queries if query['sql'].startswith('SELECT')
+                for table, user_id in tables.items() if f'FROM "{table}"' in query['sql']
+            ]
+            self.assertEqual(locked[:2], sorted(tables.values()))
+
+    def test_non_positive_amount_is_refused(self):
+        with self.assertRaises(WalletError):
+            transfer_between_wallets(self.user, self.courier, Money(0))
+
+
+class PayOrderTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(balance='120.00')
+        make_user('COURIER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _order(self):
+        # 40.00 delivery fee + 10.00 service charge
+        return Order.objects.create(
+            sender=self.user,
+            pickup_address='Pickup',
+            dropoff_address='Dropoff',
+            recipient_name='Recipient',
+            recipient_phone='+2348000000000',
+            parcel_type='DOCUMENTS',
+            parcel_description='Documents',
+            parcel_condition='Normal',
+            parcel_weight_kg='1.00',
+            parcel_financial_worth=Money.from_naira('10.00'),
+            delivery_fee=Money.from_naira('40.00'),
+            service_charge=Money.from_naira('10.00'),
+        )
+
+    def _pay(self, order, key, confirm=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f'/api/v1/orders/{order.pk}/pay/', {'confirm': confirm}, format='json', HTTP_IDEMPOTENCY_KEY=key,
+            )
+
+    def _state(self, order):
+        order.refresh_from_db()
+        return order.status, order.payment_status
+
+    def test_pay_and_confirm_in_one_request(self):
+        order = self._order()
+
+        response = self._pay(order, 'key-1', confirm=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._state(order), ('AVAILABLE', 'PAID'))
+        self.assertEqual(get_user_balance(self.user), Money(7000))
+        payment = Transaction.objects.get()
+        self.assertEqual((payment.transaction_type, payment.amount), ('PAYMENT', Money(5000)))
+        self.assertEqual(response.json()['payment_reference'], payment.reference)
+
+    def test_order_is_charged_once(self):
+        order = self._order()
+        self.assertEqual(self._pay(order, 'key-1').status_code, 200)
+
+        self.assertEqual(self._pay(order, 'key-2').status_code, 400)
+        # A caller still holding the unpaid order cannot charge it again either
+        order.payment_status = 'PENDING'
+        with self.assertRaises(WalletError):
+            pay_order_from_wallet(self.user, order)
+
+        self.assertEqual(self._state(order), ('PENDING', 'PAID'))
+        self.assertEqual(wallet_balance(self.user), Money(7000))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_insufficient_balance_leaves_the_order_unpaid(self):
+        first, second, third = self._order(), self._order(), self._order()
+        self._pay(first, 'key-1')
+        self._pay(second, 'key-2')
+
+        response = self._pay(third, 'key-3', confirm=True)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._state(third), ('PENDING', 'PENDING'))
+        self.assertEqual(wallet_balance(self.user), Money(2000))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_failed_confirmation_rolls_back_the_payment(self):
+        order = self._order()
+
+        with mock.patch('apps.orders.views.dispatch_order', side_effect=RuntimeError('boom')):
+            response = self._pay(order, 'key-1', confirm=True)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self._state(order), ('PENDING', 'PENDING'))
+        self.assertEqual(wallet_balance(self.user), Money(12000))
+        self.assertFalse(Transaction.objects.exists())
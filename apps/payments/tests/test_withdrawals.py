@@ -0,0 +1,188 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.models import IdempotencyRecord
+from apps.payments.models import Transaction
+from apps.payments.tasks import sync_pending_withdrawals
+from apps.payments.tests.helpers import make_user, make_transaction, wallet_balance
+from apps.core.money import Money
+
+TIMEOUT = {'status': False, 'message': 'Request timeout'}
+BUSY = {'status': False, 'message': 'Paystack is busy. Please try again shortly.', 'not_sent': True}
+REFUSED = {'status': False, 'message': 'Invalid recipient', 'http_status': 400}
+NOT_FOUND = {'status': False, 'message': 'Transfer not found', 'http_status': 404}
+
+
+def transfer_response(reference, status='success'):
+    return {
+        'status': True,
+        'data': {'transfer_code': 'TRF_1', 'reference': reference, 'status': status, 'amount': 2500},
+    }
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        paystack = mock.patch('apps.payments.views.PaystackClient')
+        self.paystack = paystack.start().return_value
+        self.addCleanup(paystack.stop)
+
+    def _initialize(self, amount='100.00', key='key-1'):
+        return self.client.post('/api/v1/payments/initialize/', {'amount': amount}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        self.paystack.initialize_transaction.return_value = {
+            'status': True,
+            'data': {'authorization_url': 'https://paystack.test/pay', 'access_code': 'ac', 'reference': 'ref'},
+        }
+
+        first = self._initialize()
+        replay = self._initialize()
+        cache.clear()
+        replay_from_database = self._initialize()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay_from_database.json(), first.json())
+        self.assertEqual(self.paystack.initialize_transaction.call_count, 1)
+
+    def test_key_reused_with_a_different_payload_is_rejected(self):
+        self.paystack.initialize_transaction.return_value = REFUSED
+        self.assertEqual(self._initialize('100.00').status_code, 400)
+        self.assertEqual(self._initialize('200.00').status_code, 422)
+        self.assertEqual(self.paystack.initialize_transaction.call_count, 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_request_in_flight_conflicts(self):
+        IdempotencyRecord.objects.create(
+            user=self.user, scope='initialize_payment', key='key-1', fingerprint='other',
+            locked_until='2100-01-01T00:00Z', expires_at='2100-01-01T00:00Z',
+        )
+        with mock.patch('apps.core.idempotency._fingerprint', return_value='other'):
+            self.assertEqual(self._initialize().status_code, 409)
+        self.paystack.initialize_transaction.assert_not_called()
+
+    def test_transient_failures_release_the_key(self):
+        for response in (BUSY, {'status': False, 'message': 'Bad gateway', 'http_status': 502}):
+            self.paystack.initialize_transaction.return_value = response
+            self.assertEqual(self._initialize().status_code, 503)
+            self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+class CreateTransferTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(balance='100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        paystack = mock.patch('apps.payments.views.PaystackClient')
+        self.paystack = paystack.start().return_value
+        self.addCleanup(paystack.stop)
+
+    def _transfer(self, key='key-1'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/v1/payments/transfer/',
+                {'amount': '25.00', 'recipient_code': 'RCP_1'},
+                format='json',
+                HTTP_IDEMPOTENCY_KEY=key,
+            )
+
+    def test_timeout_keeps_the_withdrawal_pending_and_replays(self):
+        self.paystack.create_transfer.return_value = TIMEOUT
+
+        response = self._transfer()
+        replay = self._transfer()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(replay.json(), response.json())
+        self.assertEqual(self.paystack.create_transfer.call_count, 1)
+        withdrawal = Transaction.objects.get()
+        self.assertEqual((withdrawal.status, withdrawal.reference), ('PENDING', response.json()['reference']))
+        self.assertEqual(wallet_balance(self.user), Money(7500))
+
+    def test_exception_after_the_debit_keeps_the_withdrawal_pending(self):
+        self.paystack.create_transfer.side_effect = ConnectionError('reset')
+
+        response = self._transfer()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Transaction.objects.get().status, 'PENDING')
+        self.assertEqual(wallet_balance(self.user), Money(7500))
+
+    def test_paystack_refusal_refunds_and_is_final(self):
+        self.paystack.create_transfer.return_value = REFUSED
+
+        self.assertEqual(self._transfer().status_code, 400)
+        self.assertEqual(self._transfer()['Idempotent-Replayed'], 'true')
+
+        self.assertEqual(Transaction.objects.get().status, 'FAILED')
+        self.assertEqual(wallet_balance(self.user), Money(10000))
+        self.assertEqual(self.paystack.create_transfer.call_count, 1)
+
+    def test_request_never_sent_refunds_and_releases_the_key(self):
+        self.paystack.create_transfer.return_value = BUSY
+
+        self.assertEqual(self._transfer().status_code, 503)
+
+        self.assertEqual(Transaction.objects.get().status, 'FAILED')
+        self.assertEqual(wallet_balance(self.user), Money(10000))
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+@override_settings(WITHDRAWAL_SWEEP_MIN_AGE=0)
+class SyncPendingWithdrawalsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(balance='75.00')
+        self.withdrawal = make_transaction(
+            self.user, 'TXN-1', transaction_type='WITHDRAWAL', status='PENDING', amount='25.00',
+            payment_method='PAYSTACK_BALANCE',
+        )
+        paystack = mock.patch('apps.payments.tasks.PaystackClient')
+        self.paystack = paystack.start().return_value
+        self.addCleanup(paystack.stop)
+
+    def _sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return sync_pending_withdrawals()
+
+    def test_transfer_paystack_never_made_is_refunded_once(self):
+        self.paystack.verify_transfer.return_value = NOT_FOUND
+
+        self.assertEqual(self._sync()['settled_count'], 1)
+        self.assertEqual(self._sync()['total_checked'], 0)
+
+        self.withdrawal.refresh_from_db()
+        self.assertEqual(self.withdrawal.status, 'FAILED')
+        self.assertEqual(wallet_balance(self.user), Money(10000))
+
+    def test_transfer_paystack_made_is_settled_without_refund(self):
+        self.paystack.verify_transfer.return_value = transfer_response('TXN-1')
+
+        self._sync()
+
+        self.withdrawal.refresh_from_db()
+        self.assertEqual((self.withdrawal.status, self.withdrawal.paystack_transaction_id), ('SUCCESS', 'TRF_1'))
+        self.assertEqual(wallet_balance(self.user), Money(7500))
+
+    def test_transfer_in_flight_or_unreachable_is_left_pending(self):
+        for response in (transfer_response('TXN-1', status='pending'), TIMEOUT):
+            self.paystack.verify_transfer.return_value = response
+            self._sync()
+
+        self.withdrawal.refresh_from_db()
+        self.assertEqual(self.withdrawal.status, 'PENDING')
+        self.assertEqual(self.withdrawal.paystack_transaction_id, 'TRF_1')
+        self.assertEqual(wallet_balance(self.user), Money(7500))
@@ -10,6 +10,7 @@ from .views import (
     list_transfer_recipients,
     create_transfer,
     finalize_transfer,
+    wallet_transfer,
     paystack_webhook,
     TransactionViewSet,
     NotificationViewSet,
@@ -42,6 +43,9 @@ urlpatterns = [
     path('transfer/', create_transfer, name='create_transfer'),
     path('transfer/finalize/', finalize_transfer, name='finalize_transfer'),
     
+    # Wallet-to-wallet transfer
+    path('wallet/transfer/', wallet_transfer, name='wallet_transfer'),
+    
     # Webhook
     path('webhook/', paystack_webhook, name='paystack_webhook'),
     
@@ -6,29 +6,53 @@ from apps.core.response import success_response, error_response, created_respons
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db import transaction as db_transaction
 from django.db import IntegrityError
-from django.db.models import Q, F
+from django.db.models import Q, F, Sum
+from django.db.models.functions import TruncMonth
+from django.http import StreamingHttpResponse
+from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
-from decimal import Decimal
-import uuid
+import csv
+import json
 import logging
 
-from apps.payments.models import Transaction, Notification, DedicatedVirtualAccount, TransferRecipient
+from apps.payments.models import (
+    Transaction,
+    Notification,
+    NotificationCounter,
+    DedicatedVirtualAccount,
+    DVAProvisioning,
+    TransferRecipient,
+    DailyTransactionSummary,
+)
 from apps.payments.serializers import (
     TransactionSerializer,
     DedicatedVirtualAccountSerializer,
+    DVAProvisioningSerializer,
     TransferRecipientSerializer,
     CreateTransferRecipientSerializer,
     CreateTransferSerializer,
     FinalizeTransferSerializer,
+    WalletTransferSerializer,
     NotificationSerializer,
 )
-from apps.payments.services.paystack_client import PaystackClient
+from apps.payments.services.paystack_client import PaystackClient, paystack_error_status, paystack_outcome_unknown
+from apps.payments.services.dva_provisioning import DVAProvisioningService
+from apps.payments.services.payloads import record_payload
+from apps.payments.services.outbox import enqueue_notification
+from apps.payments.services.deposits import schedule_deposit_verification, settle_pending_deposit
+from apps.payments.services.wallet import WalletError, transfer_between_wallets
+from apps.payments.services.withdrawals import settle_withdrawal
+from apps.payments.services.velocity import VelocityEngine, VelocityLimitExceeded
 from apps.core.services.paystack_account_verification import PaystackAccountVerification
-from apps.core.utils import get_user_balance, deduct_balance, add_balance
+from apps.core.utils import get_user_balance, deduct_balance
+from apps.core.money import Money, MoneyJSONEncoder, ZERO
+from apps.core.id_generator import generate_reference
+from apps.core.idempotency import idempotent, IDEMPOTENCY_KEY_PARAMETER
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +89,7 @@ def get_balance(request):
     tags=['Payments'],
     summary='Initialize Payment',
     description='Initialize a payment transaction. Returns authorization URL for payment.',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request={
         'application/json': {
             'type': 'object',
@@ -88,11 +113,13 @@ def get_balance(request):
         },
         400: {'description': 'Validation error'},
         401: {'description': 'Authentication required'},
+        503: {'description': 'Paystack temporarily unavailable; safe to retry'},
     },
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @ratelimit(key='user', rate='20/h', method='POST')
+@idempotent('initialize_payment')
 def initialize_payment(request):
     amount = request.data.get('amount')
     callback_url = request.data.get('callback_url')
@@ -101,27 +128,20 @@ def initialize_payment(request):
         return error_response('Payment amount is required.', status_code=status.HTTP_400_BAD_REQUEST)
     
     try:
-        amount_decimal = Decimal(str(amount))
-        if amount_decimal <= 0:
+        amount = Money.from_naira(amount)
+        if amount <= 0:
             raise ValueError('Amount must be greater than 0')
     except (ValueError, TypeError):
         return error_response('Invalid payment amount. Amount must be greater than zero.', status_code=status.HTTP_400_BAD_REQUEST)
     
-    max_attempts = 10
-    reference = None
-    for attempt in range(max_attempts):
-        reference = f"TXN_{uuid.uuid4().hex[:12].upper()}"
-        if not Transaction.objects.filter(reference=reference).exists():
-            break
-        if attempt == max_attempts - 1:
-            logger.error(f"Failed to generate unique transaction reference after {max_attempts} attempts")
-            return error_response('Unable to process payment request. Please try again.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # Time-ordered, globally unique reference; no database probe needed
+    reference = generate_reference('TXN')
     
     try:
         paystack_client = PaystackClient()
         response = paystack_client.initialize_transaction(
             email=request.user.email,
-            amount=amount_decimal,
+            amount=amount,
             reference=reference,
             callback_url=callback_url,
             metadata={
@@ -131,18 +151,22 @@ def initialize_payment(request):
         )
         
         if response.get('status'):
-            Transaction.objects.create(
-                user=request.user,
-                transaction_type='DEPOSIT',
-                status='PENDING',
-                payment_method='CARD',
-                amount=amount_decimal,
-                fee=Decimal('0.00'),
-                net_amount=amount_decimal,
-                reference=reference,
-                paystack_reference=response['data']['reference'],
-                description='Payment initialization',
-            )
+            with db_transaction.atomic():
+                Transaction.objects.create(
+                    user=request.user,
+                    transaction_type='DEPOSIT',
+                    status='PENDING',
+                    payment_method='CARD',
+                    amount=amount,
+                    fee=ZERO,
+                    net_amount=amount,
+                    reference=reference,
+                    paystack_reference=response['data']['reference'],
+                    description='Payment initialization',
+                )
+                
+                # Verify with Paystack shortly after, in case the webhook never arrives
+                schedule_deposit_verification(reference)
             
             return success_response(
                 data={
@@ -154,7 +178,7 @@ def initialize_payment(request):
             )
         else:
             error_message = response.get('message', 'Unable to start payment. Please check your details and try again.')
-            return error_response(error_message, status_code=status.HTTP_400_BAD_REQUEST)
+            return error_response(error_message, status_code=paystack_error_status(response))
             
     except Exception as e:
         logger.error(f"Error initializing payment for user {request.user.email}: {e}", exc_info=True)
@@ -211,25 +235,12 @@ def verify_payment(request):
         
         if response.get('status') and response['data']['status'] == 'success':
             # Update transaction
-            amount = Decimal(str(response['data']['amount'])) / 100
+            amount = Money.from_kobo(response['data']['amount'])
             
             if transaction_obj.status == 'PENDING':
-                transaction_obj.status = 'SUCCESS'
-                transaction_obj.completed_at = timezone.now()
-                transaction_obj.metadata.update(response['data'])
-                transaction_obj.save()
-                
-                # Update balance
-                add_balance(request.user, amount, reference)
-                
-                # Create notification
-                Notification.objects.create(
-                    user=request.user,
-                    notification_type='DEPOSIT_RECEIVED',
-                    title='Payment Received',
-                    message=f'You received ₦{amount:,.2f}',
-                    related_transaction=transaction_obj,
-                )
+                # Locks and re-checks the deposit, so a concurrent scheduled
+                # verification cannot credit it twice
+                settle_pending_deposit(transaction_obj.pk, response['data'], sync_method='verify_endpoint')
             
             return success_response(
                 data={
@@ -252,11 +263,15 @@ def verify_payment(request):
 @extend_schema(
     tags=['Payments'],
     summary='Create Dedicated Virtual Account',
-    description='Create a dedicated virtual account (DVA) for the authenticated user using single-step assignment.',
+    description=(
+        'Request a dedicated virtual account (DVA) for the authenticated user. Provisioning runs in the '
+        'background: the endpoint returns 202 with the provisioning state, and GET /dva/ reports progress '
+        'until the account is ready. Returns 200 if the user already has a DVA.'
+    ),
     request=None,
     responses={
         200: {
-            'description': 'DVA created successfully',
+            'description': 'DVA already exists',
             'examples': {
                 'application/json': {
                     'account_number': '8115333313',
@@ -265,21 +280,17 @@ def verify_payment(request):
                 }
             }
         },
-        400: {'description': 'Error creating DVA'},
+        201: {'description': 'DVA created successfully'},
+        202: {'description': 'DVA creation in progress'},
         401: {'description': 'Authentication required'},
     },
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_dva(request):
-    """Create dedicated virtual account (single-step)"""
-    # Debug logging
-    logger.info(f"create_dva called by user: {request.user.email if request.user.is_authenticated else 'Anonymous'}")
-    logger.info(f"User authenticated: {request.user.is_authenticated}")
-    logger.info(f"User type: {request.user.user_type if request.user.is_authenticated else 'N/A'}")
-    
+    """Queue background provisioning of the user's dedicated virtual account"""
     try:
-        # Step 1: Check if DVA already exists locally
+        # Check if DVA already exists locally
         if hasattr(request.user, 'dedicated_virtual_account'):
             dva = request.user.dedicated_virtual_account
             serializer = DedicatedVirtualAccountSerializer(dva)
@@ -288,223 +299,23 @@ def create_dva(request):
                 message='DVA already exists'
             )
         
-        # Step 2: Get or create Paystack customer and check for existing DVA
-        paystack_client = PaystackClient()
-        
-        # Get customer from Paystack (or create if doesn't exist)
-        customer_response = paystack_client.get_customer(email=request.user.email)
-        
-        if not customer_response.get('status'):
-            # Customer doesn't exist, create one
-            full_name = request.user.get_full_name()
-            name_parts = full_name.split(' ', 1) if full_name else ['', '']
-            first_name = name_parts[0] if len(name_parts) > 0 else ''
-            last_name = name_parts[1] if len(name_parts) > 1 else ''
-            
-            customer_response = paystack_client.create_customer(
-                email=request.user.email,
-                first_name=first_name,
-                last_name=last_name,
-                phone=request.user.phone_number,
-                metadata={
-                    'user_id': request.user.id,
-                    'user_type': request.user.user_type,
-                }
-            )
-            
-            if not customer_response.get('status'):
-                error_message = customer_response.get('message', 'Failed to create customer')
-                logger.error(f"Failed to create Paystack customer: {error_message}. Response: {customer_response}")
-                return error_response(error_message, status_code=status.HTTP_400_BAD_REQUEST)
-        
-        # Validate customer response has data
-        if 'data' not in customer_response:
-            logger.error(f"Invalid Paystack customer response structure: {customer_response}")
-            return error_response('Invalid response from Paystack. Please try again.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        customer_code = customer_response['data'].get('customer_code')
-        if not customer_code:
-            logger.error(f"Customer code not found in Paystack response: {customer_response}")
-            return error_response('Failed to get customer code from Paystack', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        # Step 3: Check if DVA already exists in Paystack for this customer
-        logger.info(f"Checking for existing DVA for customer {customer_code}...")
-        existing_dva_response = paystack_client.get_dedicated_accounts(customer_code=customer_code)
-        
-        if existing_dva_response.get('status') and existing_dva_response.get('data'):
-            # DVA already exists in Paystack, sync it to our database
-            logger.info(f"Found existing DVA in Paystack for customer {customer_code}")
-            dedicated_accounts = existing_dva_response['data']
-            
-            # Handle both array and single object responses
-            if not isinstance(dedicated_accounts, list):
-                dedicated_accounts = [dedicated_accounts]
-            
-            # Get the first active account
-            for account_data in dedicated_accounts:
-                # Extract dedicated_account - could be nested or direct
-                dedicated_account = None
-                if isinstance(account_data, dict):
-                    if 'dedicated_account' in account_data:
-                        dedicated_account = account_data['dedicated_account']
-                    elif account_data.get('account_number'):
-                        dedicated_account = account_data
-                
-                if dedicated_account and isinstance(dedicated_account, dict) and dedicated_account.get('account_number'):
-                    # Sync DVA to database
-                    dva, created = DedicatedVirtualAccount.objects.update_or_create(
-                        user=request.user,
-                        defaults={
-                            'paystack_customer_id': str(customer_response['data'].get('id', '')),
-                            'account_number': dedicated_account.get('account_number', ''),
-                            'bank_name': dedicated_account.get('bank', {}).get('name', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                            'bank_slug': dedicated_account.get('bank', {}).get('slug', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                            'account_name': dedicated_account.get('account_name', ''),
-                            'currency': dedicated_account.get('currency', 'NGN'),
-                        }
-                    )
-                    
-                    if created:
-                        Notification.objects.create(
-                            user=request.user,
-                            notification_type='DVA_CREATED',
-                            title='Dedicated Account Synced',
-                            message=f'Your dedicated account {dva.account_number} has been synced from Paystack',
-                            metadata={
-                                'account_number': dva.account_number,
-                                'bank_name': dva.bank_name,
-                            }
-                        )
-                    
-                    serializer = DedicatedVirtualAccountSerializer(dva)
-                    return success_response(
-                        data={'dva': serializer.data},
-                        message='DVA already exists and has been synced'
-                    )
-        
-        # Step 4: Create new DVA (only if none exists)
-        logger.info(f"No existing DVA found. Creating new DVA for customer {customer_code}...")
-        
-        full_name = request.user.get_full_name()
-        name_parts = full_name.split(' ', 1) if full_name else ['', '']
-        first_name = name_parts[0] if len(name_parts) > 0 else ''
-        last_name = name_parts[1] if len(name_parts) > 1 else ''
-        
-        # Assign DVA (single-step)
-        dva_response = paystack_client.assign_dedicated_account(
-            customer_code=customer_code,
-            email=request.user.email,
-            first_name=first_name,
-            last_name=last_name,
-            phone=request.user.phone_number,
-        )
-        
-        if not dva_response.get('status'):
-            error_message = dva_response.get('message', 'Failed to assign DVA')
-            logger.error(f"Failed to assign DVA: {error_message}. Response: {dva_response}")
-            return error_response(error_message, status_code=status.HTTP_400_BAD_REQUEST)
-        
-        # Paystack single-step DVA assignment can be asynchronous
-        # Check if DVA was created immediately or is in progress
-        message = dva_response.get('message', '').lower()
-        dva_data = dva_response.get('data', {})
-        dedicated_account = dva_data.get('dedicated_account', {}) if dva_data else {}
-        
-        # If response indicates "in progress" or no data, fetch from Paystack
-        if 'in progress' in message or not dedicated_account or not dedicated_account.get('account_number'):
-            logger.info(f"DVA assignment in progress for user {request.user.email}. Fetching from Paystack...")
-            
-            # Wait a moment and fetch DVA from Paystack API
-            import time
-            time.sleep(2)  # Brief delay for async processing
-            
-            dva_list_response = paystack_client.get_dedicated_accounts(customer_code=customer_code)
-            
-            if dva_list_response.get('status') and dva_list_response.get('data'):
-                dedicated_accounts = dva_list_response['data']
-                
-                # Handle both array and single object responses
-                if not isinstance(dedicated_accounts, list):
-                    dedicated_accounts = [dedicated_accounts]
-                
-                # Get the first active account
-                for account_data in dedicated_accounts:
-                    # Extract dedicated_account - could be nested or direct
-                    dedicated_account = None
-                    if isinstance(account_data, dict):
-                        if 'dedicated_account' in account_data:
-                            dedicated_account = account_data['dedicated_account']
-                        elif account_data.get('account_number'):
-                            dedicated_account = account_data
-                    
-                    if dedicated_account and isinstance(dedicated_account, dict) and dedicated_account.get('account_number'):
-                        # DVA exists in Paystack, sync it to our database
-                        dva, created = DedicatedVirtualAccount.objects.update_or_create(
-                            user=request.user,
-                            defaults={
-                                'paystack_customer_id': str(customer_response['data'].get('id', '')),
-                                'account_number': dedicated_account.get('account_number', ''),
-                                'bank_name': dedicated_account.get('bank', {}).get('name', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                                'bank_slug': dedicated_account.get('bank', {}).get('slug', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                                'account_name': dedicated_account.get('account_name', ''),
-                                'currency': dedicated_account.get('currency', 'NGN'),
-                            }
-                        )
-                        
-                        if created:
-                            Notification.objects.create(
-                                user=request.user,
-                                notification_type='DVA_CREATED',
-                                title='Dedicated Account Created',
-                                message=f'Your dedicated account {dva.account_number} has been created at {dva.bank_name}',
-                                metadata={
-                                    'account_number': dva.account_number,
-                                    'bank_name': dva.bank_name,
-                                }
-                            )
-                        
-                        serializer = DedicatedVirtualAccountSerializer(dva)
-                        return created_response(data=serializer.data, message='Dedicated account created successfully')
-            
-            # If still not found, return accepted status (webhook will update later)
-            logger.info(f"DVA assignment in progress. Will be synced via webhook.")
-            return success_response(
-                message='DVA creation in progress. You will be notified when ready.',
-                status_code=status.HTTP_202_ACCEPTED
-            )
-        
-        # DVA was created successfully (synchronous response)
-        if not dedicated_account or not dedicated_account.get('account_number'):
-            logger.error(f"Invalid DVA response structure: {dva_response}")
-            return error_response('Invalid DVA response from Paystack', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        provisioning, started = DVAProvisioningService.request_provisioning(request.user)
         
-        # Save DVA to database
-        dva, created = DedicatedVirtualAccount.objects.update_or_create(
-            user=request.user,
-            defaults={
-                'paystack_customer_id': str(customer_response['data'].get('id', '')),
-                'account_number': dedicated_account.get('account_number', ''),
-                'bank_name': dedicated_account.get('bank', {}).get('name', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                'bank_slug': dedicated_account.get('bank', {}).get('slug', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                'account_name': dedicated_account.get('account_name', ''),
-                'currency': dedicated_account.get('currency', 'NGN'),
-            }
-        )
+        # With eager tasks (or a fast worker) provisioning may already be finished
+        dva = DedicatedVirtualAccount.objects.filter(user=request.user).first()
+        if dva is not None:
+            serializer = DedicatedVirtualAccountSerializer(dva)
+            return created_response(data=serializer.data, message='Dedicated account created successfully')
         
-        if created:
-            Notification.objects.create(
-                user=request.user,
-                notification_type='DVA_CREATED',
-                title='Dedicated Account Created',
-                message=f'Your dedicated account {dva.account_number} has been created at {dva.bank_name}',
-                metadata={
-                    'account_number': dva.account_number,
-                    'bank_name': dva.bank_name,
-                }
+        provisioning.refresh_from_db()
+        if provisioning.status == 'FAILED':
+            return error_response(
+                provisioning.last_error or 'Failed to assign DVA',
+                status_code=status.HTTP_400_BAD_REQUEST,
+                data={'provisioning': DVAProvisioningSerializer(provisioning).data}
             )
         
-        serializer = DedicatedVirtualAccountSerializer(dva)
-        return created_response(data=serializer.data, message='Dedicated account created successfully')
+        return _dva_in_progress_response(provisioning)
         
     except Exception as e:
         logger.error(f"Error creating DVA: {e}", exc_info=True)
@@ -514,9 +325,13 @@ def create_dva(request):
 @extend_schema(
     tags=['Payments'],
     summary='Get Dedicated Virtual Account',
-    description='Get dedicated virtual account details for authenticated user. If not found locally, will sync from Paystack.',
+    description=(
+        'Get dedicated virtual account details for authenticated user. If not found locally, a background '
+        'sync from Paystack is started and 202 is returned with the provisioning state.'
+    ),
     responses={
         200: DedicatedVirtualAccountSerializer,
+        202: {'description': 'DVA provisioning in progress'},
         404: {'description': 'DVA not found'},
         401: {'description': 'Authentication required'},
     },
@@ -525,96 +340,86 @@ def create_dva(request):
 @permission_classes([IsAuthenticated])
 @ratelimit(key='user', rate='100/h', method='GET')
 def get_dva(request):
-    """Get user's DVA, sync from Paystack if not found locally"""
+    """Get user's DVA, or the state of its background provisioning"""
     try:
         dva = request.user.dedicated_virtual_account
         serializer = DedicatedVirtualAccountSerializer(dva)
         return success_response(data=serializer.data, message='Dedicated account retrieved successfully')
     except AttributeError:
-        # DVA not found locally, try to sync from Paystack
-        logger.info(f"DVA not found locally for user {request.user.email}. Attempting to sync from Paystack...")
-        
-        try:
-            paystack_client = PaystackClient()
-            
-            # Get customer from Paystack
-            customer_response = paystack_client.get_customer(email=request.user.email)
-            
-            if not customer_response.get('status') or 'data' not in customer_response:
-                logger.warning(f"Customer not found in Paystack for {request.user.email}. Response: {customer_response}")
-                return not_found_response('No dedicated account found. Please create a dedicated account first.')
-            
-            customer_code = customer_response['data'].get('customer_code')
-            if not customer_code:
-                logger.warning(f"Customer code not found in Paystack response: {customer_response}")
-                return not_found_response('No dedicated account found. Please create a dedicated account first.')
-            
-            # Get dedicated accounts from Paystack
-            dva_list_response = paystack_client.get_dedicated_accounts(customer_code=customer_code)
-            
-            if not dva_list_response.get('status'):
-                logger.warning(f"Failed to fetch dedicated accounts from Paystack: {dva_list_response}")
-                return not_found_response('No dedicated account found. Please create a dedicated account first.')
-            
-            if dva_list_response.get('data'):
-                dedicated_accounts = dva_list_response['data']
-                
-                # Handle both array and single object responses
-                if not isinstance(dedicated_accounts, list):
-                    dedicated_accounts = [dedicated_accounts]
-                
-                # Find the first active account with account_number
-                for account_data in dedicated_accounts:
-                    # Extract dedicated_account - could be nested or direct
-                    dedicated_account = None
-                    
-                    if isinstance(account_data, dict):
-                        # Check if dedicated_account is nested
-                        if 'dedicated_account' in account_data:
-                            dedicated_account = account_data['dedicated_account']
-                        # Check if account_data IS the dedicated_account
-                        elif account_data.get('account_number'):
-                            dedicated_account = account_data
-                    
-                    if dedicated_account and isinstance(dedicated_account, dict):
-                        account_number = dedicated_account.get('account_number')
-                        if account_number:
-                            # Sync DVA to database
-                            dva, created = DedicatedVirtualAccount.objects.update_or_create(
-                                user=request.user,
-                                defaults={
-                                    'paystack_customer_id': str(customer_response['data'].get('id', '')),
-                                    'account_number': account_number,
-                                    'bank_name': dedicated_account.get('bank', {}).get('name', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                                    'bank_slug': dedicated_account.get('bank', {}).get('slug', '') if isinstance(dedicated_account.get('bank'), dict) else '',
-                                    'account_name': dedicated_account.get('account_name', ''),
-                                    'currency': dedicated_account.get('currency', 'NGN'),
-                                }
-                            )
-                            
-                            if created:
-                                # Create notification only if newly synced
-                                Notification.objects.create(
-                                    user=request.user,
-                                    notification_type='DVA_CREATED',
-                                    title='Dedicated Account Synced',
-                                    message=f'Your dedicated account {dva.account_number} has been synced from Paystack',
-                                    metadata={
-                                        'account_number': dva.account_number,
-                                        'bank_name': dva.bank_name,
-                                    }
-                                )
-                            
-                            serializer = DedicatedVirtualAccountSerializer(dva)
-                            return success_response(data=serializer.data, message='Dedicated account retrieved successfully')
-            
-            # No DVA found in Paystack either
-            logger.warning(f"No dedicated accounts found in Paystack for customer {customer_code}. Response: {dva_list_response}")
-            return not_found_response('No dedicated account found. Please create a dedicated account first.')
+        pass
+    
+    try:
+        provisioning = DVAProvisioning.objects.filter(user=request.user).first()
+        if provisioning is None or provisioning.in_progress:
+            # DVA not found locally, sync from Paystack in the background (reuses a running request)
+            logger.info(f"DVA not found locally for user {request.user.email}. Syncing from Paystack in the background...")
+            provisioning, started = DVAProvisioningService.request_provisioning(request.user, create_if_missing=False)
             
-        except Exception as e:
-            logger.error(f"Error syncing DVA from Paystack: {e}", exc_info=True)
-            return not_found_response('No dedicated account found. Please create a dedicated account first.')
+            dva = DedicatedVirtualAccount.objects.filter(user=request.user).first()
+            if dva is not None:
+                serializer = DedicatedVirtualAccountSerializer(dva)
+                return success_response(data=serializer.data, message='Dedicated account retrieved successfully')
+            provisioning.refresh_from_db()
+        
+        if provisioning.in_progress:
+            return _dva_in_progress_response(provisioning)
+        
+        return not_found_response('No dedicated account found. Please create a dedicated account first.')
+        
+    except Exception as e:
+        logger.error(f"Error syncing DVA from Paystack: {e}", exc_info=True)
+        return not_found_response('No dedicated account found. Please create a dedicated account first.')
+
+
+def _dva_in_progress_response(provisioning):
+    return success_response(
+        data={'provisioning': DVAProvisioningSerializer(provisioning).data},
+        message='DVA creation in progress. You will be notified when ready.',
+        status_code=status.HTTP_202_ACCEPTED
+    )
+
+
+TRANSACTION_EXPORT_FIELDS = (
+    'reference',
+    'transaction_type',
+    'status',
+    'payment_method',
+    'amount',
+    'fee',
+    'net_amount',
+    'paystack_reference',
+    'description',
+    'created_at',
+    'completed_at',
+)
+TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+
+
+class _EchoBuffer:
+    """File-like object that hands written rows straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def _stream_transactions_csv(rows):
+    """Yield CSV lines (header first) for exported transaction rows"""
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(TRANSACTION_EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _stream_transactions_ndjson(rows):
+    """Yield one JSON object per line for exported transaction rows"""
+    for row in rows:
+        yield json.dumps(dict(zip(TRANSACTION_EXPORT_FIELDS, row)), cls=MoneyJSONEncoder) + '\n'
+
+
+TRANSACTION_EXPORT_FORMATS = {
+    'csv': ('text/csv', _stream_transactions_csv),
+    'ndjson': ('application/x-ndjson', _stream_transactions_ndjson),
+}
 
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -631,7 +436,8 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Return transactions for authenticated user only"""
-        queryset = Transaction.objects.filter(user=self.request.user)
+        # metadata is not serialized; leave it out of the SELECT
+        queryset = Transaction.objects.filter(user=self.request.user).defer('metadata')
         
         # Filter by transaction type
         transaction_type = self.request.query_params.get('transaction_type')
@@ -701,6 +507,214 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
         """List transactions"""
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        tags=['Payments'],
+        summary='Export Transactions',
+        description='Stream the filtered transaction history as CSV or NDJSON. '
+                    'Accepts the same filters as the transaction list.',
+        parameters=[
+            OpenApiParameter(
+                name='export_format',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Export format (default: csv)',
+                enum=['csv', 'ndjson'],
+            ),
+            OpenApiParameter(
+                name='transaction_type',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Filter by type (DEPOSIT, WITHDRAWAL)',
+                enum=['DEPOSIT', 'WITHDRAWAL'],
+            ),
+            OpenApiParameter(
+                name='status',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Filter by status',
+                enum=['PENDING', 'SUCCESS', 'FAILED', 'REVERSED'],
+            ),
+            OpenApiParameter(
+                name='payment_method',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Filter by payment method',
+            ),
+            OpenApiParameter(
+                name='start_date',
+                type=OpenApiTypes.DATE,
+                location=OpenApiParameter.QUERY,
+                description='Filter from date (ISO format)',
+            ),
+            OpenApiParameter(
+                name='end_date',
+                type=OpenApiTypes.DATE,
+                location=OpenApiParameter.QUERY,
+                description='Filter to date (ISO format)',
+            ),
+        ],
+        responses={
+            200: {'description': 'Transaction export stream'},
+            400: {'description': 'Unsupported export format'},
+            401: {'description': 'Authentication required'},
+        },
+    )
+    @action(detail=False, methods=['get'])
+    @method_decorator(ratelimit(key='user', rate='10/h', method='GET'))
+    def export(self, request):
+        """Stream filtered transactions without pagination or serializer overhead"""
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in TRANSACTION_EXPORT_FORMATS:
+            return error_response(
+                f'Unsupported export format. Use one of: {", ".join(TRANSACTION_EXPORT_FORMATS)}.',
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        # values_list + iterator() uses a server-side cursor on PostgreSQL, so
+        # only one chunk of plain tuples is held in memory at a time.
+        rows = self.filter_queryset(self.get_queryset()).values_list(
+            *TRANSACTION_EXPORT_FIELDS
+        ).iterator(chunk_size=TRANSACTION_EXPORT_CHUNK_SIZE)
+
+        content_type, stream = TRANSACTION_EXPORT_FORMATS[export_format]
+        filename = f"transactions_{timezone.now():%Y%m%d_%H%M%S}.{export_format}"
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @extend_schema(
+        tags=['Payments'],
+        summary='Transaction Summary',
+        description='Get successful deposit/withdrawal totals per day or month. '
+                    'Reads the daily rollup table, so cost grows with days rather than transactions. '
+                    'Staff users can pass all_users=true for platform-wide totals.',
+        parameters=[
+            OpenApiParameter(
+                name='period',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Grouping period (default: day)',
+                enum=['day', 'month'],
+            ),
+            OpenApiParameter(
+                name='transaction_type',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Filter by type (DEPOSIT, WITHDRAWAL)',
+                enum=['DEPOSIT', 'WITHDRAWAL'],
+            ),
+            OpenApiParameter(
+                name='start_date',
+                type=OpenApiTypes.DATE,
+                location=OpenApiParameter.QUERY,
+                description='Filter from date (YYYY-MM-DD)',
+            ),
+            OpenApiParameter(
+                name='end_date',
+                type=OpenApiTypes.DATE,
+                location=OpenApiParameter.QUERY,
+                description='Filter to date (YYYY-MM-DD)',
+            ),
+            OpenApiParameter(
+                name='all_users',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description='Aggregate across all users (staff only)',
+            ),
+        ],
+        responses={
+            200: {
+                'description': 'Summary retrieved successfully',
+                'examples': {
+                    'application/json': {
+                        'period': 'month',
+                        'summary': [
+                            {
+                                'period': '2025-01-01',
+                                'transaction_type': 'DEPOSIT',
+                                'transaction_count': 4,
+                                'total_amount': '25000.00',
+                                'total_fee': '0.00',
+                                'total_net_amount': '25000.00',
+                            }
+                        ],
+                        'totals': {
+                            'DEPOSIT': {'transaction_count': 4, 'total_amount': '25000.00'},
+                        },
+                    }
+                }
+            },
+            400: {'description': 'Invalid filter'},
+            401: {'description': 'Authentication required'},
+        },
+    )
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Summarise successful transactions from the daily rollup"""
+        period = request.query_params.get('period', 'day').lower()
+        if period not in ('day', 'month'):
+            return error_response('Invalid period. Use "day" or "month".', status_code=status.HTTP_400_BAD_REQUEST)
+
+        queryset = DailyTransactionSummary.objects.all()
+        all_users = request.query_params.get('all_users', '').lower() in ('true', '1', 'yes')
+        if not (all_users and request.user.is_staff):
+            queryset = queryset.filter(user=request.user)
+
+        transaction_type = request.query_params.get('transaction_type')
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+
+        for param, lookup in (('start_date', 'date__gte'), ('end_date', 'date__lte')):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                return error_response(f'Invalid {param}. Use the YYYY-MM-DD format.', status_code=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(**{lookup: parsed})
+
+        bucket = TruncMonth('date') if period == 'month' else F('date')
+        rows = queryset.annotate(bucket=bucket).values('bucket', 'transaction_type').annotate(
+            count=Sum('transaction_count'),
+            amount=Sum('total_amount'),
+            fee=Sum('total_fee'),
+            net_amount=Sum('total_net_amount'),
+        ).order_by('-bucket', 'transaction_type')
+
+        summary = []
+        totals = {}
+        for row in rows:
+            summary.append({
+                'period': row['bucket'].isoformat(),
+                'transaction_type': row['transaction_type'],
+                'transaction_count': row['count'],
+                'total_amount': str(row['amount']),
+                'total_fee': str(row['fee']),
+                'total_net_amount': str(row['net_amount']),
+            })
+            total = totals.setdefault(row['transaction_type'], {
+                'transaction_count': 0,
+                'total_amount': ZERO,
+                'total_fee': ZERO,
+                'total_net_amount': ZERO,
+            })
+            total['transaction_count'] += row['count']
+            total['total_amount'] += row['amount']
+            total['total_fee'] += row['fee']
+            total['total_net_amount'] += row['net_amount']
+
+        for total in totals.values():
+            for key in ('total_amount', 'total_fee', 'total_net_amount'):
+                total[key] = str(total[key])
+
+        return success_response(
+            data={'period': period, 'summary': summary, 'totals': totals},
+            message='Transaction summary retrieved successfully'
+        )
+
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -765,7 +779,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     def list(self, request, *args, **kwargs):
         """List notifications"""
         queryset = self.get_queryset()
-        unread_count = queryset.filter(is_read=False).count()
+        # Total unread for the user, served from the counter row instead of a COUNT
+        unread_count = NotificationCounter.get_unread_count(request.user.pk)
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -791,9 +806,17 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         """Mark notification as read"""
         notification = self.get_object()
         if not notification.is_read:
+            read_at = timezone.now()
+            with db_transaction.atomic():
+                # Conditional update so concurrent mark-read calls decrement only once
+                updated = Notification.objects.filter(
+                    pk=notification.pk,
+                    is_read=False
+                ).update(is_read=True, read_at=read_at)
+                if updated:
+                    NotificationCounter.adjust(request.user.pk, -updated)
             notification.is_read = True
-            notification.read_at = timezone.now()
-            notification.save()
+            notification.read_at = read_at
         serializer = self.get_serializer(notification)
         return success_response(data=serializer.data, message='Notification retrieved successfully')
     
@@ -805,33 +828,57 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        updated = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        with db_transaction.atomic():
+            updated = Notification.objects.filter(
+                user=request.user,
+                is_read=False
+            ).update(
+                is_read=True,
+                read_at=timezone.now()
+            )
+            NotificationCounter.adjust(request.user.pk, -updated)
         return success_response(
             data={'updated_count': updated},
             message=f'{updated} notifications marked as read'
         )
+    
+    @extend_schema(
+        tags=['Payments'],
+        summary='Get Unread Notification Count',
+        description='Lightweight endpoint returning the number of unread notifications for the authenticated user.',
+        responses={
+            200: {'description': 'Unread count retrieved successfully'},
+            401: {'description': 'Authentication required'},
+        },
+    )
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """Get unread notification count"""
+        unread_count = NotificationCounter.get_unread_count(request.user.pk)
+        return success_response(
+            data={'unread_count': unread_count},
+            message='Unread count retrieved successfully'
+        )
 
 
 @extend_schema(
     tags=['Payments'],
     summary='Create Transfer Recipient',
     description='Create a transfer recipient for withdrawals.',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request=CreateTransferRecipientSerializer,
     responses={
         201: TransferRecipientSerializer,
         400: {'description': 'Validation error'},
         401: {'description': 'Authentication required'},
+        429: {'description': 'Too many bank accounts added recently'},
+        503: {'description': 'Paystack temporarily unavailable; safe to retry'},
     },
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @ratelimit(key='user', rate='20/h', method='POST')
+@idempotent('create_transfer_recipient')
 def create_transfer_recipient(request):
     """Create transfer recipient"""
     serializer = CreateTransferRecipientSerializer(data=request.data)
@@ -839,6 +886,12 @@ def create_transfer_recipient(request):
     if not serializer.is_valid():
         return validation_error_response(serializer.errors, message='Validation error')
     
+    # Every attempt counts, so the limit also slows down account-number probing
+    try:
+        VelocityEngine().consume('recipient_create', {'user': request.user.pk})
+    except VelocityLimitExceeded as e:
+        return error_response(str(e), status_code=status.HTTP_429_TOO_MANY_REQUESTS)
+    
     try:
         paystack_client = PaystackClient()
         response = paystack_client.create_transfer_recipient(
@@ -854,7 +907,7 @@ def create_transfer_recipient(request):
             # Provide user-friendly error messages
             if 'already exists' in error_message.lower() or 'duplicate' in error_message.lower():
                 error_message = 'Bank account details already exist. Please use a different account or check your existing recipients.'
-            return error_response(error_message, status_code=status.HTTP_400_BAD_REQUEST)
+            return error_response(error_message, status_code=paystack_error_status(response))
         
         recipient_data = response['data']
         
@@ -930,6 +983,7 @@ def list_transfer_recipients(request):
     tags=['Payments'],
     summary='Create Transfer',
     description='Create a transfer (withdrawal) to a recipient. Balance will be deducted immediately.',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request=CreateTransferSerializer,
     responses={
         200: {
@@ -943,13 +997,17 @@ def list_transfer_recipients(request):
                 }
             }
         },
-        400: {'description': 'Validation error or insufficient balance'},
+        202: {'description': 'Transfer submitted; Paystack has not confirmed it yet'},
+        400: {'description': 'Validation error, insufficient balance or transfer refused by Paystack'},
         401: {'description': 'Authentication required'},
+        429: {'description': 'Withdrawal velocity limit reached'},
+        503: {'description': 'Paystack temporarily unavailable; nothing was sent and it is safe to retry'},
     },
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @ratelimit(key='user', rate='20/h', method='POST')
+@idempotent('create_transfer')
 def create_transfer(request):
     """Create transfer (withdrawal)"""
     serializer = CreateTransferSerializer(data=request.data)
@@ -965,22 +1023,23 @@ def create_transfer(request):
     if balance < amount:
         return error_response('Insufficient balance. Please add funds to your account before making a withdrawal.', status_code=status.HTTP_400_BAD_REQUEST)
     
-    # Generate unique reference (ensure uniqueness)
-    max_attempts = 10
-    reference = None
-    for attempt in range(max_attempts):
-        reference = f"TXN_{uuid.uuid4().hex[:12].upper()}"
-        if not Transaction.objects.filter(reference=reference).exists():
-            break
-        if attempt == max_attempts - 1:
-            logger.error(f"Failed to generate unique transaction reference after {max_attempts} attempts")
-            return error_response('Unable to process payment request. Please try again.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # Velocity limits come from per-window counter rows, not aggregate queries
+    velocity = VelocityEngine()
+    try:
+        velocity_hits = velocity.consume('withdrawal', {'user': request.user.pk, 'recipient': recipient_code}, amount)
+    except VelocityLimitExceeded as e:
+        return error_response(str(e), status_code=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    # Time-ordered, globally unique reference; no database probe needed
+    reference = generate_reference('TXN')
     
     try:
-        # Use database transaction to ensure atomicity
+        # The debit and the PENDING withdrawal are committed before Paystack is
+        # called, so a transfer Paystack may have made always has a record
         with db_transaction.atomic():
             # Deduct balance immediately
             if not deduct_balance(request.user, amount, reference):
+                velocity.release(velocity_hits)
                 return error_response('Insufficient balance. Please add funds to your account before making a withdrawal.', status_code=status.HTTP_400_BAD_REQUEST)
             
             # Create pending transaction
@@ -990,103 +1049,200 @@ def create_transfer(request):
                 status='PENDING',
                 payment_method='PAYSTACK_BALANCE',
                 amount=amount,
-                fee=Decimal('0.00'),
+                fee=ZERO,
                 net_amount=amount,
                 reference=reference,
                 description=f'Transfer to {recipient_code}',
             )
-            
-            # Create Paystack transfer
-            paystack_client = PaystackClient()
-            response = paystack_client.create_transfer(
-                source='balance',
-                amount=amount,
-                recipient=recipient_code,
-                reason=serializer.validated_data.get('reason'),
-                reference=reference,
-                currency=serializer.validated_data.get('currency', 'NGN'),
-            )
-            
-            if not response.get('status'):
-                # Reverse balance if transfer creation failed
-                add_balance(request.user, amount, reference)
-                transaction_obj.status = 'FAILED'
-                transaction_obj.save()
-                
-                return error_response(response.get('message', 'Failed to create transfer'), status_code=status.HTTP_400_BAD_REQUEST)
-            
-            transfer_data = response['data']
-            
-            # Update transaction with Paystack details
-            transaction_obj.paystack_transaction_id = transfer_data.get('transfer_code', '')
-            transaction_obj.paystack_reference = transfer_data.get('reference', reference)
-            transaction_obj.metadata.update(transfer_data)
-            
-            # Check if OTP is required
-            otp_required = 'otp' in transfer_data
-            
-            if otp_required:
-                transaction_obj.status = 'PROCESSING'
+    except Exception as e:
+        # Rolled back; nothing was debited or sent
+        logger.error(f"Error creating transfer: {e}", exc_info=True)
+        velocity.release(velocity_hits)
+        return error_response('Unable to process withdrawal at this time. Please try again later.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    try:
+        paystack_client = PaystackClient()
+        response = paystack_client.create_transfer(
+            source='balance',
+            amount=amount,
+            recipient=recipient_code,
+            reason=serializer.validated_data.get('reason'),
+            reference=reference,
+            currency=serializer.validated_data.get('currency', 'NGN'),
+        )
+    except Exception as e:
+        logger.error(f"Error creating transfer {reference}: {e}", exc_info=True)
+        response = {'status': False, 'message': str(e)}
+    
+    if not response.get('status'):
+        if paystack_outcome_unknown(response):
+            # Paystack may have made the transfer; the withdrawal stays PENDING
+            # until a webhook or sync_pending_withdrawals looks it up by reference
+            logger.warning(f"Outcome of transfer {reference} unknown: {response.get('message')}")
+            return _transfer_submitted_response(reference)
+        
+        # Paystack refused the transfer, so the debit is returned
+        settle_withdrawal(transaction_obj.pk, 'FAILED', 'transfer', reason=response.get('message'), notify=False)
+        velocity.release(velocity_hits)
+        return error_response(response.get('message', 'Failed to create transfer'), status_code=paystack_error_status(response))
+    
+    try:
+        transfer_data = response['data']
+        
+        # Update transaction with Paystack details
+        transaction_obj.paystack_transaction_id = transfer_data.get('transfer_code', '')
+        transaction_obj.paystack_reference = transfer_data.get('reference', reference)
+        record_payload(transaction_obj, 'transfer', transfer_data)
+        
+        # Check if OTP is required
+        otp_required = 'otp' in transfer_data
+        
+        if otp_required:
+            transaction_obj.status = 'PROCESSING'
+            with db_transaction.atomic():
                 transaction_obj.save()
                 
                 # Create notification
-                Notification.objects.create(
+                enqueue_notification(
                     user=request.user,
                     notification_type='TRANSFER_PENDING',
                     title='Transfer Initiated',
                     message=f'Your transfer of ₦{amount:,.2f} requires OTP verification',
                     related_transaction=transaction_obj,
                 )
-                
-                return success_response(
-                    data={
-                        'transfer_code': transfer_data.get('transfer_code', ''),
-                        'reference': reference,
-                        'status': 'processing',
-                        'otp_required': True,
-                    },
-                    message='Transfer created. OTP required.'
-                )
-            else:
-                transaction_obj.status = 'SUCCESS'
-                transaction_obj.completed_at = timezone.now()
+            
+            return success_response(
+                data={
+                    'transfer_code': transfer_data.get('transfer_code', ''),
+                    'reference': reference,
+                    'status': 'processing',
+                    'otp_required': True,
+                },
+                message='Transfer created. OTP required.'
+            )
+        else:
+            transaction_obj.status = 'SUCCESS'
+            transaction_obj.completed_at = timezone.now()
+            with db_transaction.atomic():
                 transaction_obj.save()
                 
                 # Create notification
-                Notification.objects.create(
+                enqueue_notification(
                     user=request.user,
                     notification_type='WITHDRAWAL_SUCCESS',
                     title='Transfer Successful',
                     message=f'Your transfer of ₦{amount:,.2f} was successful',
                     related_transaction=transaction_obj,
                 )
-                
-                return success_response(
-                    data={
-                        'transfer_code': transfer_data.get('transfer_code', ''),
-                        'reference': reference,
-                        'status': 'success',
-                        'otp_required': False,
-                    },
-                    message='Transfer created successfully'
-                )
             
+            return success_response(
+                data={
+                    'transfer_code': transfer_data.get('transfer_code', ''),
+                    'reference': reference,
+                    'status': 'success',
+                    'otp_required': False,
+                },
+                message='Transfer created successfully'
+            )
+    
     except Exception as e:
-        logger.error(f"Error creating transfer: {e}", exc_info=True)
-        # Reverse balance if error occurred (reference might not exist if error occurred early)
-        try:
-            if 'reference' in locals():
-                add_balance(request.user, amount, reference)
-        except:
-            pass
-        
-        return error_response('Unable to process withdrawal at this time. Please try again later.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Paystack accepted the transfer; the PENDING withdrawal is settled by
+        # its webhook or sync_pending_withdrawals, never refunded here
+        logger.error(f"Error recording transfer {reference}: {e}", exc_info=True)
+        return _transfer_submitted_response(reference)
+
+
+def _transfer_submitted_response(reference):
+    """
+    Final answer for a withdrawal whose Paystack outcome is not known yet.
+    
+    It is stored against the Idempotency-Key like any other outcome, so a
+    retry is shown the same pending withdrawal instead of making a new one.
+    """
+    return success_response(
+        data={
+            'transfer_code': '',
+            'reference': reference,
+            'status': 'pending',
+            'otp_required': False,
+        },
+        message='Transfer submitted. Its outcome will be confirmed shortly.',
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+@extend_schema(
+    tags=['Payments'],
+    summary='Wallet Transfer',
+    description='Send money from your balance to another Xcellar user (for example, tipping a courier). '
+                'Both balances are updated immediately; no bank transfer is involved.',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
+    request=WalletTransferSerializer,
+    responses={
+        200: {
+            'description': 'Transfer completed',
+            'examples': {
+                'application/json': {
+                    'reference': 'TXN_01HV6Z8Q9R7K3M2N4P5S6T7V8W',
+                    'transfer_reference': 'WTR_01HV6Z8Q9R7K3M2N4P5S6T7V8X',
+                    'amount': '500.00',
+                    'recipient': 'courier@example.com',
+                }
+            }
+        },
+        400: {'description': 'Validation error or insufficient balance'},
+        401: {'description': 'Authentication required'},
+        404: {'description': 'Recipient not found'},
+    },
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@ratelimit(key='user', rate='60/h', method='POST')
+@idempotent('wallet_transfer')
+def wallet_transfer(request):
+    """Transfer money to another user's wallet"""
+    serializer = WalletTransferSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return validation_error_response(serializer.errors, message='Validation error')
+    
+    recipient_lookup = serializer.validated_data['recipient'].strip()
+    recipient = get_user_model().objects.filter(
+        Q(email__iexact=recipient_lookup) | Q(phone_number=recipient_lookup),
+        is_active=True
+    ).first()
+    if recipient is None:
+        return not_found_response('Recipient not found.')
+    
+    try:
+        debit, credit = transfer_between_wallets(
+            sender=request.user,
+            recipient=recipient,
+            amount=serializer.validated_data['amount'],
+            note=serializer.validated_data.get('note', ''),
+        )
+    except WalletError as e:
+        return error_response(str(e), status_code=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error creating wallet transfer: {e}", exc_info=True)
+        return error_response('Unable to process transfer at this time. Please try again later.', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return success_response(
+        data={
+            'reference': debit.reference,
+            'transfer_reference': debit.metadata['transfer_reference'],
+            'amount': str(debit.amount),
+            'recipient': recipient.email,
+        },
+        message='Transfer completed successfully'
+    )
 
 
 @extend_schema(
     tags=['Payments'],
     summary='Finalize Transfer',
     description='Finalize a transfer with OTP.',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request=FinalizeTransferSerializer,
     responses={
         200: {
@@ -1100,11 +1256,13 @@ def create_transfer(request):
         },
         400: {'description': 'Invalid OTP or transfer code'},
         401: {'description': 'Authentication required'},
+        503: {'description': 'Paystack temporarily unavailable; safe to retry'},
     },
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @ratelimit(key='user', rate='20/h', method='POST')
+@idempotent('finalize_transfer')
 def finalize_transfer(request):
     """Finalize transfer with OTP"""
     serializer = FinalizeTransferSerializer(data=request.data)
@@ -1120,7 +1278,7 @@ def finalize_transfer(request):
         response = paystack_client.finalize_transfer(transfer_code, otp)
         
         if not response.get('status'):
-            return error_response(response.get('message', 'Failed to finalize transfer'), status_code=status.HTTP_400_BAD_REQUEST)
+            return error_response(response.get('message', 'Failed to finalize transfer'), status_code=paystack_error_status(response))
         
         # Find and update transaction
         transfer_data = response['data']
@@ -1134,16 +1292,17 @@ def finalize_transfer(request):
             
             transaction_obj.status = 'SUCCESS'
             transaction_obj.completed_at = timezone.now()
-            transaction_obj.save()
-            
-            # Create notification
-            Notification.objects.create(
-                user=request.user,
-                notification_type='WITHDRAWAL_SUCCESS',
-                title='Transfer Successful',
-                message=f'Your transfer of ₦{transaction_obj.amount:,.2f} was successful',
-                related_transaction=transaction_obj,
-            )
+            with db_transaction.atomic():
+                transaction_obj.save()
+                
+                # Create notification
+                enqueue_notification(
+                    user=request.user,
+                    notification_type='WITHDRAWAL_SUCCESS',
+                    title='Transfer Successful',
+                    message=f'Your transfer of ₦{transaction_obj.amount:,.2f} was successful',
+                    related_transaction=transaction_obj,
+                )
             
             return success_response(
                 data={'status': 'success'},
@@ -193,6 +193,19 @@ CACHES = {
     }
 }
 
+# Balance Cache
+# Read-through cache of wallet balances, invalidated by every balance change
+# (see apps.core.utils.get_user_balance).
+# Requires a cache shared by all web and worker processes.
+BALANCE_CACHE_ENABLED = os.environ.get('BALANCE_CACHE_ENABLED', 'True').lower() == 'true'
+BALANCE_CACHE_TIMEOUT = int(os.environ.get('BALANCE_CACHE_TIMEOUT', 300))  # seconds
+
+# Idempotency Keys
+# Stored responses for requests sent with an Idempotency-Key header (see apps.core.idempotency)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 86400))  # seconds
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 120))  # seconds, must exceed the slowest request
+IDEMPOTENCY_WAIT_TIMEOUT = int(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', 5))  # seconds a duplicate waits for the original
+
 # Session Cache
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -215,8 +228,18 @@ CELERY_TASK_DEFAULT_ROUTING_KEY = 'default'
 # Task routing
 CELERY_TASK_ROUTES = {
     'apps.payments.tasks.process_dva_deposit': {'queue': 'high_priority'},
+    'apps.payments.tasks.process_dva_deposit_batch': {'queue': 'high_priority'},
+    'apps.payments.tasks.relay_outbox_events': {'queue': 'high_priority'},
     'apps.payments.tasks.verify_dva_transaction': {'queue': 'medium_priority'},
     'apps.payments.tasks.sync_pending_dva_transactions': {'queue': 'low_priority'},
+    'apps.payments.tasks.sync_pending_withdrawals': {'queue': 'low_priority'},
+    'apps.payments.tasks.reconcile_notification_counters': {'queue': 'low_priority'},
+    'apps.core.tasks.purge_expired_idempotency_records': {'queue': 'low_priority'},
+    'apps.payments.tasks.purge_expired_velocity_counters': {'queue': 'low_priority'},
+    'apps.payments.tasks.settle_courier_earnings': {'queue': 'low_priority'},
+    'apps.payments.tasks.process_courier_payouts': {'queue': 'low_priority'},
+    'apps.payments.tasks.provision_dedicated_account': {'queue': 'medium_priority'},
+    'apps.payments.tasks.check_dva_assignment': {'queue': 'medium_priority'},
 }
 
 # Task retry configuration
@@ -232,6 +255,119 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', '').strip()
 PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', '').strip()
 PAYSTACK_WEBHOOK_SECRET = os.environ.get('PAYSTACK_WEBHOOK_SECRET', '').strip()
+# Override to point the Paystack clients at a local stand-in (see run_fake_paystack)
+PAYSTACK_BASE_URL = os.environ.get('PAYSTACK_BASE_URL', 'https://api.paystack.co').strip().rstrip('/')
+
+# Bank Directory (apps.core.services.bank_directory)
+# Seconds between background refreshes of the bank list from Paystack; 0 uses
+# the bundled nigerian_banks.json only.
+BANK_DIRECTORY_TTL = int(os.environ.get('BANK_DIRECTORY_TTL', 86400))
+
+# Account Resolution Cache (PaystackAccountVerification.resolve_account)
+RESOLVE_ACCOUNT_CACHE_TTL = int(os.environ.get('RESOLVE_ACCOUNT_CACHE_TTL', 86400))  # seconds, resolved accounts
+RESOLVE_ACCOUNT_NEGATIVE_CACHE_TTL = int(os.environ.get('RESOLVE_ACCOUNT_NEGATIVE_CACHE_TTL', 60))  # seconds, unresolvable accounts
+
+# Transactional Outbox (apps.payments.services.outbox)
+# Notifications and task requests are written with the state change and
+# published by relay_outbox_events; the first event of a burst schedules a
+# relay OUTBOX_RELAY_WINDOW seconds after its transaction commits
+OUTBOX_RELAY_WINDOW = int(os.environ.get('OUTBOX_RELAY_WINDOW', 1))  # seconds, 0 relays immediately
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 200))
+OUTBOX_MAX_BATCHES_PER_RUN = int(os.environ.get('OUTBOX_MAX_BATCHES_PER_RUN', 50))
+# Failed sends back off from OUTBOX_RETRY_DELAY, doubling per attempt
+OUTBOX_RETRY_DELAY = int(os.environ.get('OUTBOX_RETRY_DELAY', 30))  # seconds
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+
+# DVA Deposit Batching (apps.payments.services.deposits)
+# charge.success webhooks are queued and credited in batches; each webhook
+# requests a drain through the outbox, coalesced to one per relay batch
+DVA_DEPOSIT_BATCH_SIZE = int(os.environ.get('DVA_DEPOSIT_BATCH_SIZE', 200))
+DVA_DEPOSIT_MAX_BATCHES_PER_RUN = int(os.environ.get('DVA_DEPOSIT_MAX_BATCHES_PER_RUN', 50))
+# Deposits for unknown users are retried this often, up to the attempt limit
+DVA_DEPOSIT_RETRY_DELAY = int(os.environ.get('DVA_DEPOSIT_RETRY_DELAY', 300))  # seconds
+DVA_DEPOSIT_MAX_ATTEMPTS = int(os.environ.get('DVA_DEPOSIT_MAX_ATTEMPTS', 5))
+
+# Deposit Verification (apps.payments.tasks.verify_dva_transaction)
+# Each deposit created by initialize_payment is verified DEPOSIT_VERIFY_DELAY
+# seconds later and re-checked with doubling delays while Paystack reports it
+# pending; sync_pending_dva_transactions sweeps deposits the chain gave up on
+DEPOSIT_VERIFY_DELAY = int(os.environ.get('DEPOSIT_VERIFY_DELAY', 30))  # seconds, doubles per check
+DEPOSIT_VERIFY_MAX_ATTEMPTS = int(os.environ.get('DEPOSIT_VERIFY_MAX_ATTEMPTS', 6))
+DEPOSIT_SWEEP_MIN_AGE = int(os.environ.get('DEPOSIT_SWEEP_MIN_AGE', 3600))  # seconds, past the end of the chain
+DEPOSIT_SWEEP_MAX_AGE = int(os.environ.get('DEPOSIT_SWEEP_MAX_AGE', 86400))  # seconds, abandoned payments are not re-checked after this
+DEPOSIT_SWEEP_BATCH_SIZE = int(os.environ.get('DEPOSIT_SWEEP_BATCH_SIZE', 50))
+
+# Withdrawal Sync (apps.payments.tasks.sync_pending_withdrawals)
+# Withdrawals whose create_transfer call got no definite answer stay PENDING;
+# once older than WITHDRAWAL_SWEEP_MIN_AGE they are looked up on Paystack by
+# reference and settled, or refunded if Paystack never made the transfer
+WITHDRAWAL_SWEEP_MIN_AGE = int(os.environ.get('WITHDRAWAL_SWEEP_MIN_AGE', 600))  # seconds
+WITHDRAWAL_SWEEP_BATCH_SIZE = int(os.environ.get('WITHDRAWAL_SWEEP_BATCH_SIZE', 50))
+
+# DVA Provisioning (apps.payments.services.dva_provisioning)
+# An in-flight request not updated for DVA_PROVISIONING_STALE_AFTER seconds is restarted
+DVA_PROVISIONING_STALE_AFTER = int(os.environ.get('DVA_PROVISIONING_STALE_AFTER', 600))
+# Fallback polling while an assignment awaits the dedicatedaccount.assign.success webhook
+DVA_ASSIGNMENT_CHECK_INTERVAL = int(os.environ.get('DVA_ASSIGNMENT_CHECK_INTERVAL', 15))  # seconds, grows per check
+DVA_ASSIGNMENT_MAX_CHECKS = int(os.environ.get('DVA_ASSIGNMENT_MAX_CHECKS', 5))
+
+# Courier Payouts (apps.payments.services.payouts)
+# Courier balances at or above the minimum are swept nightly to their latest
+# transfer recipient through Paystack bulk transfers (requires OTP disabled).
+COURIER_AUTO_PAYOUT_ENABLED = os.environ.get('COURIER_AUTO_PAYOUT_ENABLED', 'True').lower() == 'true'
+COURIER_PAYOUT_MIN_AMOUNT = os.environ.get('COURIER_PAYOUT_MIN_AMOUNT', '1000.00')  # NGN
+COURIER_PAYOUT_MAX_ATTEMPTS = int(os.environ.get('COURIER_PAYOUT_MAX_ATTEMPTS', 5))
+PAYSTACK_BULK_TRANSFER_BATCH_SIZE = int(os.environ.get('PAYSTACK_BULK_TRANSFER_BATCH_SIZE', 100))  # Paystack maximum
+
+# Courier Earnings Settlement (apps.payments.services.settlement)
+# Share of an order's delivery fee paid to the courier, and how long after
+# delivery an order waits before it is settled.
+COURIER_PAYOUT_RATE = os.environ.get('COURIER_PAYOUT_RATE', '0.80')
+COURIER_SETTLEMENT_HOLD_HOURS = int(os.environ.get('COURIER_SETTLEMENT_HOLD_HOURS', 0))
+
+# Withdrawal Velocity Limits (apps.payments.services.velocity)
+# Sliding-window counters in the velocity_counters table (not the cache, which
+# is per-process in production), checked on every withdrawal and bank account
+# creation. Set a limit to 0 to disable that rule.
+VELOCITY_LIMITS_ENABLED = os.environ.get('VELOCITY_LIMITS_ENABLED', 'True').lower() == 'true'
+WITHDRAWAL_USER_MAX_COUNT_PER_HOUR = int(os.environ.get('WITHDRAWAL_USER_MAX_COUNT_PER_HOUR', 10))
+WITHDRAWAL_USER_MAX_AMOUNT_PER_DAY = os.environ.get('WITHDRAWAL_USER_MAX_AMOUNT_PER_DAY', '1000000.00')  # NGN
+WITHDRAWAL_RECIPIENT_MAX_COUNT_PER_DAY = int(os.environ.get('WITHDRAWAL_RECIPIENT_MAX_COUNT_PER_DAY', 10))
+WITHDRAWAL_RECIPIENT_MAX_AMOUNT_PER_DAY = os.environ.get('WITHDRAWAL_RECIPIENT_MAX_AMOUNT_PER_DAY', '500000.00')  # NGN
+TRANSFER_RECIPIENT_MAX_CREATES_PER_DAY = int(os.environ.get('TRANSFER_RECIPIENT_MAX_CREATES_PER_DAY', 5))
+
+# Paystack Rate Governor (apps.payments.services.paystack_governor)
+# Token bucket in Redis shared by every process calling Paystack. Background
+# calls (sweeps, payouts, provisioning) leave PAYSTACK_BACKGROUND_RESERVE of
+# the burst for interactive calls. Without Redis each process falls back to
+# its own bucket at PAYSTACK_RATE_LOCAL_SHARE of the rate, so the limit is
+# per worker: N processes may send N x share x PAYSTACK_RATE_LIMIT per second.
+PAYSTACK_RATE_GOVERNOR_ENABLED = os.environ.get('PAYSTACK_RATE_GOVERNOR_ENABLED', 'True').lower() == 'true'
+PAYSTACK_RATE_LIMIT = float(os.environ.get('PAYSTACK_RATE_LIMIT', 20))  # requests per second
+PAYSTACK_RATE_BURST = int(os.environ.get('PAYSTACK_RATE_BURST', 40))
+PAYSTACK_BACKGROUND_RESERVE = float(os.environ.get('PAYSTACK_BACKGROUND_RESERVE', 0.5))  # fraction of the burst
+PAYSTACK_RATE_LOCAL_SHARE = float(os.environ.get('PAYSTACK_RATE_LOCAL_SHARE', 0.25))
+PAYSTACK_INTERACTIVE_MAX_WAIT = float(os.environ.get('PAYSTACK_INTERACTIVE_MAX_WAIT', 2))  # seconds
+PAYSTACK_BACKGROUND_MAX_WAIT = float(os.environ.get('PAYSTACK_BACKGROUND_MAX_WAIT', 30))  # seconds
+
+# Paystack Response Cache (apps.payments.services.paystack_client)
+# verify_transaction, verify_transfer and get_transfer responses. Terminal
+# statuses (success/failed/reversed) are kept for PAYSTACK_TERMINAL_RESPONSE_TTL
+# seconds, 0 meaning until evicted; anything else for PAYSTACK_PENDING_RESPONSE_TTL.
+PAYSTACK_RESPONSE_CACHE_ENABLED = os.environ.get('PAYSTACK_RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+PAYSTACK_TERMINAL_RESPONSE_TTL = int(os.environ.get('PAYSTACK_TERMINAL_RESPONSE_TTL', 0)) or None
+PAYSTACK_PENDING_RESPONSE_TTL = int(os.environ.get('PAYSTACK_PENDING_RESPONSE_TTL', 10))  # seconds, 0 disables
+
+# Paystack Reconciliation (apps.payments.services.reconciliation)
+# The nightly task re-checks the last PAYSTACK_RECONCILIATION_LOOKBACK_HOURS;
+# the reconcile_paystack command takes any period.
+PAYSTACK_RECONCILIATION_LOOKBACK_HOURS = int(os.environ.get('PAYSTACK_RECONCILIATION_LOOKBACK_HOURS', 48))
+PAYSTACK_RECONCILIATION_PAGE_SIZE = int(os.environ.get('PAYSTACK_RECONCILIATION_PAGE_SIZE', 100))
+
+# Reference ID Generator (apps.core.id_generator)
+# Optional 0-65535 node id; defaults to a hash of the hostname. Set explicitly
+# when several hosts could hash to the same value.
+ID_GENERATOR_NODE_ID = os.environ.get('ID_GENERATOR_NODE_ID') or None
 
 # Email Verification (OTP) Settings
 OTP_EXPIRY_MINUTES = int(os.environ.get('OTP_EXPIRY_MINUTES', 5))
@@ -38,6 +38,16 @@ CACHES = {
     }
 }
 
+# Balance cache - LocMemCache is per-process, so write-through updates would not
+# reach other workers. Re-enable once a shared cache (Redis) is configured.
+BALANCE_CACHE_ENABLED = os.environ.get('BALANCE_CACHE_ENABLED', 'False').lower() == 'true'
+
+# Paystack rate governor - without Redis each worker process has its own token
+# bucket at PAYSTACK_RATE_LOCAL_SHARE of PAYSTACK_RATE_LIMIT, so the combined
+# rate is (processes x share x limit). Keep share x processes <= 1 to stay
+# under Paystack's limit; the shared bucket returns once Redis is configured.
+PAYSTACK_RATE_LOCAL_SHARE = float(os.environ.get('PAYSTACK_RATE_LOCAL_SHARE', 0.25))
+
 # Session - Use database-backed sessions instead of cache
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 